@@ -1,87 +1,94 @@
 """
-MaxKB 代理API - 解决CORS跨域问题 
+MaxKB 代理API - 解决CORS跨域问题
+请求体和响应体均以流的方式透传，支持 SSE（text/event-stream）逐 token 输出
 """
 from fastapi import APIRouter, Request, Response, HTTPException
 from fastapi.responses import StreamingResponse
+import anyio
 import httpx
 from typing import Optional
+from app.config import settings
+from app.infrastructure.http_client import maxkb_client
 
 router = APIRouter(tags=["MaxKB Proxy"])
-# MaxKB 配置 - 请根据实际情况修改
-MAXKB_BASE_URL = "http://192.168.1.100:8080"  # MaxKB服务地址
-MAXKB_APPLICATION_ID = "your-application-id"  # MaxKB应用ID
-# 创建httpx客户端
+# MaxKB 配置 - 通过环境变量 MAXKB_BASE_URL / MAXKB_APPLICATION_ID 修改
+MAXKB_BASE_URL = settings.MAXKB_BASE_URL  # MaxKB服务地址
+MAXKB_APPLICATION_ID = settings.MAXKB_APPLICATION_ID  # MaxKB应用ID
+
+# 不转发给上游的请求头（逐跳头）
+HOP_BY_HOP_REQUEST_HEADERS = {'host', 'connection', 'keep-alive', 'transfer-encoding', 'te', 'upgrade'}
+# 原样回传给前端的上游响应头
+PASSTHROUGH_RESPONSE_HEADERS = ['content-type', 'content-encoding', 'cache-control', 'content-disposition']
+
+class UpstreamStreamingResponse(StreamingResponse):
+    """
+    透传上游响应体的 StreamingResponse
+    iter_raw 在读完、出错或中途断开时归还并发名额；客户端在第一块数据之前断开时生成器不会启动，
+    这里在响应结束（包括被取消）时再 release 一次（重复调用无副作用）
+    """
+
+    def __init__(self, upstream: httpx.Response, **kwargs):
+        super().__init__(maxkb_client.iter_raw(upstream), **kwargs)
+        self.upstream = upstream
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await maxkb_client.release(self.upstream)
+
+
+# 获取应用级共享的httpx客户端（连接池在 lifespan 中创建）
 async def get_client():
-    return httpx.AsyncClient(timeout=60.0)
+    return maxkb_client.client
+
 
 @router.api_route("/maxkb/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
 async def proxy_maxkb(request: Request, path: str):
     """
     代理转发请求到MaxKB服务
     这样前端就不会遇到CORS问题
+
+    请求体边读边发，上游响应边收边回，不在内存中缓存完整内容，
+    首字节延迟与上游一致。
     """
+    if request.method == "OPTIONS":
+        # 处理预检请求
+        return Response(
+            status_code=200,
+            headers={
+                "Access-Control-Allow-Origin": "*",
+                "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+                "Access-Control-Allow-Headers": "*"
+            }
+        )
+    if request.method not in ("GET", "POST", "PUT", "DELETE"):
+        raise HTTPException(status_code=405, detail="Method not allowed")
+
     # 构建目标URL
     target_url = f"{MAXKB_BASE_URL}/api/{path}"
     # 获取请求头
+    # 保留 content-length：httpx 收到异步流作为请求体时，有长度就不会改用 chunked 编码
     headers = {}
     for key, value in request.headers.items():
-        # 跳过一些不需要转发的头
-        if key.lower() not in ['host', 'content-length', 'connection']:
+        if key.lower() not in HOP_BY_HOP_REQUEST_HEADERS:
             headers[key] = value
     # 获取查询参数
     query_params = dict(request.query_params)
+    # 只有 POST/PUT 携带请求体，直接把 ASGI 接收流交给 httpx
+    content = request.stream() if request.method in ("POST", "PUT") else None
+
+    client = await get_client()
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            # 根据请求方法转发
-            if request.method == "GET":
-                response = await client.get(
-                    target_url,
-                    headers=headers,
-                    params=query_params
-                )
-            elif request.method == "POST":
-                body = await request.body()
-                response = await client.post(
-                    target_url,
-                    headers=headers,
-                    params=query_params,
-                    content=body
-                )
-            elif request.method == "PUT":
-                body = await request.body()
-                response = await client.put(
-                    target_url,
-                    headers=headers,
-                    params=query_params,
-                    content=body
-                )
-            elif request.method == "DELETE":
-                response = await client.delete(
-                    target_url,
-                    headers=headers,
-                    params=query_params
-                )
-            elif request.method == "OPTIONS":
-                # 处理预检请求
-                return Response(
-                    status_code=200,
-                    headers={
-                        "Access-Control-Allow-Origin": "*",
-                        "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-                        "Access-Control-Allow-Headers": "*"
-                    }
-                )
-            else:
-                raise HTTPException(status_code=405, detail="Method not allowed")
-            # 返回响应
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                headers={
-                    "Content-Type": response.headers.get("content-type", "application/json"),
-                    "Access-Control-Allow-Origin": "*"
-                }
-            )
+        upstream_request = client.build_request(
+            request.method,
+            target_url,
+            headers=headers,
+            params=query_params,
+            content=content
+        )
+        response = await maxkb_client.send(upstream_request)
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="MaxKB服务超时")
     except httpx.ConnectError:
@@ -89,6 +96,31 @@ async def proxy_maxkb(request: Request, path: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"代理请求失败: {str(e)}")
 
+    response_headers = {"Access-Control-Allow-Origin": "*"}
+    for key in PASSTHROUGH_RESPONSE_HEADERS:
+        if key in response.headers:
+            response_headers[key] = response.headers[key]
+    response_headers.setdefault("content-type", "application/json")
+    if response_headers["content-type"].startswith("text/event-stream"):
+        # SSE：禁止中间层（如 nginx）缓冲，保证逐条推送
+        response_headers["cache-control"] = "no-cache"
+        response_headers["X-Accel-Buffering"] = "no"
+
+    # 原始字节不做解压，content-encoding 原样回传给浏览器处理；
+    # 读完、出错或客户端中途断开时 iter_raw 都会归还并发名额并关闭上游响应
+    return UpstreamStreamingResponse(
+        response,
+        status_code=response.status_code,
+        headers=response_headers
+    )
+
+@router.get("/maxkb-metrics")
+async def get_maxkb_metrics():
+    """
+    MaxKB 代理连接池指标：连接占用、排队数、上游首字节延迟和总耗时
+    """
+    return maxkb_client.metrics()
+
 @router.get("/maxkb-config")
 async def get_maxkb_config():
     """
@@ -6,7 +6,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from typing import Optional, List, Dict
 from app.infrastructure.database import get_db
-from app.models.schemas import ProjectInfo, ProjectSearchResponse
+from app.models.schemas import ProjectInfo, ProjectSearchResponse, FulltextHit, FulltextSearchResponse
+from app.services.fulltext_service import fulltext_service
 
 router = APIRouter(prefix="/search", tags=["search"])
 
@@ -188,3 +189,28 @@ async def get_top_projects(
         total=total,
         items=project_items
     )
+
+
+@router.get("/fulltext", response_model=FulltextSearchResponse)
+async def search_fulltext(
+    q: str = Query(..., min_length=1, description="检索词（支持中英文）"),
+    project: Optional[str] = Query(None, description="项目名称（格式：owner/repo 或 owner_repo），为空时检索全部项目"),
+    type: Optional[str] = Query(None, pattern="^(issue|comment)$", description="只检索 issue 或 comment"),
+    top_k: int = Query(10, ge=1, le=100, description="返回数量"),
+):
+    """
+    全文检索 issue 标题/正文和评论正文（BM25 排序）
+    
+    索引由 build_fulltext_index.py 离线构建
+    """
+    project_key = None
+    if project:
+        project_key = project.replace('_', '/', 1) if '_' in project and '/' not in project else project
+    result = fulltext_service.search(q, project=project_key, doc_type=type, top_k=top_k)
+    return FulltextSearchResponse(
+        query=q,
+        available=result["available"],
+        total_hits=result["total_hits"],
+        took_ms=result["took_ms"],
+        items=[FulltextHit(**item) for item in result["items"]]
+    )
@@ -6,7 +6,10 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from typing import Optional, Dict, List
 from app.infrastructure.database import get_db
-from app.models.schemas import TrendData, ProjectSummary, ProjectTrends, ContributorsResponse, ContributorInfo, ContributorChartData
+from app.models.schemas import (
+    TrendData, ProjectSummary, ProjectTrends, ContributorsResponse, ContributorInfo, ContributorChartData,
+    CommenterInfo, TopCommentersResponse, FirstResponseIssue, FirstResponseSummary, FirstResponseResponse
+)
 from app.services.comment_service import comment_service
 
 router = APIRouter(prefix="/stats", tags=["stats"])
@@ -345,3 +348,163 @@ async def get_contributors_chart(
             values.append(other_count)
     
     return ContributorChartData(labels=labels, values=values)
+
+
+# ========== 评论统计接口 ==========
+# 均查询 import_data_folder.py 导入时构建的汇总表（comment_*_rollup / comment_first_response），
+# 每个请求只做一次主键范围扫描，不读取原始评论
+
+def _hours(seconds) -> Optional[float]:
+    return round(int(seconds) / 3600, 2) if seconds is not None else None
+
+
+@router.get("/comments/top-commenters", response_model=TopCommentersResponse)
+async def get_top_commenters(
+    project: Optional[str] = Query(None, description="项目名称（格式：owner/repo 或 owner_repo），为空时统计全部项目"),
+    top_n: int = Query(10, ge=1, le=100, description="返回 Top N 评论者"),
+    db: Session = Depends(get_db)
+):
+    """获取评论者排行"""
+    project_key = normalize_project_name(project) if project else None
+    total_commenters, total_comments, rows = 0, 0, []
+
+    try:
+        if project_key:
+            totals = db.execute(text("""
+                SELECT commenter_count, comment_count FROM comment_project_rollup WHERE project = :project
+            """), {'project': project_key}).fetchone()
+            rows = db.execute(text("""
+                SELECT user, comment_count, issue_count
+                FROM comment_user_rollup
+                WHERE project = :project
+                ORDER BY comment_count DESC
+                LIMIT :top_n
+            """), {'project': project_key, 'top_n': top_n}).fetchall()
+        else:
+            totals = db.execute(text("""
+                SELECT COUNT(*), COALESCE(SUM(comment_count), 0) FROM comment_user_total
+            """)).fetchone()
+            rows = db.execute(text("""
+                SELECT user, comment_count, project_count
+                FROM comment_user_total
+                ORDER BY comment_count DESC
+                LIMIT :top_n
+            """), {'top_n': top_n}).fetchall()
+        if totals:
+            total_commenters, total_comments = int(totals[0] or 0), int(totals[1] or 0)
+    except Exception as e:
+        print(f"Top commenters query error: {e}")
+
+    commenters = [
+        CommenterInfo(
+            username=username,
+            comment_count=int(count),
+            issue_count=int(issues),
+            percentage=round(count / total_comments * 100, 2) if total_comments else 0,
+            github_url=f"https://github.com/{username}"
+        )
+        for username, count, issues in rows
+    ]
+    return TopCommentersResponse(
+        project=project_key,
+        total_commenters=total_commenters,
+        total_comments=total_comments,
+        commenters=commenters
+    )
+
+
+@router.get("/comments/daily", response_model=TrendData)
+async def get_comments_daily(
+    project: str = Query(..., description="项目名称（格式：owner/repo 或 owner_repo）"),
+    start_date: Optional[str] = Query(None, description="开始日期（YYYY-MM-DD）"),
+    end_date: Optional[str] = Query(None, description="结束日期（YYYY-MM-DD）"),
+    db: Session = Depends(get_db)
+):
+    """获取每日评论量（values 为每日评论数，totals 为区间内累计值）"""
+    project_key = normalize_project_name(project)
+    params = {'project': project_key}
+    conditions = ["project = :project"]
+    if start_date:
+        conditions.append("date >= :start_date")
+        params['start_date'] = start_date
+    if end_date:
+        conditions.append("date <= :end_date")
+        params['end_date'] = end_date
+
+    try:
+        sql = f"""
+            SELECT date, comment_count
+            FROM comment_daily_rollup
+            WHERE {' AND '.join(conditions)}
+            ORDER BY date
+        """
+        results = db.execute(text(sql), params).fetchall()
+    except Exception as e:
+        print(f"Comments daily query error: {e}")
+        results = []
+
+    labels = [str(row[0]) for row in results]
+    values = [int(row[1]) for row in results]
+    totals = []
+    cumulative = 0
+    for daily in values:
+        cumulative += daily
+        totals.append(cumulative)
+    return TrendData(labels=labels, values=values, totals=totals)
+
+
+@router.get("/comments/first-response", response_model=FirstResponseResponse)
+async def get_first_response(
+    project: str = Query(..., description="项目名称（格式：owner/repo 或 owner_repo）"),
+    order: str = Query("slowest", pattern="^(slowest|fastest|issue)$",
+                       description="排序：slowest 最慢 / fastest 最快 / issue 按 issue 编号倒序"),
+    limit: int = Query(50, ge=1, le=500, description="返回的 issue 数量"),
+    db: Session = Depends(get_db)
+):
+    """获取 issue 首次响应耗时（第一条非作者、非 bot 评论）"""
+    project_key = normalize_project_name(project)
+    order_by = {
+        'slowest': "latency_seconds DESC",
+        'fastest': "latency_seconds ASC",
+        'issue': "issue_number DESC"
+    }[order]
+    summary = FirstResponseSummary()
+    issues = []
+
+    try:
+        row = db.execute(text("""
+            SELECT issue_count, responded_issues, avg_response_seconds,
+                   median_response_seconds, p90_response_seconds
+            FROM comment_project_rollup
+            WHERE project = :project
+        """), {'project': project_key}).fetchone()
+        if row:
+            summary = FirstResponseSummary(
+                issue_count=int(row[0] or 0),
+                responded_issues=int(row[1] or 0),
+                avg_hours=_hours(row[2]),
+                median_hours=_hours(row[3]),
+                p90_hours=_hours(row[4])
+            )
+        results = db.execute(text(f"""
+            SELECT issue_number, issue_author, issue_created_at, first_response_at, responder, latency_seconds
+            FROM comment_first_response
+            WHERE project = :project
+            ORDER BY {order_by}
+            LIMIT :limit
+        """), {'project': project_key, 'limit': limit}).fetchall()
+        issues = [
+            FirstResponseIssue(
+                issue_number=int(r[0]),
+                issue_author=r[1],
+                issue_created_at=str(r[2]),
+                first_response_at=str(r[3]),
+                responder=r[4],
+                latency_hours=_hours(r[5])
+            )
+            for r in results
+        ]
+    except Exception as e:
+        print(f"First response query error: {e}")
+
+    return FirstResponseResponse(project=project_key, summary=summary, issues=issues)
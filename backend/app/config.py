@@ -23,6 +23,18 @@ class Settings:
     # API配置
     API_V1_PREFIX: str = "/api/v1"
     
+    # MaxKB 代理配置（共享连接池，随应用生命周期创建/关闭）
+    MAXKB_BASE_URL: str = os.getenv("MAXKB_BASE_URL", "http://192.168.1.100:8080")
+    MAXKB_APPLICATION_ID: str = os.getenv("MAXKB_APPLICATION_ID", "your-application-id")
+    MAXKB_TIMEOUT: float = float(os.getenv("MAXKB_TIMEOUT", "60"))
+    MAXKB_MAX_CONNECTIONS: int = int(os.getenv("MAXKB_MAX_CONNECTIONS", "100"))
+    MAXKB_MAX_KEEPALIVE: int = int(os.getenv("MAXKB_MAX_KEEPALIVE", "20"))
+    MAXKB_KEEPALIVE_EXPIRY: float = float(os.getenv("MAXKB_KEEPALIVE_EXPIRY", "30"))
+    # 每个上游主机同时进行中的请求上限（超出的请求排队等待）
+    MAXKB_MAX_CONCURRENCY: int = int(os.getenv("MAXKB_MAX_CONCURRENCY", "32"))
+    # 安装了 h2 时启用 HTTP/2（pip install httpx[http2]）
+    MAXKB_HTTP2: bool = os.getenv("MAXKB_HTTP2", "true").lower() == "true"
+    
     @property
     def database_url(self) -> str:
         """构建数据库连接URL"""
@@ -0,0 +1,209 @@
+"""
+上游 HTTP 连接池
+整个应用共享一个 httpx.AsyncClient，由 FastAPI lifespan 创建和关闭，
+并按上游主机限制并发、记录连接池占用与上游延迟
+"""
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Optional
+import anyio
+import httpx
+from app.config import settings
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 延迟统计只保留最近的样本
+LATENCY_WINDOW = 1024
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class UpstreamClient:
+    """带并发上限和指标统计的共享上游客户端"""
+
+    def __init__(
+        self,
+        timeout: float,
+        max_connections: int,
+        max_keepalive: int,
+        keepalive_expiry: float,
+        max_concurrency: int,
+        http2: bool = True
+    ):
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.max_concurrency = max_concurrency
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._client: Optional[httpx.AsyncClient] = None
+        # 按 host:port 区分的并发闸门
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._upstreams: Dict[str, Dict] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """获取共享客户端（未经 lifespan 启动时按需创建）"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2
+            )
+        return self._client
+
+    async def start(self):
+        _ = self.client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _upstream_key(self, url: httpx.URL) -> str:
+        return f"{url.host}:{url.port or (443 if url.scheme == 'https' else 80)}"
+
+    def _stats(self, key: str) -> Dict:
+        if key not in self._upstreams:
+            self._semaphores[key] = asyncio.Semaphore(self.max_concurrency)
+            self._upstreams[key] = {
+                "in_flight": 0,
+                "waiting": 0,
+                "peak_in_flight": 0,
+                "requests_total": 0,
+                "errors_total": 0,
+                "ttfb_ms": deque(maxlen=LATENCY_WINDOW),
+                "duration_ms": deque(maxlen=LATENCY_WINDOW)
+            }
+        return self._upstreams[key]
+
+    async def send(self, request: httpx.Request) -> httpx.Response:
+        """
+        以流模式发送请求，返回时已拿到响应头
+        调用方通过 iter_raw() 读取响应体（结束时自动 release），或读完后自行调用 release() 归还并发名额
+        """
+        key = self._upstream_key(request.url)
+        stats = self._stats(key)
+        semaphore = self._semaphores[key]
+
+        stats["waiting"] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            stats["waiting"] -= 1
+
+        stats["in_flight"] += 1
+        stats["requests_total"] += 1
+        stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+        started = time.perf_counter()
+        try:
+            response = await self.client.send(request, stream=True)
+        except BaseException:
+            stats["errors_total"] += 1
+            stats["in_flight"] -= 1
+            semaphore.release()
+            raise
+        stats["ttfb_ms"].append((time.perf_counter() - started) * 1000)
+        response.extensions["upstream_key"] = key
+        response.extensions["upstream_started"] = started
+        return response
+
+    async def iter_raw(self, response: httpx.Response) -> AsyncIterator[bytes]:
+        """
+        逐块产出原始响应体（不解压）
+        正常读完、上游出错或下游客户端断开（生成器被取消 / 关闭）时都在 finally 中 release，
+        不依赖只在响应成功发完后才执行的 BackgroundTask
+        """
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            # 客户端断开时所在任务已被取消，屏蔽取消以完成关闭连接和归还名额
+            with anyio.CancelScope(shield=True):
+                await self.release(response)
+
+    async def release(self, response: httpx.Response):
+        """关闭响应流并归还并发名额（重复调用无副作用）"""
+        if response.extensions.get("upstream_released"):
+            return
+        response.extensions["upstream_released"] = True
+        try:
+            await response.aclose()
+        finally:
+            key = response.extensions.get("upstream_key")
+            if key in self._upstreams:
+                stats = self._upstreams[key]
+                stats["duration_ms"].append(
+                    (time.perf_counter() - response.extensions["upstream_started"]) * 1000
+                )
+                if response.status_code >= 500:
+                    stats["errors_total"] += 1
+                stats["in_flight"] -= 1
+                self._semaphores[key].release()
+
+    def _pool_connections(self) -> Dict:
+        """连接池占用情况（依赖 httpcore 内部结构，取不到时返回空）"""
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {}
+        idle = sum(1 for c in connections if c.is_idle())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+    def metrics(self) -> Dict:
+        """连接池和上游延迟指标"""
+        upstreams = {}
+        for key, stats in self._upstreams.items():
+            ttfb = sorted(stats["ttfb_ms"])
+            duration = sorted(stats["duration_ms"])
+            upstreams[key] = {
+                "in_flight": stats["in_flight"],
+                "waiting": stats["waiting"],
+                "peak_in_flight": stats["peak_in_flight"],
+                "max_concurrency": self.max_concurrency,
+                "requests_total": stats["requests_total"],
+                "errors_total": stats["errors_total"],
+                "ttfb_ms": {
+                    "p50": round(_percentile(ttfb, 50), 2),
+                    "p95": round(_percentile(ttfb, 95), 2),
+                    "max": round(ttfb[-1], 2) if ttfb else 0.0
+                },
+                "duration_ms": {
+                    "p50": round(_percentile(duration, 50), 2),
+                    "p95": round(_percentile(duration, 95), 2),
+                    "max": round(duration[-1], 2) if duration else 0.0
+                }
+            }
+        return {
+            "http2": self.http2,
+            "limits": {
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "keepalive_expiry": self.limits.keepalive_expiry
+            },
+            "pool": self._pool_connections(),
+            "upstreams": upstreams
+        }
+
+
+# MaxKB 代理使用的共享客户端
+maxkb_client = UpstreamClient(
+    timeout=settings.MAXKB_TIMEOUT,
+    max_connections=settings.MAXKB_MAX_CONNECTIONS,
+    max_keepalive=settings.MAXKB_MAX_KEEPALIVE,
+    keepalive_expiry=settings.MAXKB_KEEPALIVE_EXPIRY,
+    max_concurrency=settings.MAXKB_MAX_CONCURRENCY,
+    http2=settings.MAXKB_HTTP2
+)
@@ -25,6 +25,26 @@ class ProjectSearchResponse(BaseModel):
     total: int
     items: List[ProjectInfo]
 
+class FulltextHit(BaseModel):
+    """全文检索命中的 issue / 评论"""
+    type: str                            # issue / comment
+    project: str
+    score: float
+    issue_number: Optional[int] = None
+    title: Optional[str] = None
+    snippet: str = ""
+    url: Optional[str] = None
+    user: Optional[str] = None
+    created_at: Optional[str] = None
+
+class FulltextSearchResponse(BaseModel):
+    """全文检索响应"""
+    query: str
+    available: bool = True               # 索引未构建时为 False
+    total_hits: int = 0
+    took_ms: float = 0.0
+    items: List[FulltextHit]
+
 # ========== 统计相关模型 ==========
 
 class TrendData(BaseModel):
@@ -78,6 +98,47 @@ class ContributorChartData(BaseModel):
     values: List[int]
 
 
+# ========== 评论统计相关模型 ==========
+
+class CommenterInfo(BaseModel):
+    """评论者信息"""
+    username: str
+    comment_count: int = 0
+    issue_count: int = 0         # 参与评论的 issue 数（跨项目时为项目数）
+    percentage: float = 0.0
+    github_url: Optional[str] = None
+
+class TopCommentersResponse(BaseModel):
+    """评论者排行响应"""
+    project: Optional[str] = None   # 为空表示全部项目
+    total_commenters: int = 0
+    total_comments: int = 0
+    commenters: List[CommenterInfo]
+
+class FirstResponseIssue(BaseModel):
+    """单个 issue 的首次响应"""
+    issue_number: int
+    issue_author: Optional[str] = None
+    issue_created_at: str
+    first_response_at: str
+    responder: Optional[str] = None
+    latency_hours: float
+
+class FirstResponseSummary(BaseModel):
+    """首次响应耗时汇总（小时）"""
+    issue_count: int = 0          # 有评论的 issue 数
+    responded_issues: int = 0     # 有非作者评论的 issue 数
+    avg_hours: Optional[float] = None
+    median_hours: Optional[float] = None
+    p90_hours: Optional[float] = None
+
+class FirstResponseResponse(BaseModel):
+    """首次响应耗时响应"""
+    project: str
+    summary: FirstResponseSummary
+    issues: List[FirstResponseIssue]
+
+
 # ========== 健康度评估相关模型 ==========
 
 class HealthDimensionDetails(BaseModel):
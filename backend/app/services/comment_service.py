@@ -3,16 +3,31 @@ Comment 数据服务
 从 JSON 文件读取评论数据并进行分析
 """
 import os
+import sys
 import json
-from typing import Dict, List, Optional
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from collections import defaultdict
 from functools import lru_cache
 
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common.json_stream import iter_comments
+from common.jsonl_store import find_data_file, list_data_files
+
 # 评论数据目录
-COMMENT_CLEANED_DIR = os.path.join(
-    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))),
-    "data", "comment_cleaned"
-)
+COMMENT_CLEANED_DIR = os.path.join(ROOT_DIR, "data", "comment_cleaned")
+# 单文件聚合结果的旁路索引目录（按源文件 mtime + size 校验是否过期）
+AGGREGATE_DIR_NAME = ".aggregates"
+AGGREGATE_VERSION = 1
+# 全局贡献者汇总（由各文件聚合 map-reduce 得到）
+GLOBAL_AGGREGATE_FILE = "_global.json"
+# 汇总缺失或过期时是否在后台线程中增量刷新（0 时只由 precompute_comment_summary.py 离线刷新）
+BACKGROUND_REFRESH = os.getenv("COMMENT_SUMMARY_BACKGROUND_REFRESH", "1") != "0"
 
 
 def get_username(user_field) -> Optional[str]:
@@ -49,17 +64,61 @@ def get_project_from_issue_url(issue_url: str) -> Optional[str]:
     return None
 
 
+def aggregate_comment_file(filepath: str) -> Dict:
+    """
+    统计单个评论文件的贡献者评论数
+
+    Returns:
+        {"total_comments": int, "contributors": [[username, count], ...]}  # 按评论数降序
+    """
+    contributor_counts = defaultdict(int)
+    total_comments = 0
+    
+    # 流式逐条读取，内存占用与文件大小无关
+    for _, comment in iter_comments(filepath):
+        username = get_username(comment.get("user"))
+        if username:
+            contributor_counts[username] += 1
+            total_comments += 1
+    
+    return {
+        "total_comments": total_comments,
+        "contributors": sorted(
+            ([u, c] for u, c in contributor_counts.items()),
+            key=lambda x: (-x[1], x[0])
+        )
+    }
+
+
+def _aggregate_worker(args: Tuple[str, str]) -> Tuple[str, Optional[Tuple[int, int, Dict]]]:
+    """进程池 map 阶段：统计单个文件（同时写入该文件的旁路索引）"""
+    comment_dir, filename = args
+    try:
+        return filename, CommentService(comment_dir)._get_file_entry(filename)
+    except Exception as e:
+        print(f"Error reading {filename}: {e}")
+        return filename, None
+
+
 class CommentService:
     """评论数据服务"""
     
-    def __init__(self):
-        self.comment_dir = COMMENT_CLEANED_DIR
+    def __init__(self, comment_dir: str = COMMENT_CLEANED_DIR):
+        self.comment_dir = comment_dir
+        self.aggregate_dir = os.path.join(self.comment_dir, AGGREGATE_DIR_NAME)
+        # 内存缓存: filename -> (mtime_ns, size, aggregate)
+        self._aggregates: Dict[str, Tuple[int, int, Dict]] = {}
+        # 按文件加锁，避免同一文件被并发重复统计
+        self._file_locks: Dict[str, threading.Lock] = {}
+        # 全局汇总的内存副本，及对应的汇总文件 mtime（其他进程重新生成后重新读取）
+        self._global: Optional[Dict] = None
+        self._global_mtime: Optional[int] = None
+        self._global_lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
     
     def _get_comment_files(self) -> List[str]:
-        """获取所有评论 JSON 文件"""
-        if not os.path.exists(self.comment_dir):
-            return []
-        return [f for f in os.listdir(self.comment_dir) if f.endswith('.json')]
+        """获取所有评论文件（JSON / JSONL，同一项目只取优先级最高的格式）"""
+        return list_data_files(self.comment_dir)
     
     def _normalize_to_filename(self, project: str) -> str:
         """将项目名标准化为文件名格式 (owner_repo)"""
@@ -67,13 +126,82 @@ class CommentService:
             return project.replace('/', '_')
         return project
     
+    def _aggregate_path(self, filename: str) -> str:
+        return os.path.join(self.aggregate_dir, filename + ".agg")
+    
+    def _read_sidecar(self, filename: str) -> Optional[Tuple[int, int, Dict]]:
+        """读取旁路索引，返回 (mtime_ns, size, aggregate)，是否过期由调用方判断"""
+        path = self._aggregate_path(filename)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                sidecar = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if sidecar.get("version") != AGGREGATE_VERSION:
+            return None
+        return sidecar.get("mtime_ns"), sidecar.get("size"), sidecar.get("aggregate")
+    
+    def _write_sidecar(self, filename: str, mtime_ns: int, size: int, aggregate: Dict):
+        """原子写入旁路索引（先写临时文件再替换）"""
+        try:
+            os.makedirs(self.aggregate_dir, exist_ok=True)
+            path = self._aggregate_path(filename)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "version": AGGREGATE_VERSION,
+                    "source": filename,
+                    "mtime_ns": mtime_ns,
+                    "size": size,
+                    "aggregate": aggregate
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing aggregate for {filename}: {e}")
+    
+    def _get_file_entry(self, filename: str) -> Optional[Tuple[int, int, Dict]]:
+        """
+        获取单个评论文件的 (mtime_ns, size, aggregate)
+        依次查找：内存缓存 -> 旁路索引 -> 重新统计（并写回旁路索引）
+        文件不存在时返回 None
+        """
+        filepath = os.path.join(self.comment_dir, filename)
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        
+        cached = self._aggregates.get(filename)
+        if cached and cached[:2] == key:
+            return cached
+        
+        with self._file_locks.setdefault(filename, threading.Lock()):
+            cached = self._aggregates.get(filename)
+            if cached and cached[:2] == key:
+                return cached
+            
+            sidecar = self._read_sidecar(filename)
+            if sidecar and sidecar[:2] == key:
+                entry = sidecar
+            else:
+                entry = (key[0], key[1], aggregate_comment_file(filepath))
+                self._write_sidecar(filename, *entry)
+            self._aggregates[filename] = entry
+            return entry
+    
+    def get_file_aggregate(self, filename: str) -> Optional[Dict]:
+        """获取单个评论文件的聚合结果，文件不存在时返回 None"""
+        entry = self._get_file_entry(filename)
+        return entry[2] if entry else None
+    
     def get_contributors_for_project(
         self, 
         project_key: str, 
         top_n: int = 10
     ) -> Dict:
         """
-        获取指定项目的贡献者统计（优化：直接读取对应的项目文件）
+        获取指定项目的贡献者统计（使用按 mtime/size 校验的单文件聚合缓存）
         
         Args:
             project_key: 项目标识 (如 facebook/react 或 facebook_react)
@@ -88,56 +216,22 @@ class CommentService:
                 ]
             }
         """
-        contributor_counts = defaultdict(int)
-        total_comments = 0
+        stem = self._normalize_to_filename(project_key)
+        filepath = find_data_file(self.comment_dir, stem)
+        filename = os.path.basename(filepath) if filepath else stem + ".json"
         
-        # 直接读取对应项目的文件（优化：不再遍历所有文件）
-        filename = self._normalize_to_filename(project_key) + ".json"
-        filepath = os.path.join(self.comment_dir, filename)
+        try:
+            aggregate = self.get_file_aggregate(filename)
+        except Exception as e:
+            print(f"Error reading {filename}: {e}")
+            aggregate = None
         
-        if os.path.exists(filepath):
-            try:
-                with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                    data = json.load(f)
-                
-                # 处理数据 - 支持两种格式
-                if isinstance(data, dict):
-                    # 新格式: {"issues": [{"comments": [...]}]}
-                    if "issues" in data:
-                        for issue in data.get("issues", []):
-                            for comment in issue.get("comments", []):
-                                username = get_username(comment.get("user"))
-                                if username:
-                                    contributor_counts[username] += 1
-                                    total_comments += 1
-                    # 旧格式: {"comments": [...]}
-                    elif "comments" in data:
-                        for comment in data.get("comments", []):
-                            username = get_username(comment.get("user"))
-                            if username:
-                                contributor_counts[username] += 1
-                                total_comments += 1
-                # 数组格式
-                elif isinstance(data, list):
-                    for item in data:
-                        for comment in item.get("comments", []):
-                            username = get_username(comment.get("user"))
-                            if username:
-                                contributor_counts[username] += 1
-                                total_comments += 1
-                            
-            except Exception as e:
-                print(f"Error reading {filename}: {e}")
-        
-        # 排序并取 Top N
-        sorted_contributors = sorted(
-            contributor_counts.items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        )[:top_n]
+        if aggregate is None:
+            aggregate = {"total_comments": 0, "contributors": []}
         
+        total_comments = aggregate["total_comments"]
         contributors = []
-        for username, count in sorted_contributors:
+        for username, count in aggregate["contributors"][:top_n]:
             percentage = round(count / total_comments * 100, 2) if total_comments > 0 else 0
             contributors.append({
                 "username": username,
@@ -146,14 +240,175 @@ class CommentService:
             })
         
         return {
-            "total_contributors": len(contributor_counts),
+            "total_contributors": len(aggregate["contributors"]),
             "total_comments": total_comments,
             "contributors": contributors
         }
     
+    def _global_path(self) -> str:
+        return os.path.join(self.aggregate_dir, GLOBAL_AGGREGATE_FILE)
+    
+    def _load_global(self) -> Optional[Dict]:
+        """读取持久化的全局汇总（文件未变化时使用内存副本）"""
+        try:
+            mtime = os.stat(self._global_path()).st_mtime_ns
+        except OSError:
+            return self._global
+        if self._global is not None and self._global_mtime == mtime:
+            return self._global
+        try:
+            with open(self._global_path(), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return self._global
+        if data.get("version") != AGGREGATE_VERSION:
+            return None
+        contributors = [tuple(x) for x in data.pop("contributors", [])]
+        data["counts"] = dict(contributors)
+        data["contributors_sorted"] = contributors
+        self._global = data
+        self._global_mtime = mtime
+        return data
+    
+    def _save_global(self, state: Dict):
+        """原子写入全局汇总，贡献者按评论数降序保存"""
+        contributors = sorted(state["counts"].items(), key=lambda x: (-x[1], x[0]))
+        state["contributors_sorted"] = contributors
+        try:
+            os.makedirs(self.aggregate_dir, exist_ok=True)
+            path = self._global_path()
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "version": AGGREGATE_VERSION,
+                    "generated_at": state["generated_at"],
+                    "files": state["files"],
+                    "total_comments": state["total_comments"],
+                    "contributors": contributors
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._global_mtime = os.stat(path).st_mtime_ns
+        except OSError as e:
+            print(f"Error writing global aggregate: {e}")
+    
+    def _map_files(self, filenames: List[str], workers: int) -> Dict[str, Tuple[int, int, Dict]]:
+        """map 阶段：workers > 1 时使用进程池并行统计"""
+        entries = {}
+        if workers > 1 and len(filenames) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                tasks = [(self.comment_dir, f) for f in filenames]
+                for filename, entry in pool.map(_aggregate_worker, tasks, chunksize=1):
+                    if entry is not None:
+                        self._aggregates[filename] = entry
+                        entries[filename] = entry
+        else:
+            for filename in filenames:
+                try:
+                    entry = self._get_file_entry(filename)
+                except Exception as e:
+                    print(f"Error reading {filename}: {e}")
+                    continue
+                if entry is not None:
+                    entries[filename] = entry
+        return entries
+    
+    def _current_files(self) -> Dict[str, List[int]]:
+        """各评论文件当前的 [mtime_ns, size]（只 stat，不读取内容）"""
+        current = {}
+        for filename in self._get_comment_files():
+            try:
+                stat = os.stat(os.path.join(self.comment_dir, filename))
+            except OSError:
+                continue
+            current[filename] = [stat.st_mtime_ns, stat.st_size]
+        return current
+    
+    def _refresh_in_background(self):
+        """在后台线程中增量刷新全局汇总，同一时间只有一个刷新线程"""
+        with self._global_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(
+                target=self._background_refresh, name="comment-summary-refresh", daemon=True
+            )
+            self._refresh_thread.start()
+    
+    def _background_refresh(self):
+        try:
+            self.refresh_global_aggregate()
+        except Exception as e:
+            print(f"Error refreshing global aggregate: {e}")
+    
+    def refresh_global_aggregate(self, workers: int = 0) -> Dict:
+        """
+        增量刷新全局贡献者汇总
+        
+        只重新统计 mtime/size 发生变化的文件：先用旧的单文件聚合扣减，再加上新结果；
+        旧的单文件聚合已不可用时，改为从全部单文件聚合重新归约（未变化的文件直接读旁路索引）。
+        
+        Args:
+            workers: map 阶段的进程数，<= 1 时在当前线程内统计
+        """
+        with self._global_lock:
+            current = self._current_files()
+            state = self._load_global()
+            if state is not None and state["files"] == current:
+                self._global = state
+                return state
+            
+            counts = None
+            if state is not None:
+                previous = state["files"]
+                stale = [f for f in previous if current.get(f) != previous[f]]
+                counts = defaultdict(int, state["counts"])
+                for filename in stale:
+                    # 找到与上次汇总时 mtime/size 一致的旧聚合
+                    old = None
+                    for candidate in (self._aggregates.get(filename), self._read_sidecar(filename)):
+                        if candidate and list(candidate[:2]) == previous[filename]:
+                            old = candidate
+                            break
+                    if old is None:
+                        counts = None
+                        break
+                    for username, count in old[2]["contributors"]:
+                        counts[username] -= count
+            
+            if counts is None:
+                # 无法增量扣减：从所有文件的单文件聚合重新归约
+                changed = list(current)
+                counts = defaultdict(int)
+            else:
+                changed = [f for f in current if state["files"].get(f) != current[f]]
+            
+            entries = self._map_files(changed, workers)
+            for entry in entries.values():
+                for username, count in entry[2]["contributors"]:
+                    counts[username] += count
+            
+            # 统计失败的文件不记入汇总，下次刷新时重试
+            changed_set = set(changed)
+            files = {
+                f: key for f, key in current.items()
+                if f not in changed_set or f in entries
+            }
+            
+            counts = {u: c for u, c in counts.items() if c > 0}
+            state = {
+                "generated_at": datetime.now().isoformat(),
+                "files": files,
+                "total_comments": sum(counts.values()),
+                "counts": counts
+            }
+            self._save_global(state)
+            self._global = state
+            return state
+    
     def get_all_contributors_summary(self, top_n: int = 20) -> Dict:
         """
         获取所有项目的贡献者汇总统计
+        只读取持久化的全局汇总（由 precompute_comment_summary.py 离线并行生成），请求中不统计评论文件；
+        汇总缺失或评论文件已变化时标记 stale，并在后台线程中增量刷新（COMMENT_SUMMARY_BACKGROUND_REFRESH=0 时不刷新）
         
         Returns:
             {
@@ -161,43 +416,38 @@ class CommentService:
                 "total_comments": int,
                 "top_contributors": [
                     {"username": str, "comment_count": int}
-                ]
+                ],
+                "generated_at": str | None,
+                "stale": bool
             }
         """
-        contributor_counts = defaultdict(int)
-        total_comments = 0
-        
-        for filename in self._get_comment_files():
-            filepath = os.path.join(self.comment_dir, filename)
-            try:
-                with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                    data = json.load(f)
-                
-                items = [data] if isinstance(data, dict) else data
-                
-                for item in items:
-                    for comment in item.get("comments", []):
-                        username = get_username(comment.get("user"))
-                        if username:
-                            contributor_counts[username] += 1
-                            total_comments += 1
-                            
-            except Exception as e:
-                continue
+        state = self._load_global()
+        stale = state is None or state["files"] != self._current_files()
+        if stale and BACKGROUND_REFRESH:
+            self._refresh_in_background()
+        if state is None:
+            return {
+                "total_contributors": 0,
+                "total_comments": 0,
+                "top_contributors": [],
+                "generated_at": None,
+                "stale": True
+            }
         
-        sorted_contributors = sorted(
-            contributor_counts.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:top_n]
+        sorted_contributors = state.get("contributors_sorted")
+        if sorted_contributors is None:
+            sorted_contributors = sorted(state["counts"].items(), key=lambda x: (-x[1], x[0]))
+            state["contributors_sorted"] = sorted_contributors
         
         return {
-            "total_contributors": len(contributor_counts),
-            "total_comments": total_comments,
+            "total_contributors": len(state["counts"]),
+            "total_comments": state["total_comments"],
             "top_contributors": [
                 {"username": u, "comment_count": c}
-                for u, c in sorted_contributors
-            ]
+                for u, c in sorted_contributors[:top_n]
+            ],
+            "generated_at": state.get("generated_at"),
+            "stale": stale
         }
 
 
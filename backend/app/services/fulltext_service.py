@@ -0,0 +1,70 @@
+"""
+全文检索服务
+读取 build_fulltext_index.py 离线构建的 BM25 索引（mmap 段文件），manifest 更新后自动重新加载
+"""
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common.fulltext import MANIFEST_FILE, FulltextIndex
+
+# 索引目录
+FULLTEXT_INDEX_DIR = os.path.join(ROOT_DIR, "data", "fulltext_index")
+
+
+class FulltextService:
+    """全文检索服务类"""
+
+    def __init__(self, index_dir: str = FULLTEXT_INDEX_DIR):
+        self.index_dir = index_dir
+        self._index: Optional[FulltextIndex] = None
+        self._mtime_ns: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _manifest_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.index_dir, MANIFEST_FILE)).st_mtime_ns
+        except OSError:
+            return None
+
+    def get_index(self) -> Optional[FulltextIndex]:
+        """返回当前索引；索引重建后（manifest mtime 变化）重新打开段文件"""
+        mtime = self._manifest_mtime()
+        if mtime == self._mtime_ns:
+            return self._index
+        with self._lock:
+            if mtime != self._mtime_ns:
+                # 旧索引的 mmap 可能仍被进行中的查询引用，交给垃圾回收释放
+                self._index = FulltextIndex(self.index_dir) if mtime is not None else None
+                self._mtime_ns = mtime
+        return self._index
+
+    def search(
+        self,
+        query: str,
+        project: Optional[str] = None,
+        doc_type: Optional[str] = None,
+        top_k: int = 10
+    ) -> Dict:
+        """检索 issue / 评论，返回命中数、耗时和 top_k 结果"""
+        start = time.perf_counter()
+        index = self.get_index()
+        if index is None:
+            return {"available": False, "total_hits": 0, "took_ms": 0.0, "items": []}
+        total_hits, items = index.search(query, project=project, doc_type=doc_type, top_k=top_k)
+        return {
+            "available": True,
+            "total_hits": total_hits,
+            "took_ms": round((time.perf_counter() - start) * 1000, 2),
+            "items": items
+        }
+
+
+# 单例
+fulltext_service = FulltextService()
@@ -0,0 +1,98 @@
+"""
+构建 issue / 评论全文检索索引（BM25）
+逐项目流式读取 data/issue 和 data/comment_cleaned，写出 mmap 段文件到 data/fulltext_index/
+构建在临时目录中完成，结束后整体替换旧索引，运行中的服务会在下一次查询时自动加载
+
+运行方式:
+    python build_fulltext_index.py                          # 全部项目
+    python build_fulltext_index.py --segment-size 100000    # 每段文档数
+    python build_fulltext_index.py --limit 10               # 只索引前 10 个项目（调试用）
+"""
+import argparse
+import os
+import shutil
+import time
+from datetime import datetime
+from app.services.comment_service import COMMENT_CLEANED_DIR, ROOT_DIR
+from app.services.fulltext_service import FULLTEXT_INDEX_DIR
+
+from common.fulltext import SEGMENT_SIZE, IndexBuilder, iter_project_documents, publish_index
+from common.jsonl_store import list_data_files, strip_data_ext
+
+ISSUE_DIR = os.path.join(ROOT_DIR, "data", "issue")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='构建 issue / 评论全文检索索引')
+    parser.add_argument('--issue-dir', default=ISSUE_DIR, help='issue 数据目录')
+    parser.add_argument('--comment-dir', default=COMMENT_CLEANED_DIR, help='清洗后的评论数据目录')
+    parser.add_argument('--output', default=FULLTEXT_INDEX_DIR, help='索引输出目录')
+    parser.add_argument('--segment-size', type=int, default=SEGMENT_SIZE, help=f'每段文档数 (默认: {SEGMENT_SIZE})')
+    parser.add_argument('--limit', type=int, default=0, help='只处理前 N 个项目')
+    return parser.parse_args()
+
+
+def collect_projects(issue_dir: str, comment_dir: str):
+    """按文件名合并两个目录，返回 [(项目名, issue 文件, 评论文件)]"""
+    files = {}
+    for slot, directory in ((0, issue_dir), (1, comment_dir)):
+        for filename in list_data_files(directory):
+            stem = strip_data_ext(filename)
+            files.setdefault(stem, [None, None])[slot] = os.path.join(directory, filename)
+    return [(stem.replace('_', '/', 1), paths[0], paths[1]) for stem, paths in sorted(files.items())]
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 60)
+    print("🔎 全文检索索引构建工具")
+    print(f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 60)
+
+    projects = collect_projects(args.issue_dir, args.comment_dir)
+    if args.limit:
+        projects = projects[:args.limit]
+    print(f"\n📁 issue 目录: {args.issue_dir}")
+    print(f"📁 评论目录: {args.comment_dir}")
+    print(f"📊 共 {len(projects)} 个项目\n")
+
+    build_dir = args.output.rstrip(os.sep) + '.building'
+    if os.path.exists(build_dir):
+        shutil.rmtree(build_dir)
+    builder = IndexBuilder(build_dir, segment_size=args.segment_size)
+
+    start = time.perf_counter()
+    for i, (project, issue_file, comment_file) in enumerate(projects, 1):
+        count = 0
+        # 边读边加入索引；读取中途失败时回滚到项目开始前，整个项目跳过，不留下部分文档
+        builder.begin_project()
+        try:
+            for doc_type, body, meta, boost in iter_project_documents(project, issue_file, comment_file):
+                builder.add(project, doc_type, body, meta, boost_text=boost)
+                count += 1
+        except Exception as e:
+            builder.rollback_project()
+            print(f"   ❌ {project}: 读取失败，跳过 - {e}")
+            continue
+        builder.commit_project()
+        print(f"   [{i}/{len(projects)}] {project}: {count:,} 个文档")
+
+    manifest = builder.finish()
+    publish_index(build_dir, args.output)
+    elapsed = time.perf_counter() - start
+
+    size_mb = sum(
+        os.path.getsize(os.path.join(args.output, s['file'])) for s in manifest['segments']
+    ) / (1024 * 1024)
+    print("=" * 60)
+    print("📊 构建完成！")
+    print(f"   文档数: {manifest['total_docs']:,}")
+    print(f"   段数: {len(manifest['segments'])}")
+    print(f"   索引大小: {size_mb:.1f} MB")
+    print(f"   耗时: {elapsed:.1f} 秒")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -37,6 +37,9 @@ INDEXES = [
     ("top300_2022_2023", "idx_top300_repo_type", "repo_name(100), type(50)"),
     
     ("comments", "idx_comments_project", "project(255)"),
+    # 构建评论汇总表时按 (project, issue_number) 关联 issues
+    ("comments", "idx_comments_project_issue", "project(100), issue_number"),
+    ("issues", "idx_issues_project_number", "project(100), number"),
 ]
 
 
@@ -0,0 +1,59 @@
+"""
+本地模拟 MaxKB 服务，用于验证代理的流式转发、连接复用和并发上限
+运行方式:
+    python fake_maxkb.py                      # 监听 127.0.0.1:8081
+    MAXKB_BASE_URL=http://127.0.0.1:8081 python main.py
+
+    curl -N -X POST http://127.0.0.1:8000/api/v1/maxkb/application/chat_message/demo \
+         -H "Content-Type: application/json" -d '{"message": "你好"}'
+    curl http://127.0.0.1:8000/api/v1/maxkb-metrics
+"""
+import asyncio
+import json
+import sys
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+app = FastAPI(title="Fake MaxKB")
+
+# 每个 token 的输出间隔（秒），模拟大模型逐字生成
+TOKEN_DELAY = 0.05
+REPLY = "这是来自模拟 MaxKB 服务的流式回复，用于测试代理的首字节延迟。"
+
+
+@app.post("/api/application/chat_message/{chat_id}")
+async def chat_message(chat_id: str, request: Request):
+    """SSE 流式回复，逐字推送"""
+    body = await request.body()
+    try:
+        message = json.loads(body or b"{}").get("message", "")
+    except ValueError:
+        message = ""
+
+    async def generate():
+        for char in REPLY:
+            chunk = {"chat_id": chat_id, "content": char, "is_end": False}
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            await asyncio.sleep(TOKEN_DELAY)
+        end = {"chat_id": chat_id, "content": "", "is_end": True, "echo": message}
+        yield f"data: {json.dumps(end, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+
+@app.api_route("/api/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+async def echo(path: str, request: Request):
+    """普通接口：回显请求方法、路径、参数和请求体大小"""
+    body = await request.body()
+    return {
+        "path": path,
+        "method": request.method,
+        "query": dict(request.query_params),
+        "body_bytes": len(body)
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    uvicorn.run(app, host="127.0.0.1", port=port)
@@ -3,16 +3,26 @@ FastAPI 应用入口
 """
 import traceback
 import sys
+from contextlib import asynccontextmanager
 from datetime import datetime
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.api import search, stats, health, maxkb_proxy
+from app.infrastructure.http_client import maxkb_client
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 应用级共享的上游连接池
+    await maxkb_client.start()
+    yield
+    await maxkb_client.close()
 
 app = FastAPI(
     title="OpenPulse API",
     description="GitHub开源数据搜索与可视化系统",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
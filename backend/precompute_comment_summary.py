@@ -0,0 +1,64 @@
+"""
+预计算全局评论贡献者汇总
+多进程并行统计 data/comment_cleaned 下的每个文件（map），归约为全局汇总（reduce），
+结果保存在 data/comment_cleaned/.aggregates/ 中，API 直接读取
+
+运行方式:
+    python precompute_comment_summary.py              # 使用全部 CPU 核心
+    python precompute_comment_summary.py --workers 4  # 指定进程数
+    python precompute_comment_summary.py --full       # 忽略已有汇总，全部重新归约
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+from app.services.comment_service import CommentService, GLOBAL_AGGREGATE_FILE
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='预计算全局评论贡献者汇总')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='并行进程数 (默认: CPU 核心数)')
+    parser.add_argument('--full', action='store_true',
+                        help='删除已有的全局汇总后重新归约（单文件旁路索引仍会复用）')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 60)
+    print("💬 评论贡献者汇总预计算工具")
+    print(f"📅 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 60)
+
+    service = CommentService()
+    files = service._get_comment_files()
+    print(f"\n📁 评论目录: {service.comment_dir}")
+    print(f"📊 共 {len(files)} 个文件，进程数: {args.workers}\n")
+
+    if args.full:
+        global_path = os.path.join(service.aggregate_dir, GLOBAL_AGGREGATE_FILE)
+        if os.path.exists(global_path):
+            os.remove(global_path)
+
+    start = time.perf_counter()
+    state = service.refresh_global_aggregate(workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    summary = service.get_all_contributors_summary(top_n=10)
+
+    print("=" * 60)
+    print("📊 预计算完成！")
+    print(f"   文件数: {len(state['files'])}/{len(files)}")
+    print(f"   贡献者: {summary['total_contributors']:,}")
+    print(f"   评论数: {summary['total_comments']:,}")
+    print(f"   耗时: {elapsed:.2f} 秒")
+    print("\n   Top 10:")
+    for i, item in enumerate(summary['top_contributors'], 1):
+        print(f"   {i:2}. {item['username']}: {item['comment_count']:,}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
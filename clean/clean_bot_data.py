@@ -3,9 +3,14 @@
 检查user字段，删除包含"bot"关键词的条目
 """
 import os
+import sys
 import json
-import re
-from typing import List, Dict, Tuple
+import shutil
+from typing import Dict, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.json_stream import JsonArrayWriter, JsonStreamReader
+from common.jsonl_store import JsonlWriter, index_path, is_jsonl, iter_records, list_data_files
 
 # 配置
 COMMENT_DIR = os.path.join("data", "comment")
@@ -26,25 +31,10 @@ def is_bot_user(username) -> bool:
         return False
     return "adguard-bot" in username.lower()
 
-def clean_data(data: List[Dict]) -> Tuple[List[Dict], int]:
-    """
-    清洗数据，移除bot用户的条目
-    
-    Args:
-        data: 原始数据列表
-        
-    Returns:
-        (cleaned_data, removed_count): 清洗后的数据和移除的条目数量
-    """
-    original_count = len(data)
-    cleaned_data = [item for item in data if not is_bot_user(item.get("user"))]
-    removed_count = original_count - len(cleaned_data)
-    
-    return cleaned_data, removed_count
-
 def process_json_file(filepath: str, backup: bool = True) -> Tuple[int, int]:
     """
     处理单个JSON文件
+    流式逐条读取并写入临时文件，内存占用与文件大小无关
     
     Args:
         filepath: JSON文件路径
@@ -53,49 +43,98 @@ def process_json_file(filepath: str, backup: bool = True) -> Tuple[int, int]:
     Returns:
         (original_count, removed_count): 原始条目数和移除的条目数
     """
+    tmp_path = filepath + ".tmp"
     try:
+        original_count = 0
+        removed_count = 0
+        
         # 读取原始数据，忽略控制字符
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-            # 移除控制字符（除了换行、制表符等正常字符）
-            import re
-            content = re.sub(r'[\x00-\x08\x0b-\x0c\x0e-\x1f]', '', content)
-            data = json.loads(content)
+        with open(filepath, 'r', encoding='utf-8', errors='ignore') as src, \
+                open(tmp_path, 'w', encoding='utf-8') as dst:
+            reader = JsonStreamReader(src)
+            writer = JsonArrayWriter(dst)
+            for _, item in reader.items():
+                original_count += 1
+                if is_bot_user(item.get("user")):
+                    removed_count += 1
+                    continue
+                writer.write(item)
+            writer.close()
         
-        if not isinstance(data, list):
+        if reader.header:
+            os.remove(tmp_path)
             print(f"  ⚠️  {os.path.basename(filepath)}: 数据格式不是数组，跳过")
             return 0, 0
         
-        original_count = len(data)
-        
-        # 清洗数据
-        cleaned_data, removed_count = clean_data(data)
-        
         # 如果有数据被移除，则更新文件
         if removed_count > 0:
             # 备份原文件
             if backup:
                 backup_path = filepath + BACKUP_SUFFIX
                 if not os.path.exists(backup_path):
-                    with open(backup_path, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, ensure_ascii=False, indent=2)
+                    shutil.copyfile(filepath, backup_path)
             
-            # 写入清洗后的数据
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(cleaned_data, f, ensure_ascii=False, indent=2)
+            # 用清洗后的数据替换原文件
+            os.replace(tmp_path, filepath)
             
             print(f"  ✓ {os.path.basename(filepath)}: 移除 {removed_count}/{original_count} 条bot数据")
         else:
+            os.remove(tmp_path)
             print(f"  - {os.path.basename(filepath)}: 无bot数据")
         
         return original_count, removed_count
         
     except json.JSONDecodeError as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         print(f"  ❌ {os.path.basename(filepath)}: JSON解析错误 - {e}")
         return 0, 0
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"  ❌ {os.path.basename(filepath)}: 处理失败 - {e}")
+        return 0, 0
+
+def process_jsonl_file(filepath: str, backup: bool = True) -> Tuple[int, int]:
+    """
+    处理单个JSONL文件（逐行过滤，重写数据文件和偏移索引）
+    
+    Returns:
+        (original_count, removed_count): 原始条目数和移除的条目数
+    """
+    # 临时文件保持相同扩展名，以便按同样方式压缩
+    tmp_path = os.path.join(os.path.dirname(filepath), ".tmp_" + os.path.basename(filepath))
+    try:
+        original_count = 0
+        removed_count = 0
+        with JsonlWriter(tmp_path, append=False) as writer:
+            for item in iter_records(filepath):
+                original_count += 1
+                if is_bot_user(item.get("user")):
+                    removed_count += 1
+                    continue
+                writer.write(item)
+        
+        if removed_count > 0:
+            if backup:
+                backup_path = filepath + BACKUP_SUFFIX
+                if not os.path.exists(backup_path):
+                    shutil.copyfile(filepath, backup_path)
+            os.replace(tmp_path, filepath)
+            os.replace(index_path(tmp_path), index_path(filepath))
+            print(f"  ✓ {os.path.basename(filepath)}: 移除 {removed_count}/{original_count} 条bot数据")
+        else:
+            print(f"  - {os.path.basename(filepath)}: 无bot数据")
+        
+        return original_count, removed_count
+    
     except Exception as e:
         print(f"  ❌ {os.path.basename(filepath)}: 处理失败 - {e}")
         return 0, 0
+    finally:
+        for p in (tmp_path, index_path(tmp_path)):
+            if os.path.exists(p):
+                os.remove(p)
 
 def process_directory(directory: str, backup: bool = True) -> Dict[str, int]:
     """
@@ -118,15 +157,18 @@ def process_directory(directory: str, backup: bool = True) -> Dict[str, int]:
         "removed_items": 0
     }
     
-    # 获取所有JSON文件
-    json_files = [f for f in os.listdir(directory) if f.endswith('.json')]
+    # 获取所有JSON / JSONL文件
+    json_files = list_data_files(directory)
     
     print(f"\n📁 处理目录: {directory}")
     print(f"   找到 {len(json_files)} 个JSON文件\n")
     
     for filename in sorted(json_files):
         filepath = os.path.join(directory, filename)
-        original_count, removed_count = process_json_file(filepath, backup)
+        if is_jsonl(filepath):
+            original_count, removed_count = process_jsonl_file(filepath, backup)
+        else:
+            original_count, removed_count = process_json_file(filepath, backup)
         
         stats["files"] += 1
         stats["total_items"] += original_count
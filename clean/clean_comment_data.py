@@ -4,7 +4,8 @@ Comment数据清洗脚本
 1. 顺序处理每个JSON文件
 2. 按issue_url分组,将同一个问题的所有comments放在一起
 3. 只保留指定字段: id, body, user, created_at, updated_at, html_url, issue_url
-4. 输出结构: 每个原始文件对应一个输出文件
+4. 输出结构: 每个原始文件对应一个 JSONL 输出文件（每行一个 issue 的评论组，附带偏移索引）
+   输入支持旧版 JSON 数组和爬虫输出的 JSONL（.jsonl / .jsonl.gz）
 
 用法:
     python clean_comment_data.py          # 交互式，需要确认
@@ -17,6 +18,9 @@ import re
 from typing import List, Dict, Optional
 from collections import defaultdict
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.jsonl_store import JsonlWriter, is_jsonl, iter_records, list_data_files, strip_data_ext
+
 # 配置
 COMMENT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "comment")
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "comment_cleaned")
@@ -191,6 +195,23 @@ def try_parse_json(content: str, filepath: str) -> Optional[List[Dict]]:
         return None
 
 
+def flatten_comments(items: List[Dict]) -> List[Dict]:
+    """爬虫按 issue 输出评论组 {"issue_url", "comments": [...]}，展开为单条评论列表"""
+    comments = []
+    for item in items:
+        if isinstance(item.get("comments"), list):
+            comments.extend(item["comments"])
+        else:
+            comments.append(item)
+    return comments
+
+
+def get_output_filename(filename: str) -> str:
+    """输出统一为 JSONL，压缩输入对应压缩输出"""
+    ext = ".jsonl.gz" if filename.endswith(".gz") else ".jsonl"
+    return strip_data_ext(filename) + ext
+
+
 def clean_comment(comment: Dict) -> Dict:
     """清洗单条comment,只保留指定字段"""
     cleaned = {}
@@ -199,6 +220,10 @@ def clean_comment(comment: Dict) -> Dict:
             cleaned[field] = comment[field]
         else:
             cleaned[field] = None
+    # 爬虫原始数据使用 created_time / updated_time
+    for field, legacy in (("created_at", "created_time"), ("updated_at", "updated_time")):
+        if cleaned[field] is None:
+            cleaned[field] = comment.get(legacy)
     return cleaned
 
 
@@ -239,18 +264,24 @@ def process_single_file(input_filepath: str, output_filepath: str) -> tuple[bool
     }
     
     try:
-        # 读取原始数据
-        with open(input_filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            content = f.read()
-        
-        # 清理内容
-        content = clean_json_content(content)
-        
-        # 解析JSON
-        data = try_parse_json(content, input_filepath)
+        if is_jsonl(input_filepath):
+            # JSONL 逐行读取，无需修复
+            data = list(iter_records(input_filepath))
+        else:
+            # 读取原始数据
+            with open(input_filepath, 'r', encoding='utf-8', errors='ignore') as f:
+                content = f.read()
+            
+            # 清理内容
+            content = clean_json_content(content)
+            
+            # 解析JSON
+            data = try_parse_json(content, input_filepath)
+            
+            if data is None:
+                return False, stats
         
-        if data is None:
-            return False, stats
+        data = flatten_comments(data)
         
         # 清洗每条comment
         cleaned_comments = [clean_comment(comment) for comment in data]
@@ -260,29 +291,18 @@ def process_single_file(input_filepath: str, output_filepath: str) -> tuple[bool
         grouped = group_comments_by_issue(cleaned_comments)
         stats["issue_count"] = len(grouped)
         
-        # 构建输出数据结构
-        output_data = {
-            "source_file": filename,
-            "total_comments": len(cleaned_comments),
-            "issue_count": len(grouped),
-            "issues": []
-        }
-        
-        # 按issue_url排序输出
-        for issue_url in sorted(grouped.keys()):
-            issue_comments = grouped[issue_url]
-            output_data["issues"].append({
-                "issue_url": issue_url,
-                "comment_count": len(issue_comments),
-                "comments": issue_comments
-            })
-        
         # 确保输出目录存在
         os.makedirs(os.path.dirname(output_filepath), exist_ok=True)
         
-        # 保存到文件
-        with open(output_filepath, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=2)
+        # 按issue_url排序输出，每行一个 issue 的评论组
+        with JsonlWriter(output_filepath, append=False) as writer:
+            for issue_url in sorted(grouped.keys()):
+                issue_comments = grouped[issue_url]
+                writer.write({
+                    "issue_url": issue_url,
+                    "comment_count": len(issue_comments),
+                    "comments": issue_comments
+                })
         
         return True, stats
         
@@ -309,8 +329,7 @@ def main():
         return
     
     # 获取所有JSON文件
-    json_files = [f for f in os.listdir(COMMENT_DIR) if f.endswith('.json')]
-    json_files.sort()
+    json_files = list_data_files(COMMENT_DIR)
     
     print(f"\n找到 {len(json_files)} 个JSON文件")
     
@@ -340,7 +359,7 @@ def main():
     # 顺序处理每个文件
     for i, filename in enumerate(json_files, 1):
         input_path = os.path.join(COMMENT_DIR, filename)
-        output_path = os.path.join(OUTPUT_DIR, filename)
+        output_path = os.path.join(OUTPUT_DIR, get_output_filename(filename))
         
         print(f"[{i}/{len(json_files)}] 处理: {filename}")
         
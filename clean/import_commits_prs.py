@@ -12,6 +12,9 @@
     - 数据库: openrankdata
     - 端口: 3306
     - 密码: root
+
+爬虫以 CRAWL_SINK=mysql 运行时（见 crawls/sinks.py）数据已按批直接写入同名表，无需再运行本脚本；
+写入后各表都带 sink 用于 upsert 的唯一键（见 common/table_keys.py），append 模式按键 upsert，不会与 sink 写入的行重复
 """
 
 import pandas as pd
@@ -25,6 +28,9 @@ import json
 import shutil
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.table_keys import write_keyed_table
+
 # 禁用输出缓冲
 sys.stdout.reconfigure(line_buffering=True)
 
@@ -184,13 +190,7 @@ def import_data_type(engine, data_type, import_mode):
     
     # 写入数据库
     print(f"   📊 写入数据库 ({len(df)} 行)...")
-    df.to_sql(
-        name=config['table'],
-        con=engine,
-        if_exists=import_mode,
-        index=False,
-        dtype=dtype_mapping
-    )
+    write_keyed_table(engine, df, config['table'], import_mode, dtype_mapping)
     
     elapsed = (datetime.now() - start_time).total_seconds()
     print(f"   ✅ {data_type} 导入完成！")
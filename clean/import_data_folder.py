@@ -8,12 +8,17 @@
     python import_data_folder.py --type issue       # 只导入 issue 数据
     python import_data_folder.py --type comment     # 只导入 comment 数据
     python import_data_folder.py --mode append      # 追加模式
+    python import_data_folder.py --type rollup      # 只根据 comments / issues 表重建评论汇总表
+    python import_data_folder.py --type catalog     # 只导入项目目录 (project_catalog.json，由 crawl_repo_counters.py 生成)
 
 目标数据库:
     - Docker容器: openpulse_data
     - 数据库: openrankdata
     - 端口: 3306
     - 密码: root
+
+爬虫以 CRAWL_SINK=mysql 运行时（见 crawls/sinks.py）数据已按批直接写入同名表，无需再运行本脚本；
+写入后各表都带 sink 用于 upsert 的唯一键（见 common/table_keys.py），append 模式按键 upsert，不会与 sink 写入的行重复
 """
 
 import pandas as pd
@@ -25,9 +30,15 @@ import argparse
 import os
 import sys
 import json
+import re
 import shutil
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.json_stream import iter_issues, iter_items
+from common.jsonl_store import list_data_files, strip_data_ext
+from common.table_keys import write_keyed_table
+
 # 禁用输出缓冲
 sys.stdout.reconfigure(line_buffering=True)
 
@@ -67,6 +78,143 @@ DATA_TYPES = {
     }
 }
 
+# 项目目录（仓库级计数，每个项目一行）
+CATALOG_FILE = 'project_catalog.json'
+CATALOG_TABLE = 'project_catalog'
+
+# ====== 评论汇总表（导入时构建，供 /stats/comments/* 接口直接查询） ======
+ISSUE_NUMBER = re.compile(r'/(?:issues|pull)/(\d+)')
+
+# ISO 时间字符串（2022-06-01T12:00:00+00:00 / ...Z）统一按 UTC 截取前 19 位解析
+ISO_DATETIME = "STR_TO_DATE(LEFT({col}, 19), '%Y-%m-%dT%H:%i:%s')"
+
+ROLLUP_TABLES = {
+    # 项目内评论者排行
+    'comment_user_rollup': """
+        CREATE TABLE comment_user_rollup (
+            project VARCHAR(255) NOT NULL,
+            user VARCHAR(255) NOT NULL,
+            comment_count INT NOT NULL,
+            issue_count INT NOT NULL,
+            first_comment_at VARCHAR(32),
+            last_comment_at VARCHAR(32),
+            PRIMARY KEY (project, user),
+            KEY idx_comment_user_rollup_rank (project, comment_count)
+        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+    """,
+    # 跨项目评论者排行
+    'comment_user_total': """
+        CREATE TABLE comment_user_total (
+            user VARCHAR(255) NOT NULL,
+            comment_count INT NOT NULL,
+            project_count INT NOT NULL,
+            PRIMARY KEY (user),
+            KEY idx_comment_user_total_rank (comment_count)
+        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+    """,
+    # 每日评论量
+    'comment_daily_rollup': """
+        CREATE TABLE comment_daily_rollup (
+            project VARCHAR(255) NOT NULL,
+            date CHAR(10) NOT NULL,
+            comment_count INT NOT NULL,
+            commenter_count INT NOT NULL,
+            PRIMARY KEY (project, date)
+        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+    """,
+    # 每个 issue 的首次响应（第一条非作者评论）
+    'comment_first_response': """
+        CREATE TABLE comment_first_response (
+            project VARCHAR(255) NOT NULL,
+            issue_number BIGINT NOT NULL,
+            issue_author VARCHAR(255),
+            issue_created_at DATETIME NOT NULL,
+            first_response_at DATETIME NOT NULL,
+            responder VARCHAR(255),
+            latency_seconds BIGINT NOT NULL,
+            PRIMARY KEY (project, issue_number),
+            KEY idx_comment_first_response_latency (project, latency_seconds)
+        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+    """,
+    # 项目级汇总（总量 + 首次响应分位数）
+    'comment_project_rollup': """
+        CREATE TABLE comment_project_rollup (
+            project VARCHAR(255) NOT NULL,
+            comment_count INT NOT NULL,
+            commenter_count INT NOT NULL,
+            issue_count INT NOT NULL,
+            first_date CHAR(10),
+            last_date CHAR(10),
+            responded_issues INT NOT NULL DEFAULT 0,
+            avg_response_seconds BIGINT,
+            median_response_seconds BIGINT,
+            p90_response_seconds BIGINT,
+            PRIMARY KEY (project)
+        ) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
+    """,
+}
+
+# 重建时先写入新表，换下的旧表随后删除
+ROLLUP_NEW_SUFFIX = '_new'
+ROLLUP_OLD_SUFFIX = '_old'
+ROLLUP_TABLE_NAME = re.compile(r'\b(?:' + '|'.join(ROLLUP_TABLES) + r')\b')
+
+ROLLUP_SQL = [
+    """
+    INSERT INTO comment_user_rollup
+    SELECT project, user, COUNT(*), COUNT(DISTINCT issue_number), MIN(created_at), MAX(created_at)
+    FROM comments
+    WHERE user IS NOT NULL AND user != ''
+    GROUP BY project, user
+    """,
+    """
+    INSERT INTO comment_user_total
+    SELECT user, SUM(comment_count), COUNT(*)
+    FROM comment_user_rollup
+    GROUP BY user
+    """,
+    """
+    INSERT INTO comment_daily_rollup
+    SELECT project, LEFT(created_at, 10) AS day, COUNT(*), COUNT(DISTINCT user)
+    FROM comments
+    WHERE created_at IS NOT NULL AND created_at != ''
+    GROUP BY project, day
+    """,
+    f"""
+    INSERT INTO comment_first_response
+    SELECT project, issue_number, issue_author, issue_created_at, created_at, user,
+           TIMESTAMPDIFF(SECOND, issue_created_at, created_at)
+    FROM (
+        SELECT c.project, c.issue_number, i.user AS issue_author, i.issue_created_at, c.created_at, c.user,
+               ROW_NUMBER() OVER (PARTITION BY c.project, c.issue_number
+                                  ORDER BY c.created_at, c.comment_id) AS rn
+        FROM (
+            SELECT project, issue_number, comment_id, user, {ISO_DATETIME.format(col='created_at')} AS created_at
+            FROM comments
+            WHERE issue_number IS NOT NULL
+        ) c
+        JOIN (
+            SELECT project, number, user, {ISO_DATETIME.format(col='created_at')} AS issue_created_at
+            FROM issues
+        ) i ON i.project = c.project AND i.number = c.issue_number
+        WHERE c.created_at IS NOT NULL
+          AND i.issue_created_at IS NOT NULL
+          AND c.created_at >= i.issue_created_at
+          AND NOT (c.user <=> i.user)
+          AND c.user NOT LIKE '%[bot]'
+    ) ranked
+    WHERE rn = 1
+    """,
+    """
+    INSERT INTO comment_project_rollup
+        (project, comment_count, commenter_count, issue_count, first_date, last_date)
+    SELECT project, COUNT(*), COUNT(DISTINCT user), COUNT(DISTINCT issue_number),
+           MIN(LEFT(created_at, 10)), MAX(LEFT(created_at, 10))
+    FROM comments
+    GROUP BY project
+    """,
+]
+
 def check_disk_space():
     """检查磁盘剩余空间，返回剩余空间（GB）"""
     total, used, free = shutil.disk_usage(DISK_TO_MONITOR)
@@ -123,20 +271,46 @@ def test_connection():
 def parse_args():
     """解析命令行参数"""
     parser = argparse.ArgumentParser(description='导入 data 文件夹数据到 MySQL 数据库')
-    parser.add_argument('--type', choices=['star', 'fork', 'issue', 'comment', 'all'], 
+    parser.add_argument('--type', choices=['star', 'fork', 'issue', 'comment', 'rollup', 'catalog', 'all'], 
                        default='all', 
-                       help='数据类型：star/fork/issue/comment/all (默认: all)')
+                       help='数据类型：star/fork/issue/comment/rollup/all (默认: all)')
     parser.add_argument('--mode', choices=['replace', 'append', 'fail'], 
                        default='replace', 
                        help='导入模式：replace/append/fail (默认: replace)')
     return parser.parse_args()
 
+def project_from_filename(file_name, suffix=''):
+    """
+    由数据文件名还原项目名：owner_repo[后缀].json / .jsonl -> owner/repo
+    GitHub 用户名不含下划线，只替换第一个 '_'，仓库名中的下划线保留（与后端和 sink 写入的项目名一致），
+    所有数据类型都用这一种还原方式
+    """
+    stem = strip_data_ext(file_name)
+    if suffix and stem.endswith(suffix):
+        stem = stem[:-len(suffix)]
+    return stem.replace('_', '/', 1)
+
+def migrate_project_names(engine, table):
+    """
+    旧版导入把文件名中的每个 '_' 都换成 '/'（owner_my_repo -> owner/my/repo），
+    把这些行改回 owner/my_repo；改名后与已有行重复的（append 过新数据）直接删除
+    """
+    fixed = "CONCAT(SUBSTRING_INDEX(project, '/', 1), '/', REPLACE(SUBSTRING(project, LOCATE('/', project) + 1), '/', '_'))"
+    with engine.begin() as conn:
+        if not conn.execute(text("SHOW TABLES LIKE :t"), {'t': table}).first():
+            return 0
+        moved = conn.execute(text(f"UPDATE IGNORE `{table}` SET project = {fixed} WHERE project LIKE '%/%/%'")).rowcount
+        conn.execute(text(f"DELETE FROM `{table}` WHERE project LIKE '%/%/%'"))
+    if moved:
+        print(f"   🔧 {table}: 修正 {moved} 行旧版项目名（owner/my/repo -> owner/my_repo）")
+    return moved
+
 def process_star_fork_file(file_path, data_type):
     """处理 star 或 fork 类型的 JSON 文件，展开为多行数据"""
     with open(file_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
     
-    project = data.get('project', os.path.basename(file_path).replace('_stars.json', '').replace('_forks.json', '').replace('_', '/'))
+    project = data.get('project') or project_from_filename(os.path.basename(file_path), f"_{data_type}s")
     start_date = data.get('start_date', '')
     end_date = data.get('end_date', '')
     
@@ -163,16 +337,12 @@ def process_star_fork_file(file_path, data_type):
     return pd.DataFrame(rows)
 
 def process_issue_file(file_path):
-    """处理 issue 类型的 JSON 文件"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
+    """处理 issue 类型的 JSON 文件（流式逐条读取）"""
     # 从文件名提取项目名
-    file_name = os.path.basename(file_path)
-    project = file_name.replace('.json', '').replace('_', '/')
+    project = project_from_filename(os.path.basename(file_path))
     
     rows = []
-    for issue in data:
+    for issue in iter_issues(file_path):
         rows.append({
             'project': project,
             'title': issue.get('title', ''),
@@ -199,30 +369,31 @@ def extract_username(user_field):
         return user_field.get('login', '')
     return str(user_field)
 
+def parse_issue_number(issue_url):
+    """从 issue_url（API 或网页链接）解析 issue number"""
+    match = ISSUE_NUMBER.search(issue_url or '')
+    return int(match.group(1)) if match else None
+
 def process_comment_file(file_path):
-    """处理 comment_cleaned 类型的 JSON 文件"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
+    """处理 comment_cleaned 类型的 JSON 文件（流式逐个 issue 读取）"""
     # 从文件名提取项目名
-    file_name = os.path.basename(file_path)
-    project = file_name.replace('.json', '').replace('_', '/', 1)
-    
-    source_file = data.get('source_file', '')
-    total_comments = data.get('total_comments', 0)
+    project = project_from_filename(os.path.basename(file_path))
     
     rows = []
-    for issue_data in data.get('issues', []):
+    for _, issue_data in iter_items(file_path, ('issues',)):
         issue_url = issue_data.get('issue_url', '')
+        issue_number = parse_issue_number(issue_url)
         for comment in issue_data.get('comments', []):
             rows.append({
                 'project': project,
                 'issue_url': issue_url,
+                'issue_number': issue_number,
                 'comment_id': comment.get('id', 0),
                 'body': comment.get('body', ''),
                 'user': extract_username(comment.get('user')),
-                'created_at': comment.get('created_at', ''),
-                'updated_at': comment.get('updated_at', ''),
+                # 爬虫原始数据使用 created_time / updated_time
+                'created_at': comment.get('created_at') or comment.get('created_time') or '',
+                'updated_at': comment.get('updated_at') or comment.get('updated_time') or '',
                 'html_url': comment.get('html_url', '')
             })
     
@@ -262,6 +433,7 @@ def get_dtype_mapping(data_type):
         return {
             'project': Text(),
             'issue_url': Text(),
+            'issue_number': BigInteger(),
             'comment_id': BigInteger(),
             'body': LONGTEXT(),
             'user': Text(),
@@ -271,6 +443,100 @@ def get_dtype_mapping(data_type):
         }
     return {}
 
+def staged(sql):
+    """把 SQL 中的汇总表名换成构建用的新表名（<表名>_new）"""
+    return ROLLUP_TABLE_NAME.sub(lambda m: m.group(0) + ROLLUP_NEW_SUFFIX, sql)
+
+def update_response_percentiles(conn):
+    """按项目计算首次响应耗时的均值 / 中位数 / P90，写回 comment_project_rollup（构建中的新表）"""
+    rows = conn.execute(text(staged(
+        "SELECT project, latency_seconds FROM comment_first_response ORDER BY project, latency_seconds"
+    )))
+    updates = []
+    current, latencies = None, []
+
+    def flush():
+        if current is None or not latencies:
+            return
+        n = len(latencies)
+        updates.append({
+            'project': current,
+            'responded': n,
+            'avg': int(sum(latencies) / n),
+            'median': latencies[(n - 1) // 2],
+            'p90': latencies[min(n - 1, int(n * 0.9))]
+        })
+
+    for project, latency in rows:
+        if project != current:
+            flush()
+            current, latencies = project, []
+        latencies.append(int(latency))
+    flush()
+
+    if updates:
+        conn.execute(text(staged("""
+            UPDATE comment_project_rollup
+            SET responded_issues = :responded, avg_response_seconds = :avg,
+                median_response_seconds = :median, p90_response_seconds = :p90
+            WHERE project = :project
+        """)), updates)
+    return len(updates)
+
+def build_comment_rollups(engine):
+    """
+    根据 comments / issues 表重建评论汇总表
+    汇总表均以 (project, ...) 为主键，接口查询只需一次主键范围扫描
+    MySQL 的 DDL 会自动提交，不能在事务里删表重建；先全部写入 <表名>_new，
+    再用一条 RENAME TABLE 原子地换下旧表，重建期间 /stats/comments/* 接口一直读到完整的旧表
+    """
+    print("\n📊 正在构建评论汇总表...")
+    start_time = datetime.now()
+    new_tables = [table + ROLLUP_NEW_SUFFIX for table in ROLLUP_TABLES]
+    try:
+        with engine.begin() as conn:
+            tables = {row[0] for row in conn.execute(text("SHOW TABLES"))}
+            if 'comments' not in tables:
+                print("   ⚠️  comments 表不存在，跳过")
+                return False
+            # 上次中断留下的新表
+            for table in new_tables + [table + ROLLUP_OLD_SUFFIX for table in ROLLUP_TABLES]:
+                conn.execute(text(f"DROP TABLE IF EXISTS `{table}`"))
+            for ddl in ROLLUP_TABLES.values():
+                conn.execute(text(staged(ddl)))
+            for sql in ROLLUP_SQL:
+                if 'FROM issues' in sql and 'issues' not in tables:
+                    print("   ⚠️  issues 表不存在，跳过首次响应统计")
+                    continue
+                conn.execute(text(staged(sql)))
+            responded = update_response_percentiles(conn)
+            counts = {
+                table: conn.execute(text(f"SELECT COUNT(*) FROM `{table}{ROLLUP_NEW_SUFFIX}`")).scalar()
+                for table in ROLLUP_TABLES
+            }
+            # 一条语句内的多个改名是原子的：旧表 -> _old，新表 -> 正式表名
+            renames = [f"`{table}` TO `{table}{ROLLUP_OLD_SUFFIX}`" for table in ROLLUP_TABLES if table in tables]
+            renames += [f"`{table}{ROLLUP_NEW_SUFFIX}` TO `{table}`" for table in ROLLUP_TABLES]
+            conn.execute(text("RENAME TABLE " + ", ".join(renames)))
+            for table in ROLLUP_TABLES:
+                conn.execute(text(f"DROP TABLE IF EXISTS `{table}{ROLLUP_OLD_SUFFIX}`"))
+    except Exception as e:
+        print(f"   ❌ 构建评论汇总表失败（旧汇总表保持不变）: {e}")
+        try:
+            with engine.begin() as conn:
+                for table in new_tables:
+                    conn.execute(text(f"DROP TABLE IF EXISTS `{table}`"))
+        except Exception:
+            pass
+        return False
+
+    elapsed = (datetime.now() - start_time).total_seconds()
+    for table, count in counts.items():
+        print(f"   ✅ {table}: {count:,} 行")
+    print(f"   有首次响应数据的项目: {responded}")
+    print(f"   耗时: {elapsed:.1f} 秒")
+    return True
+
 def import_data_type(engine, data_type, import_mode):
     """导入指定类型的数据"""
     config = DATA_TYPES[data_type]
@@ -281,8 +547,8 @@ def import_data_type(engine, data_type, import_mode):
         print(f"❌ 文件夹不存在: {folder_path}")
         return False
     
-    # 获取所有 JSON 文件
-    files = [f for f in os.listdir(folder_path) if f.endswith('.json')]
+    # 获取所有 JSON / JSONL 文件（同一项目只取优先级最高的格式）
+    files = list_data_files(folder_path)
     
     if not files:
         print(f"❌ 文件夹 {folder_path} 中没有 JSON 文件")
@@ -295,6 +561,9 @@ def import_data_type(engine, data_type, import_mode):
     print(f"   导入模式: {import_mode}")
     
     dtype_mapping = get_dtype_mapping(data_type)
+    if import_mode == 'append':
+        # 追加到已有表之前，先让旧版导入的项目名与本次的还原方式一致
+        migrate_project_names(engine, table_name)
     start_time = datetime.now()
     total_rows = 0
     processed_files = 0
@@ -342,7 +611,7 @@ def import_data_type(engine, data_type, import_mode):
         combined_df = pd.concat(all_data, ignore_index=True)
         
         print(f"   📊 写入数据库 ({total_rows:,} 行)...")
-        combined_df.to_sql(name=table_name, con=engine, if_exists=import_mode, index=False, dtype=dtype_mapping)
+        write_keyed_table(engine, combined_df, table_name, import_mode, dtype_mapping)
         
         elapsed = (datetime.now() - start_time).total_seconds()
         print(f"   ✅ {data_type} 导入完成！")
@@ -354,6 +623,55 @@ def import_data_type(engine, data_type, import_mode):
         print(f"   ⚠️  没有数据可导入")
         return False
 
+def import_catalog(engine):
+    """导入项目目录，整表替换（数据量小，每次全量）"""
+    path = os.path.join(DATA_FOLDER, CATALOG_FILE)
+    if not os.path.exists(path):
+        print(f"⚠️  项目目录不存在: {path}，跳过")
+        return False
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        catalog = json.load(f)
+    
+    rows = []
+    for project, entry in catalog.items():
+        window = entry.get('window') or {}
+        rows.append({
+            'project': project,
+            'stars': entry.get('stars'),
+            'forks': entry.get('forks'),
+            'open_issues': entry.get('open_issues'),
+            'closed_issues': entry.get('closed_issues'),
+            'open_prs': entry.get('open_prs'),
+            'closed_prs': entry.get('closed_prs'),
+            'merged_prs': entry.get('merged_prs'),
+            'window_issues': window.get('issues'),
+            'window_prs': window.get('prs'),
+            'language': entry.get('language'),
+            'license': entry.get('license'),
+            'created_at': entry.get('created_at'),
+            'pushed_at': entry.get('pushed_at'),
+            'archived': int(bool(entry.get('archived'))),
+            'updated_at': entry.get('updated_at')
+        })
+    
+    if not rows:
+        print(f"⚠️  项目目录为空")
+        return False
+    
+    df = pd.DataFrame(rows)
+    dtype_mapping = {col: BigInteger() for col in (
+        'stars', 'forks', 'open_issues', 'closed_issues', 'open_prs', 'closed_prs', 'merged_prs',
+        'window_issues', 'window_prs'
+    )}
+    dtype_mapping.update({col: Text() for col in ('project', 'language', 'license', 'created_at', 'pushed_at', 'updated_at')})
+    dtype_mapping['archived'] = Integer()
+    df.to_sql(name=CATALOG_TABLE, con=engine, if_exists='replace', index=False, dtype=dtype_mapping)
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {CATALOG_TABLE} MODIFY project VARCHAR(255) NOT NULL, ADD PRIMARY KEY (project)"))
+    print(f"   ✅ 项目目录导入完成: {len(rows)} 个项目 -> {CATALOG_TABLE}")
+    return True
+
 def main():
     args = parse_args()
     
@@ -391,6 +709,8 @@ def main():
     # 确定要导入的数据类型
     if args.type == 'all':
         types_to_import = ['star', 'fork', 'issue', 'comment']
+    elif args.type in ('rollup', 'catalog'):
+        types_to_import = []
     else:
         types_to_import = [args.type]
     
@@ -404,6 +724,13 @@ def main():
         if import_data_type(engine, data_type, args.mode):
             success_count += 1
     
+    if args.type in ('all', 'catalog'):
+        import_catalog(engine)
+    
+    # comments / issues 变化后重建评论汇总表
+    if args.type in ('all', 'comment', 'issue', 'rollup'):
+        build_comment_rollups(engine)
+    
     # 汇总
     elapsed = (datetime.now() - start_time).total_seconds()
     print()
@@ -0,0 +1,175 @@
+"""
+流式读取基准测试
+生成指定大小的合成评论文件（comment_cleaned 格式），分别在子进程中用
+流式读取和 json.load 统计评论数，对比耗时与峰值内存
+
+运行方式:
+    python -m common.bench_json_stream                 # 默认生成 1 GB 文件，只测流式读取
+    python -m common.bench_json_stream --size-mb 200 --compare
+    python -m common.bench_json_stream --file data/comment_cleaned/xxx.json --compare
+    python -m common.bench_json_stream --check                  # 各种块大小下流式读取与 json.loads 结果一致
+"""
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def generate_file(path: str, size_mb: int, seed: int = 42):
+    """生成约 size_mb 大小的合成评论文件，逐个 issue 写出"""
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    words = ["bug", "fix", "修复", "merge", "LGTM", "please", "rebase", "测试", "thanks", "issue"]
+    users = [f"user{i}" for i in range(5000)]
+    written = 0
+    issue_no = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        header = '{\n  "source_file": "synthetic.json",\n  "issues": [\n'
+        f.write(header)
+        written += len(header)
+        while written < target:
+            issue_no += 1
+            url = f"https://api.github.com/repos/bench/synthetic/issues/{issue_no}"
+            comments = []
+            for j in range(rng.randint(1, 30)):
+                comments.append({
+                    "id": issue_no * 100 + j,
+                    "body": " ".join(rng.choice(words) for _ in range(rng.randint(5, 120))),
+                    "user": rng.choice(users),
+                    "created_at": "2022-06-01T12:00:00+00:00",
+                    "updated_at": None,
+                    "html_url": f"https://github.com/bench/synthetic/issues/{issue_no}#issuecomment-{j}",
+                    "issue_url": url
+                })
+            text = json.dumps({"issue_url": url, "comment_count": len(comments), "comments": comments},
+                              ensure_ascii=False)
+            chunk = ("    " if issue_no == 1 else ",\n    ") + text
+            f.write(chunk)
+            written += len(chunk.encode('utf-8'))
+        f.write("\n  ]\n}\n")
+
+
+def run_mode(mode: str, path: str):
+    """子进程入口：统计评论数并输出 JSON 结果"""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from common.json_stream import iter_comments
+
+    start = time.perf_counter()
+    count = 0
+    if mode == 'stream':
+        for _ in iter_comments(path):
+            count += 1
+    else:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            data = json.load(f)
+        for issue in data.get("issues", []):
+            count += len(issue.get("comments", []))
+    elapsed = time.perf_counter() - start
+
+    peak_mb = None
+    if resource is not None:
+        # Linux 上 ru_maxrss 单位为 KB，macOS 为字节
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    print(json.dumps({"mode": mode, "comments": count, "seconds": elapsed, "peak_mb": peak_mb}))
+
+
+def measure(mode: str, path: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run", mode, "--file", path],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return {"mode": mode, "error": result.stderr.strip().splitlines()[-1:] or ["failed"]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# 值跨越块边界的情况：小数、指数、负数、字面量、嵌套、转义、空数组、带 header 的对象
+CHECK_DOCUMENTS = [
+    '[{"a":1}, 12.75, 3]',
+    '[1e10, -0.5E-3, 2.5e+7, 0, -12]',
+    '[true, false, null, "x", 100000000000000000000]',
+    '[ {"n": [1, 2.25, {"m": null}]} , "a\\"b,]" , -7 ]',
+    '[]',
+    '{"source_file": "x.json", "total": 12345.5, "issues": [{"comments": [1.5, true]}, 42.0], "tail": null}',
+]
+
+
+def check_chunk_sizes(max_chunk: int = 16) -> int:
+    """块大小 1~max_chunk（及整个文档）扫描，流式读取结果应与 json.loads 一致，返回失败数"""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from common.json_stream import JsonStreamReader
+
+    failures = 0
+    for doc in CHECK_DOCUMENTS:
+        data = json.loads(doc)
+        expected = data if isinstance(data, list) else data['issues']
+        for chunk_size in list(range(1, max_chunk + 1)) + [len(doc)]:
+            try:
+                got = [item for _, item in JsonStreamReader(io.StringIO(doc), chunk_size=chunk_size).items(('issues',))]
+            except ValueError as e:
+                got = e
+            if got != expected:
+                failures += 1
+                print(f"❌ chunk_size={chunk_size}: {doc} -> {got!r}")
+    print(f"{'✅' if not failures else '❌'} 块大小扫描: {len(CHECK_DOCUMENTS)} 个文档, {failures} 处不一致")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流式 JSON 读取基准测试')
+    parser.add_argument('--size-mb', type=int, default=1024, help='合成文件大小 (默认: 1024 MB)')
+    parser.add_argument('--file', help='使用已有文件，不再生成')
+    parser.add_argument('--compare', action='store_true', help='同时测试 json.load（需要数倍于文件大小的内存）')
+    parser.add_argument('--keep', action='store_true', help='保留生成的合成文件')
+    parser.add_argument('--check', action='store_true', help='只做块大小扫描的正确性检查')
+    parser.add_argument('--run', choices=['stream', 'load'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(1 if check_chunk_sizes() else 0)
+    if args.run:
+        run_mode(args.run, args.file)
+        return
+
+    path = args.file
+    generated = False
+    if not path:
+        fd, path = tempfile.mkstemp(suffix='.json', prefix='bench_comments_')
+        os.close(fd)
+        print(f"生成 {args.size_mb} MB 合成文件: {path}")
+        start = time.perf_counter()
+        generate_file(path, args.size_mb)
+        print(f"  生成耗时: {time.perf_counter() - start:.1f} 秒")
+        generated = True
+
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(f"文件大小: {size_mb:.1f} MB\n")
+
+    modes = ['stream', 'load'] if args.compare else ['stream']
+    try:
+        for mode in modes:
+            r = measure(mode, path)
+            if "error" in r:
+                print(f"{mode:>6}: 失败 - {r['error'][0]}")
+                continue
+            peak = f"{r['peak_mb']:.1f} MB" if r['peak_mb'] is not None else "n/a"
+            rate = size_mb / r['seconds'] if r['seconds'] else 0
+            print(f"{mode:>6}: {r['comments']:,} 条评论 | {r['seconds']:.1f} 秒 ({rate:.1f} MB/s) | 峰值内存 {peak}")
+    finally:
+        if generated and not args.keep:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,496 @@
+"""
+Issue / 评论全文检索（BM25）
+离线构建倒排索引，按段写成二进制文件，查询时 mmap 只读打开，无需加载到内存
+
+索引目录结构:
+    manifest.json      - 段列表、项目列表、全局统计
+    seg_00000.seg      - 段文件
+
+段文件布局（小端）:
+    header   magic(8) | n_docs(u32) | n_terms(u32) | total_len(u64) | 8 个区段偏移(u64)
+    lex      每个词项一条 (term_off u64, term_len u32, df u32, post_off u64)，按词项 UTF-8 字节序排列
+    terms    词项字节串
+    postings 每个词项: doc_id[df] (u32) + tf[df] (u32)，doc_id 递增
+    doc_len  文档长度 (u32)
+    doc_proj 文档所属项目编号 (u32)
+    doc_type 文档类型 (u8): 0 = issue, 1 = comment
+    meta_idx 文档元数据偏移 (u64, n_docs + 1 个)
+    meta     文档元数据 JSON（标题、链接、摘要等）
+
+同一段内的文档按项目连续编号，按项目检索时在 postings 上二分出该项目的区间即可
+"""
+import bisect
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b'OPBM25\x00\x01'
+HEADER = struct.Struct('<8sIIQ8Q')
+LEX_ENTRY = struct.Struct('<QIIQ')
+MANIFEST_FILE = 'manifest.json'
+INDEX_VERSION = 1
+
+DOC_TYPES = ('issue', 'comment')
+
+# BM25 参数
+K1 = 1.2
+B = 0.75
+
+# 每段文档数上限，控制构建时的内存占用
+SEGMENT_SIZE = 200_000
+# 元数据中保存的正文摘要长度
+SNIPPET_CHARS = 240
+MAX_TOKEN_CHARS = 64
+
+# 日文假名、CJK 统一表意文字（含扩展 A、兼容区）、韩文音节
+CJK_RANGES = '぀-ヿ㐀-䶿一-鿿豈-﫿가-힯'
+TOKEN = re.compile(rf'[{CJK_RANGES}]+|[^\W_{CJK_RANGES}]+')
+CJK_CHAR = re.compile(rf'[{CJK_RANGES}]')
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have if in into is it its of on or that the
+their then there these this to was were will with you your we i he she they them not no
+can do does did been so than too very just also
+""".split())
+
+if sys.byteorder != 'little':  # 段文件固定小端，直接 cast 到本机整数数组
+    raise ImportError("common.fulltext 目前只支持小端平台")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    分词：英文/数字按单词切分（小写、去停用词），CJK 连续字符切成二元组
+    单个 CJK 字符保留为一元词
+    """
+    if not text:
+        return []
+    tokens = []
+    for match in TOKEN.finditer(text.lower()):
+        word = match.group(0)
+        if CJK_CHAR.match(word):
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        elif word not in STOPWORDS and (len(word) > 1 or word.isdigit()):
+            tokens.append(word[:MAX_TOKEN_CHARS])
+    return tokens
+
+
+# ========== 构建 ==========
+
+class IndexBuilder:
+    """
+    增量写入文档，满 segment_size 条写出一个段
+    同一项目的文档需要连续 add，以保证段内项目区间连续
+    begin_project / commit_project / rollback_project 为每个项目设检查点：项目读取中途失败时
+    rollback_project 撤销该项目已 add 的文档（包括期间写出的段），不在索引中留下部分文档
+    """
+
+    def __init__(self, index_dir: str, segment_size: int = SEGMENT_SIZE):
+        self.index_dir = index_dir
+        self.segment_size = segment_size
+        self.projects: List[str] = []
+        self._project_ids: Dict[str, int] = {}
+        self.segments: List[Dict] = []
+        self.total_docs = 0
+        self.total_len = 0
+        self._checkpoint: Optional[Dict] = None
+        os.makedirs(index_dir, exist_ok=True)
+        self._reset()
+
+    def _reset(self):
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._doc_len = array('I')
+        self._doc_proj = array('I')
+        self._doc_type = array('B')
+        self._meta: List[bytes] = []
+        self._ranges: Dict[int, List[int]] = {}
+        self._seg_len = 0
+
+    def add(self, project: str, doc_type: str, text: str, meta: Dict, boost_text: str = ''):
+        """
+        添加一个文档
+        boost_text（如 issue 标题）的词项额外计一次词频
+        """
+        tokens = tokenize(boost_text) + tokenize(text)
+        counts = Counter(tokens)
+        counts.update(tokenize(boost_text))
+
+        pid = self._project_ids.get(project)
+        if pid is None:
+            pid = self._project_ids[project] = len(self.projects)
+            self.projects.append(project)
+
+        doc = len(self._doc_len)
+        for term, tf in counts.items():
+            entry = self._postings.get(term)
+            if entry is None:
+                entry = self._postings[term] = (array('I'), array('I'))
+            entry[0].append(doc)
+            entry[1].append(tf)
+        self._doc_len.append(len(tokens))
+        self._doc_proj.append(pid)
+        self._doc_type.append(DOC_TYPES.index(doc_type))
+        self._meta.append(json.dumps(meta, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        span = self._ranges.setdefault(pid, [doc, doc])
+        span[1] = doc + 1
+        self._seg_len += len(tokens)
+
+        if len(self._doc_len) >= self.segment_size:
+            cut = self._checkpoint['docs'] if self._checkpoint else 0
+            if cut:
+                # 检查点之前的文档先单独成段，之后写出的段只含当前项目，回滚时可以整段删除
+                tail = self._split(cut)
+                self.flush()
+                self._restore(tail)
+                self._checkpoint.update(segments=len(self.segments), docs=0,
+                                        total_docs=self.total_docs, total_len=self.total_len)
+            if len(self._doc_len) >= self.segment_size:
+                self.flush()
+
+    def begin_project(self):
+        """记录检查点，之后 add 的文档在 rollback_project 时整体撤销"""
+        self._checkpoint = {
+            'segments': len(self.segments),
+            'docs': len(self._doc_len),
+            'projects': len(self.projects),
+            'total_docs': self.total_docs,
+            'total_len': self.total_len,
+        }
+
+    def commit_project(self):
+        self._checkpoint = None
+
+    def rollback_project(self):
+        """撤销检查点之后的文档：删除期间写出的段，截断缓冲"""
+        checkpoint, self._checkpoint = self._checkpoint, None
+        for info in self.segments[checkpoint['segments']:]:
+            os.remove(os.path.join(self.index_dir, info['file']))
+        del self.segments[checkpoint['segments']:]
+        self.total_docs = checkpoint['total_docs']
+        self.total_len = checkpoint['total_len']
+        self._split(checkpoint['docs'])
+        for project in self.projects[checkpoint['projects']:]:
+            del self._project_ids[project]
+        del self.projects[checkpoint['projects']:]
+
+    def _split(self, cut: int) -> Tuple:
+        """把缓冲中编号 >= cut 的文档移出并返回（编号从 0 开始），缓冲只保留之前的文档"""
+        postings = {}
+        for term in list(self._postings):
+            docs, tfs = self._postings[term]
+            i = bisect.bisect_left(docs, cut)
+            if i == len(docs):
+                continue
+            postings[term] = (array('I', (doc - cut for doc in docs[i:])), tfs[i:])
+            if i:
+                del docs[i:]
+                del tfs[i:]
+            else:
+                del self._postings[term]
+        ranges = {}
+        for pid, (start, end) in list(self._ranges.items()):
+            if end <= cut:
+                continue
+            ranges[pid] = [max(start - cut, 0), end - cut]
+            if start >= cut:
+                del self._ranges[pid]
+            else:
+                self._ranges[pid] = [start, cut]
+        tail = (postings, self._doc_len[cut:], self._doc_proj[cut:], self._doc_type[cut:], self._meta[cut:], ranges)
+        del self._doc_len[cut:]
+        del self._doc_proj[cut:]
+        del self._doc_type[cut:]
+        del self._meta[cut:]
+        self._seg_len -= sum(tail[1])
+        return tail
+
+    def _restore(self, tail: Tuple):
+        """把 _split 移出的文档放回空缓冲"""
+        self._postings, self._doc_len, self._doc_proj, self._doc_type, self._meta, self._ranges = tail
+        self._seg_len = sum(self._doc_len)
+
+    def flush(self):
+        """把当前缓冲写成一个段文件"""
+        n_docs = len(self._doc_len)
+        if not n_docs:
+            return
+        name = f"seg_{len(self.segments):05d}.seg"
+        terms = sorted((t.encode('utf-8'), t) for t in self._postings)
+
+        lex = bytearray()
+        term_blob = bytearray()
+        postings = bytearray()
+        for encoded, term in terms:
+            docs, tfs = self._postings[term]
+            lex += LEX_ENTRY.pack(len(term_blob), len(encoded), len(docs), len(postings))
+            term_blob += encoded
+            postings += docs.tobytes()
+            postings += tfs.tobytes()
+
+        meta_idx = array('Q', [0])
+        meta_blob = bytearray()
+        for m in self._meta:
+            meta_blob += m
+            meta_idx.append(len(meta_blob))
+
+        sections = [bytes(lex), bytes(term_blob), bytes(postings), self._doc_len.tobytes(),
+                    self._doc_proj.tobytes(), self._doc_type.tobytes(), meta_idx.tobytes(), bytes(meta_blob)]
+        offsets = []
+        pos = HEADER.size
+        for section in sections:
+            # 按 8 字节对齐，方便 memoryview.cast
+            pos += -pos % 8
+            offsets.append(pos)
+            pos += len(section)
+
+        with open(os.path.join(self.index_dir, name), 'wb') as f:
+            f.write(HEADER.pack(MAGIC, n_docs, len(terms), self._seg_len, *offsets))
+            for offset, section in zip(offsets, sections):
+                f.write(b'\0' * (offset - f.tell()))
+                f.write(section)
+
+        self.segments.append({
+            'file': name,
+            'docs': n_docs,
+            'terms': len(terms),
+            'projects': {str(pid): span for pid, span in self._ranges.items()}
+        })
+        self.total_docs += n_docs
+        self.total_len += self._seg_len
+        self._reset()
+
+    def finish(self) -> Dict:
+        """写出最后一个段和 manifest"""
+        self.flush()
+        manifest = {
+            'version': INDEX_VERSION,
+            'built_at': datetime.now().isoformat(timespec='seconds'),
+            'total_docs': self.total_docs,
+            'total_len': self.total_len,
+            'projects': self.projects,
+            'segments': self.segments
+        }
+        with open(os.path.join(self.index_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        return manifest
+
+
+def publish_index(build_dir: str, index_dir: str):
+    """用新构建的索引目录替换旧目录（先改名再删除，读取方按 manifest 重新加载）"""
+    old_dir = index_dir + '.old'
+    if os.path.exists(old_dir):
+        shutil.rmtree(old_dir)
+    if os.path.exists(index_dir):
+        os.replace(index_dir, old_dir)
+    os.replace(build_dir, index_dir)
+    if os.path.exists(old_dir):
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+# ========== 查询 ==========
+
+class Segment:
+    """mmap 打开的只读段"""
+
+    def __init__(self, path: str, info: Dict):
+        self.path = path
+        self.project_ranges = {int(pid): tuple(span) for pid, span in info.get('projects', {}).items()}
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_docs, self.n_terms, self.total_len, *offsets = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"不是有效的索引段文件: {path}")
+        (self._lex, self._terms, self._postings, doc_len, doc_proj,
+         doc_type, meta_idx, self._meta) = offsets
+        view = memoryview(self._mm)
+        self._view = view
+        self.doc_len = view[doc_len:doc_len + 4 * self.n_docs].cast('I')
+        self.doc_proj = view[doc_proj:doc_proj + 4 * self.n_docs].cast('I')
+        self.doc_type = view[doc_type:doc_type + self.n_docs]
+        self.meta_idx = view[meta_idx:meta_idx + 8 * (self.n_docs + 1)].cast('Q')
+
+    def _entry(self, i: int) -> Tuple[int, int, int, int]:
+        return LEX_ENTRY.unpack_from(self._mm, self._lex + i * LEX_ENTRY.size)
+
+    def _term_at(self, entry) -> bytes:
+        start = self._terms + entry[0]
+        return self._mm[start:start + entry[1]]
+
+    def lookup(self, term: str):
+        """二分查找词项，返回 (docs, tfs) 两个 u32 视图；不存在返回 None"""
+        key = term.encode('utf-8')
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry = self._entry(mid)
+            current = self._term_at(entry)
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                df, start = entry[2], self._postings + entry[3]
+                docs = self._view[start:start + 4 * df].cast('I')
+                tfs = self._view[start + 4 * df:start + 8 * df].cast('I')
+                return docs, tfs
+        return None
+
+    def meta(self, doc: int) -> Dict:
+        start, end = self.meta_idx[doc], self.meta_idx[doc + 1]
+        return json.loads(self._mm[self._meta + start:self._meta + end])
+
+    def close(self):
+        for name in ('doc_len', 'doc_proj', 'doc_type', 'meta_idx', '_view'):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self._mm.close()
+
+
+class FulltextIndex:
+    """加载 manifest 和全部段，提供 BM25 检索"""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.projects: List[str] = self.manifest['projects']
+        self._project_ids = {p: i for i, p in enumerate(self.projects)}
+        self.total_docs = self.manifest['total_docs']
+        self.avg_len = self.manifest['total_len'] / self.total_docs if self.total_docs else 0.0
+        self.segments = [Segment(os.path.join(index_dir, s['file']), s) for s in self.manifest['segments']]
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+    def search(
+        self,
+        query: str,
+        project: Optional[str] = None,
+        doc_type: Optional[str] = None,
+        top_k: int = 10
+    ) -> Tuple[int, List[Dict]]:
+        """
+        BM25 检索，返回 (命中文档数, top_k 结果)
+        project 为空时检索全部项目；doc_type 为 issue / comment 时只返回该类型
+        """
+        terms = Counter(tokenize(query))
+        if not terms or not self.total_docs:
+            return 0, []
+
+        pid = None
+        if project is not None:
+            pid = self._project_ids.get(project)
+            if pid is None:
+                return 0, []
+        type_id = DOC_TYPES.index(doc_type) if doc_type else None
+
+        # 第一遍：各段查词项，汇总全局 df 计算 idf（按项目检索时 idf 仍使用全部文档）
+        per_segment = []
+        df = Counter()
+        for segment in self.segments:
+            span = segment.project_ranges.get(pid) if pid is not None else (0, segment.n_docs)
+            found = {}
+            for term in terms:
+                postings = segment.lookup(term)
+                if postings is None:
+                    continue
+                docs, tfs = postings
+                df[term] += len(docs)
+                if span is None:
+                    continue
+                lo = bisect.bisect_left(docs, span[0]) if pid is not None else 0
+                hi = bisect.bisect_left(docs, span[1]) if pid is not None else len(docs)
+                if lo < hi:
+                    found[term] = (docs, tfs, lo, hi)
+            if found:
+                per_segment.append((segment, found))
+
+        n = self.total_docs
+        idf = {t: math.log(1 + (n - d + 0.5) / (d + 0.5)) for t, d in df.items()}
+        norm = K1 / self.avg_len * B if self.avg_len else 0.0
+        base = K1 * (1 - B)
+
+        # 第二遍：累加得分
+        total_hits = 0
+        candidates = []
+        for seg_no, (segment, found) in enumerate(per_segment):
+            scores: Dict[int, float] = {}
+            doc_len = segment.doc_len
+            doc_types = segment.doc_type
+            for term, (docs, tfs, lo, hi) in found.items():
+                weight = idf[term] * (K1 + 1) * terms[term]
+                for i in range(lo, hi):
+                    doc = docs[i]
+                    if type_id is not None and doc_types[doc] != type_id:
+                        continue
+                    tf = tfs[i]
+                    scores[doc] = scores.get(doc, 0.0) + weight * tf / (tf + base + norm * doc_len[doc])
+            total_hits += len(scores)
+            candidates.extend(
+                (score, seg_no, doc) for doc, score in heapq.nlargest(top_k, scores.items(), key=lambda x: x[1])
+            )
+
+        results = []
+        for score, seg_no, doc in heapq.nlargest(top_k, candidates):
+            segment = per_segment[seg_no][0]
+            item = segment.meta(doc)
+            item['type'] = DOC_TYPES[segment.doc_type[doc]]
+            item['project'] = self.projects[segment.doc_proj[doc]]
+            item['score'] = round(score, 4)
+            results.append(item)
+        return total_hits, results
+
+
+def snippet(text: Optional[str], limit: int = SNIPPET_CHARS) -> str:
+    text = ' '.join((text or '').split())
+    return text if len(text) <= limit else text[:limit] + '…'
+
+
+def iter_project_documents(project: str, issue_file: Optional[str], comment_file: Optional[str]) -> Iterable[Tuple]:
+    """
+    逐个产出项目的待索引文档 (doc_type, text, meta, boost_text)
+    issue 以标题加权，评论以正文索引
+    """
+    from common.json_stream import iter_comments, iter_issues
+
+    if issue_file:
+        for issue in iter_issues(issue_file):
+            body = issue.get('body') or ''
+            title = issue.get('title') or ''
+            yield 'issue', body, {
+                'issue_number': issue.get('number'),
+                'title': title,
+                'snippet': snippet(body),
+                'url': issue.get('html_url'),
+                'user': issue.get('user') if isinstance(issue.get('user'), str) else (issue.get('user') or {}).get('login'),
+                'created_at': issue.get('created_at')
+            }, title
+    if comment_file:
+        for issue_url, comment in iter_comments(comment_file):
+            body = comment.get('body') or ''
+            user = comment.get('user')
+            match = re.search(r'/(?:issues|pull)/(\d+)', issue_url or comment.get('issue_url') or '')
+            yield 'comment', body, {
+                'issue_number': int(match.group(1)) if match else None,
+                'title': None,
+                'snippet': snippet(body),
+                'url': comment.get('html_url'),
+                'user': user.get('login') if isinstance(user, dict) else user,
+                'created_at': comment.get('created_at') or comment.get('created_time')
+            }, ''
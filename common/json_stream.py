@@ -0,0 +1,242 @@
+"""
+评论 / Issue JSON 文件的流式读取
+按块读取文件并逐个解码数组元素，内存占用只与单个 issue 的大小有关，与文件大小无关
+
+支持的文件格式:
+- Issue 文件 / 旧版评论文件: [{...}, {...}]
+- 清洗后的评论文件: {"source_file": ..., "issues": [{"issue_url": ..., "comments": [...]}]}
+- 旧版评论文件: {"comments": [...]}
+- JSON Lines（.jsonl / .jsonl.gz，见 common/jsonl_store.py）：每行一个 issue / 评论组
+
+用法:
+    from common.json_stream import iter_issues, iter_comments
+
+    for issue in iter_issues("data/issue/facebook_react.json"):
+        ...
+    for issue_url, comment in iter_comments("data/comment_cleaned/facebook_react.json"):
+        ...
+"""
+import json
+import re
+from typing import IO, Any, Dict, Iterator, Optional, Sequence, Tuple, Union
+
+# 每次从文件读取的字符数
+CHUNK_SIZE = 1 << 20
+
+# JSON 中非法的控制字符（保留 \t \n \r），与清洗脚本的处理保持一致
+CONTROL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# 数字 / 字面量之后合法的下一个字符
+DELIMITERS = ',]} \t\n\r'
+# 单个数组元素的最大字符数；超过时报错，避免格式错误的数据把文件剩余部分全部读入内存
+MAX_ELEMENT_SIZE = 64 << 20
+# 解码错误位置距缓冲区末尾不超过这么多字符时，才可能是被截断的数字 / 字面量 / 转义序列
+TRUNCATED_TAIL = 32
+
+
+class JsonStreamReader:
+    """
+    增量 JSON 读取器
+    只解析顶层结构，数组元素逐个用 json 解码后产出，已消费的数据会及时丢弃
+    """
+
+    def __init__(self, fp: IO[str], chunk_size: int = CHUNK_SIZE, sanitize: bool = True,
+                 max_element_size: int = MAX_ELEMENT_SIZE):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._max_element_size = max_element_size
+        self._sanitize = sanitize
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._started = False
+        # strict=False 允许字符串内出现换行等控制字符
+        self._decoder = json.JSONDecoder(strict=False)
+        # 顶层对象中数组之外的字段（如 source_file、total_comments）
+        self.header: Dict[str, Any] = {}
+
+    def _fill(self, min_size: int = 0) -> bool:
+        """读取下一块数据到缓冲区，文件结束时返回 False"""
+        if self._eof:
+            return False
+        chunk = self._fp.read(max(self._chunk_size, min_size))
+        if not chunk:
+            self._eof = True
+            return False
+        if not self._started:
+            self._started = True
+            if chunk.startswith('\ufeff'):
+                chunk = chunk[1:]
+        if self._sanitize:
+            chunk = CONTROL_CHARS.sub('', chunk)
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """跳过空白，返回下一个字符（文件结束返回空串）"""
+        while True:
+            self._pos = WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ''
+
+    def _error(self, message: str):
+        raise json.JSONDecodeError(message, self._buf, self._pos)
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            self._error(f"Expecting '{char}'")
+        self._pos += 1
+
+    def _decode_value(self) -> Any:
+        """解码当前位置的一个完整 JSON 值，数据不足时继续读取"""
+        first = self._peek()
+        if not first:
+            self._error("Unexpected end of file")
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError as e:
+                # 只有错误出现在缓冲区末尾（值跨越了缓冲区边界）时才补读，其余位置的错误是数据本身格式错误
+                if not self._truncated(e) or not self._grow():
+                    raise
+                continue
+            if first not in '{["' and not self._eof and (end == len(self._buf) or self._buf[end] not in DELIMITERS):
+                # 数字/字面量后面不是分隔符，可能在缓冲区边界被截断（如 "12." 被解码为 12），补读后重新解码
+                if self._grow():
+                    continue
+            self._pos = end
+            return value
+
+    def _truncated(self, error: json.JSONDecodeError) -> bool:
+        """解码错误是否可能由缓冲区末尾截断造成（未结束的字符串，或错误位置紧挨缓冲区末尾）"""
+        return error.msg.startswith('Unterminated string') or len(self._buf) - error.pos <= TRUNCATED_TAIL
+
+    def _grow(self) -> bool:
+        """按当前剩余长度翻倍读取（避免反复解析），元素超过 max_element_size 时报错"""
+        pending = len(self._buf) - self._pos
+        if pending >= self._max_element_size:
+            self._error(f"Element exceeds {self._max_element_size} characters")
+        return self._fill(min(pending, self._max_element_size - pending))
+
+    def _iter_array(self) -> Iterator[Any]:
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._decode_value()
+            char = self._peek()
+            if char == ',':
+                self._pos += 1
+            elif char == ']':
+                self._pos += 1
+                return
+            else:
+                self._error("Expecting ',' or ']'")
+
+    def items(self, keys: Sequence[str] = ()) -> Iterator[Tuple[Optional[str], Any]]:
+        """
+        逐个产出数组元素，返回 (key, item)
+        顶层是数组时 key 为 None；顶层是对象时遍历 keys 中指定字段的数组，其余字段存入 header
+        """
+        char = self._peek()
+        if char == '[':
+            for item in self._iter_array():
+                yield None, item
+            return
+        if char != '{':
+            raise ValueError("顶层 JSON 不是数组或对象")
+
+        self._pos += 1
+        while True:
+            char = self._peek()
+            if char == '}':
+                self._pos += 1
+                return
+            if char == ',':
+                self._pos += 1
+                continue
+            key = self._decode_value()
+            self._expect(':')
+            if key in keys and self._peek() == '[':
+                for item in self._iter_array():
+                    yield key, item
+            else:
+                self.header[key] = self._decode_value()
+
+
+PathOrFile = Union[str, IO[str]]
+
+
+def _open(source: PathOrFile):
+    if isinstance(source, str):
+        return open(source, 'r', encoding='utf-8', errors='ignore')
+    return None
+
+
+def iter_items(source: PathOrFile, keys: Sequence[str] = (), **kwargs) -> Iterator[Tuple[Optional[str], Any]]:
+    """流式遍历文件的顶层数组（或顶层对象中 keys 指定的数组）"""
+    if isinstance(source, str):
+        from common.jsonl_store import is_jsonl, iter_records
+        if is_jsonl(source):
+            for record in iter_records(source):
+                yield None, record
+            return
+    fp = _open(source)
+    try:
+        yield from JsonStreamReader(fp or source, **kwargs).items(keys)
+    finally:
+        if fp is not None:
+            fp.close()
+
+
+def iter_issues(source: PathOrFile, **kwargs) -> Iterator[Dict]:
+    """逐个产出 issue（支持顶层数组和 {"issues": [...]} 两种格式）"""
+    for _, issue in iter_items(source, ('issues',), **kwargs):
+        yield issue
+
+
+def iter_comments(source: PathOrFile, **kwargs) -> Iterator[Tuple[Optional[str], Dict]]:
+    """
+    逐条产出评论，返回 (issue_url, comment)
+    兼容 {"issues": [...]}、{"comments": [...]} 和 [{"comments": [...]}] 三种格式
+    """
+    for key, item in iter_items(source, ('issues', 'comments'), **kwargs):
+        if key == 'comments':
+            yield item.get('issue_url'), item
+        else:
+            issue_url = item.get('issue_url')
+            for comment in item.get('comments', []):
+                yield issue_url, comment
+
+
+class JsonArrayWriter:
+    """
+    逐条写出 JSON 数组，排版与 json.dump(data, indent=2) 一致
+    配合流式读取使用，无需在内存中保留整个数组
+    """
+
+    def __init__(self, fp: IO[str], indent: int = 2):
+        self._fp = fp
+        self._pad = ' ' * indent
+        self._indent = indent
+        self.count = 0
+
+    def write(self, item: Any):
+        text = json.dumps(item, ensure_ascii=False, indent=self._indent)
+        self._fp.write(('[\n' if self.count == 0 else ',\n') + self._pad + text.replace('\n', '\n' + self._pad))
+        self.count += 1
+
+    def close(self):
+        self._fp.write('\n]' if self.count else '[]')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
@@ -0,0 +1,435 @@
+"""
+评论 / Issue 数据的 JSON Lines 存储
+每行一条记录，只追加不改写；可选 gzip 压缩（.jsonl.gz，每批写成一个 gzip member）
+
+旁路偏移索引 <文件名>.idx 每行一个 JSON 数组:
+    [seq, key, created_at, offset, skip, end]
+    seq        - 记录序号（从 1 开始，最后一行即记录总数）
+    key        - issue number
+    created_at - 记录的创建时间（issue 的 created_at / 评论组中第一条评论的时间）
+    offset     - 记录所在行（gzip 为所在 member）在数据文件中的字节偏移
+    skip       - gzip member 内需要跳过的行数（未压缩文件恒为 0）
+    end        - 写完该批次后数据文件的大小，用于崩溃后截掉未建索引的尾部
+
+续爬只需读取索引最后一行（O(1)），按 key 随机读取只需一次 seek
+"""
+import gzip
+import json
+import os
+import re
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+INDEX_SUFFIX = ".idx"
+# 同一数据的多种存储格式，按优先级排列
+DATA_EXTENSIONS = ('.jsonl.gz', '.jsonl', '.json')
+
+ISSUE_NUMBER = re.compile(r'/(?:issues|pull)/(\d+)')
+# 重建 gzip 文件索引时每次读取的字节数
+READ_CHUNK = 1 << 20
+
+
+class IndexEntry(NamedTuple):
+    seq: int
+    key: Any
+    created_at: Optional[str]
+    offset: int
+    skip: int
+    end: int
+
+
+def is_jsonl(path: str) -> bool:
+    return path.endswith('.jsonl') or path.endswith('.jsonl.gz')
+
+
+def is_gzip(path: str) -> bool:
+    return path.endswith('.gz')
+
+
+def index_path(path: str) -> str:
+    return path + INDEX_SUFFIX
+
+
+def strip_data_ext(filename: str) -> str:
+    """去掉数据文件扩展名: facebook_react.jsonl.gz -> facebook_react"""
+    for ext in DATA_EXTENSIONS:
+        if filename.endswith(ext):
+            return filename[:-len(ext)]
+    return filename
+
+
+def list_data_files(directory: str) -> List[str]:
+    """列出目录中的数据文件，同一项目存在多种格式时只保留优先级最高的一个"""
+    if not os.path.exists(directory):
+        return []
+    chosen = {}
+    for filename in os.listdir(directory):
+        # . 开头的是转换中的临时文件
+        if filename.startswith('.'):
+            continue
+        for rank, ext in enumerate(DATA_EXTENSIONS):
+            if filename.endswith(ext):
+                stem = filename[:-len(ext)]
+                if stem not in chosen or rank < chosen[stem][0]:
+                    chosen[stem] = (rank, filename)
+                break
+    return sorted(filename for _, filename in chosen.values())
+
+
+def find_data_file(directory: str, stem: str) -> Optional[str]:
+    """按优先级查找项目的数据文件，返回完整路径"""
+    for ext in DATA_EXTENSIONS:
+        path = os.path.join(directory, stem + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def record_key(record: Dict) -> Optional[int]:
+    """记录的 issue number（issue 取 number，评论组从 issue_url 解析）"""
+    number = record.get('number')
+    if number is not None:
+        return number
+    match = ISSUE_NUMBER.search(record.get('issue_url') or '')
+    return int(match.group(1)) if match else None
+
+
+def record_created_at(record: Dict) -> Optional[str]:
+    """记录的创建时间（issue 取 created_at，评论组取第一条评论的时间）"""
+    if record.get('created_at'):
+        return record['created_at']
+    for comment in record.get('comments') or []:
+        created = comment.get('created_at') or comment.get('created_time')
+        if created:
+            return created
+    return None
+
+
+def _dumps(record: Any) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+
+
+def read_last_entry(path: str) -> Optional[IndexEntry]:
+    """读取索引最后一个完整行（只读文件尾部）"""
+    idx = index_path(path)
+    try:
+        with open(idx, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            block = 4096
+            while True:
+                start = max(0, size - block)
+                f.seek(start)
+                tail = f.read(size - start)
+                lines = tail.split(b'\n')
+                # 最后一段可能是未写完的行
+                complete = lines[:-1]
+                if len(complete) >= 2 or start == 0:
+                    break
+                block *= 2
+    except OSError:
+        return None
+    for line in reversed(complete):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            return IndexEntry(*json.loads(line))
+        except (ValueError, TypeError):
+            continue
+    return None
+
+
+def _repair(path: str, **kwargs) -> Optional[IndexEntry]:
+    """
+    崩溃恢复：截掉索引中未写完的行，以及数据文件中超出索引记录的尾部
+    索引缺失或无法读取时扫描数据文件重建索引（rebuild_index），不按缺失的索引截断数据
+    返回索引最后一条记录
+    """
+    idx = index_path(path)
+    if os.path.exists(idx):
+        with open(idx, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size:
+                f.seek(size - 1)
+                if f.read(1) != b'\n':
+                    f.seek(0)
+                    data_end = f.read().rfind(b'\n') + 1
+                    f.truncate(data_end)
+    if not os.path.exists(path):
+        return read_last_entry(path)
+    last = read_last_entry(path)
+    if last is None and os.path.getsize(path):
+        rebuild_index(path, **kwargs)
+        last = read_last_entry(path)
+    # 只在有效索引记录的结尾之后截断（未建索引的批次或未写完的行）
+    if last is not None and os.path.getsize(path) > last.end:
+        with open(path, 'rb+') as f:
+            f.truncate(last.end)
+    return last
+
+
+class JsonlWriter:
+    """
+    JSONL 写入器，同时维护旁路偏移索引
+    记录先缓存，每 batch_size 条落盘一次（gzip 模式下每批一个 member）
+    """
+
+    def __init__(
+        self,
+        path: str,
+        append: bool = True,
+        key_fn: Callable[[Dict], Any] = record_key,
+        created_at_fn: Callable[[Dict], Optional[str]] = record_created_at,
+        batch_size: int = 1000
+    ):
+        self.path = path
+        self.key_fn = key_fn
+        self.created_at_fn = created_at_fn
+        self.batch_size = batch_size
+        self._gzip = is_gzip(path)
+        self._pending: List[Dict] = []
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if append:
+            last = _repair(path, key_fn=key_fn, created_at_fn=created_at_fn)
+            self.seq = last.seq if last else 0
+        else:
+            for p in (path, index_path(path)):
+                if os.path.exists(p):
+                    os.remove(p)
+            self.seq = 0
+        self._data = open(path, 'ab')
+        self._index = open(index_path(path), 'a', encoding='utf-8')
+
+    def write(self, record: Dict):
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, records: Iterable[Dict]):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        if not self._pending:
+            return
+        offset = self._data.tell()
+        lines = [(_dumps(r) + '\n').encode('utf-8') for r in self._pending]
+        positions = []
+        if self._gzip:
+            with gzip.GzipFile(fileobj=self._data, mode='wb') as gz:
+                gz.write(b''.join(lines))
+            positions = [(offset, i) for i in range(len(lines))]
+        else:
+            pos = offset
+            for line in lines:
+                positions.append((pos, 0))
+                pos += len(line)
+            self._data.write(b''.join(lines))
+        # 数据先落盘，索引后写：索引永远不会指向不存在的数据
+        self._data.flush()
+        end = self._data.tell()
+
+        index_lines = []
+        for record, (pos, skip) in zip(self._pending, positions):
+            self.seq += 1
+            index_lines.append(_dumps([
+                self.seq, self.key_fn(record), self.created_at_fn(record), pos, skip, end
+            ]) + '\n')
+        self._index.write(''.join(index_lines))
+        self._index.flush()
+        self._pending = []
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._data.close()
+            self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def append_records(path: str, records: List[Dict], **kwargs) -> Optional[IndexEntry]:
+    """追加一批记录并返回最后一条索引"""
+    if not records:
+        return read_last_entry(path)
+    with JsonlWriter(path, append=True, batch_size=max(len(records), 1), **kwargs) as writer:
+        writer.write_many(records)
+    return read_last_entry(path)
+
+
+def _open_text(path: str):
+    if is_gzip(path):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='ignore')
+    return open(path, 'r', encoding='utf-8', errors='ignore')
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """
+    逐行读取 JSONL 文件
+    末尾未写完的行（或被截断的 gzip member）视为崩溃残留，直接忽略
+    """
+    with _open_text(path) as f:
+        try:
+            for line in f:
+                if not line.endswith('\n'):
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                yield json.loads(line, strict=False)
+        except (EOFError, gzip.BadGzipFile):
+            return
+
+
+class JsonlIndex:
+    """加载旁路索引，按 issue number 或创建时间随机读取记录"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: List[IndexEntry] = []
+        self.by_key: Dict[Any, IndexEntry] = {}
+        try:
+            with open(index_path(path), 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break
+                    entry = IndexEntry(*json.loads(line))
+                    self.entries.append(entry)
+                    if entry.key is not None:
+                        self.by_key[entry.key] = entry
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self.entries)
+
+    def read(self, entry: IndexEntry) -> Dict:
+        with open(self.path, 'rb') as raw:
+            raw.seek(entry.offset)
+            if not is_gzip(self.path):
+                return json.loads(raw.readline().decode('utf-8', errors='ignore'), strict=False)
+            with gzip.GzipFile(fileobj=raw, mode='rb') as gz:
+                for i, line in enumerate(gz):
+                    if i == entry.skip:
+                        return json.loads(line.decode('utf-8', errors='ignore'), strict=False)
+        raise KeyError(entry.key)
+
+    def get(self, key: Any) -> Optional[Dict]:
+        entry = self.by_key.get(key)
+        return self.read(entry) if entry else None
+
+    def between(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict]:
+        """按 created_at（ISO 字符串）范围读取记录"""
+        for entry in self.entries:
+            created = entry.created_at or ''
+            if (start is None or created >= start) and (end is None or created <= end):
+                yield self.read(entry)
+
+
+def _gzip_members(path: str) -> Iterator[Tuple[int, int, List[bytes]]]:
+    """
+    逐个解压 gzip member，产出 (起始偏移, 结束偏移, 各行)
+    遇到截断、损坏或最后一行未写完的 member 即停止，之后的字节不再可信
+    """
+    with open(path, 'rb') as f:
+        offset = 0
+        buf = f.read(READ_CHUNK)
+        while buf:
+            decompressor = zlib.decompressobj(wbits=31)
+            parts = []
+            consumed = 0
+            try:
+                while True:
+                    parts.append(decompressor.decompress(buf))
+                    if decompressor.eof:
+                        break
+                    consumed += len(buf)
+                    buf = f.read(READ_CHUNK)
+                    if not buf:
+                        return
+            except zlib.error:
+                return
+            content = b''.join(parts)
+            if content and not content.endswith(b'\n'):
+                return
+            end = offset + consumed + len(buf) - len(decompressor.unused_data)
+            yield offset, end, content.splitlines()
+            buf = decompressor.unused_data or f.read(READ_CHUNK)
+            offset = end
+
+
+def rebuild_index(path: str, **kwargs) -> int:
+    """
+    根据数据文件重建索引
+    gzip 文件按 member 记录偏移，end 为最后一个能完整解压的 member 的结尾，
+    _repair 据此截掉损坏或未写完的尾部 member（否则其后追加的数据都无法读出）
+    """
+    idx = index_path(path)
+    count = 0
+    tmp_idx = idx + '.tmp'
+    with open(tmp_idx, 'w', encoding='utf-8') as out:
+        key_fn = kwargs.get('key_fn', record_key)
+        created_at_fn = kwargs.get('created_at_fn', record_created_at)
+        if is_gzip(path):
+            for offset, end, lines in _gzip_members(path):
+                try:
+                    # skip 按 member 内的行号计（与 JsonlIndex.read 逐行跳过一致）
+                    records = [(i, json.loads(line.decode('utf-8', errors='ignore'), strict=False))
+                               for i, line in enumerate(lines) if line.strip()]
+                except ValueError:
+                    break
+                for i, record in records:
+                    count += 1
+                    out.write(_dumps([count, key_fn(record), created_at_fn(record), offset, i, end]) + '\n')
+        else:
+            with open(path, 'rb') as f:
+                offset = 0
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    next_offset = offset + len(line)
+                    if line.strip():
+                        record = json.loads(line.decode('utf-8', errors='ignore'), strict=False)
+                        count += 1
+                        out.write(_dumps([count, key_fn(record), created_at_fn(record),
+                                          offset, 0, next_offset]) + '\n')
+                    offset = next_offset
+    os.replace(tmp_idx, idx)
+    return count
+
+
+def convert_json_array(src: str, dst: str, **kwargs) -> int:
+    """
+    把旧的 JSON 数组文件流式转换为 JSONL（附带索引）
+    先写到同目录下的临时文件（. 开头，list_data_files 不会列出），全部成功后再替换为 dst 和它的索引，
+    中途失败不会留下不完整的 dst（否则之后的运行会认为已经转换过）
+    """
+    from common.json_stream import iter_items
+
+    directory, name = os.path.split(dst)
+    tmp = os.path.join(directory, f".converting-{name}")
+    count = 0
+    try:
+        with JsonlWriter(tmp, append=False, **kwargs) as writer:
+            for _, record in iter_items(src, ('issues',)):
+                writer.write(record)
+                count += 1
+        # 先替换索引再替换数据：dst 出现时索引一定已就位
+        os.replace(index_path(tmp), index_path(dst))
+        os.replace(tmp, dst)
+    except BaseException:
+        for p in (tmp, index_path(tmp)):
+            if os.path.exists(p):
+                os.remove(p)
+        raise
+    return count
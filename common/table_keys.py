@@ -0,0 +1,100 @@
+"""
+爬虫数据表的唯一键（MySQL）
+爬虫的数据库 sink（crawls/sinks.py，CRAWL_SINK=mysql）和导入脚本（clean/import_data_folder.py、
+clean/import_commits_prs.py）写入同一批表；sink 按唯一键 upsert，导入脚本用 DataFrame.to_sql 建的表没有键，
+两边都在写入前调用 ensure_unique_key，保证这些表始终带键，重复运行不会产生重复行:
+    已有的表没有键时，复制表结构、加上键后 INSERT IGNORE 原表数据（重复行只保留一行），再整表替换
+    导入脚本的 append 模式经临时表 INSERT ... ON DUPLICATE KEY UPDATE 写入（write_keyed_table）
+"""
+from typing import Dict, Sequence, Tuple
+
+UNIQUE_KEYS: Dict[str, Tuple[str, ...]] = {
+    'stars': ('project', 'date'),
+    'forks': ('project', 'date'),
+    'commit_activity': ('project', 'date'),
+    'pr_daily': ('project', 'date'),
+    'issues': ('project', 'number'),
+    'comments': ('project', 'comment_id'),
+}
+
+# to_sql 建的表键列为 TEXT，MySQL 无法直接建索引，加键前改为定长类型
+KEY_COLUMN_TYPES = {
+    'project': 'VARCHAR(255) NOT NULL',
+    'date': 'VARCHAR(10) NOT NULL',
+    'number': 'BIGINT NOT NULL',
+    'comment_id': 'BIGINT NOT NULL',
+}
+KEY_NAME = 'uniq_crawl_key'
+STAGING_SUFFIX = '__import'
+
+
+def table_exists(cur, table: str) -> bool:
+    cur.execute("SHOW TABLES LIKE %s", (table,))
+    return cur.fetchone() is not None
+
+
+def has_unique_key(cur, table: str, keys: Sequence[str]) -> bool:
+    """表上是否已有恰好覆盖 keys 的主键或唯一键"""
+    cur.execute(f"SHOW INDEX FROM `{table}` WHERE Non_unique = 0")
+    indexes: Dict[str, list] = {}
+    for row in cur.fetchall():
+        # SHOW INDEX 的列: Table, Non_unique, Key_name, Seq_in_index, Column_name, ...
+        indexes.setdefault(row[2], []).append((row[3], row[4]))
+    return any([c for _, c in sorted(columns)] == list(keys) for columns in indexes.values())
+
+
+def ensure_unique_key(conn, table: str, keys: Sequence[str] = ()) -> bool:
+    """
+    conn 为 DB-API 连接（pymysql）；表不存在或已有键时不做任何事，返回是否新加了键
+    """
+    keys = list(keys or UNIQUE_KEYS[table])
+    cur = conn.cursor()
+    if not table_exists(cur, table) or has_unique_key(cur, table, keys):
+        return False
+    keyed, old = f"{table}__keyed", f"{table}__old"
+    cur.execute(f"DROP TABLE IF EXISTS `{keyed}`")
+    cur.execute(f"CREATE TABLE `{keyed}` LIKE `{table}`")
+    cur.execute(f"ALTER TABLE `{keyed}` "
+                + ', '.join(f"MODIFY `{c}` {KEY_COLUMN_TYPES[c]}" for c in keys)
+                + f", ADD UNIQUE KEY `{KEY_NAME}` ({', '.join(f'`{c}`' for c in keys)})")
+    cur.execute(f"INSERT IGNORE INTO `{keyed}` SELECT * FROM `{table}`")
+    cur.execute(f"RENAME TABLE `{table}` TO `{old}`, `{keyed}` TO `{table}`")
+    cur.execute(f"DROP TABLE `{old}`")
+    conn.commit()
+    return True
+
+
+def upsert_from(conn, source: str, table: str):
+    """把 source 表的全部行按唯一键 upsert 到 table"""
+    cur = conn.cursor()
+    cur.execute(f"SHOW COLUMNS FROM `{source}`")
+    columns = [row[0] for row in cur.fetchall()]
+    keys = UNIQUE_KEYS[table]
+    updates = [c for c in columns if c not in keys] or list(keys)[:1]
+    names = ', '.join(f"`{c}`" for c in columns)
+    cur.execute(f"INSERT INTO `{table}` ({names}) SELECT {names} FROM `{source}` "
+                f"ON DUPLICATE KEY UPDATE " + ', '.join(f"`{c}` = VALUES(`{c}`)" for c in updates))
+    conn.commit()
+
+
+def write_keyed_table(engine, df, table: str, import_mode: str, dtype: Dict):
+    """
+    导入脚本写表：replace / fail 模式照常 to_sql 后补上唯一键；
+    append 模式且表已存在时先写临时表再 upsert，避免与 sink 写入的行重复（直接追加会违反唯一键）
+    """
+    from sqlalchemy import inspect
+
+    raw = engine.raw_connection()
+    try:
+        if import_mode == 'append' and inspect(engine).has_table(table):
+            ensure_unique_key(raw, table)
+            staging = table + STAGING_SUFFIX
+            df.to_sql(name=staging, con=engine, if_exists='replace', index=False, dtype=dtype)
+            upsert_from(raw, staging, table)
+            raw.cursor().execute(f"DROP TABLE `{staging}`")
+            raw.commit()
+        else:
+            df.to_sql(name=table, con=engine, if_exists=import_mode, index=False, dtype=dtype)
+            ensure_unique_key(raw, table)
+    finally:
+        raw.close()
@@ -0,0 +1,174 @@
+"""
+全文检索（common/fulltext.py）测试：分词、BM25 排序、按项目 / 类型过滤、分段与项目回滚
+
+运行方式:
+    python common/test_fulltext.py
+    python -m pytest common/test_fulltext.py
+"""
+import math
+import os
+import sys
+import tempfile
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.fulltext import B, K1, MAX_TOKEN_CHARS, FulltextIndex, IndexBuilder, tokenize
+
+# (项目, 类型, 正文, 标题)
+DOCUMENTS = [
+    ('octo/alpha', 'issue', 'Memory leak when the parser reads large files', 'Parser memory leak'),
+    ('octo/alpha', 'comment', 'I can reproduce the leak with version 2 of the parser', ''),
+    ('octo/alpha', 'issue', 'Add dark mode to the settings page', 'Dark mode'),
+    ('octo/alpha', 'comment', 'dark mode please, dark mode everywhere', ''),
+    ('octo/beta', 'issue', '内存泄漏：解析大文件时内存持续增长', '解析器内存泄漏'),
+    ('octo/beta', 'comment', 'The leak is fixed in the latest release', ''),
+    ('octo/beta', 'issue', 'Crash on startup with empty config', 'Startup crash'),
+    ('octo/gamma', 'comment', 'Unrelated discussion about documentation', ''),
+]
+
+
+def build(index_dir: str, documents=DOCUMENTS, segment_size: int = 1000, failing=()) -> FulltextIndex:
+    """按项目分组写入；failing 中的项目排在第一个项目之后，写入几个文档后回滚（模拟读取中途失败）"""
+    builder = IndexBuilder(index_dir, segment_size=segment_size)
+    projects = []
+    for project, *_ in documents:
+        if project not in projects:
+            projects.append(project)
+    for project in projects[:1] + list(failing) + projects[1:]:
+        builder.begin_project()
+        docs = [d for d in documents if d[0] == project] if project not in failing else [
+            (project, 'issue', f'partial document {i} about the parser leak', 'partial') for i in range(3)]
+        for i, (_, doc_type, text, title) in enumerate(docs):
+            builder.add(project, doc_type, text, {'id': f"{project}#{i}", 'title': title}, boost_text=title)
+        if project in failing:
+            builder.rollback_project()
+        else:
+            builder.commit_project()
+    builder.finish()
+    return FulltextIndex(index_dir)
+
+
+def bm25(query: str, documents=DOCUMENTS):
+    """按定义逐个文档计算 BM25 得分（与索引的实现无关），返回 {(项目, 序号): 得分}"""
+    docs = []
+    for project, doc_type, text, title in documents:
+        tokens = tokenize(title) + tokenize(text)
+        counts = Counter(tokens)
+        counts.update(tokenize(title))
+        docs.append((project, counts, len(tokens)))
+    avg_len = sum(length for _, _, length in docs) / len(docs)
+    terms = Counter(tokenize(query))
+    scores = {}
+    seen = Counter()
+    for project, counts, length in docs:
+        key = (project, seen[project])
+        seen[project] += 1
+        score = 0.0
+        for term, qtf in terms.items():
+            tf = counts.get(term, 0)
+            if not tf:
+                continue
+            df = sum(1 for _, c, _ in docs if term in c)
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            score += idf * (K1 + 1) * qtf * tf / (tf + K1 * (1 - B + B * length / avg_len))
+        if score:
+            scores[key] = score
+    return scores
+
+
+def result_ids(results):
+    return [r['id'] for r in results]
+
+
+def test_tokenize():
+    """英文小写、去停用词和单字母，数字保留；CJK 切二元组，单字保留；下划线分词；超长词截断"""
+    assert tokenize(None) == [] and tokenize('') == []
+    assert tokenize('The Parser is LEAKING memory in v2') == ['parser', 'leaking', 'memory', 'v2']
+    assert tokenize('a b 7 x') == ['7']
+    assert tokenize('snake_case-name') == ['snake', 'case', 'name']
+    assert tokenize('内存泄漏') == ['内存', '存泄', '泄漏']
+    assert tokenize('修 bug') == ['修', 'bug']
+    assert tokenize('解析器crash') == ['解析', '析器', 'crash']
+    assert tokenize('x' * 100) == ['x' * MAX_TOKEN_CHARS]
+
+
+def test_ranking_matches_bm25():
+    """排序和得分与按定义计算的 BM25 一致，标题词项加权"""
+    with tempfile.TemporaryDirectory() as tmp:
+        index = build(tmp)
+        try:
+            for query in ('parser leak', 'dark mode', '内存泄漏', 'crash startup config', 'leak'):
+                expected = bm25(query)
+                hits, results = index.search(query, top_k=len(DOCUMENTS))
+                assert hits == len(expected), query
+                got = {tuple(r['id'].split('#')): r['score'] for r in results}
+                assert {(p, int(i)): s for (p, i), s in got.items()} == \
+                    {k: round(v, 4) for k, v in expected.items()}, query
+                scores = [r['score'] for r in results]
+                assert scores == sorted(scores, reverse=True), query
+
+            # 标题含查询词的 issue 排在只有正文提到的评论之前
+            _, results = index.search('parser leak', top_k=2)
+            assert result_ids(results)[0] == 'octo/alpha#0'
+            # 标题加权计入词频：标题和正文都有 dark mode 的 issue 排在正文重复两次的评论之前
+            _, results = index.search('dark mode', top_k=2)
+            assert result_ids(results) == ['octo/alpha#2', 'octo/alpha#3']
+            assert index.search('nonexistentword') == (0, [])
+            assert index.search('the of and') == (0, [])
+        finally:
+            index.close()
+
+
+def test_filters():
+    """按项目检索时只返回该项目的文档，idf 仍按全部文档计算；按类型过滤"""
+    with tempfile.TemporaryDirectory() as tmp:
+        index = build(tmp)
+        try:
+            hits, results = index.search('leak', project='octo/beta')
+            assert hits == 1 and result_ids(results) == ['octo/beta#1']
+            assert results[0]['project'] == 'octo/beta' and results[0]['type'] == 'comment'
+            assert results[0]['score'] == round(bm25('leak')[('octo/beta', 1)], 4)
+
+            hits, results = index.search('leak', doc_type='issue')
+            assert hits == 1 and result_ids(results) == ['octo/alpha#0']
+            assert index.search('leak', project='octo/gamma') == (0, [])
+            assert index.search('leak', project='missing/project') == (0, [])
+        finally:
+            index.close()
+
+
+def test_segments_and_rollback():
+    """不同段大小、中途回滚的项目都不影响检索结果"""
+    queries = ('parser leak', 'dark mode', '内存泄漏', 'partial', 'crash')
+    with tempfile.TemporaryDirectory() as tmp:
+        reference = build(os.path.join(tmp, 'ref'))
+        expected = {q: reference.search(q, top_k=20) for q in queries}
+        reference.close()
+        for segment_size in (1, 2, 3, 5, 100):
+            for failing in ((), ('octo/failed',)):
+                index_dir = os.path.join(tmp, f"seg{segment_size}-{len(failing)}")
+                index = build(index_dir, segment_size=segment_size, failing=failing)
+                try:
+                    assert index.projects == ['octo/alpha', 'octo/beta', 'octo/gamma']
+                    assert index.total_docs == len(DOCUMENTS)
+                    for query in queries:
+                        assert index.search(query, top_k=20) == expected[query], (segment_size, failing, query)
+                    # 回滚的项目写出的段文件已删除
+                    assert sorted(os.listdir(index_dir)) == sorted(
+                        ['manifest.json'] + [s['file'] for s in index.manifest['segments']])
+                finally:
+                    index.close()
+
+
+if __name__ == '__main__':
+    tests = [test_tokenize, test_ranking_matches_bm25, test_filters, test_segments_and_rollback]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,131 @@
+"""
+流式 JSON 读取（common/json_stream.py）的异常输入测试
+截断、格式错误的文件应在出错位置抛出 ValueError，之前的元素照常产出，且不会为了找错而读完整个文件
+
+运行方式:
+    python common/test_json_stream.py
+    python -m pytest common/test_json_stream.py
+"""
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.json_stream import JsonStreamReader, iter_comments, iter_issues
+
+CHUNK_SIZES = (1, 3, 7, 1000)
+
+
+class CountingReader(io.StringIO):
+    """记录已读取的字符数"""
+
+    def __init__(self, text: str):
+        super().__init__(text)
+        self.consumed = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.consumed += len(data)
+        return data
+
+
+def read_until_error(doc: str, chunk_size: int, keys=('issues',), **kwargs):
+    """返回 (出错前产出的元素, 异常)"""
+    items = []
+    try:
+        for _, item in JsonStreamReader(io.StringIO(doc), chunk_size=chunk_size, **kwargs).items(keys):
+            items.append(item)
+    except ValueError as e:
+        return items, e
+    return items, None
+
+
+def test_truncated_input():
+    """文件在元素中间截断：之前的元素完整产出，截断处报错"""
+    for doc, expected in (
+        ('[{"a": 1}, {"b": 2', [{'a': 1}]),
+        ('[{"a": 1}, {"b": "unterminated', [{'a': 1}]),
+        ('[1, 2', [1, 2]),
+        ('{"issues": [{"n": 1},', [{'n': 1}]),
+        ('{"source_file": "x.json", "issues": [', []),
+    ):
+        for chunk_size in CHUNK_SIZES:
+            items, error = read_until_error(doc, chunk_size)
+            assert error is not None, f"{doc!r} chunk_size={chunk_size} 应报错"
+            assert items == expected, f"{doc!r} chunk_size={chunk_size}: {items!r}"
+
+
+def test_malformed_input():
+    """格式错误的元素报错，不会跳过或产出错误的数据"""
+    for doc, expected in (
+        ('[{"a": 1}, {"b" 2}, {"c": 3}]', [{'a': 1}]),
+        ('[{"a": 1} {"b": 2}]', [{'a': 1}]),
+        ('[{"a": 1}, tru, 3]', [{'a': 1}]),
+    ):
+        for chunk_size in CHUNK_SIZES:
+            items, error = read_until_error(doc, chunk_size)
+            assert error is not None, f"{doc!r} chunk_size={chunk_size} 应报错"
+            assert items == expected, f"{doc!r} chunk_size={chunk_size}: {items!r}"
+
+    for doc in ('"x"', '42', ''):
+        items, error = read_until_error(doc, 1000)
+        assert error is not None and items == [], doc
+
+
+def test_malformed_element_stops_early():
+    """大文件中间的格式错误：报错时只读取了出错位置附近的数据，而不是整个文件"""
+    good = '{"body": "' + 'x' * 200 + '"}'
+    doc = '[' + ', '.join([good] * 20) + ', {"body" "broken"}, ' + ', '.join([good] * 20000) + ']'
+    fp = CountingReader(doc)
+    items = []
+    try:
+        for _, item in JsonStreamReader(fp, chunk_size=1024).items():
+            items.append(item)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("格式错误的元素应报错")
+    assert len(items) == 20
+    assert fp.consumed < 16 * 1024, f"报错前读取了 {fp.consumed} 个字符"
+
+
+def test_element_size_limit():
+    """单个元素超过 max_element_size 时报错，不会无限扩大缓冲区"""
+    doc = '[{"a": 1}, {"body": "' + 'x' * 5000 + '"}, {"c": 3}]'
+    items, error = read_until_error(doc, 64, max_element_size=1000)
+    assert items == [{'a': 1}]
+    assert error is not None and 'exceeds' in str(error)
+
+    # 限制足够大时正常读取
+    items, error = read_until_error(doc, 64, max_element_size=10000)
+    assert error is None and len(items) == 3
+
+
+def test_control_chars_and_formats():
+    """字符串中的控制字符被清理；三种评论文件格式都能读取"""
+    issues = list(iter_issues(io.StringIO('[{"title": "a\x01b\nc"}]')))
+    assert issues == [{'title': 'ab\nc'}]
+
+    expected = [('u1', {'id': 1}), ('u1', {'id': 2})]
+    for doc in (
+        '{"source_file": "x", "issues": [{"issue_url": "u1", "comments": [{"id": 1}, {"id": 2}]}]}',
+        '[{"issue_url": "u1", "comments": [{"id": 1}, {"id": 2}]}]',
+    ):
+        assert list(iter_comments(io.StringIO(doc), chunk_size=5)) == expected, doc
+    legacy = '{"comments": [{"issue_url": "u1", "id": 1}]}'
+    assert list(iter_comments(io.StringIO(legacy))) == [('u1', {'issue_url': 'u1', 'id': 1})]
+
+
+if __name__ == '__main__':
+    tests = [test_truncated_input, test_malformed_input, test_malformed_element_stops_early,
+             test_element_size_limit, test_control_chars_and_formats]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
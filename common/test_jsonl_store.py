@@ -0,0 +1,144 @@
+"""
+JSONL 存储（common/jsonl_store.py）的崩溃恢复测试
+索引缺失、索引或数据文件尾部未写完、gzip 尾部 member 损坏时，续写前应恢复到最后一条完整记录，
+之后追加的数据和原有数据都能按顺序和按 key 读出
+
+运行方式:
+    python common/test_jsonl_store.py
+    python -m pytest common/test_jsonl_store.py
+"""
+import gzip
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.jsonl_store import (JsonlIndex, JsonlWriter, append_records, index_path, iter_records,
+                                read_last_entry, rebuild_index)
+
+
+def make_records(start: int, count: int):
+    return [{'number': n, 'created_at': f"2024-01-{n % 28 + 1:02d}T00:00:00Z", 'body': f"issue {n} 内容"}
+            for n in range(start, start + count)]
+
+
+def write_batches(path: str, batches):
+    for batch in batches:
+        append_records(path, batch)
+
+
+def assert_readable(path: str, expected):
+    """顺序读取、索引读取和索引最后一行都与 expected 一致"""
+    assert list(iter_records(path)) == expected
+    index = JsonlIndex(path)
+    assert len(index) == len(expected)
+    for record in expected:
+        assert index.get(record['number']) == record, record['number']
+    last = read_last_entry(path)
+    assert last.seq == len(expected) and last.end == os.path.getsize(path)
+
+
+def check_missing_index(name: str):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, name)
+        first, second = make_records(1, 5), make_records(6, 3)
+        write_batches(path, [first[:2], first[2:]])
+        os.remove(index_path(path))
+
+        # 索引缺失：续写前扫描数据文件重建，序号接着已有记录
+        append_records(path, second)
+        assert_readable(path, first + second)
+
+
+def test_missing_index_plain():
+    """未压缩文件的索引缺失"""
+    check_missing_index('a.jsonl')
+
+
+def test_missing_index_gzip():
+    """gzip 文件的索引缺失（重建时按 member 记录偏移和行号）"""
+    check_missing_index('a.jsonl.gz')
+
+
+def test_unfinished_tail_plain():
+    """数据文件末尾未写完的行和索引末尾未写完的行都被截掉"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'a.jsonl')
+        first = make_records(1, 4)
+        append_records(path, first)
+        with open(path, 'ab') as f:
+            f.write(b'{"number": 99, "bo')
+        with open(index_path(path), 'a', encoding='utf-8') as f:
+            f.write('[5, 99, null, 1')
+
+        second = make_records(5, 2)
+        append_records(path, second)
+        assert_readable(path, first + second)
+
+
+def corrupt_gzip_tails(path: str):
+    """三种损坏的尾部：截断的 member、无法解压的字节、能解压但最后一行不完整的 member"""
+    with open(path, 'rb') as f:
+        clean = f.read()
+    member = gzip.compress(b'{"number": 100, "body": "tail"}\n' * 50)
+    return [
+        clean + member[:len(member) // 2],
+        clean + b'\x1f\x8b\x08\x00garbage bytes',
+        clean + gzip.compress(b'{"number": 100}\n{"number": 101}'),
+    ]
+
+
+def test_corrupt_gzip_tail():
+    """gzip 尾部 member 损坏：索引缺失时重建并截到最后一个完整 member，之后追加的数据可读"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'a.jsonl.gz')
+        first = make_records(1, 6)
+        write_batches(path, [first[:3], first[3:]])
+        clean_size = os.path.getsize(path)
+
+        for i, data in enumerate(corrupt_gzip_tails(path)):
+            with open(path, 'wb') as f:
+                f.write(data)
+            os.remove(index_path(path))
+            assert rebuild_index(path) == len(first), i
+            assert read_last_entry(path).end == clean_size, i
+
+            second = make_records(10 + i * 10, 2)
+            append_records(path, second)
+            assert_readable(path, first + second)
+
+            # 恢复到干净的两个 member，测试下一种损坏
+            with open(path, 'rb+') as f:
+                f.truncate(clean_size)
+            rebuild_index(path)
+
+
+def test_corrupt_gzip_tail_with_index():
+    """索引完好、数据文件尾部有未建索引的 member 时，按索引的 end 截断"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'a.jsonl.gz')
+        first = make_records(1, 3)
+        append_records(path, first)
+        data = corrupt_gzip_tails(path)[0]
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        second = make_records(4, 3)
+        with JsonlWriter(path, batch_size=2) as writer:
+            writer.write_many(second)
+        assert_readable(path, first + second)
+
+
+if __name__ == '__main__':
+    tests = [test_missing_index_plain, test_missing_index_gzip, test_unfinished_tail_plain,
+             test_corrupt_gzip_tail, test_corrupt_gzip_tail_with_index]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,343 @@
+"""
+爬虫吞吐量基准测试
+在本地启动模拟 GitHub API（fake_github.py），逐个运行各爬虫爬取同一批项目，按服务端计数报告
+每个爬虫的页数、请求数、实际消耗的 API 额度（core / search / graphql）、耗时和每秒页数，
+异步内核的爬虫另外报告累计请求耗时与等待时间（退避 / 节奏 / 额度，见 retry_policy.py）；
+stars 另外与旧的逐页串行方式对比（crawl_stars 只爬时间范围内的页面，请求数更少），
+comments 另外与旧的 PyGithub 逐个 issue 请求评论的方式对比，按每秒得到的范围内评论数比较
+（旧方式每个 issue 至少一次请求，很慢，默认只跑前 --comments-baseline-repos 个项目）
+
+爬虫:
+    stars / forks / commits_prs / repo_counters / issues / comments   github_core 异步内核
+
+每个爬虫在单独的临时目录中运行（输出、任务队列、Token 状态都写在这里），互不影响
+
+运行方式:
+    python bench_crawl.py                          # 全部爬虫，8 个项目，每请求 50ms 延迟
+    python bench_crawl.py --crawlers stars,forks --repos 16 --latency 100 --stars 3000
+    python bench_crawl.py --crawlers stars --skip-baseline        # 不测试旧的串行方式
+    python bench_crawl.py --crawlers comments --comments-baseline-repos 2   # 旧评论爬取方式跑 2 个项目
+    python bench_crawl.py --secondary-limit 8 --retry-after 1 --stats-pending 1   # 二级限流 / 202 处理
+    python bench_crawl.py --replay fixtures.json --projects facebook/react        # 回放录制的响应
+    python bench_crawl.py --crawlers stars --shards 4 --secondary-limit 4        # 分片多进程的扩展性
+
+--shards N 另外比较同一工作目录中 1 个进程 1 个 Token 与 N 个进程（--shard i/N，见 sharding.py）各 1 个 Token，
+两者都用子进程运行爬虫的 main()；配合 --secondary-limit 限制每个 Token 的并发，吞吐受 Token 数约束时才能看出扩展性
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+CRAWLS_DIR = os.path.dirname(os.path.abspath(__file__))
+for path in (CRAWLS_DIR, os.path.dirname(CRAWLS_DIR)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import httpx
+
+import github_core
+from common.jsonl_store import iter_records
+from fake_github import FakeDataset, FixtureStore, start_server
+
+BENCH_TOKENS = [f"bench-token-{i}" for i in range(4)]
+PROJECT_LIST_FILE = "top300_projects_list.txt"
+CRAWLERS = ('stars', 'forks', 'commits_prs', 'repo_counters', 'issues', 'comments')
+CRAWLER_MODULES = {
+    'stars': 'crawl_stars',
+    'forks': 'crawl_forks',
+    'commits_prs': 'crawl_commits_prs',
+    'repo_counters': 'crawl_repo_counters',
+    'issues': 'crawl_issues_v2',
+    'comments': 'crawl_comments',
+}
+
+
+def run_baseline(base_url: str, repos, page_sleep: float = 0.1):
+    """旧实现的请求模式：单连接、逐页串行、每页额外 sleep"""
+    with httpx.Client(headers={'Authorization': f'Bearer {BENCH_TOKENS[0]}',
+                               'Accept': 'application/vnd.github.star+json'}) as client:
+        for repo in repos:
+            page = 1
+            while True:
+                response = client.get(f"{base_url}/repos/{repo}/stargazers",
+                                      params={'page': page, 'per_page': 100})
+                if 'rel="next"' not in response.headers.get('Link', ''):
+                    break
+                page += 1
+                time.sleep(page_sleep)
+
+
+def run_comments_baseline(base_url: str, repos):
+    """
+    旧 crawl_comments 的请求模式（PyGithub 逐个 issue）：单连接串行，列出 START_DATE 之后更新的 issue，
+    再逐个请求每个 issue 的评论，每页 30 条（PyGithub 默认），返回时间范围内的评论数
+    """
+    module = load_crawler('crawl_comments', base_url)
+    since = module.START_DATE.strftime('%Y-%m-%dT%H:%M:%SZ')
+    kept = 0
+
+    def pages(client, url, params):
+        page = 1
+        while True:
+            response = client.get(url, params={**params, 'page': page, 'per_page': 30})
+            yield from response.json()
+            if 'rel="next"' not in response.headers.get('Link', ''):
+                return
+            page += 1
+
+    with httpx.Client(headers={'Authorization': f'Bearer {BENCH_TOKENS[0]}'}) as client:
+        for repo in repos:
+            client.get(f"{base_url}/repos/{repo}")
+            issues = pages(client, f"{base_url}/repos/{repo}/issues",
+                           {'state': 'all', 'sort': 'updated', 'direction': 'asc', 'since': since})
+            for issue in issues:
+                for comment in pages(client, issue['comments_url'], {}):
+                    created = datetime.fromisoformat(comment['created_at'].replace('Z', '+00:00'))
+                    if module.START_DATE <= created <= module.END_DATE:
+                        kept += 1
+    return kept
+
+
+def load_crawler(module_name: str, base_url: str):
+    """导入爬虫模块并指向模拟服务"""
+    os.environ['GITHUB_API_URL'] = base_url
+    # crawl_comments 导入时检查 GITHUB_TOKENS
+    os.environ.setdefault('GITHUB_TOKENS', ','.join(BENCH_TOKENS))
+    github_core.API_URL = base_url
+    module = __import__(module_name)
+    module.TOKENS = BENCH_TOKENS
+    if hasattr(module, 'API_URL'):
+        module.API_URL = base_url
+    return module
+
+
+def run_async_crawler(module_name: str):
+    def run(base_url, repos):
+        module = load_crawler(module_name, base_url)
+        module.ensure_dirs()
+        asyncio.run(module.crawl_projects(list(repos)))
+    return run
+
+
+def count_comments(repos) -> int:
+    """工作目录输出中的评论数"""
+    module = __import__('crawl_comments')
+    paths = [module.get_output_path(repo) for repo in repos]
+    return sum(len(group['comments']) for path in paths if os.path.exists(path) for group in iter_records(path))
+
+
+def run_comments(base_url, repos):
+    """评论爬虫，返回输出中的评论数"""
+    run_async_crawler('crawl_comments')(base_url, repos)
+    return count_comments(repos)
+
+
+def run_repo_counters(base_url, repos):
+    module = load_crawler('crawl_repo_counters', base_url)
+    asyncio.run(module.collect_counters(list(repos)))
+
+
+def run_sharded(module_name: str, shards: int):
+    """在工作目录中启动 shards 个子进程，各跑一个分片（--shard i/N），每个分片一个 Token"""
+    def run(base_url, repos):
+        env = dict(os.environ, GITHUB_API_URL=base_url,
+                   GITHUB_TOKENS=','.join(f"bench-token-{i}" for i in range(shards)))
+        command = [sys.executable, os.path.abspath(__file__), '--worker', module_name]
+        procs = []
+        for i in range(1, shards + 1):
+            # 输出写到临时文件，避免管道写满时子进程阻塞
+            log = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+            procs.append((subprocess.Popen(command + ['--shard', f"{i}/{shards}"], env=env,
+                                           stdout=log, stderr=subprocess.STDOUT), log))
+        for proc, log in procs:
+            proc.wait()
+        for proc, log in procs:
+            if proc.returncode:
+                log.seek(0)
+                lines = log.read().strip().splitlines() or [f"退出码 {proc.returncode}"]
+                if lines[-1].startswith(('ModuleNotFoundError', 'ImportError')):
+                    raise ImportError(lines[-1])
+                raise RuntimeError(f"{module_name} 分片进程失败: {lines[-1]}")
+        if module_name == 'crawl_comments':
+            return count_comments(repos)
+    return run
+
+
+def run_worker(module_name: str, argv):
+    """--shards 的子进程：Token 来自 GITHUB_TOKENS，其余参数（--shard i/N）交给爬虫的 main()"""
+    module = load_crawler(module_name, os.environ['GITHUB_API_URL'])
+    module.TOKENS = os.environ['GITHUB_TOKENS'].split(',')
+    sys.argv = [f"{module_name}.py"] + list(argv)
+    module.main()
+
+
+RUNNERS = {
+    'stars': run_async_crawler('crawl_stars'),
+    'forks': run_async_crawler('crawl_forks'),
+    'commits_prs': run_async_crawler('crawl_commits_prs'),
+    'repo_counters': run_repo_counters,
+    'issues': run_async_crawler('crawl_issues_v2'),
+    'comments': run_comments,
+}
+
+
+@contextmanager
+def workdir(repos):
+    """在临时目录中运行，并写入项目列表"""
+    path = tempfile.mkdtemp(prefix='bench_crawl_')
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        with open(PROJECT_LIST_FILE, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(repos) + '\n')
+        yield path
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def measure(server, run, repos) -> dict:
+    """
+    运行一个爬虫，返回服务端统计；run 返回整数时作为得到的数据条数（如评论数）一并报告；
+    依赖缺失时返回 {"skipped": 原因}
+    """
+    server.reset_counters()
+    stats = github_core.reset_run_stats()
+    start = time.perf_counter()
+    with workdir(repos):
+        try:
+            items = run(server.base_url, repos)
+        except ImportError as e:
+            server.reset_counters()
+            return {"skipped": str(e)}
+    elapsed = time.perf_counter() - start
+    counters = server.reset_counters()
+    return {
+        "pages": counters.get('pages', 0),
+        "requests": counters.get('requests', 0),
+        "api_calls": sum(counters.get(r, 0) for r in ('core', 'search', 'graphql')),
+        "core": counters.get('core', 0),
+        "search": counters.get('search', 0),
+        "graphql": counters.get('graphql', 0),
+        "not_modified": counters.get('304', 0),
+        "secondary_limited": counters.get('secondary_limited', 0),
+        "rate_limited": counters.get('403', 0) - counters.get('secondary_limited', 0),
+        "accepted": counters.get('202', 0),
+        "seconds": round(elapsed, 2),
+        "pages_per_sec": round(counters.get('pages', 0) / elapsed, 2) if elapsed else 0.0,
+        "items": items if isinstance(items, int) else None,
+        "items_per_sec": round(items / elapsed, 1) if isinstance(items, int) and elapsed else None,
+        "client": stats.summary() if stats.requests else None
+    }
+
+
+def format_result(name: str, r: dict) -> str:
+    if 'skipped' in r:
+        return f"{name}: 跳过 ({r['skipped']})"
+    line = (f"{name}: {r['pages']} 页 | {r['requests']} 次请求 | "
+            f"额度 {r['api_calls']} (core {r['core']} / search {r['search']} / graphql {r['graphql']}) | "
+            f"{r['seconds']} 秒 | {r['pages_per_sec']} 页/秒")
+    if r['items'] is not None:
+        line += f" | {r['items']} 条 | {r['items_per_sec']} 条/秒"
+    extras = [f"{label} {r[key]}" for key, label in (
+        ('not_modified', '304'), ('secondary_limited', '二级限流'), ('rate_limited', '额度耗尽'), ('accepted', '202')
+    ) if r[key]]
+    if extras:
+        line += ' | ' + ', '.join(extras)
+    client = r['client']
+    if client:
+        waits = client['waits']
+        line += (f"\n    累计请求耗时 {client['fetch_seconds']} 秒 | 等待 {client['wait_seconds']} 秒 "
+                 f"(退避 {waits['backoff']} / 节奏 {waits['pacing']} / 额度 {waits['budget']})")
+    return line
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--worker':
+        run_worker(sys.argv[2], sys.argv[3:])
+        return
+    parser = argparse.ArgumentParser(description='爬虫吞吐量基准测试（本地模拟 GitHub API）')
+    parser.add_argument('--crawlers', default=','.join(CRAWLERS), help=f"逗号分隔，可选 {', '.join(CRAWLERS)}")
+    parser.add_argument('--repos', type=int, default=8, help='项目数')
+    parser.add_argument('--projects', help='逗号分隔的项目名（回放录制的响应时使用），代替 --repos 生成的项目')
+    parser.add_argument('--stars', type=int, default=2000, help='每个项目的平均 star 数')
+    parser.add_argument('--forks', type=int, default=1000, help='每个项目的平均 fork 数')
+    parser.add_argument('--commits', type=int, default=3000, help='每个项目的平均 commit 数')
+    parser.add_argument('--pulls', type=int, default=1500, help='每个项目的平均 PR 数')
+    parser.add_argument('--issues', type=int, default=2000, help='每个项目的平均 issue 数')
+    parser.add_argument('--comments', type=int, default=4000, help='每个项目的平均评论数')
+    parser.add_argument('--latency', type=float, default=50, help='模拟请求延迟（毫秒）')
+    parser.add_argument('--secondary-limit', type=int, default=0, help='每个 Token 的并发上限，超过返回二级限流')
+    parser.add_argument('--retry-after', type=int, default=1, help='二级限流的冷却时间（秒）')
+    parser.add_argument('--stats-pending', type=int, default=0, help='stats/* 前 N 次请求返回 202')
+    parser.add_argument('--replay', metavar='FILE', help='回放 fake_github.py --record 录制的响应')
+    parser.add_argument('--skip-baseline', action='store_true', help='不测试旧的串行方式')
+    parser.add_argument('--comments-baseline-repos', type=int, default=1, help='旧评论爬取方式只跑前 N 个项目')
+    parser.add_argument('--shards', type=int, default=0, help='另外比较 1 个进程 1 个 Token 与 N 个分片进程各 1 个 Token')
+    args = parser.parse_args()
+
+    crawlers = [c.strip() for c in args.crawlers.split(',') if c.strip()]
+    unknown = [c for c in crawlers if c not in RUNNERS]
+    if unknown:
+        parser.error(f"未知的爬虫: {', '.join(unknown)}")
+
+    dataset = FakeDataset(stars=args.stars, forks=args.forks, commits=args.commits, pulls=args.pulls,
+                          issues=args.issues, comments=args.comments)
+    server = start_server(latency=args.latency / 1000, dataset=dataset,
+                          secondary_limit=args.secondary_limit, retry_after=args.retry_after,
+                          stats_pending=args.stats_pending,
+                          fixtures=FixtureStore(args.replay) if args.replay else None)
+    if args.projects:
+        repos = [p.strip() for p in args.projects.split(',') if p.strip()]
+    else:
+        repos = [f"bench/repo{i}" for i in range(args.repos)]
+    print(f"模拟 GitHub API: {server.base_url} | {len(repos)} 个项目 | 延迟 {args.latency:.0f}ms"
+          f"{' | 回放 ' + args.replay if args.replay else ''}\n")
+
+    results = []
+    try:
+        if 'stars' in crawlers and not args.skip_baseline:
+            results.append(("stars 串行(旧)", measure(server, run_baseline, repos)))
+        if 'comments' in crawlers and not args.skip_baseline:
+            results.append(("comments 逐 issue(旧)",
+                            measure(server, run_comments_baseline, repos[:args.comments_baseline_repos])))
+        for name in crawlers:
+            print(f"\n▶️  {name}")
+            results.append((name, measure(server, RUNNERS[name], repos)))
+            if args.shards > 1:
+                print(f"\n▶️  {name} 1 Token / {args.shards} 分片")
+                module_name = CRAWLER_MODULES[name]
+                results.append((f"{name} 1 Token", measure(server, run_sharded(module_name, 1), repos)))
+                results.append((f"{name} {args.shards} 分片", measure(server, run_sharded(module_name, args.shards), repos)))
+    finally:
+        server.shutdown()
+
+    print("\n" + "=" * 60)
+    for name, r in results:
+        print(format_result(name, r))
+    measured = dict(results)
+    baseline, core = measured.get("stars 串行(旧)"), measured.get("stars")
+    if baseline and core and 'skipped' not in core and baseline['pages_per_sec']:
+        print(f"stars 加速比: {core['pages_per_sec'] / baseline['pages_per_sec']:.1f}x (页/秒), "
+              f"{baseline['seconds'] / max(core['seconds'], 0.01):.1f}x (总耗时)")
+    baseline, comments = measured.get("comments 逐 issue(旧)"), measured.get("comments")
+    if baseline and comments and 'skipped' not in comments and baseline['items_per_sec']:
+        print(f"comments 加速比: {comments['items_per_sec'] / baseline['items_per_sec']:.1f}x (评论/秒, "
+              f"旧方式 {min(args.comments_baseline_repos, len(repos))} 个项目 / 新方式 {len(repos)} 个项目)")
+    for name in crawlers:
+        single, sharded = measured.get(f"{name} 1 Token"), measured.get(f"{name} {args.shards} 分片")
+        if single and sharded and 'skipped' not in sharded and sharded['seconds']:
+            print(f"{name} 分片扩展: {args.shards} 个分片 / {args.shards} 个Token 总耗时 "
+                  f"{single['seconds'] / sharded['seconds']:.1f}x")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+每日 commit 数的获取策略
+按项目选择请求数最少的数据源：
+    stats    /stats/commit_activity（最近 52 周按天统计，1 次请求；时间范围需在最近一年内，
+             GitHub 生成统计期间返回 202，超过重试次数视为未就绪）
+    graphql  默认分支 history(since, until){ totalCount }，每天一个别名，每次查询 GRAPHQL_BATCH 天
+    paging   逐页列出范围内的全部 commit（兜底）
+
+先用一次 GraphQL 查询取得范围内的 commit 总数，再比较 graphql 与 paging 需要的请求数
+"""
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+STRATEGY_STATS = 'stats'
+STRATEGY_GRAPHQL = 'graphql'
+STRATEGY_PAGING = 'paging'
+STRATEGIES = (STRATEGY_STATS, STRATEGY_GRAPHQL, STRATEGY_PAGING)
+
+# 每次 GraphQL 查询的别名（天）数
+GRAPHQL_BATCH = 100
+PER_PAGE = 100
+STATS_WEEKS = 52
+
+
+class StrategyStats:
+    """按策略统计请求数和项目数"""
+
+    def __init__(self):
+        self.requests = defaultdict(int)
+        self.repos = defaultdict(int)
+
+    def record(self, strategy: str, requests: int = 1):
+        self.requests[strategy] += requests
+
+    def chosen(self, strategy: str):
+        self.repos[strategy] += 1
+
+    def summary(self) -> str:
+        parts = [f"{s}: {self.repos[s]} 个项目 / {self.requests[s]} 次请求"
+                 for s in STRATEGIES if self.requests[s] or self.repos[s]]
+        return ', '.join(parts) or '无'
+
+
+def _iso(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def day_range(start: datetime, end: datetime) -> List[datetime]:
+    """[start, end] 内每天 00:00 (UTC)"""
+    day = start.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    days = []
+    while day <= end:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def history_query(owner: str, repo: str, windows: Dict[str, tuple]) -> str:
+    """windows: {别名: (since, until)}，生成批量 history totalCount 查询"""
+    fields = '\n'.join(
+        f'{alias}: history(first: 1, since: "{_iso(since)}", until: "{_iso(until)}") {{ totalCount }}'
+        for alias, (since, until) in windows.items()
+    )
+    return (
+        f'query {{ repository(owner: {json.dumps(owner)}, name: {json.dumps(repo)}) {{ '
+        f'defaultBranchRef {{ target {{ ... on Commit {{\n{fields}\n}} }} }} }} }}'
+    )
+
+
+def _history_target(data: Optional[Dict]) -> Optional[Dict]:
+    repository = (data or {}).get('repository')
+    if repository is None:
+        return None
+    branch = repository.get('defaultBranchRef')
+    # 空仓库没有默认分支
+    return (branch or {}).get('target') or {}
+
+
+async def window_commit_count(crawler, owner, repo, since, until, stats: StrategyStats) -> Optional[int]:
+    """范围内的 commit 总数（1 次 GraphQL 查询），失败返回 None"""
+    data = await crawler.graphql(history_query(owner, repo, {'total': (since, until)}))
+    stats.record(STRATEGY_GRAPHQL)
+    target = _history_target(data)
+    if target is None:
+        return None
+    return (target.get('total') or {}).get('totalCount', 0)
+
+
+async def daily_counts_graphql(
+    crawler, owner, repo, days: List[datetime], stats: StrategyStats,
+    on_batch: Optional[Callable[[List[datetime], Dict[str, int]], None]] = None
+) -> Optional[Dict[str, int]]:
+    """按天批量查询 history totalCount，每批完成后回调 on_batch(该批的日期, 每天的数量)；失败返回 None"""
+    daily = {}
+    for i in range(0, len(days), GRAPHQL_BATCH):
+        batch = days[i:i + GRAPHQL_BATCH]
+        windows = {f"d{j}": (day, day + timedelta(days=1) - timedelta(seconds=1)) for j, day in enumerate(batch)}
+        data = await crawler.graphql(history_query(owner, repo, windows))
+        stats.record(STRATEGY_GRAPHQL)
+        target = _history_target(data)
+        if target is None:
+            return None
+        counts = {}
+        for j, day in enumerate(batch):
+            count = (target.get(f"d{j}") or {}).get('totalCount', 0)
+            if count:
+                counts[day.strftime('%Y-%m-%d')] = count
+        daily.update(counts)
+        if on_batch:
+            on_batch(batch, counts)
+    return daily
+
+
+def stats_available(start: datetime, now: Optional[datetime] = None) -> bool:
+    """commit_activity 只覆盖最近 52 周"""
+    now = now or datetime.now(timezone.utc)
+    return start >= now - timedelta(weeks=STATS_WEEKS) + timedelta(days=7)
+
+
+async def daily_counts_stats(crawler, owner, repo, start, end, stats: StrategyStats) -> Optional[Dict[str, int]]:
+    """从 /stats/commit_activity 取每日数量，未就绪（持续 202）或不覆盖范围时返回 None"""
+    data, _ = await crawler.get(f"/repos/{owner}/{repo}/stats/commit_activity")
+    stats.record(STRATEGY_STATS)
+    if not isinstance(data, list) or not data:
+        return None
+    first_week = datetime.fromtimestamp(data[0].get('week', 0), timezone.utc)
+    if first_week > start:
+        return None
+    daily = {}
+    for week in data:
+        sunday = datetime.fromtimestamp(week.get('week', 0), timezone.utc)
+        for offset, count in enumerate(week.get('days') or []):
+            day = sunday + timedelta(days=offset)
+            if count and start <= day <= end:
+                daily[day.strftime('%Y-%m-%d')] = count
+    return daily
+
+
+def choose_strategy(window_total: Optional[int], days: int) -> str:
+    """比较 graphql 与 paging 的请求数；总数未知时只能逐页"""
+    if window_total is None:
+        return STRATEGY_PAGING
+    paging_requests = max(-(-window_total // PER_PAGE), 1)
+    graphql_requests = -(-days // GRAPHQL_BATCH)
+    return STRATEGY_GRAPHQL if graphql_requests < paging_requests else STRATEGY_PAGING
@@ -1,16 +1,36 @@
+"""
+Issue / PR comment crawler
+Lists all comments per repository (/repos/{owner}/{repo}/issues/comments) instead of requesting each issue's comments.
+Features:
+- Runs on the github_core async core: token pool, connection reuse, several projects crawled at once
+- Lists comments updated since START_DATE in ascending creation order (100 per page) and keeps those created
+  within START_DATE ~ END_DATE; once the first page gives the page count, PAGE_WAVE pages are fetched per wave,
+  stopping at the first comment created after END_DATE
+- Takes the kept fields straight from the JSON response (no PyGithub objects, no extra lazy-loading requests)
+- Each wave is grouped by issue and appended to JSONL (same record layout as before; an issue may span several records)
+- Resume: the job queue cursor stores the next page and the largest comment id written (ids grow with creation time);
+  a resume restarts one page earlier (comments deleted meanwhile shift later ones forward) and dedupes by id
+- Incremental mode (CRAWL_INCREMENTAL=1): lists comments updated after the watermark, keeps those created after it,
+  then advances the watermark
+"""
 import os
-import json
-import time
 import sys
-import re
+import asyncio
 from datetime import datetime, timezone
-from dateutil import parser
-from github import Github, GithubException, Auth, RateLimitExceededException
 from tqdm import tqdm
 
 from dotenv import load_dotenv
 load_dotenv()
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.jsonl_store import append_records, convert_json_array, iter_records
+from github_core import DEFAULT_REPO_CONCURRENCY, AsyncGitHubCrawler, fetch_pages, link_page
+from incremental import INCREMENTAL, REFRESH_INTERVAL, parse_time
+from job_queue import DONE, JOB_DB_FILE, open_queue, run_jobs
+from scheduler import crawler_budget, schedule
+from sharding import describe, pop_shard_arg, shard_projects, shard_tokens
+from sinks import SINK_NAMES, open_sinks
+
 TOKENS = os.getenv("GITHUB_TOKENS", "").split(",")
 if not TOKENS or TOKENS == [""]:
     print("警告: 未设置 GITHUB_TOKENS 环境变量！")
@@ -19,20 +39,30 @@ if not TOKENS or TOKENS == [""]:
 PROJECT_LIST_FILE = "top300_projects_list.txt"
 DATA_DIR = "data"
 COMMENT_DIR = os.path.join(DATA_DIR, "comment")
-NUMBER_DIR = os.path.join(DATA_DIR, "comment_number") 
+# Legacy checkpoint directory (read-only, migrated to the job queue on first cursor read)
+NUMBER_DIR = os.path.join(DATA_DIR, "comment_number")
+# Job queue cursor: {"page": next page, "last_id": largest comment id written, "watermark": incremental watermark}
+# A legacy cursor {"issues_processed": issues done} counts issues and cannot be mapped to a page,
+# so until the project completes, resumes dedupe against the comment ids already in the output
+JOB_TYPE = "comments"
+# Output is JSON Lines (one comment group per issue per line), gzip-compressed when CRAWL_GZIP=1
+USE_GZIP = os.getenv("CRAWL_GZIP", "0") == "1"
 START_DATE = datetime(2022, 3, 1, tzinfo=timezone.utc)
 END_DATE = datetime(2023, 3, 31, 23, 59, 59, tzinfo=timezone.utc)
+PER_PAGE = 100
+# Pages fetched concurrently per wave (larger is faster, but over-fetches more when stopping early)
+PAGE_WAVE = 5
 
-def get_github_client(token_index):
-    token = TOKENS[token_index % len(TOKENS)]
-    auth = Auth.Token(token)
-    return Github(auth=auth)
+async def get_comments_page(crawler, owner, repo, since, sort='created', page=1, per_page=PER_PAGE):
+    return await crawler.get_page(
+        f"/repos/{owner}/{repo}/issues/comments",
+        {'sort': sort, 'direction': 'asc', 'since': since.strftime('%Y-%m-%dT%H:%M:%SZ')},
+        page=page, per_page=per_page
+    )
 
 def ensure_dirs():
     if not os.path.exists(COMMENT_DIR):
-        os.makedirs(COMMENT_DIR)
-    if not os.path.exists(NUMBER_DIR):
-        os.makedirs(NUMBER_DIR)
+        os.makedirs(COMMENT_DIR, exist_ok=True)
 
 def get_projects():
     projects = []
@@ -52,200 +82,311 @@ def get_checkpoint_path(repo_name):
     return os.path.join(NUMBER_DIR, f"{safe_name}.txt")
 
 def read_checkpoint(repo_name):
+    cursor = open_queue().cursor(repo_name, JOB_TYPE)
+    if cursor is not None:
+        return cursor
     path = get_checkpoint_path(repo_name)
     if os.path.exists(path):
         try:
             with open(path, 'r', encoding='utf-8') as f:
                 content = f.read().strip()
                 if content.isdigit():
-                    return int(content)
+                    return {"issues_processed": int(content)}
         except:
-            return 0
-    return 0
+            pass
+    return {}
 
-def write_checkpoint(repo_name, count):
-    path = get_checkpoint_path(repo_name)
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write(str(count))
+def write_checkpoint(repo_name, page, last_id, watermark=None):
+    cursor = open_queue().cursor(repo_name, JOB_TYPE) or {}
+    cursor.update(page=page, last_id=last_id)
+    if watermark is not None:
+        # Once complete, the legacy output no longer needs deduping
+        cursor.pop("issues_processed", None)
+        cursor["watermark"] = watermark.astimezone(timezone.utc).isoformat()
+    open_queue().save_cursor(repo_name, JOB_TYPE, cursor)
 
-def append_data(repo_name, data_list):
-    if not data_list:
-        return
+def read_watermark(repo_name):
+    return parse_time((open_queue().cursor(repo_name, JOB_TYPE) or {}).get("watermark"))
+
+def get_output_path(repo_name):
+    safe_name = repo_name.replace('/', '_')
+    ext = ".jsonl.gz" if USE_GZIP else ".jsonl"
+    return os.path.join(COMMENT_DIR, f"{safe_name}{ext}")
 
+def migrate_legacy_output(repo_name):
+    """Convert a legacy JSON array output to JSONL once; later runs only append."""
     safe_name = repo_name.replace('/', '_')
-    file_path = os.path.join(COMMENT_DIR, f"{safe_name}.json")
-    
-    if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+    legacy_path = os.path.join(COMMENT_DIR, f"{safe_name}.json")
+    output_path = get_output_path(repo_name)
+    if os.path.exists(legacy_path) and not os.path.exists(output_path):
         try:
-            with open(file_path, 'rb+') as f:
-                f.seek(0, os.SEEK_END)
-                pos = f.tell() - 1
-                found = False
-                while pos >= 0:
-                    f.seek(pos)
-                    char = f.read(1)
-                    if char == b']':
-                        found = True
-                        break
-                    pos -= 1
-                
-                if found:
-                    f.seek(pos)
-                    needs_comma = True
-                    scan_pos = pos - 1
-                    while scan_pos >= 0:
-                        f.seek(scan_pos)
-                        c = f.read(1)
-                        if c in (b' ', b'\n', b'\r', b'\t'):
-                            scan_pos -= 1
-                            continue
-                        if c == b'[':
-                            needs_comma = False
-                        break
-
-                    f.seek(pos)
-                    
-                    json_str = json.dumps(data_list, ensure_ascii=False, indent=2)
-                    inner = json_str.strip()
-                    if inner.startswith('['): inner = inner[1:]
-                    if inner.endswith(']'): inner = inner[:-1]
-                    
-                    inner_bytes = inner.encode('utf-8')
-                    
-                    if needs_comma:
-                        f.write(b',' + inner_bytes + b']')
-                    else:
-                        f.write(inner_bytes + b']')
-                    f.truncate()
+            count = convert_json_array(legacy_path, output_path)
+            os.rename(legacy_path, legacy_path + ".migrated")
+            print(f"[{repo_name}] Converted legacy JSON to JSONL ({count} records)")
         except Exception as e:
-            print(f"Error appending to JSON: {e}")
-    else:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data_list, f, ensure_ascii=False, indent=2)
+            print(f"[{repo_name}] Error converting legacy JSON: {e}")
 
-def serialize_comment(comment):
-    c_created = comment.created_at
-    if c_created.tzinfo is None:
-        c_created = c_created.replace(tzinfo=timezone.utc)
-    
-    c_updated = comment.updated_at
-    if c_updated and c_updated.tzinfo is None:
-        c_updated = c_updated.replace(tzinfo=timezone.utc)
+def existing_comment_ids(repo_name):
+    """Comment ids already in the output (dedupe when resuming from a legacy cursor)."""
+    path = get_output_path(repo_name)
+    if not os.path.exists(path):
+        return set()
+    return {comment["id"] for group in iter_records(path) for comment in group.get("comments") or []}
+
+def append_data(repo_name, data_list):
+    """Append comment groups (json: one record per line plus the offset index; database sinks: one upserted row per comment)."""
+    if not data_list:
+        return
+    sinks = open_sinks()
+    if sinks.json:
+        append_records(get_output_path(repo_name), data_list)
+    sinks.write_records('comments', repo_name, data_list)
 
+def serialize_comment(comment):
+    """Keep the output fields of one comment from the REST response."""
+    user = comment.get("user")
+    updated = parse_time(comment.get("updated_at"))
     return {
-        "id": comment.id,
-        "body": comment.body,
-        "user": comment.user.login if comment.user else None,
-        "created_time": c_created.isoformat(),
-        "updated_time": c_updated.isoformat() if c_updated else None,
-        "html_url": comment.html_url,
-        "issue_url": comment.issue_url
+        "id": comment["id"],
+        "body": comment.get("body"),
+        "user": user.get("login") if user else None,
+        "created_time": created_at(comment).isoformat(),
+        "updated_time": updated.isoformat() if updated else None,
+        "html_url": comment.get("html_url"),
+        "issue_url": comment.get("issue_url")
     }
 
-def process_repo(g, repo_name):
-    print(f"[{repo_name}] Starting...")
-    
-    try:
-        repo = g.get_repo(repo_name)
-    except Exception as e:
-        print(f"[{repo_name}] Error accessing repo: {e}")
-        return
+def group_by_issue(comments):
+    """Group comments by issue (groups ordered by their first comment)."""
+    groups = {}
+    for comment in comments:
+        groups.setdefault(comment["issue_url"], []).append(comment)
+    return [{
+        "issue_url": items[0]["html_url"].split('#')[0],
+        "issue_api_url": issue_api_url,
+        "comments": items
+    } for issue_api_url, items in groups.items()]
+
+def created_at(comment):
+    return parse_time(comment["created_at"])
+
+async def process_repo(crawler, repo_name):
+    parts = repo_name.split('/')
+    if len(parts) != 2:
+        print(f"Skipping invalid project name: {repo_name}")
+        return False
+    owner, repo = parts
+
+    migrate_legacy_output(repo_name)
+    checkpoint = read_checkpoint(repo_name)
+    last_id = checkpoint.get("last_id", 0)
+    # Restart one page earlier: comments deleted meanwhile shift later ones forward
+    start_page = max(checkpoint.get("page", 1) - 1, 1)
+    seen_ids = set()
+    if checkpoint.get("issues_processed"):
+        seen_ids = existing_comment_ids(repo_name)
+        print(f"[{repo_name}] Legacy checkpoint, relisting and skipping {len(seen_ids)} existing comments")
+    crawl_started = datetime.now(timezone.utc)
+    kept = 0
+    calls = 0
 
-    processed_issues_count = read_checkpoint(repo_name)
-    print(f"[{repo_name}] Resuming from Issue count: {processed_issues_count}")
+    async def fetch(page):
+        nonlocal calls
+        calls += 1
+        return await get_comments_page(crawler, owner, repo, START_DATE, page=page)
+
+    pbar = tqdm(desc=f"[{repo_name}]", unit=" pages", initial=start_page - 1)
+
+    def handle_pages(pages):
+        """Process a wave of pages in page order and append them; returns True once past END_DATE."""
+        nonlocal last_id, kept
+        valid_comments = []
+        passed_end = False
+        for page in sorted(pages):
+            for comment in pages[page]:
+                if comment["id"] <= last_id or comment["id"] in seen_ids:
+                    continue
+                c_created = created_at(comment)
+                if c_created > END_DATE:
+                    passed_end = True
+                    break
+                if c_created >= START_DATE:
+                    valid_comments.append(serialize_comment(comment))
+            if passed_end:
+                break
+        append_data(repo_name, group_by_issue(valid_comments))
+        kept += len(valid_comments)
+        last_id = max([last_id] + [c["id"] for c in valid_comments])
+        pbar.update(len(pages))
+        return passed_end
 
     try:
-        issues = repo.get_issues(state='all', sort='updated', direction='asc', since=START_DATE)
-        
-        buffer = []
-        pbar = tqdm(desc=f"[{repo_name}]", unit=" issues", initial=processed_issues_count)
-        
-        current_count = 0
-        
-        for issue in issues:
-            if current_count < processed_issues_count:
-                current_count += 1
-                continue
-            
-            try:
-                comments = issue.get_comments()
-                
-                valid_comments = []
-                for comment in comments:
-                    c_created = comment.created_at
-                    if c_created.tzinfo is None:
-                        c_created = c_created.replace(tzinfo=timezone.utc)
-                    
-                    if START_DATE <= c_created <= END_DATE:
-                        valid_comments.append(serialize_comment(comment))
-                
-                if valid_comments:
-                    issue_data = {
-                        "issue_url": issue.html_url, # Using html_url as the main identifier link
-                        "issue_api_url": issue.url,
-                        "comments": valid_comments
-                    }
-                    buffer.append(issue_data)
-                
-                current_count += 1
-                pbar.update(1)
-                
-                if len(buffer) >= 20:
-                    append_data(repo_name, buffer)
-                    write_checkpoint(repo_name, current_count)
-                    buffer = []
-
-            except RateLimitExceededException:
-                raise 
-            except Exception as e:
-                print(f"Error processing issue {issue.number}: {e}")
-                current_count += 1
-                continue
-
-        if buffer:
-            append_data(repo_name, buffer)
-            write_checkpoint(repo_name, current_count)
-        
+        data, headers = await fetch(start_page)
+        if data is None:
+            pbar.close()
+            print(f"[{repo_name}] Failed to fetch page {start_page}")
+            return False
+        page_count = max(link_page(headers, 'last') or start_page, start_page)
+        stop = handle_pages({start_page: data})
+        next_page = start_page + 1
+        while not stop and next_page <= page_count:
+            wave = list(range(next_page, min(next_page + PAGE_WAVE, page_count + 1)))
+            pages = {}
+            failed = await fetch_pages(wave, fetch, pages.__setitem__, concurrency=len(wave))
+            # Only pages before the first failed one are processed, so nothing before last_id is missed
+            done = [page for page in wave if not failed or page < failed[0]]
+            stop = handle_pages({page: pages[page] for page in done})
+            next_page = (done[-1] if done else wave[0] - 1) + 1
+            write_checkpoint(repo_name, next_page, last_id)
+            if failed and not stop:
+                pbar.close()
+                print(f"[{repo_name}] {len(failed)} pages failed, resuming next run: {failed[:10]}")
+                return False
+
         pbar.close()
-        print(f"[{repo_name}] Done. Total issues scanned: {current_count}")
+        # Covered up to END_DATE (or now, if END_DATE is still ahead); incremental mode continues from here
+        write_checkpoint(repo_name, next_page, last_id, watermark=min(END_DATE, crawl_started))
+        print(f"[{repo_name}] Done. Comments in range: {kept} | API calls: {calls}/{page_count} pages")
+        return True
 
-    except RateLimitExceededException:
-        print(f"[{repo_name}] Rate limit exceeded.")
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pbar.close()
+        print(f"\n[{repo_name}] Interrupted.")
         raise
     except Exception as e:
-        print(f"[{repo_name}] Error: {e}")
+        pbar.close()
+        print(f"\n[{repo_name}] Error: {e}")
+        return False
+
+
+async def refresh_repo(crawler, repo_name, watermark):
+    """
+    Incremental mode: list comments updated after the watermark (since filters on updated_at, so new comments
+    are always included), keep those created in (watermark, run start], append them grouped by issue,
+    then advance the watermark.
+    """
+    owner, repo = repo_name.split('/')
+    until = datetime.now(timezone.utc)
+    pages = {}
+
+    async def fetch(page):
+        return await get_comments_page(crawler, owner, repo, watermark, sort='updated', page=page)
+
+    try:
+        data, headers = await fetch(1)
+        if data is None:
+            print(f"[{repo_name}] Incremental: failed to fetch page 1")
+            return False
+        pages[1] = data
+        page_count = link_page(headers, 'last') or 1
+        failed = await fetch_pages(range(2, page_count + 1), fetch, pages.__setitem__)
+        if failed:
+            print(f"[{repo_name}] Incremental: {len(failed)} pages failed, retrying next run")
+            return False
+
+        new_comments = sorted(
+            (comment for page in pages.values() for comment in page if watermark < created_at(comment) <= until),
+            key=lambda c: (c["created_at"], c["id"])
+        )
+        buffer = group_by_issue([serialize_comment(c) for c in new_comments])
+        append_data(repo_name, buffer)
+        checkpoint = read_checkpoint(repo_name)
+        last_id = max([checkpoint.get("last_id", 0)] + [c["id"] for c in new_comments])
+        write_checkpoint(repo_name, checkpoint.get("page", 1), last_id, watermark=until)
+        print(f"[{repo_name}] Incremental done. New comments since {watermark.strftime('%Y-%m-%d %H:%M')}: "
+              f"{len(new_comments)} in {len(buffer)} issues | API calls: {page_count} pages")
+        return True
+    except Exception as e:
+        print(f"\n[{repo_name}] Incremental error: {e}")
+        return False
+
+
+async def crawl_projects(projects):
+    """Crawl several projects concurrently; returns (success, skipped, error) counts."""
+    success_count = 0
+    error_count = 0
+    skipped_count = 0
+
+    async with AsyncGitHubCrawler(TOKENS) as crawler:
+        remaining = (await crawler.get_rate_limit_info())['core_remaining']
+        print(f"Remaining core requests for the current token: {remaining}")
+
+        queue = open_queue()
+        queue.enqueue(projects, JOB_TYPE)
+        if INCREMENTAL:
+            queue.reopen(projects, JOB_TYPE, REFRESH_INTERVAL.total_seconds())
+        for repo_name, status in queue.statuses(projects, JOB_TYPE).items():
+            if status == DONE:
+                print(f"[{repo_name}] Already completed, skipping.")
+                skipped_count += 1
+        scheduled = schedule(queue, projects, [JOB_TYPE])
+        budget = crawler_budget(crawler)
+
+        async def work(repo_name, data_type):
+            watermark = read_watermark(repo_name) if INCREMENTAL else None
+            if watermark is not None:
+                return await refresh_repo(crawler, repo_name, watermark)
+            return await process_repo(crawler, repo_name)
+
+        results = await run_jobs(queue, [JOB_TYPE], scheduled, work, DEFAULT_REPO_CONCURRENCY,
+                                 stop=budget and budget.exhausted)
+        for repo_name, _, result in results:
+            if result is True:
+                success_count += 1
+            else:
+                if isinstance(result, Exception):
+                    print(f"[{repo_name}] Error: {result}")
+                error_count += 1
+
+        stats = crawler.stats.summary()
+        print(f"Requests: {stats['requests']}, pages: {stats['pages']}, "
+              f"time: {stats['seconds']}s, throughput: {stats['pages_per_sec']} pages/s")
+        waits = stats['waits']
+        print(f"Total request time: {stats['fetch_seconds']}s, waiting: {stats['wait_seconds']}s "
+              f"(backoff {waits['backoff']} / pacing {waits['pacing']} / budget {waits['budget']})")
+        if crawler.cache is not None:
+            print(f"Cache hits: {stats['cache_hits']}, misses: {stats['cache_misses']}, "
+                  f"hit rate: {stats['cache_hit_rate']:.1%}")
+        if budget is not None:
+            print(f"API budget: spent {budget.spent}/{budget.limit}")
+        print(f"Job queue: {queue.summary([JOB_TYPE])}")
+
+    return success_count, skipped_count, error_count
 
 
 def main():
+    global TOKENS
+    shard = pop_shard_arg(sys.argv)
+    TOKENS = shard_tokens(TOKENS, shard)
+    print(f"Project list: {PROJECT_LIST_FILE}, output: {COMMENT_DIR} ({', '.join(SINK_NAMES)}), job queue: {JOB_DB_FILE}")
+    print(f"Tokens: {len(TOKENS)}, date range: {START_DATE.strftime('%Y-%m-%d')} ~ {END_DATE.strftime('%Y-%m-%d')}")
+    if INCREMENTAL:
+        print("Incremental mode: projects with a watermark are crawled from it up to now")
+
     ensure_dirs()
-    
+
     if len(sys.argv) > 1:
         projects = [sys.argv[1]]
     else:
         projects = get_projects()
-        
+    projects = shard_projects(projects, shard)
+    if shard:
+        print(describe(shard, projects, TOKENS))
+
+    if not projects:
+        print("No projects found.")
+        return
+
     print(f"Found {len(projects)} projects.")
-    
-    token_index = 0
-    g = get_github_client(token_index)
-    
-    for repo_name in projects:
-        while True:
-            try:
-                process_repo(g, repo_name)
-                break
-            except RateLimitExceededException:
-                print(f"Rate limit reached for token {token_index % len(TOKENS)}. Switching token...")
-                token_index += 1
-                g = get_github_client(token_index)
-                
-                if token_index % len(TOKENS) == 0:
-                    print("All tokens exhausted. Sleeping for 60 seconds...")
-                    time.sleep(60)
-                continue
-            except Exception as e:
-                print(f"Critical error processing {repo_name}: {e}")
-                break
+
+    try:
+        success_count, skipped_count, error_count = asyncio.run(crawl_projects(projects))
+    except KeyboardInterrupt:
+        print("\nInterrupted.")
+        return
+
+    print(f"Done. Projects: {len(projects)}, success: {success_count}, "
+          f"skipped (completed): {skipped_count}, failed: {error_count}")
 
 if __name__ == "__main__":
     main()
@@ -3,25 +3,39 @@ Commit Activity 和 PR 数量爬虫脚本
 使用GitHub API爬取top300项目每天的commit数量和PR数量
 
 功能:
-- 断点续传支持
-- 多Token轮换
-- 获取每个项目的每日commit数量
+- 断点续传支持（commit 和 PR 是任务队列中的两类任务，进度保存在各自的游标中，见 job_queue.py）
+- 多Token并发（基于 github_core 异步内核，多个项目同时爬取）
+- 获取每个项目的每日commit数量（按项目选择请求最少的策略: stats / GraphQL 按天计数 / 逐页，见 commit_counts.py）
 - 获取每个项目的每日PR创建数量
 - 数据存储到 data/commit_activity/ 和 data/pr_daily/ 目录
+- 增量模式（CRAWL_INCREMENTAL=1）：已完成的项目只统计水位之后的commit（GraphQL 按天计数，失败时逐页）
+  和PR（按创建时间倒序，越过水位即停止），合并到已有的每日统计（见 incremental.py）
 
 参考: crawls/crawl_stars.py 的存储路径结构
 """
 
 import os
 import json
-import time
 import sys
+import asyncio
 from datetime import datetime, timezone, timedelta
 from collections import defaultdict
-import requests
 from tqdm import tqdm
 from dotenv import load_dotenv
 
+from commit_counts import (
+    STRATEGY_GRAPHQL, STRATEGY_PAGING, STRATEGY_STATS, StrategyStats, choose_strategy, daily_counts_graphql,
+    daily_counts_stats, day_range, stats_available, window_commit_count
+)
+from github_core import DEFAULT_REPO_CONCURRENCY, AsyncGitHubCrawler, has_next_page
+from incremental import (
+    INCREMENTAL, REFRESH_INTERVAL, merge_daily, output_watermark, parse_time, since_day
+)
+from job_queue import DONE, JOB_DB_FILE, open_queue, run_jobs
+from scheduler import crawler_budget, schedule
+from sharding import describe, pop_shard_arg, shard_projects, shard_tokens
+from sinks import SINK_NAMES, open_sinks
+
 load_dotenv()
 
 TOKENS = [
@@ -34,139 +48,44 @@ PROJECT_LIST_FILE = "top300_projects_list.txt"
 DATA_DIR = "data"
 COMMIT_DIR = os.path.join(DATA_DIR, "commit_activity")
 PR_DIR = os.path.join(DATA_DIR, "pr_daily")
+# 旧版断点目录（只读，首次读取游标时迁移到任务队列）
 CHECKPOINT_DIR = os.path.join(DATA_DIR, "commits_prs_checkpoint")
+JOB_TYPES = ('commits', 'prs')
 
 START_DATE = datetime(2022, 3, 1, tzinfo=timezone.utc)
 END_DATE = datetime(2023, 3, 31, 23, 59, 59, tzinfo=timezone.utc)
 
 
-class GitHubCrawler:
-    def __init__(self, tokens):
-        self.tokens = tokens
-        self.current_token_index = 0
-        self.session = requests.Session()
-        self._update_headers()
-    
-    def _update_headers(self):
-        token = self.tokens[self.current_token_index % len(self.tokens)]
-        self.session.headers.update({
-            'Authorization': f'Bearer {token}',
-            'Accept': 'application/vnd.github.v3+json',
-            'X-GitHub-Api-Version': '2022-11-28'
-        })
-    
-    def switch_token(self):
-        self.current_token_index += 1
-        self._update_headers()
-        print(f"切换到Token {self.current_token_index % len(self.tokens) + 1}")
-        return self.current_token_index
-    
-    def get_rate_limit_info(self):
-        url = "https://api.github.com/rate_limit"
-        try:
-            response = self.session.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                core = data.get('resources', {}).get('core', {})
-                search = data.get('resources', {}).get('search', {})
-                return {
-                    'core_remaining': core.get('remaining', 0),
-                    'core_reset': core.get('reset', 0),
-                    'search_remaining': search.get('remaining', 0),
-                    'search_reset': search.get('reset', 0)
-                }
-        except:
-            pass
-        return {'core_remaining': 0, 'core_reset': 0, 'search_remaining': 0, 'search_reset': 0}
-    
-    def get_with_retry(self, url, params=None, max_retries=3, is_search=False):
-        for attempt in range(max_retries):
-            try:
-                response = self.session.get(url, params=params, timeout=30)
-                
-                remaining = int(response.headers.get('X-RateLimit-Remaining', 1))
-                if remaining == 0:
-                    reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
-                    wait_time = max(reset_time - time.time(), 0) + 5
-                    print(f"\nRate limit达到，切换token...")
-                    old_index = self.current_token_index
-                    self.switch_token()
-                    if self.current_token_index >= old_index + len(self.tokens):
-                        actual_wait = min(wait_time, 60) if is_search else min(wait_time, 30)
-                        print(f"所有token都达到限制，等待 {actual_wait:.0f} 秒...")
-                        time.sleep(actual_wait)
-                    continue
-                
-                if response.status_code == 200:
-                    return response.json(), response.headers
-                elif response.status_code == 202:
-                    print(f"\n数据生成中，等待2秒后重试...")
-                    time.sleep(2)
-                    continue
-                elif response.status_code == 403:
-                    error_msg = response.json().get('message', '')
-                    if 'rate limit' in error_msg.lower() or 'secondary rate limit' in error_msg.lower():
-                        print(f"\n403 Rate limit, 切换token...")
-                        self.switch_token()
-                        time.sleep(2)
-                        continue
-                    else:
-                        print(f"\n403 Forbidden: {error_msg}")
-                        return None, None
-                elif response.status_code == 404:
-                    return None, None
-                elif response.status_code == 422:
-                    print(f"\n422 Unprocessable: {response.text[:200]}")
-                    return None, None
-                elif response.status_code == 409:
-                    print(f"\n409 Conflict (可能是空仓库)")
-                    return None, None
-                else:
-                    print(f"\nHTTP {response.status_code}: {response.text[:200]}")
-                    time.sleep(2)
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"\n请求错误 (尝试 {attempt + 1}/{max_retries}): {e}")
-                time.sleep(5)
-        
-        return None, None
-
-    def get_commits_page(self, owner, repo, since=None, until=None, page=1, per_page=100):
-        url = f"https://api.github.com/repos/{owner}/{repo}/commits"
-        params = {'page': page, 'per_page': per_page}
-        if since:
-            params['since'] = since.isoformat()
-        if until:
-            params['until'] = until.isoformat()
-        data, headers = self.get_with_retry(url, params)
-        return data, headers
-    
-    def get_prs_page(self, owner, repo, state='all', page=1, per_page=100):
-        url = f"https://api.github.com/repos/{owner}/{repo}/pulls"
-        params = {
-            'state': state,
-            'sort': 'created',
-            'direction': 'desc',
-            'page': page, 
-            'per_page': per_page
-        }
-        data, headers = self.get_with_retry(url, params)
-        return data, headers
-    
-    def search_prs(self, repo, created_date):
-        url = "https://api.github.com/search/issues"
-        query = f"repo:{repo} is:pr created:{created_date}"
-        params = {'q': query, 'per_page': 1}
-        data, headers = self.get_with_retry(url, params, is_search=True)
-        if data:
-            return data.get('total_count', 0)
-        return 0
+async def get_commits_page(crawler, owner, repo, since=None, until=None, page=1, per_page=100):
+    params = {}
+    if since:
+        params['since'] = since.isoformat()
+    if until:
+        params['until'] = until.isoformat()
+    return await crawler.get_page(f"/repos/{owner}/{repo}/commits", params, page=page, per_page=per_page)
+
+
+async def get_prs_page(crawler, owner, repo, state='all', page=1, per_page=100):
+    params = {
+        'state': state,
+        'sort': 'created',
+        'direction': 'desc'
+    }
+    return await crawler.get_page(f"/repos/{owner}/{repo}/pulls", params, page=page, per_page=per_page)
+
+
+async def search_prs(crawler, repo, created_date):
+    query = f"repo:{repo} is:pr created:{created_date}"
+    data, headers = await crawler.get("/search/issues", {'q': query, 'per_page': 1})
+    if data:
+        return data.get('total_count', 0)
+    return 0
 
 
 def ensure_dirs():
-    for d in [COMMIT_DIR, PR_DIR, CHECKPOINT_DIR]:
+    for d in [COMMIT_DIR, PR_DIR]:
         if not os.path.exists(d):
-            os.makedirs(d)
+            os.makedirs(d, exist_ok=True)
 
 
 def get_projects():
@@ -205,6 +124,9 @@ def get_output_path(repo_name, data_type):
 
 
 def read_checkpoint(repo_name, data_type):
+    cursor = open_queue().cursor(repo_name, data_type)
+    if cursor is not None:
+        return cursor
     path = get_checkpoint_path(repo_name, data_type)
     if os.path.exists(path):
         try:
@@ -216,12 +138,11 @@ def read_checkpoint(repo_name, data_type):
 
 
 def write_checkpoint(repo_name, data_type, checkpoint_data):
-    path = get_checkpoint_path(repo_name, data_type)
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(checkpoint_data, f, ensure_ascii=False, indent=2)
+    open_queue().save_cursor(repo_name, data_type, checkpoint_data)
 
 
-def save_result(repo_name, data_type, daily_counts, total_count):
+def save_result(repo_name, data_type, daily_counts, total_count, end_date=None, since=None):
+    """写入输出（见 sinks.py）；增量模式下 since 之前的天未变化"""
     path = get_output_path(repo_name, data_type)
     
     sorted_dates = sorted(daily_counts.keys())
@@ -232,16 +153,71 @@ def save_result(repo_name, data_type, daily_counts, total_count):
         f"total_{data_type}_in_range": sum(daily_counts.values()),
         f"total_{data_type}_all_time": total_count,
         "start_date": START_DATE.strftime("%Y-%m-%d"),
-        "end_date": END_DATE.strftime("%Y-%m-%d"),
+        "end_date": (end_date or END_DATE).strftime("%Y-%m-%d"),
         "crawled_at": datetime.now(timezone.utc).isoformat(),
         f"daily_{data_type}": {date: daily_counts[date] for date in sorted_dates}
     }
     
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    open_sinks().save_series(data_type, result, path, since)
 
 
-def process_commits(crawler, repo_name):
+def parse_commit_date(commit_info):
+    commit_data = commit_info.get('commit', {})
+    committer = commit_data.get('committer', {})
+    commit_date_str = committer.get('date')
+    
+    if not commit_date_str:
+        author = commit_data.get('author', {})
+        commit_date_str = author.get('date')
+    
+    if not commit_date_str:
+        return None
+    
+    try:
+        return datetime.fromisoformat(commit_date_str.replace('Z', '+00:00'))
+    except:
+        return None
+
+
+async def count_commits_by_paging(crawler, owner, repo, progress, save, strategy_stats, start=None, end=None):
+    """逐页列出 [start, end]（默认为 START_DATE ~ END_DATE）内的commit（兜底策略），progress 中记录 last_page 和 daily_counts"""
+    start, end = start or START_DATE, end or END_DATE
+    daily_commits = progress["daily_counts"]
+    page = progress["last_page"] + 1
+    
+    pbar = tqdm(desc=f"    Commits", unit=" pages", initial=page - 1, leave=False)
+    while True:
+        data, headers = await get_commits_page(crawler, 
+            owner, repo, 
+            since=start, 
+            until=end,
+            page=page, 
+            per_page=100
+        )
+        strategy_stats.record(STRATEGY_PAGING)
+        
+        if data is None or len(data) == 0:
+            break
+        
+        for commit_info in data:
+            commit_date = parse_commit_date(commit_info)
+            if commit_date and start <= commit_date <= end:
+                daily_commits[commit_date.strftime("%Y-%m-%d")] += 1
+        
+        progress["last_page"] = page
+        pbar.update(1)
+        
+        if not has_next_page(headers):
+            break
+        
+        if page % 10 == 0:
+            save()
+        
+        page += 1
+    pbar.close()
+
+
+async def process_commits(crawler, repo_name, strategy_stats):
     parts = repo_name.split('/')
     if len(parts) != 2:
         print(f"⚠️  跳过无效项目格式: {repo_name}")
@@ -255,109 +231,81 @@ def process_commits(crawler, repo_name):
         print(f"  [Commits] 已完成，跳过")
         return True
     
-    last_page = checkpoint.get("last_page", 0)
-    daily_commits = defaultdict(int, checkpoint.get("daily_counts", {}))
-    
-    print(f"  [Commits] 开始爬取，从第 {last_page + 1} 页继续...")
+    # 旧断点只有 last_page，按逐页策略继续
+    strategy = checkpoint.get("strategy") or (STRATEGY_PAGING if checkpoint.get("last_page") else None)
+    progress = {
+        "strategy": strategy,
+        "last_page": checkpoint.get("last_page", 0),
+        "counted_days": checkpoint.get("counted_days", []),
+        "daily_counts": defaultdict(int, checkpoint.get("daily_counts", {})),
+    }
     
-    page = last_page + 1
-    total_commits = 0
-    commits_in_range = 0
+    def save(completed=False):
+        write_checkpoint(repo_name, 'commits', {
+            **progress,
+            "daily_counts": dict(progress["daily_counts"]),
+            "completed": completed
+        })
     
-    pbar = tqdm(desc=f"    Commits", unit=" pages", initial=last_page, leave=False)
+    def reset(new_strategy):
+        progress.update(strategy=new_strategy, last_page=0, counted_days=[], daily_counts=defaultdict(int))
     
     try:
-        while True:
-            data, headers = crawler.get_commits_page(
-                owner, repo, 
-                since=START_DATE, 
-                until=END_DATE,
-                page=page, 
-                per_page=100
-            )
-            
-            if data is None or len(data) == 0:
-                break
-            
-            for commit_info in data:
-                total_commits += 1
-                
-                commit_data = commit_info.get('commit', {})
-                committer = commit_data.get('committer', {})
-                commit_date_str = committer.get('date')
-                
-                if not commit_date_str:
-                    author = commit_data.get('author', {})
-                    commit_date_str = author.get('date')
-                
-                if not commit_date_str:
-                    continue
-                
-                try:
-                    commit_date = datetime.fromisoformat(commit_date_str.replace('Z', '+00:00'))
-                except:
-                    continue
-                
-                if START_DATE <= commit_date <= END_DATE:
-                    date_str = commit_date.strftime("%Y-%m-%d")
-                    daily_commits[date_str] += 1
-                    commits_in_range += 1
-            
-            pbar.update(1)
-            
-            link_header = headers.get('Link', '') if headers else ''
-            if 'rel="next"' not in link_header:
-                break
-            
-            if page % 10 == 0:
-                checkpoint_data = {
-                    "last_page": page,
-                    "daily_counts": dict(daily_commits),
-                    "completed": False
-                }
-                write_checkpoint(repo_name, 'commits', checkpoint_data)
+        if strategy is None and stats_available(START_DATE):
+            daily = await daily_counts_stats(crawler, owner, repo, START_DATE, END_DATE, strategy_stats)
+            if daily is not None:
+                reset(STRATEGY_STATS)
+                progress["daily_counts"].update(daily)
+        
+        if progress["strategy"] is None:
+            days = len(day_range(START_DATE, END_DATE))
+            window_total = await window_commit_count(crawler, owner, repo, START_DATE, END_DATE, strategy_stats)
+            reset(choose_strategy(window_total, days))
+            save()
+        
+        strategy = progress["strategy"]
+        strategy_stats.chosen(strategy)
+        print(f"  [Commits] 策略: {strategy}")
+        
+        if strategy == STRATEGY_GRAPHQL:
+            counted = set(progress["counted_days"])
+            days = [d for d in day_range(START_DATE, END_DATE) if d.strftime("%Y-%m-%d") not in counted]
             
-            page += 1
+            def on_batch(batch, counts):
+                progress["counted_days"].extend(day.strftime("%Y-%m-%d") for day in batch)
+                for date_str, count in counts.items():
+                    progress["daily_counts"][date_str] = count
+                save()
             
-            time.sleep(0.1)
+            if await daily_counts_graphql(crawler, owner, repo, days, strategy_stats, on_batch) is None:
+                print(f"  [Commits] GraphQL 查询失败，改为逐页")
+                reset(STRATEGY_PAGING)
+                strategy_stats.chosen(STRATEGY_PAGING)
         
-        pbar.close()
+        if progress["strategy"] == STRATEGY_PAGING:
+            await count_commits_by_paging(crawler, owner, repo, progress, save, strategy_stats)
         
-        save_result(repo_name, 'commits', dict(daily_commits), total_commits)
+        daily_commits = dict(progress["daily_counts"])
+        total_commits = sum(daily_commits.values())
+        save_result(repo_name, 'commits', daily_commits, total_commits)
+        save(completed=True)
         
-        checkpoint_data = {
-            "last_page": page,
-            "daily_counts": dict(daily_commits),
-            "completed": True
-        }
-        write_checkpoint(repo_name, 'commits', checkpoint_data)
-        
-        print(f"  [Commits] 完成! 总数: {total_commits}, 范围内: {commits_in_range}")
+        print(f"  [Commits] 完成! 总数: {total_commits}, 范围内: {total_commits} ({progress['strategy']})")
         return True
         
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print(f"\n  [Commits] 用户中断，保存进度...")
-        checkpoint_data = {
-            "last_page": page - 1,
-            "daily_counts": dict(daily_commits),
-            "completed": False
-        }
-        write_checkpoint(repo_name, 'commits', checkpoint_data)
+        save()
         raise
     except Exception as e:
         print(f"\n  [Commits] 错误: {e}")
         import traceback
         traceback.print_exc()
-        checkpoint_data = {
-            "last_page": page - 1,
-            "daily_counts": dict(daily_commits),
-            "completed": False
-        }
-        write_checkpoint(repo_name, 'commits', checkpoint_data)
+        save()
         return False
 
 
-def process_prs(crawler, repo_name):
+async def process_prs(crawler, repo_name):
     parts = repo_name.split('/')
     if len(parts) != 2:
         print(f"⚠️  跳过无效项目格式: {repo_name}")
@@ -385,7 +333,7 @@ def process_prs(crawler, repo_name):
     
     try:
         while True:
-            data, headers = crawler.get_prs_page(owner, repo, state='all', page=page, per_page=100)
+            data, headers = await get_prs_page(crawler, owner, repo, state='all', page=page, per_page=100)
             
             if data is None or len(data) == 0:
                 break
@@ -420,8 +368,7 @@ def process_prs(crawler, repo_name):
                 if all_before:
                     break
             
-            link_header = headers.get('Link', '') if headers else ''
-            if 'rel="next"' not in link_header:
+            if not has_next_page(headers):
                 break
             
             if page % 10 == 0:
@@ -433,8 +380,6 @@ def process_prs(crawler, repo_name):
                 write_checkpoint(repo_name, 'prs', checkpoint_data)
             
             page += 1
-            
-            time.sleep(0.1)
         
         pbar.close()
         
@@ -450,7 +395,7 @@ def process_prs(crawler, repo_name):
         print(f"  [PRs] 完成! 总数: {total_prs}, 范围内: {prs_in_range}")
         return True
         
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print(f"\n  [PRs] 用户中断，保存进度...")
         checkpoint_data = {
             "last_page": page - 1,
@@ -472,22 +417,151 @@ def process_prs(crawler, repo_name):
         return False
 
 
-def process_repo(crawler, repo_name):
-    commit_success = process_commits(crawler, repo_name)
-    pr_success = process_prs(crawler, repo_name)
-    return commit_success and pr_success
+async def refresh_commits(crawler, repo_name, output, strategy_stats):
+    """增量模式：水位之后按天用 GraphQL 计数（每天一个别名，通常 1 次查询），失败时逐页"""
+    owner, repo = repo_name.split('/')
+    since = since_day(output_watermark(output))
+    until = datetime.now(timezone.utc)
+    try:
+        daily_new = await daily_counts_graphql(crawler, owner, repo, day_range(since, until), strategy_stats)
+        strategy = STRATEGY_GRAPHQL
+        if daily_new is None:
+            progress = {"last_page": 0, "daily_counts": defaultdict(int)}
+            await count_commits_by_paging(crawler, owner, repo, progress, lambda: None, strategy_stats, since, until)
+            daily_new = dict(progress["daily_counts"])
+            strategy = STRATEGY_PAGING
+        strategy_stats.chosen(strategy)
+        
+        daily_commits = merge_daily(output.get("daily_commits", {}), daily_new, since)
+        total_commits = sum(daily_commits.values())
+        save_result(repo_name, 'commits', daily_commits, total_commits, end_date=until, since=since.strftime("%Y-%m-%d"))
+        print(f"  [Commits] 增量完成! 自 {since.strftime('%Y-%m-%d')} 新增: {sum(daily_new.values())} ({strategy})")
+        return True
+    except Exception as e:
+        print(f"\n  [Commits] 增量错误: {e}")
+        return False
 
 
+async def refresh_prs(crawler, repo_name, output):
+    """增量模式：PR 按创建时间倒序，越过水位即停止"""
+    owner, repo = repo_name.split('/')
+    since = since_day(output_watermark(output))
+    until = datetime.now(timezone.utc)
+    daily_new = defaultdict(int)
+    page = 1
+    try:
+        while True:
+            data, headers = await get_prs_page(crawler, owner, repo, state='all', page=page, per_page=100)
+            if not data:
+                break
+            created = [parse_time(pr.get('created_at')) for pr in data]
+            for created_at in created:
+                if created_at and since <= created_at <= until:
+                    daily_new[created_at.strftime("%Y-%m-%d")] += 1
+            if any(created_at and created_at < since for created_at in created) or not has_next_page(headers):
+                break
+            page += 1
+        
+        old_daily = output.get("daily_prs", {})
+        daily_prs = merge_daily(old_daily, daily_new, since)
+        # 全部PR数按范围内的变化量同步调整
+        total_prs = output.get("total_prs_all_time", 0) + sum(daily_prs.values()) - sum(old_daily.values())
+        save_result(repo_name, 'prs', daily_prs, total_prs, end_date=until, since=since.strftime("%Y-%m-%d"))
+        print(f"  [PRs] 增量完成! 自 {since.strftime('%Y-%m-%d')} 新增: {sum(daily_new.values())} | API调用: {page} 页")
+        return True
+    except Exception as e:
+        print(f"\n  [PRs] 增量错误: {e}")
+        return False
+
+
+async def process_job(crawler, repo_name, data_type, strategy_stats):
+    """执行一个任务；增量模式下已有输出的部分只爬水位之后的数据"""
+    output = open_sinks().load_series(data_type, repo_name, get_output_path(repo_name, data_type)) if INCREMENTAL else None
+    refresh = output is not None and output_watermark(output) is not None
+    if data_type == 'commits':
+        if refresh:
+            return await refresh_commits(crawler, repo_name, output, strategy_stats)
+        return await process_commits(crawler, repo_name, strategy_stats)
+    if refresh:
+        return await refresh_prs(crawler, repo_name, output)
+    return await process_prs(crawler, repo_name)
+
+
+async def crawl_projects(projects):
+    """并发爬取多个项目，返回 (成功数, 跳过数, 失败数)"""
+    success_count = 0
+    error_count = 0
+    skipped_count = 0
+    
+    strategy_stats = StrategyStats()
+    async with AsyncGitHubCrawler(TOKENS) as crawler:
+        rate_info = await crawler.get_rate_limit_info()
+        print(f"📊 当前Token剩余请求次数: Core={rate_info['core_remaining']}, Search={rate_info['search_remaining']}")
+        print(f"\n🚀 开始爬取...\n")
+        
+        queue = open_queue()
+        for data_type in JOB_TYPES:
+            queue.enqueue(projects, data_type)
+            if INCREMENTAL:
+                queue.reopen(projects, data_type, REFRESH_INTERVAL.total_seconds())
+        statuses = [queue.statuses(projects, data_type) for data_type in JOB_TYPES]
+        for repo_name in projects:
+            if all(status.get(repo_name) == DONE for status in statuses):
+                print(f"  ✓ {repo_name} 已完成，跳过")
+                skipped_count += 1
+        # 两类任务一起打分，按分数混合排序、共用预算
+        scheduled = schedule(
+            queue, projects, JOB_TYPES,
+            lambda name, data_type: open_sinks().load_series(data_type, name, get_output_path(name, data_type))
+        )
+        budget = crawler_budget(crawler)
+        
+        results = await run_jobs(
+            queue, JOB_TYPES, scheduled,
+            lambda name, data_type: process_job(crawler, name, data_type, strategy_stats),
+            DEFAULT_REPO_CONCURRENCY, stop=budget and budget.exhausted
+        )
+        # 一个项目的 commit 和 PR 任务都成功才算成功
+        outcome = {}
+        for repo_name, data_type, result in results:
+            if isinstance(result, Exception):
+                print(f"  ❌ {repo_name} {data_type} 错误: {result}")
+            outcome[repo_name] = outcome.get(repo_name, True) and result is True
+        success_count = sum(outcome.values())
+        error_count = len(outcome) - success_count
+        
+        stats = crawler.stats.summary()
+        print(f"\n📈 请求数: {stats['requests']}, 页数: {stats['pages']}, "
+              f"耗时: {stats['seconds']} 秒, 吞吐: {stats['pages_per_sec']} 页/秒")
+        waits = stats['waits']
+        print(f"⏱️ 累计请求耗时: {stats['fetch_seconds']} 秒, 等待: {stats['wait_seconds']} 秒 "
+              f"(退避 {waits['backoff']} / 节奏 {waits['pacing']} / 额度 {waits['budget']})")
+        if crawler.cache is not None:
+            print(f"🗄️ 缓存命中: {stats['cache_hits']}, 未命中: {stats['cache_misses']}, "
+                  f"命中率: {stats['cache_hit_rate']:.1%}")
+        print(f"🧮 Commit 计数策略: {strategy_stats.summary()}")
+        if budget is not None:
+            print(f"💰 API 预算: 已用 {budget.spent}/{budget.limit}")
+        print(f"🗂️ 任务队列: {queue.summary(JOB_TYPES)}")
+    
+    return success_count, skipped_count, error_count
+
 def main():
+    global TOKENS
+    shard = pop_shard_arg(sys.argv)
+    TOKENS = shard_tokens(TOKENS, shard)
     print("=" * 60)
     print("📊 GitHub Commit Activity & PR 数据爬虫 (每日统计)")
     print("=" * 60)
     print(f"\n📁 项目列表: {PROJECT_LIST_FILE}")
     print(f"📁 Commit数据目录: {COMMIT_DIR}")
     print(f"📁 PR数据目录: {PR_DIR}")
-    print(f"📁 断点目录: {CHECKPOINT_DIR}")
+    print(f"📁 任务队列: {JOB_DB_FILE}")
+    print(f"📤 输出: {', '.join(SINK_NAMES)}")
     print(f"🔑 Token数量: {len(TOKENS)}")
     print(f"📅 时间范围: {START_DATE.strftime('%Y-%m-%d')} ~ {END_DATE.strftime('%Y-%m-%d')}")
+    if INCREMENTAL:
+        print(f"🔁 增量模式: 已有输出的项目从上次水位爬到现在")
     
     ensure_dirs()
     
@@ -495,6 +569,9 @@ def main():
         projects = [sys.argv[1]]
     else:
         projects = get_projects()
+    projects = shard_projects(projects, shard)
+    if shard:
+        print(describe(shard, projects, TOKENS))
     
     if not projects:
         print("❌ 未找到项目列表")
@@ -502,40 +579,11 @@ def main():
     
     print(f"\n📋 找到 {len(projects)} 个项目")
     
-    crawler = GitHubCrawler(TOKENS)
-    
-    rate_info = crawler.get_rate_limit_info()
-    print(f"📊 当前Token剩余请求次数: Core={rate_info['core_remaining']}, Search={rate_info['search_remaining']}")
-    
-    print(f"\n🚀 开始爬取...\n")
-    
-    success_count = 0
-    error_count = 0
-    skipped_count = 0
-    
-    for i, repo_name in enumerate(projects):
-        print(f"\n[{i+1}/{len(projects)}] 处理: {repo_name}")
-        
-        commit_checkpoint = read_checkpoint(repo_name, 'commits')
-        pr_checkpoint = read_checkpoint(repo_name, 'prs')
-        if commit_checkpoint.get("completed", False) and pr_checkpoint.get("completed", False):
-            print(f"  ✓ 已完成，跳过")
-            skipped_count += 1
-            continue
-        
-        try:
-            success = process_repo(crawler, repo_name)
-            if success:
-                success_count += 1
-            else:
-                error_count += 1
-        except KeyboardInterrupt:
-            print("\n\n⚠️  用户中断!")
-            break
-        except Exception as e:
-            print(f"  ❌ 错误: {e}")
-            error_count += 1
-            crawler.switch_token()
+    try:
+        success_count, skipped_count, error_count = asyncio.run(crawl_projects(projects))
+    except KeyboardInterrupt:
+        print("\n\n⚠️  用户中断!")
+        return
     
     print("\n" + "=" * 60)
     print("📊 爬取统计")
@@ -2,22 +2,31 @@
 Fork数据爬虫脚本
 使用GitHub API爬取top300项目每天的fork数量
 功能:
-- 断点续传支持（续传时删除最后一页数据重新爬取，确保不重复不遗漏）
-- 多Token轮换
+- 断点续传支持（按页记录每天fork数的增量和fork id，保存在任务队列的游标中，续传时精确回滚受影响的页面重新爬取，
+  按 id 去重，确保不重复不遗漏）
+- 多Token并发（基于 github_core 异步内核，多个项目同时爬取）
+- 按创建时间从新到旧列出，每批并发获取若干页，出现早于 START_DATE 的fork后即停止
 - 获取每个项目的forks及其fork时间
 - 按日期统计每天的fork数量
 - 数据存储到 data/fork/ 目录
+- 增量模式（CRAWL_INCREMENTAL=1）：已完成的项目只爬到水位之前的fork为止，合并到已有的每日统计（见 incremental.py）
 """
 import os
 import json
-import time
 import sys
+import asyncio
 from datetime import datetime, timezone
 from collections import defaultdict
-import requests
 from tqdm import tqdm
 from dotenv import load_dotenv
 
+from github_core import DEFAULT_REPO_CONCURRENCY, AsyncGitHubCrawler, fetch_pages, link_page
+from incremental import INCREMENTAL, REFRESH_INTERVAL, merge_daily, output_watermark, since_day
+from job_queue import DONE, JOB_DB_FILE, open_queue, run_jobs
+from scheduler import crawler_budget, schedule
+from sharding import describe, pop_shard_arg, shard_projects, shard_tokens
+from sinks import SINK_NAMES, open_sinks
+
 load_dotenv()
 
 # --- Configuration ---
@@ -30,98 +39,25 @@ TOKENS = [
 PROJECT_LIST_FILE = "top300_projects_list.txt"
 DATA_DIR = "data"
 FORK_DIR = os.path.join(DATA_DIR, "fork")
+# 旧版断点目录（只读，首次读取游标时迁移到任务队列）
 CHECKPOINT_DIR = os.path.join(DATA_DIR, "fork_checkpoint")
+JOB_TYPE = "fork"
 
 START_DATE = datetime(2022,3,1,tzinfo=timezone.utc)
 END_DATE = datetime(2023,3,31,23,59,59, tzinfo=timezone.utc)
+PER_PAGE = 100
+# 每批并发获取的页数（越大越快，提前停止时多爬的页也越多）
+PAGE_WAVE = 5
 
-class GitHubCrawler:
-    def __init__(self, tokens):
-        self.tokens = tokens
-        self.current_token_index = 0
-        self.session = requests.Session()
-        self._update_headers()
-    
-    def _update_headers(self):
-        token = self.tokens[self.current_token_index % len(self.tokens)]
-        self.session.headers.update({
-            'Authorization': f'Bearer {token}',
-            'Accept': 'application/vnd.github.v3+json',
-            'X-GitHub-Api-Version': '2022-11-28'
-        })
-    
-    def switch_token(self):
-        self.current_token_index += 1
-        self._update_headers()
-        print(f"切换到Token {self.current_token_index % len(self.tokens) + 1}")
-        return self.current_token_index
-    
-    def get_rate_limit_info(self):
-        url = "https://api.github.com/rate_limit"
-        try:
-            response = self.session.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                core = data.get('resources', {}).get('core', {})
-                return core.get('remaining', 0), core.get('reset', 0)
-        except:
-            pass
-        return 0, 0
-    
-    def get_with_retry(self, url, params=None, max_retries=3):
-        for attempt in range(max_retries):
-            try:
-                response = self.session.get(url, params=params, timeout=30)
-                
-                remaining = int(response.headers.get('X-RateLimit-Remaining', 1))
-                if remaining == 0:
-                    reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
-                    wait_time = max(reset_time - time.time(), 0) + 5
-                    print(f"\nRate limit达到，切换token...")
-                    old_index = self.current_token_index
-                    self.switch_token()
-                    if self.current_token_index >= old_index + len(self.tokens):
-                        print(f"所有token都达到限制，等待 {min(wait_time, 60):.0f} 秒...")
-                        time.sleep(min(wait_time, 60))
-                    continue
-                
-                if response.status_code == 200:
-                    return response.json(), response.headers
-                elif response.status_code == 403:
-                    error_msg = response.json().get('message', '')
-                    if 'rate limit' in error_msg.lower():
-                        print(f"\n403 Rate limit, 切换token...")
-                        self.switch_token()
-                        continue
-                    else:
-                        print(f"\n403 Forbidden: {error_msg}")
-                        return None, None
-                elif response.status_code == 404:
-                    return None, None
-                elif response.status_code == 422:
-                    return None, None
-                else:
-                    print(f"\nHTTP {response.status_code}: {response.text[:200]}")
-                    time.sleep(2)
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"\n请求错误 (尝试 {attempt + 1}/{max_retries}): {e}")
-                time.sleep(5)
-        
-        return None, None
-
-    def get_forks_page(self, owner, repo, page=1, per_page=100):
-        url = f"https://api.github.com/repos/{owner}/{repo}/forks"
-        params = {'page': page, 'per_page': per_page, 'sort': 'oldest'}
-        data, headers = self.get_with_retry(url, params)
-        return data, headers
+async def get_forks_page(crawler, owner, repo, page=1, per_page=100):
+    return await crawler.get_page(
+        f"/repos/{owner}/{repo}/forks", {'sort': 'newest'}, page=page, per_page=per_page
+    )
 
 
 def ensure_dirs():
     if not os.path.exists(FORK_DIR):
-        os.makedirs(FORK_DIR)
-    if not os.path.exists(CHECKPOINT_DIR):
-        os.makedirs(CHECKPOINT_DIR)
+        os.makedirs(FORK_DIR, exist_ok=True)
 
 
 def get_projects():
@@ -157,6 +93,9 @@ def get_output_path(repo_name):
 
 
 def read_checkpoint(repo_name):
+    cursor = open_queue().cursor(repo_name, JOB_TYPE)
+    if cursor is not None:
+        return cursor
     path = get_checkpoint_path(repo_name)
     if os.path.exists(path):
         try:
@@ -164,32 +103,55 @@ def read_checkpoint(repo_name):
                 return json.load(f)
         except:
             pass
+    return new_checkpoint()
+
+
+def new_checkpoint():
+    # page_data: 每页的增量 {"页码": {"daily": {"date": count}, "ids": [范围内的fork id], "oldest": 最早创建时间}}
     return {
-        "last_page": 0, 
-        "daily_forks": {}, 
-        "page_dates": {},
+        "sort": "newest",
+        "page_count": 0,
         "total_forks": 0,
+        "page_data": {},
+        "daily_forks": {},
+        "api_calls": 0,
         "completed": False
     }
 
 
+def build_checkpoint(state, daily_forks, completed=False):
+    return {
+        **state,
+        "completed_pages": sorted(int(p) for p in state["page_data"]),
+        "daily_forks": {date: count for date, count in daily_forks.items() if count},
+        "completed": completed
+    }
+
+
 def write_checkpoint(repo_name, checkpoint_data):
-    path = get_checkpoint_path(repo_name)
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(checkpoint_data, f, ensure_ascii=False, indent=2)
+    open_queue().save_cursor(repo_name, JOB_TYPE, checkpoint_data)
+
 
+def apply_page_data(daily_forks, page_data, page, entry):
+    """记录一页的增量并累加到每日统计"""
+    page_data[str(page)] = entry
+    for date_str, count in entry["daily"].items():
+        daily_forks[date_str] += count
+    return daily_forks, page_data
 
-def remove_page_data(daily_forks, page_dates, page):
-    page_key = str(page)
-    if page_key in page_dates:
-        dates_to_remove = page_dates[page_key]
-        for date_str in dates_to_remove:
-            if date_str in daily_forks:
-                pass
-        del page_dates[page_key]
-    return daily_forks, page_dates
 
-def save_result(repo_name, daily_forks, total_forks):
+def remove_page_data(daily_forks, page_data, page):
+    """回滚一页：从每日统计中减去该页的增量，并删除该页记录"""
+    entry = page_data.pop(str(page), None)
+    if entry:
+        for date_str, count in entry["daily"].items():
+            daily_forks[date_str] -= count
+            if daily_forks[date_str] <= 0:
+                del daily_forks[date_str]
+    return daily_forks, page_data
+
+def save_result(repo_name, daily_forks, total_forks, end_date=None, since=None):
+    """写入输出（见 sinks.py）；增量模式下 since 之前的天未变化"""
     path = get_output_path(repo_name)
     sorted_dates = sorted(daily_forks.keys())
     result = {
@@ -197,15 +159,49 @@ def save_result(repo_name, daily_forks, total_forks):
         "total_forks_in_range": sum(daily_forks.values()),
         "total_forks_all_time": total_forks,
         "start_date": START_DATE.strftime("%Y-%m-%d"),
-        "end_date": END_DATE.strftime("%Y-%m-%d"),
+        "end_date": (end_date or END_DATE).strftime("%Y-%m-%d"),
         "crawled_at": datetime.now(timezone.utc).isoformat(),
         "daily_forks": {date: daily_forks[date] for date in sorted_dates}
     }
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    open_sinks().save_series("forks", result, path, since)
 
 
-def process_repo(crawler, repo_name):
+def parse_created_at(fork_info):
+    created_at_str = fork_info.get('created_at')
+    if not created_at_str:
+        return None
+    try:
+        return datetime.fromisoformat(created_at_str.replace('Z', '+00:00'))
+    except:
+        return None
+
+
+def count_page(data, seen_ids, start=None, end=None):
+    """统计一页中 [start, end]（默认为 START_DATE ~ END_DATE）内每天的fork数（跳过已计数的id），返回该页的增量记录"""
+    start, end = start or START_DATE, end or END_DATE
+    counts = defaultdict(int)
+    ids = []
+    oldest = None
+    for fork_info in data:
+        created_at = parse_created_at(fork_info)
+        if not created_at:
+            continue
+        oldest = created_at if oldest is None else min(oldest, created_at)
+        
+        fork_id = fork_info.get('id')
+        if start <= created_at <= end and fork_id not in seen_ids:
+            counts[created_at.strftime("%Y-%m-%d")] += 1
+            ids.append(fork_id)
+            seen_ids.add(fork_id)
+    return {"daily": dict(counts), "ids": ids, "oldest": oldest.isoformat() if oldest else None}
+
+
+def past_start(entry, start=None):
+    # 该页已有早于 START_DATE 的fork（从新到旧排列，之后的页面都在范围外）
+    return entry["oldest"] is None or datetime.fromisoformat(entry["oldest"]) < (start or START_DATE)
+
+
+async def process_repo(crawler, repo_name):
     parts = repo_name.split('/')
     if len(parts) != 2:
         print(f"⚠️  跳过无效项目格式: {repo_name}")
@@ -219,137 +215,240 @@ def process_repo(crawler, repo_name):
         print(f"[{repo_name}] 已完成，跳过")
         return True
     
-    last_page = checkpoint.get("last_page", 0)
+    if checkpoint.get("sort") != "newest":
+        # 旧格式按从旧到新的页码记录，无法续传
+        if checkpoint.get("last_page") or checkpoint.get("page_count"):
+            print(f"[{repo_name}] 旧格式断点，重新爬取")
+        checkpoint = new_checkpoint()
     
+    state = {key: checkpoint.get(key, value) for key, value in new_checkpoint().items()
+             if key not in ("daily_forks", "completed")}
+    page_data = state["page_data"]
     daily_forks = defaultdict(int)
-    
-    # 读取 page_data: 记录每一页每天的fork数量
-    # 结构: {"page_number": {"date": count, ...}, ...}
-    page_data = checkpoint.get("page_data", {})
-    total_forks = checkpoint.get("total_forks", 0)
-    
-    if last_page > 0:
-        last_page_key = str(last_page)
-        if last_page_key in page_data:
-            print(f"[{repo_name}] 断点续传：删除第 {last_page} 页数据并重新爬取...")
-            # 计算需要减去的 fork 数量
-            removed_count = sum(page_data[last_page_key].values())
-            total_forks -= removed_count
-            del page_data[last_page_key]
-        # 从 last_page 重新开始（而不是 last_page + 1）
-        start_page = last_page
-    else:
-        start_page = 1
-    
-    # 从已保存的 page_data 重建 daily_forks
-    for page_key, date_counts in page_data.items():
-        for date_str, count in date_counts.items():
+    for entry in page_data.values():
+        for date_str, count in entry["daily"].items():
             daily_forks[date_str] += count
+    old_total = state["total_forks"]
+    calls_before = state["api_calls"]
+    fetched = {}
     
-    print(f"[{repo_name}] 开始爬取，从第 {start_page} 页开始...")
+    async def fetch(page):
+        data, headers = await get_forks_page(crawler, owner, repo, page=page, per_page=PER_PAGE)
+        state["api_calls"] += 1
+        if data is not None:
+            fetched[page] = data
+        return data, headers
     
-    page = start_page
-    forks_in_range = sum(daily_forks.values())
+    seen_ids = set()
+    pbar = tqdm(desc=f"[{repo_name}]", unit=" pages")
     
-    pbar = tqdm(desc=f"[{repo_name}]", unit=" pages", initial=start_page - 1)
+    def handle_page(page, data):
+        apply_page_data(daily_forks, page_data, page, count_page(data, seen_ids))
+        pbar.update(1)
+        if len(page_data) % 10 == 0:
+            write_checkpoint(repo_name, build_checkpoint(state, daily_forks))
     
     try:
-        while True:
-            data, headers = crawler.get_forks_page(owner, repo, page=page, per_page=100)
-            
-            if data is None or len(data) == 0:
-                break
-            
-            current_page_data = defaultdict(int)
-            
-            for fork_info in data:
-                total_forks += 1
-                
-                created_at_str = fork_info.get('created_at')
-                if not created_at_str:
-                    continue
-                
-                try:
-                    created_at = datetime.fromisoformat(created_at_str.replace('Z', '+00:00'))
-                except:
-                    continue
-                
-                if START_DATE <= created_at <= END_DATE:
-                    date_str = created_at.strftime("%Y-%m-%d")
-                    daily_forks[date_str] += 1
-                    current_page_data[date_str] += 1
-                    forks_in_range += 1
-            
-            page_data[str(page)] = dict(current_page_data)
-            
-            pbar.update(1)
-            
-            link_header = headers.get('Link', '') if headers else ''
-            if 'rel="next"' not in link_header:
-                break
-            
-            if page % 10 == 0:
-                checkpoint_data = {
-                    "last_page": page,
-                    "daily_forks": dict(daily_forks),
-                    "page_data": page_data,
-                    "total_forks": total_forks,
-                    "completed": False
-                }
-                write_checkpoint(repo_name, checkpoint_data)
-            
-            page += 1
-            time.sleep(0.1)
+        # 第一页给出总页数（rel="last"），最后一页给出总fork数
+        data, headers = await fetch(1)
+        if data is None:
+            # 请求失败（重试后仍为 None）与空列表不同：不能按 0 页记为完成，保留任务下次运行重试
+            pbar.close()
+            print(f"[{repo_name}] 第 1 页获取失败，下次运行重试")
+            return False
+        page_count = (link_page(headers, 'last') or 1) if data else 0
+        state["page_count"] = page_count
+        if page_count > 1:
+            last_data, _ = await fetch(page_count)
+            if last_data is None:
+                raise RuntimeError(f"第 {page_count} 页获取失败")
+            state["total_forks"] = (page_count - 1) * PER_PAGE + len(last_data)
+        else:
+            state["total_forks"] = len(data or [])
         
-        pbar.close()
+        if page_data:
+            # 续传：期间新增的fork排在最前，已爬的页面整体后移；
+            # 回滚可能受影响的页面（含上次最后一页）重新爬取，其余页面的fork按 id 去重
+            first_missing = next(p for p in range(1, len(page_data) + 2) if str(p) not in page_data)
+            shift_pages = -(-max(state["total_forks"] - old_total, 0) // PER_PAGE) + 1
+            rollback = [int(p) for p in page_data if int(p) >= first_missing - shift_pages]
+            for page in rollback:
+                remove_page_data(daily_forks, page_data, page)
+            if rollback:
+                print(f"[{repo_name}] 断点续传：回滚 {len(rollback)} 页数据并重新爬取...")
+        for entry in page_data.values():
+            seen_ids.update(entry["ids"])
+        pbar.update(len(page_data))
+        
+        if data and "1" not in page_data:
+            handle_page(1, data)
         
-        save_result(repo_name, dict(daily_forks), total_forks)
+        stop = not data or past_start(page_data["1"])
+        next_page = 2
+        while not stop and next_page <= page_count:
+            wave = list(range(next_page, min(next_page + PAGE_WAVE, page_count + 1)))
+            next_page = wave[-1] + 1
+            for page in wave:
+                if page in fetched and str(page) not in page_data:
+                    handle_page(page, fetched[page])
+            todo = [page for page in wave if str(page) not in page_data]
+            failed = await fetch_pages(todo, fetch, handle_page, concurrency=len(todo) or 1)
+            if failed:
+                pbar.close()
+                write_checkpoint(repo_name, build_checkpoint(state, daily_forks))
+                print(f"[{repo_name}] {len(failed)} 页获取失败，下次运行继续: {failed[:10]}")
+                return False
+            stop = any(past_start(page_data[str(page)]) for page in wave)
+        
+        pbar.close()
         
-        checkpoint_data = {
-            "last_page": page,
-            "daily_forks": dict(daily_forks),
-            "page_data": page_data,
-            "total_forks": total_forks,
-            "completed": True
-        }
+        checkpoint_data = build_checkpoint(state, daily_forks, completed=True)
+        save_result(repo_name, checkpoint_data["daily_forks"], state["total_forks"])
         write_checkpoint(repo_name, checkpoint_data)
         
-        print(f"[{repo_name}] 完成! 总fork: {total_forks}, 范围内: {forks_in_range}")
+        calls = state["api_calls"] - calls_before
+        print(f"[{repo_name}] 完成! 总fork: {state['total_forks']}, "
+              f"范围内: {sum(checkpoint_data['daily_forks'].values())} | "
+              f"API调用: {calls}/{page_count} 页，节省 {max(page_count - calls, 0)} 次")
         return True
         
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print(f"\n[{repo_name}] 用户中断，保存进度...")
-        checkpoint_data = {
-            "last_page": page,
-            "daily_forks": dict(daily_forks),
-            "page_data": page_data,
-            "total_forks": total_forks,
-            "completed": False
-        }
-        write_checkpoint(repo_name, checkpoint_data)
+        write_checkpoint(repo_name, build_checkpoint(state, daily_forks))
         raise
     except Exception as e:
         print(f"\n[{repo_name}] 错误: {e}")
-        checkpoint_data = {
-            "last_page": page,
-            "daily_forks": dict(daily_forks),
-            "page_data": page_data,
-            "total_forks": total_forks,
-            "completed": False
-        }
-        write_checkpoint(repo_name, checkpoint_data)
+        write_checkpoint(repo_name, build_checkpoint(state, daily_forks))
+        return False
+
+async def refresh_repo(crawler, repo_name, output):
+    """增量模式：从最新的fork往前爬，越过水位即停止，合并到已有的每日统计"""
+    owner, repo = repo_name.split('/')
+    since = since_day(output_watermark(output))
+    until = datetime.now(timezone.utc)
+    daily_new = defaultdict(int)
+    seen_ids = set()
+    calls = 0
+    
+    async def fetch(page):
+        nonlocal calls
+        calls += 1
+        return await get_forks_page(crawler, owner, repo, page=page, per_page=PER_PAGE)
+    
+    entries = {}
+    
+    def handle_page(page, data):
+        entries[page] = count_page(data, seen_ids, since, until)
+        for date_str, count in entries[page]["daily"].items():
+            daily_new[date_str] += count
+    
+    try:
+        data, headers = await fetch(1)
+        if data is None:
+            raise RuntimeError("第 1 页获取失败")
+        page_count = (link_page(headers, 'last') or 1) if data else 0
+        total_forks = len(data)
+        if data:
+            handle_page(1, data)
+        
+        # 从新到旧，水位之后的新fork通常只有一两页，逐批并发直到越过水位
+        stop = not data or past_start(entries[1], since)
+        next_page = 2
+        while not stop and next_page <= page_count:
+            wave = list(range(next_page, min(next_page + PAGE_WAVE, page_count + 1)))
+            next_page = wave[-1] + 1
+            failed = await fetch_pages(wave, fetch, handle_page, concurrency=len(wave))
+            if failed:
+                print(f"[{repo_name}] 增量: {len(failed)} 页获取失败，下次运行重试: {failed[:10]}")
+                return False
+            stop = any(past_start(entries[page], since) for page in wave)
+        
+        if page_count > 1:
+            last_data, _ = await fetch(page_count)
+            if last_data is None:
+                raise RuntimeError(f"第 {page_count} 页获取失败")
+            total_forks = (page_count - 1) * PER_PAGE + len(last_data)
+        
+        daily_forks = merge_daily(output.get("daily_forks", {}), daily_new, since)
+        save_result(repo_name, daily_forks, total_forks, end_date=until, since=since.strftime("%Y-%m-%d"))
+        
+        print(f"[{repo_name}] 增量完成! 自 {since.strftime('%Y-%m-%d')} 新增: {sum(daily_new.values())}, "
+              f"总fork: {total_forks} | API调用: {calls}/{page_count} 页")
+        return True
+    except Exception as e:
+        print(f"\n[{repo_name}] 增量错误: {e}")
         return False
 
+async def crawl_projects(projects):
+    """并发爬取多个项目，返回 (成功数, 跳过数, 失败数)"""
+    success_count = 0
+    error_count = 0
+    skipped_count = 0
+    
+    async with AsyncGitHubCrawler(TOKENS) as crawler:
+        remaining = (await crawler.get_rate_limit_info())['core_remaining']
+        print(f"📊 当前Token剩余请求次数: {remaining}")
+        print(f"\n🚀 开始爬取...\n")
+        
+        queue = open_queue()
+        queue.enqueue(projects, JOB_TYPE)
+        if INCREMENTAL:
+            queue.reopen(projects, JOB_TYPE, REFRESH_INTERVAL.total_seconds())
+        for repo_name, status in queue.statuses(projects, JOB_TYPE).items():
+            if status == DONE:
+                print(f"  ✓ {repo_name} 已完成，跳过")
+                skipped_count += 1
+        scheduled = schedule(queue, projects, [JOB_TYPE],
+                             lambda repo_name, _: open_sinks().load_series("forks", repo_name, get_output_path(repo_name)))
+        budget = crawler_budget(crawler)
+        
+        async def work(repo_name, data_type):
+            output = open_sinks().load_series("forks", repo_name, get_output_path(repo_name)) if INCREMENTAL else None
+            if output is not None and output_watermark(output) is not None:
+                return await refresh_repo(crawler, repo_name, output)
+            return await process_repo(crawler, repo_name)
+        
+        results = await run_jobs(queue, [JOB_TYPE], scheduled, work, DEFAULT_REPO_CONCURRENCY,
+                                 stop=budget and budget.exhausted)
+        for repo_name, _, result in results:
+            if result is True:
+                success_count += 1
+            else:
+                if isinstance(result, Exception):
+                    print(f"  ❌ {repo_name} 错误: {result}")
+                error_count += 1
+        
+        stats = crawler.stats.summary()
+        print(f"\n📈 请求数: {stats['requests']}, 页数: {stats['pages']}, "
+              f"耗时: {stats['seconds']} 秒, 吞吐: {stats['pages_per_sec']} 页/秒")
+        waits = stats['waits']
+        print(f"⏱️ 累计请求耗时: {stats['fetch_seconds']} 秒, 等待: {stats['wait_seconds']} 秒 "
+              f"(退避 {waits['backoff']} / 节奏 {waits['pacing']} / 额度 {waits['budget']})")
+        if crawler.cache is not None:
+            print(f"🗄️ 缓存命中: {stats['cache_hits']}, 未命中: {stats['cache_misses']}, "
+                  f"命中率: {stats['cache_hit_rate']:.1%}")
+        if budget is not None:
+            print(f"💰 API 预算: 已用 {budget.spent}/{budget.limit}")
+        print(f"🗂️ 任务队列: {queue.summary([JOB_TYPE])}")
+    
+    return success_count, skipped_count, error_count
+
 def main():
+    global TOKENS
+    shard = pop_shard_arg(sys.argv)
+    TOKENS = shard_tokens(TOKENS, shard)
     print("=" * 60)
     print("🍴 GitHub Fork数据爬虫 (每日统计)")
     print("=" * 60)
     print(f"\n📁 项目列表: {PROJECT_LIST_FILE}")
     print(f"📁 数据目录: {FORK_DIR}")
-    print(f"📁 断点目录: {CHECKPOINT_DIR}")
+    print(f"📁 任务队列: {JOB_DB_FILE}")
+    print(f"📤 输出: {', '.join(SINK_NAMES)}")
     print(f"🔑 Token数量: {len(TOKENS)}")
     print(f"📅 时间范围: {START_DATE.strftime('%Y-%m-%d')} ~ {END_DATE.strftime('%Y-%m-%d')}")
-    print(f"⚠️  断点续传: 自动删除最后一页数据并重新爬取，确保不重复不遗漏")
+    print(f"⚠️  断点续传: 自动回滚受影响页面的数据并重新爬取，按 id 去重，确保不重复不遗漏")
+    if INCREMENTAL:
+        print(f"🔁 增量模式: 已有输出的项目从上次水位爬到现在")
 
     ensure_dirs()
 
@@ -357,6 +456,9 @@ def main():
         projects = [sys.argv[1]]
     else:
         projects = get_projects()
+    projects = shard_projects(projects, shard)
+    if shard:
+        print(describe(shard, projects, TOKENS))
     
     if not projects:
         print("❌ 未找到项目列表")
@@ -364,40 +466,12 @@ def main():
     
     print(f"\n📋 找到 {len(projects)} 个项目")
 
-    crawler = GitHubCrawler(TOKENS)
-
-    remaining, reset = crawler.get_rate_limit_info()
-    print(f"📊 当前Token剩余请求次数: {remaining}")
-    
-    print(f"\n🚀 开始爬取...\n")
-    
-    success_count = 0
-    error_count = 0
-    skipped_count = 0
+    try:
+        success_count, skipped_count, error_count = asyncio.run(crawl_projects(projects))
+    except KeyboardInterrupt:
+        print("\n\n⚠️  用户中断!")
+        return
     
-    for i, repo_name in enumerate(projects):
-        print(f"\n[{i+1}/{len(projects)}] 处理: {repo_name}")
-
-        checkpoint = read_checkpoint(repo_name)
-        if checkpoint.get("completed", False):
-            print(f"  ✓ 已完成，跳过")
-            skipped_count += 1
-            continue
-        
-        try:
-            success = process_repo(crawler, repo_name)
-            if success:
-                success_count += 1
-            else:
-                error_count += 1
-        except KeyboardInterrupt:
-            print("\n\n⚠️  用户中断!")
-            break
-        except Exception as e:
-            print(f"  ❌ 错误: {e}")
-            error_count += 1
-            crawler.switch_token()
-
     print("\n" + "=" * 60)
     print("📊 爬取统计")
     print("=" * 60)
@@ -1,13 +1,18 @@
 import os
-import json
 import sys
-import time
-import re
+import asyncio
 from datetime import datetime, timezone, timedelta
-from github import Github, GithubException, Auth
 from tqdm import tqdm
-from dateutil import parser
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.jsonl_store import append_records, convert_json_array, read_last_entry
+from github_core import DEFAULT_REPO_CONCURRENCY, AsyncGitHubCrawler, fetch_pages, link_page
+from project_catalog import window_issue_count
+from incremental import INCREMENTAL, REFRESH_INTERVAL, parse_time
+from job_queue import DONE, open_queue, run_jobs
+from scheduler import crawler_budget, schedule
+from sharding import describe, pop_shard_arg, shard_projects, shard_tokens
+from sinks import open_sinks
 TOKENS = [
     os.getenv("GITHUB_TOKEN_1", "your_github_token_1"),
     os.getenv("GITHUB_TOKEN_2", "your_github_token_2"),
@@ -16,22 +21,27 @@ TOKENS = [
 ]
 PROJECT_LIST_FILE = "top300_projects_list.txt"
 
-def get_github_client(token_index):
-    token = TOKENS[token_index % len(TOKENS)]
-    auth = Auth.Token(token)
-    return Github(auth=auth)
-
 OUTPUT_DIR = os.path.join("data", "issue")
+# 旧版断点目录（只读，首次读取游标时迁移到任务队列）
 NUMBER_DIR = os.path.join("data", "issue_numbers")
+# 任务队列游标即每个项目的状态记录，重启时不读取输出文件，已完成的项目不发任何请求:
+#   {"count": 已爬取的 issue 数, "last_created_at": 最后一条的 created_at, "completed": 是否已爬完,
+#    "total": {"count": 时间范围内 GitHub 上的 issue + PR 数, "window": [起, 止], "checked_at": 查询时间}}
+JOB_TYPE = "issues"
+# 时间范围内的总数在这段时间内复用，不重复 search
+TOTAL_CHECK_INTERVAL = timedelta(days=7)
+# 输出为 JSON Lines（每行一个 issue），CRAWL_GZIP=1 时使用 gzip 压缩
+USE_GZIP = os.getenv("CRAWL_GZIP", "0") == "1"
+PER_PAGE = 100
+# 每批并发获取的页数（越大越快，越过 END_DATE 提前停止时多爬的页也越多）
+PAGE_WAVE = 5
 
 FIXED_START_DATE = datetime(2022, 3, 1, tzinfo=timezone.utc)
 END_DATE = datetime(2023, 3, 31, 23, 59, 59, tzinfo=timezone.utc)
 
 def ensure_dirs():
     if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
-    if not os.path.exists(NUMBER_DIR):
-        os.makedirs(NUMBER_DIR)
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 def get_projects():
     projects = []
@@ -49,162 +59,180 @@ def get_projects():
                 projects.append(line)
     return projects
 
-def read_checkpoint(filepath):
-    """Read the number of crawled issues from file."""
+def read_state(project_name, filepath):
+    """Read the project state record from the job cursor, falling back to the legacy count file."""
+    cursor = open_queue().cursor(project_name, JOB_TYPE)
+    if cursor is not None:
+        return cursor
     if not os.path.exists(filepath):
-        return 0
+        return {"count": 0}
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
             content = f.read().strip()
             if not content:
-                return 0
+                return {"count": 0}
             
             lines = content.splitlines()
             
             # Legacy fallback: count lines if it looks like a list (more than 1 line)
             if len(lines) > 1:
-                return len(lines)
+                return {"count": len(lines)}
             
             # New format: single count (1 line)
             if len(lines) == 1 and lines[0].isdigit():
-                 return int(lines[0])
+                 return {"count": int(lines[0])}
                  
-            return 0
+            return {"count": 0}
     except Exception as e:
         print(f"Error reading checkpoint {filepath}: {e}")
-        return 0
+        return {"count": 0}
 
-def write_checkpoint(filepath, count):
-    """Write the total count of crawled issues."""
-    try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(str(count))
-    except Exception as e:
-        print(f"Error writing checkpoint {filepath}: {e}")
+def write_state(project_name, state):
+    """Save the project state record to the job cursor."""
+    open_queue().save_cursor(project_name, JOB_TYPE, state)
 
-def append_issues_to_json(json_file, new_issues):
-    """Append issues to a JSON file (handling array structure)."""
+def append_issues_to_json(json_file, new_issues, project_name):
+    """Append issues to a JSONL file and its offset index (json sink) and upsert them into the database sinks."""
     if not new_issues:
         return
-    
-    if not os.path.exists(json_file):
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(new_issues, f, ensure_ascii=False, indent=2)
-    else:
+    sinks = open_sinks()
+    if sinks.json:
         try:
-            with open(json_file, 'rb+') as f:
-                f.seek(0, os.SEEK_END)
-                filesize = f.tell()
-                
-                if filesize == 0:
-                    f.write(json.dumps(new_issues, ensure_ascii=False, indent=2).encode('utf-8'))
-                    return
-
-                pos = filesize
-                found_bracket = False
-                while pos > 0:
-                    pos -= 1
-                    f.seek(pos)
-                    char = f.read(1)
-                    if char == b']':
-                        found_bracket = True
-                        break
-                
-                if not found_bracket:
-                    return
-
-                needs_comma = True
-                scan_pos = pos - 1
-                while scan_pos >= 0:
-                    f.seek(scan_pos)
-                    c = f.read(1)
-                    if c in (b' ', b'\n', b'\r', b'\t'):
-                        scan_pos -= 1
-                        continue
-                    if c == b'[':
-                        needs_comma = False
-                    break
-                
-                f.seek(pos)
-                content = json.dumps(new_issues, ensure_ascii=False, indent=2)
-                inner_content = content.strip()
-                if inner_content.startswith('['): inner_content = inner_content[1:]
-                if inner_content.endswith(']'): inner_content = inner_content[:-1]
-                
-                if needs_comma:
-                    f.write(b',' + inner_content.encode('utf-8') + b']')
-                else:
-                    f.write(inner_content.encode('utf-8') + b']')
-                f.truncate()
+            append_records(json_file, new_issues)
         except Exception as e:
-            print(f"Error appending to JSON {json_file}: {e}")
+            print(f"Error appending to JSONL {json_file}: {e}")
+    sinks.write_records('issues', project_name, new_issues)
 
-def get_last_created_at(filepath):
+def get_last_created_at(filepath, project_name):
     """
-    Efficiently get the last 'created_at' date from a large JSON file.
+    Get the last 'created_at' date from the sidecar offset index (reads only its tail),
+    or from the database sink when JSON output is disabled.
     """
-    try:
-        with open(filepath, 'rb') as f:
-            f.seek(0, os.SEEK_END)
-            filesize = f.tell()
-            seek_size = min(5120, filesize)
-            f.seek(-seek_size, os.SEEK_END)
-            tail_data = f.read().decode('utf-8', errors='ignore')
-            matches = re.findall(r'"created_at":\s*"([^"]+)"', tail_data)
-            if matches:
-                dt = parser.parse(matches[-1])
-                # Ensure timezone aware
-                if dt.tzinfo is None:
-                    dt = dt.replace(tzinfo=timezone.utc)
-                return dt
-    except Exception:
+    sinks = open_sinks()
+    if sinks.json:
+        entry = read_last_entry(filepath) if os.path.exists(filepath) else None
+        created_at = entry.created_at if entry is not None else None
+    else:
+        created_at = sinks.last_created_at('issues', project_name)
+    if not created_at:
         return None
-    return None
+    return parse_time(created_at)
+
+def migrate_legacy_output(legacy_file, json_file):
+    """Convert a legacy JSON array output to JSONL once; later runs only append."""
+    if os.path.exists(legacy_file) and not os.path.exists(json_file):
+        try:
+            count = convert_json_array(legacy_file, json_file)
+            os.rename(legacy_file, legacy_file + ".migrated")
+            print(f"Converted {legacy_file} to JSONL ({count} issues)")
+        except Exception as e:
+            print(f"Error converting {legacy_file}: {e}")
+
+def isoformat(value):
+    """REST timestamps ("...Z") in the same format PyGithub's datetime.isoformat() produced ("...+00:00")."""
+    dt = parse_time(value)
+    return dt.isoformat() if dt else None
 
 def serialize_issue(issue):
+    """Keep the output fields of one issue from the REST response."""
+    user = issue.get("user")
     return {
-        "title": issue.title,
-        "body": issue.body,
-        "state": issue.state,
-        "number": issue.number,
-        "created_at": issue.created_at.isoformat() if issue.created_at else None,
-        "closed_at": issue.closed_at.isoformat() if issue.closed_at else None,
-        "labels": [label.name for label in issue.labels],
-        "author_association": issue.author_association,
-        "user": issue.user.login if issue.user else None,
-        "html_url": issue.html_url
+        "title": issue.get("title"),
+        "body": issue.get("body"),
+        "state": issue.get("state"),
+        "number": issue["number"],
+        "created_at": isoformat(issue.get("created_at")),
+        "closed_at": isoformat(issue.get("closed_at")),
+        "labels": [label["name"] for label in issue.get("labels") or []],
+        "author_association": issue.get("author_association"),
+        "user": user.get("login") if user else None,
+        "html_url": issue.get("html_url")
     }
 
-def get_github_issue_count(g, project_name, start_date, end_date):
-    try:
-        start_str = start_date.strftime("%Y-%m-%d")
-        end_str = end_date.strftime("%Y-%m-%d")
-        
-        query_issues = f"repo:{project_name} created:{start_str}..{end_str} is:issue"
-        query_prs = f"repo:{project_name} created:{start_str}..{end_str} is:pr"
-        
-        issues_count = g.search_issues(query_issues).totalCount
-        time.sleep(1) 
-        prs_count = g.search_issues(query_prs).totalCount
-        
-        return issues_count + prs_count
-    except Exception as e:
-        print(f"[{project_name}] Error getting total count: {e}")
+async def get_issues_page(crawler, project_name, since, page=1, per_page=PER_PAGE):
+    return await crawler.get_page(
+        f"/repos/{project_name}/issues",
+        {'state': 'all', 'sort': 'created', 'direction': 'asc', 'since': since.strftime('%Y-%m-%dT%H:%M:%SZ')},
+        page=page, per_page=per_page
+    )
+
+async def search_count(crawler, query):
+    data, _ = await crawler.get("/search/issues", {'q': query, 'per_page': 1})
+    if data is None:
+        raise RuntimeError(f"search failed: {query}")
+    return data["total_count"]
+
+def window_key(start_date, end_date):
+    return [start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")]
+
+def recorded_issue_count(state, start_date, end_date):
+    """Total recorded in the state within TOTAL_CHECK_INTERVAL for the same window, else None."""
+    total = state.get("total") or {}
+    checked_at = parse_time(total.get("checked_at"))
+    if total.get("window") != window_key(start_date, end_date) or checked_at is None:
+        return None
+    if datetime.now(timezone.utc) - checked_at > TOTAL_CHECK_INTERVAL:
         return None
+    return total.get("count")
+
+async def get_github_issue_count(crawler, project_name, start_date, end_date, state):
+    # 依次使用：状态记录中近期查过的总数、crawl_repo_counters.py 写入项目目录的计数，最后才发两次 search 请求
+    recorded = recorded_issue_count(state, start_date, end_date)
+    if recorded is not None:
+        return recorded
+    count = window_issue_count(project_name, start_date, end_date)
+    if count is None:
+        try:
+            start_str, end_str = window_key(start_date, end_date)
+            
+            query_issues = f"repo:{project_name} created:{start_str}..{end_str} is:issue"
+            query_prs = f"repo:{project_name} created:{start_str}..{end_str} is:pr"
+            
+            issues_count = await search_count(crawler, query_issues)
+            prs_count = await search_count(crawler, query_prs)
+            
+            count = issues_count + prs_count
+        except Exception as e:
+            print(f"[{project_name}] Error getting total count: {e}")
+            return None
+    state["total"] = {
+        "count": count,
+        "window": window_key(start_date, end_date),
+        "checked_at": datetime.now(timezone.utc).isoformat()
+    }
+    return count
 
-def process_project(g, project_name):
+async def process_project(crawler, project_name):
     safe_name = project_name.replace('/', '_')
-    json_file = os.path.join(OUTPUT_DIR, f"{safe_name}.json")
+    ext = ".jsonl.gz" if USE_GZIP else ".jsonl"
+    json_file = os.path.join(OUTPUT_DIR, f"{safe_name}{ext}")
     number_file = os.path.join(NUMBER_DIR, f"{safe_name}.txt")
+    migrate_legacy_output(os.path.join(OUTPUT_DIR, f"{safe_name}.json"), json_file)
 
-    crawled_count = read_checkpoint(number_file)
+    state = read_state(project_name, number_file)
+    crawled_count = state.get("count", 0)
+    if state.get("completed") and not INCREMENTAL:
+        print(f"[{project_name}] Already completed (state record).")
+        return "skipped"
 
-    total_count = get_github_issue_count(g, project_name, FIXED_START_DATE, END_DATE)
-    
+    # 状态记录中没有时（旧版游标）才读取输出索引的尾部
+    last_date = parse_time(state.get("last_created_at")) or get_last_created_at(json_file, project_name)
+
+    # 增量模式：已有输出的项目不再按数量判断是否完成，从最后一条的 created_at 一直爬到现在
+    incremental = INCREMENTAL and last_date is not None
+    end_date = datetime.now(timezone.utc) if incremental else END_DATE
+    total_count = None if incremental else await get_github_issue_count(crawler, project_name, FIXED_START_DATE, END_DATE, state)
     if total_count is not None:
+        # 中断后重启时复用查到的总数
+        write_state(project_name, state)
+    
+    if incremental:
+        print(f"[{project_name}] Incremental mode: crawling up to {end_date}")
+    elif total_count is not None:
         print(f"[{project_name}] Local count: {crawled_count}, GitHub total: {total_count}")
         if crawled_count >= total_count:
             print(f"[{project_name}] Already completed (Count match).")
+            write_state(project_name, {**state, "completed": True})
             return "skipped"
     else:
         print(f"[{project_name}] Could not verify total count. Proceeding with crawl...")
@@ -212,85 +240,165 @@ def process_project(g, project_name):
     current_start_date = FIXED_START_DATE
     is_resuming = False
     
-    if os.path.exists(json_file):
-        last_date = get_last_created_at(json_file)
-        if last_date and last_date > FIXED_START_DATE:
-            current_start_date = last_date
-            is_resuming = True
-            print(f"[{project_name}] Resuming from {current_start_date}")
+    if last_date and last_date > FIXED_START_DATE:
+        current_start_date = last_date
+        is_resuming = True
+        print(f"[{project_name}] Resuming from {current_start_date}")
     
-    if current_start_date >= END_DATE:
+    if current_start_date >= end_date:
         print(f"[{project_name}] Date range exhausted.")
+        write_state(project_name, {**state, "completed": True})
         return "skipped"
 
-    try:
-        repo = g.get_repo(project_name)
-        
-        issues = repo.get_issues(state='all', sort='created', direction='asc', since=current_start_date)
-        
-        new_batch = []
-        current_count = crawled_count
-        
-        pbar_total = total_count if total_count else (crawled_count + 1000) # Estimate if None
-        pbar = tqdm(desc=f"[{project_name}] Crawling", unit="issue", initial=crawled_count, total=pbar_total)
-        
-        for issue in issues:
-            if issue.created_at < FIXED_START_DATE:
-                continue
-            
-            if issue.created_at > END_DATE:
-                break
-            
-            if is_resuming and issue.created_at <= current_start_date:
-                continue
+    new_batch = []
+    current_count = crawled_count
+    calls = 0
 
-            data = serialize_issue(issue)
-            new_batch.append(data)
-            current_count += 1
-            pbar.update(1)
-            
-            if len(new_batch) >= 50:
-                append_issues_to_json(json_file, new_batch)
-                write_checkpoint(number_file, current_count)
-                new_batch = []
-        
+    async def fetch(page):
+        nonlocal calls
+        calls += 1
+        return await get_issues_page(crawler, project_name, current_start_date, page=page)
+
+    def save_batch():
+        nonlocal new_batch
         if new_batch:
-            append_issues_to_json(json_file, new_batch)
-            write_checkpoint(number_file, current_count)
-            
+            append_issues_to_json(json_file, new_batch, project_name)
+            state.update(count=current_count, last_created_at=new_batch[-1]["created_at"])
+            write_state(project_name, state)
+            new_batch = []
+
+    pbar_total = total_count if total_count else (crawled_count + 1000) # Estimate if None
+    pbar = tqdm(desc=f"[{project_name}] Crawling", unit="issue", initial=crawled_count, total=pbar_total)
+
+    def handle_pages(pages):
+        """Process a wave of pages in page order; returns True once an issue past end_date is seen."""
+        nonlocal current_count
+        for page in sorted(pages):
+            for issue in pages[page]:
+                created = parse_time(issue["created_at"])
+                if created < FIXED_START_DATE:
+                    continue
+
+                if created > end_date:
+                    return True
+
+                if is_resuming and created <= current_start_date:
+                    continue
+
+                new_batch.append(serialize_issue(issue))
+                current_count += 1
+                pbar.update(1)
+
+                if len(new_batch) >= 50:
+                    save_batch()
+        return False
+
+    try:
+        data, headers = await fetch(1)
+        if data is None:
+            pbar.close()
+            print(f"[{project_name}] Failed to fetch the first page.")
+            return "error"
+        page_count = link_page(headers, 'last') or 1
+        stop = handle_pages({1: data})
+        next_page = 2
+        while not stop and next_page <= page_count:
+            wave = list(range(next_page, min(next_page + PAGE_WAVE, page_count + 1)))
+            pages = {}
+            failed = await fetch_pages(wave, fetch, pages.__setitem__, concurrency=len(wave))
+            # Only pages before the first failed one are processed, so last_created_at never skips an issue
+            done = [page for page in wave if not failed or page < failed[0]]
+            stop = handle_pages({page: pages[page] for page in done})
+            next_page = wave[-1] + 1
+            if failed and not stop:
+                save_batch()
+                pbar.close()
+                print(f"[{project_name}] {len(failed)} pages failed, resuming next run: {failed[:10]}")
+                return "error"
+
+        save_batch()
+        # 列表已走到 end_date（或没有更多 issue）
+        state["completed"] = True
+        write_state(project_name, state)
+
         pbar.close()
-        print(f"[{project_name}] Done. Total issues: {current_count}")
-        
-    except GithubException as e:
-        print(f"[{project_name}] GitHub Error: {e}")
-        if e.status == 403 and 'rate limit' in str(e).lower():
-            return "rate_limit"
+        print(f"[{project_name}] Done. Total issues: {current_count} | API calls: {calls}/{page_count} pages")
+
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pbar.close()
+        print(f"\n[{project_name}] Interrupted.")
+        raise
     except Exception as e:
+        pbar.close()
         print(f"[{project_name}] Error: {e}")
-    
+        return "error"
+
     return "ok"
 
+async def crawl_projects(projects):
+    """Crawl several projects concurrently; returns (success, skipped, error) counts."""
+    success_count = 0
+    skipped_count = 0
+    error_count = 0
+
+    async with AsyncGitHubCrawler(TOKENS) as crawler:
+        remaining = (await crawler.get_rate_limit_info())['core_remaining']
+        print(f"Remaining core requests for the current token: {remaining}")
+
+        queue = open_queue()
+        queue.enqueue(projects, JOB_TYPE)
+        if INCREMENTAL:
+            queue.reopen(projects, JOB_TYPE, REFRESH_INTERVAL.total_seconds())
+        for project, status in queue.statuses(projects, JOB_TYPE).items():
+            if status == DONE:
+                skipped_count += 1
+        scheduled = schedule(queue, projects, [JOB_TYPE])
+        budget = crawler_budget(crawler)
+
+        async def work(project, data_type):
+            return await process_project(crawler, project) in ("ok", "skipped")
+
+        results = await run_jobs(queue, [JOB_TYPE], scheduled, work, DEFAULT_REPO_CONCURRENCY,
+                                 stop=budget and budget.exhausted)
+        for project, _, result in results:
+            if result is True:
+                success_count += 1
+            else:
+                if isinstance(result, Exception):
+                    print(f"[{project}] Error: {result}")
+                error_count += 1
+
+        stats = crawler.stats.summary()
+        print(f"Requests: {stats['requests']}, pages: {stats['pages']}, "
+              f"time: {stats['seconds']}s, throughput: {stats['pages_per_sec']} pages/s")
+        if crawler.cache is not None:
+            print(f"Cache hits: {stats['cache_hits']}, misses: {stats['cache_misses']}, "
+                  f"hit rate: {stats['cache_hit_rate']:.1%}")
+        if budget is not None:
+            print(f"API budget: spent {budget.spent}/{budget.limit}")
+        print(f"Job queue: {queue.summary([JOB_TYPE])}")
+
+    return success_count, skipped_count, error_count
+
 def main():
+    global TOKENS
+    shard = pop_shard_arg(sys.argv)
+    TOKENS = shard_tokens(TOKENS, shard)
     ensure_dirs()
-    projects = get_projects()
+    projects = shard_projects(get_projects(), shard)
     print(f"Found {len(projects)} projects.")
+    if shard:
+        print(describe(shard, projects, TOKENS))
     
-    token_index = 0
-    g = get_github_client(token_index)
-    
-    for project in projects:
-        while True:
-            status = process_project(g, project)
-            if status == "rate_limit":
-                print(f"Rate limit reached for token {token_index % len(TOKENS)}. Switching token...")
-                token_index += 1
-                g = get_github_client(token_index)
-                
-                if token_index % len(TOKENS) == 0:
-                    print("All tokens exhausted. Sleeping for 60 seconds...")
-                    time.sleep(60)
-                continue
-            break 
+    if not projects:
+        return
+
+    try:
+        success_count, skipped_count, error_count = asyncio.run(crawl_projects(projects))
+    except KeyboardInterrupt:
+        print("\nInterrupted.")
+        return
+    print(f"Success: {success_count}, skipped (completed): {skipped_count}, failed: {error_count}")
 
 if __name__ == "__main__":
     main()
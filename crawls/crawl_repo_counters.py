@@ -0,0 +1,217 @@
+"""
+仓库级计数采集（GraphQL 批量查询）
+每次 GraphQL 查询用别名同时取 50~100 个项目的:
+    star 总数、fork 总数、open/closed issue 数、open/closed/merged PR 数、
+    主要语言、许可证、创建/最近推送时间、是否归档，
+    以及时间范围内创建的 issue 数和 PR 数（search issueCount）
+结果直接合并写入项目目录 data/project_catalog.json（见 project_catalog.py）
+
+按 GraphQL 额度点数控制批量大小：每次查询附带 rateLimit { cost remaining }，
+根据实际单项目消耗调整下一批的项目数，使单次查询消耗不超过 QUERY_COST_TARGET；
+查询失败（超时 / 节点数超限）时批量减半重试
+
+运行方式:
+    python crawl_repo_counters.py                 # top300_projects_list.txt 中的全部项目
+    python crawl_repo_counters.py facebook/react  # 单个项目
+    python crawl_repo_counters.py --shard 1/2     # 分片运行（见 sharding.py）
+"""
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+from github_core import AsyncGitHubCrawler
+from project_catalog import CATALOG_FILE, upsert_projects
+from sharding import describe, pop_shard_arg, shard_projects, shard_tokens
+
+load_dotenv()
+
+TOKENS = [
+    os.getenv("GITHUB_TOKEN_1", "your_github_token_1"),
+    os.getenv("GITHUB_TOKEN_2", "your_github_token_2"),
+    os.getenv("GITHUB_TOKEN_3", "your_github_token_3"),
+    os.getenv("GITHUB_TOKEN_4", "your_github_token_4"),
+]
+PROJECT_LIST_FILE = "top300_projects_list.txt"
+
+START_DATE = datetime(2022, 3, 1, tzinfo=timezone.utc)
+END_DATE = datetime(2023, 3, 31, 23, 59, 59, tzinfo=timezone.utc)
+
+INITIAL_BATCH = 50
+MIN_BATCH = 10
+MAX_BATCH = 100
+# 单次查询的目标额度点数
+QUERY_COST_TARGET = 50
+
+REPO_FRAGMENT = """
+fragment RepoCounters on Repository {
+  nameWithOwner
+  stargazerCount
+  forkCount
+  openIssues: issues(states: OPEN) { totalCount }
+  closedIssues: issues(states: CLOSED) { totalCount }
+  openPRs: pullRequests(states: OPEN) { totalCount }
+  closedPRs: pullRequests(states: CLOSED) { totalCount }
+  mergedPRs: pullRequests(states: MERGED) { totalCount }
+  primaryLanguage { name }
+  licenseInfo { spdxId name }
+  createdAt
+  pushedAt
+  isArchived
+}
+"""
+
+
+def get_projects():
+    projects = []
+    if not os.path.exists(PROJECT_LIST_FILE):
+        print(f"Error: {PROJECT_LIST_FILE} not found.")
+        return []
+
+    with open(PROJECT_LIST_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if '→' in line:
+                projects.append(line.split('→')[-1].strip())
+            else:
+                projects.append(line)
+    return projects
+
+
+def build_query(projects):
+    """每个项目一个 repository 别名 + 两个时间范围内的 search 别名"""
+    window = f"created:{START_DATE.strftime('%Y-%m-%d')}..{END_DATE.strftime('%Y-%m-%d')}"
+    fields = []
+    for i, project in enumerate(projects):
+        owner, name = project.split('/', 1)
+        fields.append(f'r{i}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) {{ ...RepoCounters }}')
+        for kind in ('issue', 'pr'):
+            query = json.dumps(f"repo:{project} is:{kind} {window}")
+            fields.append(f'r{i}_{kind}s: search(query: {query}, type: ISSUE, first: 1) {{ issueCount }}')
+    body = '\n  '.join(fields)
+    return f"query {{\n  rateLimit {{ cost remaining resetAt }}\n  {body}\n}}\n{REPO_FRAGMENT}"
+
+
+def parse_repo(repo, issues, prs):
+    """GraphQL 返回的仓库字段 -> 目录字段"""
+    count = lambda key: (repo.get(key) or {}).get('totalCount', 0)
+    license_info = repo.get('licenseInfo') or {}
+    return {
+        "stars": repo.get('stargazerCount', 0),
+        "forks": repo.get('forkCount', 0),
+        "open_issues": count('openIssues'),
+        "closed_issues": count('closedIssues'),
+        "open_prs": count('openPRs'),
+        "closed_prs": count('closedPRs'),
+        "merged_prs": count('mergedPRs'),
+        "language": (repo.get('primaryLanguage') or {}).get('name'),
+        "license": license_info.get('spdxId') or license_info.get('name'),
+        "created_at": repo.get('createdAt'),
+        "pushed_at": repo.get('pushedAt'),
+        "archived": repo.get('isArchived', False),
+        "window": {
+            "start": START_DATE.strftime('%Y-%m-%d'),
+            "end": END_DATE.strftime('%Y-%m-%d'),
+            "issues": (issues or {}).get('issueCount'),
+            "prs": (prs or {}).get('issueCount'),
+        },
+        "counters_crawled_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
+async def fetch_batch(crawler, projects):
+    """查询一批项目，返回 ({项目: 字段}, 不存在的项目, rateLimit)；请求失败返回 None"""
+    data = await crawler.graphql(build_query(projects))
+    if data is None:
+        return None
+    entries = {}
+    missing = []
+    for i, project in enumerate(projects):
+        repo = data.get(f"r{i}")
+        if repo is None:
+            missing.append(project)
+            continue
+        entries[repo.get('nameWithOwner') or project] = parse_repo(
+            repo, data.get(f"r{i}_issues"), data.get(f"r{i}_prs")
+        )
+    return entries, missing, data.get('rateLimit') or {}
+
+
+async def collect_counters(projects, catalog_file=CATALOG_FILE):
+    """分批采集并写入项目目录，返回 (写入数, 不存在的项目, 失败的项目, 查询次数)"""
+    projects = [p for p in projects if p.count('/') == 1]
+    written = 0
+    missing, failed = [], []
+    queries = 0
+    batch_size = INITIAL_BATCH
+
+    async with AsyncGitHubCrawler(TOKENS) as crawler:
+        pending = list(projects)
+        while pending:
+            batch = pending[:batch_size]
+            result = await fetch_batch(crawler, batch)
+            queries += 1
+            if result is None:
+                if batch_size > MIN_BATCH:
+                    batch_size = max(batch_size // 2, MIN_BATCH)
+                    print(f"⚠️  查询失败，批量减半为 {batch_size} 重试")
+                    continue
+                failed.extend(batch)
+                pending = pending[len(batch):]
+                continue
+
+            entries, batch_missing, rate = result
+            written += upsert_projects(entries, catalog_file)
+            missing.extend(batch_missing)
+            pending = pending[len(batch):]
+
+            cost = rate.get('cost') or 1
+            per_repo = cost / len(batch)
+            batch_size = max(MIN_BATCH, min(MAX_BATCH, int(QUERY_COST_TARGET / per_repo)))
+            print(f"✅ {len(entries)} 个项目 | 消耗 {cost} 点 (剩余 {rate.get('remaining', '?')}) | "
+                  f"剩余项目 {len(pending)} | 下一批 {batch_size}")
+
+    return written, missing, failed, queries
+
+
+def main():
+    global TOKENS
+    shard = pop_shard_arg(sys.argv)
+    TOKENS = shard_tokens(TOKENS, shard)
+    print("=" * 60)
+    print("🧮 GitHub 仓库计数采集 (GraphQL 批量)")
+    print("=" * 60)
+    print(f"📁 项目目录: {CATALOG_FILE}")
+    print(f"🔑 Token数量: {len(TOKENS)}")
+
+    projects = [sys.argv[1]] if len(sys.argv) > 1 else get_projects()
+    projects = shard_projects(projects, shard)
+    if shard:
+        print(describe(shard, projects, TOKENS))
+    if not projects:
+        print("❌ 未找到项目列表")
+        return
+    print(f"📋 找到 {len(projects)} 个项目\n")
+
+    try:
+        written, missing, failed, queries = asyncio.run(collect_counters(projects))
+    except KeyboardInterrupt:
+        print("\n\n⚠️  用户中断!")
+        return
+
+    print("\n" + "=" * 60)
+    print(f"写入目录: {written} 个项目 | GraphQL 查询: {queries} 次")
+    if missing:
+        print(f"不存在/无权限: {len(missing)} 个: {missing[:10]}")
+    if failed:
+        print(f"失败: {len(failed)} 个: {failed[:10]}")
+    print("✅ 完成!")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,32 @@
 Star数据爬虫脚本
 使用GitHub API爬取top300项目每天的star数量
 功能:
-- 断点续传支持
-- 多Token轮换
+- 断点续传支持（按页记录已完成的页码集合，保存在任务队列的游标中，见 job_queue.py）
+- 多Token并发（基于 github_core 异步内核，多个项目同时爬取）
+- stargazers 按 star 时间升序排列：先二分查找与时间范围重叠的页码区间，只爬这些页面，
+  区间内的页面并发获取，按页乱序合并
 - 获取每个项目的stargazers及其star时间
 - 按日期统计每天的star数量
 - 数据存储到 data/star/ 目录
+- 增量模式（CRAWL_INCREMENTAL=1）：已完成的项目从上次的水位开始，二分定位到水位所在页，
+  只爬之后的页面并合并到已有的每日统计（见 incremental.py）
 """
 import os
 import json
-import time
 import sys
+import asyncio
 from datetime import datetime, timezone
 from collections import defaultdict
-import requests
 from tqdm import tqdm
 from dotenv import load_dotenv
 
+from github_core import ACCEPT_STAR, DEFAULT_REPO_CONCURRENCY, AsyncGitHubCrawler, fetch_pages, link_page
+from incremental import INCREMENTAL, REFRESH_INTERVAL, merge_daily, output_watermark, since_day
+from job_queue import DONE, JOB_DB_FILE, open_queue, run_jobs
+from scheduler import crawler_budget, schedule
+from sharding import describe, pop_shard_arg, shard_projects, shard_tokens
+from sinks import SINK_NAMES, open_sinks
+
 load_dotenv()
 
 TOKENS = [
@@ -29,98 +39,22 @@ TOKENS = [
 PROJECT_LIST_FILE = "top300_projects_list.txt"
 DATA_DIR = "data"
 STAR_DIR = os.path.join(DATA_DIR, "star")
+# 旧版断点目录（只读，首次读取游标时迁移到任务队列）
 CHECKPOINT_DIR = os.path.join(DATA_DIR, "star_checkpoint")
+JOB_TYPE = "star"
 
 START_DATE = datetime(2022, 3, 1, tzinfo=timezone.utc)
 END_DATE = datetime(2023, 3, 31, 23, 59, 59, tzinfo=timezone.utc)
+PER_PAGE = 100
 
-class GitHubCrawler:
-    def __init__(self, tokens):
-        self.tokens = tokens
-        self.current_token_index = 0
-        self.session = requests.Session()
-        self._update_headers()
-    
-    def _update_headers(self):
-        token = self.tokens[self.current_token_index % len(self.tokens)]
-        self.session.headers.update({
-            'Authorization': f'Bearer {token}',
-            'Accept': 'application/vnd.github.star+json',
-            'X-GitHub-Api-Version': '2022-11-28'
-        })
-    
-    def switch_token(self):
-        self.current_token_index += 1
-        self._update_headers()
-        print(f"切换到Token {self.current_token_index % len(self.tokens) + 1}")
-        return self.current_token_index
-    
-    def get_rate_limit_info(self):
-        url = "https://api.github.com/rate_limit"
-        try:
-            headers = {'Accept': 'application/vnd.github.v3+json'}
-            response = self.session.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                core = data.get('resources', {}).get('core', {})
-                return core.get('remaining', 0), core.get('reset', 0)
-        except:
-            pass
-        return 0, 0
-    
-    def get_with_retry(self, url, params=None, max_retries=3):
-        for attempt in range(max_retries):
-            try:
-                response = self.session.get(url, params=params, timeout=30)
-                
-                remaining = int(response.headers.get('X-RateLimit-Remaining', 1))
-                if remaining == 0:
-                    reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
-                    wait_time = max(reset_time - time.time(), 0) + 5
-                    print(f"\nRate limit达到，切换token...")
-                    old_index = self.current_token_index
-                    self.switch_token()
-                    if self.current_token_index >= old_index + len(self.tokens):
-                        print(f"所有token都达到限制，等待 {min(wait_time, 60):.0f} 秒...")
-                        time.sleep(min(wait_time, 60))
-                    continue
-                
-                if response.status_code == 200:
-                    return response.json(), response.headers
-                elif response.status_code == 403:
-                    error_msg = response.json().get('message', '')
-                    if 'rate limit' in error_msg.lower():
-                        print(f"\n403 Rate limit, 切换token...")
-                        self.switch_token()
-                        continue
-                    else:
-                        print(f"\n403 Forbidden: {error_msg}")
-                        return None, None
-                elif response.status_code == 404:
-                    return None, None
-                elif response.status_code == 422:
-                    return None, None
-                else:
-                    print(f"\nHTTP {response.status_code}: {response.text[:200]}")
-                    time.sleep(2)
-                    
-            except requests.exceptions.RequestException as e:
-                print(f"\n请求错误 (尝试 {attempt + 1}/{max_retries}): {e}")
-                time.sleep(5)
-        
-        return None, None
-
-    def get_stargazers_page(self, owner, repo, page=1, per_page=100):
-        url = f"https://api.github.com/repos/{owner}/{repo}/stargazers"
-        params = {'page': page, 'per_page': per_page}
-        data, headers = self.get_with_retry(url, params)
-        return data, headers
+async def get_stargazers_page(crawler, owner, repo, page=1, per_page=100):
+    return await crawler.get_page(
+        f"/repos/{owner}/{repo}/stargazers", page=page, per_page=per_page, accept=ACCEPT_STAR
+    )
 
 def ensure_dirs():
     if not os.path.exists(STAR_DIR):
-        os.makedirs(STAR_DIR)
-    if not os.path.exists(CHECKPOINT_DIR):
-        os.makedirs(CHECKPOINT_DIR)
+        os.makedirs(STAR_DIR, exist_ok=True)
 
 
 def get_projects():
@@ -156,6 +90,9 @@ def get_output_path(repo_name):
 
 
 def read_checkpoint(repo_name):
+    cursor = open_queue().cursor(repo_name, JOB_TYPE)
+    if cursor is not None:
+        return cursor
     path = get_checkpoint_path(repo_name)
     if os.path.exists(path):
         try:
@@ -163,16 +100,46 @@ def read_checkpoint(repo_name):
                 return json.load(f)
         except:
             pass
-    return {"last_page": 0, "daily_stars": {}, "completed": False}
+    return new_checkpoint()
+
+
+def new_checkpoint():
+    # window: 与时间范围重叠的页码区间 [lo, hi]
+    # page_bounds: 探测过的页面的首尾 star 时间 {"页码": [first, last]}，续传时免去重复探测
+    # page_data: 区间内每页每天的star数 {"页码": {"date": count}}，其键即已完成的页码集合
+    # last_page_total: 最后一页的star数，用于计算总star数
+    return {
+        "page_count": 0,
+        "window": None,
+        "page_bounds": {},
+        "page_data": {},
+        "last_page_total": 0,
+        "api_calls": 0,
+        "completed": False
+    }
+
+
+def build_checkpoint(state, completed=False):
+    daily_stars = defaultdict(int)
+    for date_counts in state["page_data"].values():
+        for date_str, count in date_counts.items():
+            daily_stars[date_str] += count
+    page_count = state["page_count"]
+    return {
+        **state,
+        "completed_pages": sorted(int(p) for p in state["page_data"]),
+        "daily_stars": dict(daily_stars),
+        "total_stars": (page_count - 1) * PER_PAGE + state["last_page_total"] if page_count else 0,
+        "completed": completed
+    }
 
 
 def write_checkpoint(repo_name, checkpoint_data):
-    path = get_checkpoint_path(repo_name)
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(checkpoint_data, f, ensure_ascii=False, indent=2)
+    open_queue().save_cursor(repo_name, JOB_TYPE, checkpoint_data)
 
 
-def save_result(repo_name, daily_stars, total_stars):
+def save_result(repo_name, daily_stars, total_stars, end_date=None, since=None):
+    """写入输出（见 sinks.py）；增量模式下 since 之前的天未变化"""
     path = get_output_path(repo_name)
     
     sorted_dates = sorted(daily_stars.keys())
@@ -182,16 +149,67 @@ def save_result(repo_name, daily_stars, total_stars):
         "total_stars_in_range": sum(daily_stars.values()),
         "total_stars_all_time": total_stars,
         "start_date": START_DATE.strftime("%Y-%m-%d"),
-        "end_date": END_DATE.strftime("%Y-%m-%d"),
+        "end_date": (end_date or END_DATE).strftime("%Y-%m-%d"),
         "crawled_at": datetime.now(timezone.utc).isoformat(),
         "daily_stars": {date: daily_stars[date] for date in sorted_dates}
     }
     
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    open_sinks().save_series("stars", result, path, since)
+
+
+def parse_starred_at(star_info):
+    starred_at_str = star_info.get('starred_at')
+    if not starred_at_str:
+        return None
+    try:
+        return datetime.fromisoformat(starred_at_str.replace('Z', '+00:00'))
+    except:
+        return None
 
 
-def process_repo(crawler, repo_name):
+def count_page(data, start=None, end=None):
+    """统计一页中 [start, end]（默认为 START_DATE ~ END_DATE）内每天的star数"""
+    start, end = start or START_DATE, end or END_DATE
+    counts = defaultdict(int)
+    for star_info in data:
+        starred_at = parse_starred_at(star_info)
+        if starred_at and start <= starred_at <= end:
+            counts[starred_at.strftime("%Y-%m-%d")] += 1
+    return dict(counts)
+
+
+def page_bounds(data):
+    """一页的首尾 star 时间，空页返回 None"""
+    times = [t for t in (parse_starred_at(x) for x in data) if t]
+    if not times:
+        return None
+    return [times[0].isoformat(), times[-1].isoformat()]
+
+
+async def bisect_pages(lo, hi, probe, predicate):
+    """在 [lo, hi] 中找第一个 predicate(页面首尾时间) 为真的页码（predicate 单调），找不到返回 hi + 1"""
+    result = hi + 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        if predicate(await probe(mid)):
+            result = mid
+            hi = mid - 1
+        else:
+            lo = mid + 1
+    return result
+
+
+def reaches_start(bounds, start=None):
+    # 页面最后一个 star 不早于 START_DATE（空页视为已越过末尾）
+    return bounds is None or datetime.fromisoformat(bounds[1]) >= (start or START_DATE)
+
+
+def passes_end(bounds):
+    # 页面第一个 star 已晚于 END_DATE
+    return bounds is None or datetime.fromisoformat(bounds[0]) > END_DATE
+
+
+async def process_repo(crawler, repo_name):
     parts = repo_name.split('/')
     if len(parts) != 2:
         print(f"⚠️  跳过无效项目格式: {repo_name}")
@@ -205,101 +223,223 @@ def process_repo(crawler, repo_name):
         print(f"[{repo_name}] 已完成，跳过")
         return True
     
-    last_page = checkpoint.get("last_page", 0)
-    daily_stars = defaultdict(int, checkpoint.get("daily_stars", {}))
+    if "page_bounds" not in checkpoint:
+        # 旧格式没有页面边界信息，无法按页续传
+        if checkpoint.get("last_page") or checkpoint.get("page_count"):
+            print(f"[{repo_name}] 旧格式断点，重新爬取")
+        checkpoint = new_checkpoint()
     
-    print(f"[{repo_name}] 开始爬取，从第 {last_page + 1} 页继续...")
+    state = {key: checkpoint.get(key, value) for key, value in new_checkpoint().items() if key != "completed"}
+    page_data = state["page_data"]
+    bounds = state["page_bounds"]
     
-    page = last_page + 1
-    total_stars = 0
-    stars_in_range = 0
+    # 上次的最后一页可能不满，期间新增的star会追加到这一页，需要重新探测和爬取
+    old_last = str(state["page_count"])
+    page_data.pop(old_last, None)
+    bounds.pop(old_last, None)
     
-    pbar = tqdm(desc=f"[{repo_name}]", unit=" pages", initial=last_page)
+    fetched = {}
+    
+    async def fetch(page):
+        data, headers = await get_stargazers_page(crawler, owner, repo, page=page, per_page=PER_PAGE)
+        state["api_calls"] += 1
+        if data is not None:
+            fetched[page] = data
+            bounds[str(page)] = page_bounds(data)
+        return data, headers
+    
+    async def probe(page):
+        if str(page) not in bounds:
+            data, _ = await fetch(page)
+            if data is None:
+                raise RuntimeError(f"第 {page} 页获取失败")
+        return bounds[str(page)]
+    
+    calls_before = state["api_calls"]
+    pbar = None
+    
+    def handle_page(page, data):
+        page_data[str(page)] = count_page(data)
+        pbar.update(1)
+        if len(page_data) % 10 == 0:
+            write_checkpoint(repo_name, build_checkpoint(state))
     
     try:
-        while True:
-            data, headers = crawler.get_stargazers_page(owner, repo, page=page, per_page=100)
-            
-            if data is None or len(data) == 0:
-                break
-            
-            for star_info in data:
-                total_stars += 1
-                
-                starred_at_str = star_info.get('starred_at')
-                if not starred_at_str:
-                    continue
-                
-                try:
-                    starred_at = datetime.fromisoformat(starred_at_str.replace('Z', '+00:00'))
-                except:
-                    continue
-                
-                if START_DATE <= starred_at <= END_DATE:
-                    date_str = starred_at.strftime("%Y-%m-%d")
-                    daily_stars[date_str] += 1
-                    stars_in_range += 1
-            
-            pbar.update(1)
-            
-            link_header = headers.get('Link', '') if headers else ''
-            if 'rel="next"' not in link_header:
-                break
-            
-            if page % 10 == 0:
-                checkpoint_data = {
-                    "last_page": page,
-                    "daily_stars": dict(daily_stars),
-                    "completed": False
-                }
-                write_checkpoint(repo_name, checkpoint_data)
-            
-            page += 1
-            
-            time.sleep(0.1)
+        # 第一页给出总页数（rel="last"），最后一页给出总star数
+        data, headers = await fetch(1)
+        if data is None:
+            # 请求失败（重试后仍为 None）与空列表不同：不能按 0 页记为完成，保留任务下次运行重试
+            print(f"[{repo_name}] 第 1 页获取失败，下次运行重试")
+            return False
+        page_count = (link_page(headers, 'last') or 1) if data else 0
+        state["page_count"] = page_count
+        if page_count:
+            if page_count not in fetched:
+                data, _ = await fetch(page_count)
+                if data is None:
+                    raise RuntimeError(f"第 {page_count} 页获取失败")
+            state["last_page_total"] = len(fetched[page_count])
         
+        # 二分查找与 [START_DATE, END_DATE] 重叠的页码区间
+        lo = await bisect_pages(1, page_count, probe, reaches_start)
+        hi = await bisect_pages(lo, page_count, probe, passes_end) - 1
+        state["window"] = [lo, hi]
+        
+        window = range(lo, hi + 1)
+        for page in [p for p in page_data if not lo <= int(p) <= hi]:
+            del page_data[page]
+        done = {int(p) for p in page_data}
+        print(f"[{repo_name}] 共 {page_count} 页，时间范围内: 第 {lo}~{hi} 页，已完成 {len(done & set(window))} 页")
+        
+        pbar = tqdm(desc=f"[{repo_name}]", unit=" pages", total=len(window), initial=len(done & set(window)))
+        for page in window:
+            if page in fetched and page not in done:
+                handle_page(page, fetched[page])
+        remaining = [page for page in window if str(page) not in page_data]
+        failed = await fetch_pages(remaining, fetch, handle_page, concurrency=crawler.max_concurrency)
         pbar.close()
         
-        save_result(repo_name, dict(daily_stars), total_stars)
+        if failed:
+            write_checkpoint(repo_name, build_checkpoint(state))
+            print(f"[{repo_name}] {len(failed)} 页获取失败，下次运行继续: {failed[:10]}")
+            return False
         
-        checkpoint_data = {
-            "last_page": page,
-            "daily_stars": dict(daily_stars),
-            "completed": True
-        }
+        checkpoint_data = build_checkpoint(state, completed=True)
+        save_result(repo_name, checkpoint_data["daily_stars"], checkpoint_data["total_stars"])
         write_checkpoint(repo_name, checkpoint_data)
         
-        print(f"[{repo_name}] 完成! 总star: {total_stars}, 范围内: {stars_in_range}")
+        calls = state["api_calls"] - calls_before
+        print(f"[{repo_name}] 完成! 总star: {checkpoint_data['total_stars']}, "
+              f"范围内: {sum(checkpoint_data['daily_stars'].values())} | "
+              f"API调用: {calls}/{page_count} 页，节省 {max(page_count - calls, 0)} 次")
         return True
         
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print(f"\n[{repo_name}] 用户中断，保存进度...")
-        checkpoint_data = {
-            "last_page": page - 1,
-            "daily_stars": dict(daily_stars),
-            "completed": False
-        }
-        write_checkpoint(repo_name, checkpoint_data)
+        write_checkpoint(repo_name, build_checkpoint(state))
         raise
     except Exception as e:
         print(f"\n[{repo_name}] 错误: {e}")
-        checkpoint_data = {
-            "last_page": page - 1,
-            "daily_stars": dict(daily_stars),
-            "completed": False
-        }
-        write_checkpoint(repo_name, checkpoint_data)
+        write_checkpoint(repo_name, build_checkpoint(state))
         return False
 
+async def refresh_repo(crawler, repo_name, output):
+    """增量模式：二分定位水位所在页，只爬之后的页面，合并到已有的每日统计"""
+    owner, repo = repo_name.split('/')
+    since = since_day(output_watermark(output))
+    until = datetime.now(timezone.utc)
+    fetched = {}
+    
+    async def fetch(page):
+        data, headers = await get_stargazers_page(crawler, owner, repo, page=page, per_page=PER_PAGE)
+        if data is not None:
+            fetched[page] = data
+        return data, headers
+    
+    async def probe(page):
+        if page not in fetched:
+            data, _ = await fetch(page)
+            if data is None:
+                raise RuntimeError(f"第 {page} 页获取失败")
+        return page_bounds(fetched[page])
+    
+    try:
+        data, headers = await fetch(1)
+        if data is None:
+            raise RuntimeError("第 1 页获取失败")
+        page_count = (link_page(headers, 'last') or 1) if data else 0
+        lo = await bisect_pages(1, page_count, probe, lambda bounds: reaches_start(bounds, since))
+        pages = list(range(lo, page_count + 1))
+        failed = await fetch_pages([p for p in pages if p not in fetched], fetch,
+                                   lambda page, data: None, concurrency=crawler.max_concurrency)
+        if failed:
+            print(f"[{repo_name}] 增量: {len(failed)} 页获取失败，下次运行重试: {failed[:10]}")
+            return False
+        
+        daily_new = defaultdict(int)
+        for page in pages:
+            for date_str, count in count_page(fetched[page], since, until).items():
+                daily_new[date_str] += count
+        daily_stars = merge_daily(output.get("daily_stars", {}), daily_new, since)
+        total_stars = (page_count - 1) * PER_PAGE + len(fetched[page_count]) if page_count else 0
+        save_result(repo_name, daily_stars, total_stars, end_date=until, since=since.strftime("%Y-%m-%d"))
+        
+        print(f"[{repo_name}] 增量完成! 自 {since.strftime('%Y-%m-%d')} 新增: {sum(daily_new.values())}, "
+              f"总star: {total_stars} | API调用: {len(fetched)}/{page_count} 页")
+        return True
+    except Exception as e:
+        print(f"\n[{repo_name}] 增量错误: {e}")
+        return False
+
+async def crawl_projects(projects):
+    """并发爬取多个项目，返回 (成功数, 跳过数, 失败数)"""
+    success_count = 0
+    error_count = 0
+    skipped_count = 0
+    
+    async with AsyncGitHubCrawler(TOKENS) as crawler:
+        remaining = (await crawler.get_rate_limit_info())['core_remaining']
+        print(f"📊 当前Token剩余请求次数: {remaining}")
+        print(f"\n🚀 开始爬取...\n")
+        
+        queue = open_queue()
+        queue.enqueue(projects, JOB_TYPE)
+        if INCREMENTAL:
+            queue.reopen(projects, JOB_TYPE, REFRESH_INTERVAL.total_seconds())
+        for repo_name, status in queue.statuses(projects, JOB_TYPE).items():
+            if status == DONE:
+                print(f"  ✓ {repo_name} 已完成，跳过")
+                skipped_count += 1
+        scheduled = schedule(queue, projects, [JOB_TYPE],
+                             lambda repo_name, _: open_sinks().load_series("stars", repo_name, get_output_path(repo_name)))
+        budget = crawler_budget(crawler)
+        
+        async def work(repo_name, data_type):
+            output = open_sinks().load_series("stars", repo_name, get_output_path(repo_name)) if INCREMENTAL else None
+            if output is not None and output_watermark(output) is not None:
+                return await refresh_repo(crawler, repo_name, output)
+            return await process_repo(crawler, repo_name)
+        
+        results = await run_jobs(queue, [JOB_TYPE], scheduled, work, DEFAULT_REPO_CONCURRENCY,
+                                 stop=budget and budget.exhausted)
+        for repo_name, _, result in results:
+            if result is True:
+                success_count += 1
+            else:
+                if isinstance(result, Exception):
+                    print(f"  ❌ {repo_name} 错误: {result}")
+                error_count += 1
+        
+        stats = crawler.stats.summary()
+        print(f"\n📈 请求数: {stats['requests']}, 页数: {stats['pages']}, "
+              f"耗时: {stats['seconds']} 秒, 吞吐: {stats['pages_per_sec']} 页/秒")
+        waits = stats['waits']
+        print(f"⏱️ 累计请求耗时: {stats['fetch_seconds']} 秒, 等待: {stats['wait_seconds']} 秒 "
+              f"(退避 {waits['backoff']} / 节奏 {waits['pacing']} / 额度 {waits['budget']})")
+        if crawler.cache is not None:
+            print(f"🗄️ 缓存命中: {stats['cache_hits']}, 未命中: {stats['cache_misses']}, "
+                  f"命中率: {stats['cache_hit_rate']:.1%}")
+        if budget is not None:
+            print(f"💰 API 预算: 已用 {budget.spent}/{budget.limit}")
+        print(f"🗂️ 任务队列: {queue.summary([JOB_TYPE])}")
+    
+    return success_count, skipped_count, error_count
+
 def main():
+    global TOKENS
+    shard = pop_shard_arg(sys.argv)
+    TOKENS = shard_tokens(TOKENS, shard)
     print("=" * 60)
     print("⭐ GitHub Star数据爬虫 (每日统计)")
     print("=" * 60)
     print(f"\n📁 项目列表: {PROJECT_LIST_FILE}")
     print(f"📁 数据目录: {STAR_DIR}")
-    print(f"📁 断点目录: {CHECKPOINT_DIR}")
+    print(f"📁 任务队列: {JOB_DB_FILE}")
+    print(f"📤 输出: {', '.join(SINK_NAMES)}")
     print(f"🔑 Token数量: {len(TOKENS)}")
     print(f"📅 时间范围: {START_DATE.strftime('%Y-%m-%d')} ~ {END_DATE.strftime('%Y-%m-%d')}")
+    if INCREMENTAL:
+        print(f"🔁 增量模式: 已有输出的项目从上次水位爬到现在")
     
     ensure_dirs()
     
@@ -307,6 +447,9 @@ def main():
         projects = [sys.argv[1]]
     else:
         projects = get_projects()
+    projects = shard_projects(projects, shard)
+    if shard:
+        print(describe(shard, projects, TOKENS))
     
     if not projects:
         print("❌ 未找到项目列表")
@@ -314,39 +457,11 @@ def main():
     
     print(f"\n📋 找到 {len(projects)} 个项目")
     
-    crawler = GitHubCrawler(TOKENS)
-    
-    remaining, reset = crawler.get_rate_limit_info()
-    print(f"📊 当前Token剩余请求次数: {remaining}")
-    
-    print(f"\n🚀 开始爬取...\n")
-    
-    success_count = 0
-    error_count = 0
-    skipped_count = 0
-    
-    for i, repo_name in enumerate(projects):
-        print(f"\n[{i+1}/{len(projects)}] 处理: {repo_name}")
-        
-        checkpoint = read_checkpoint(repo_name)
-        if checkpoint.get("completed", False):
-            print(f"  ✓ 已完成，跳过")
-            skipped_count += 1
-            continue
-        
-        try:
-            success = process_repo(crawler, repo_name)
-            if success:
-                success_count += 1
-            else:
-                error_count += 1
-        except KeyboardInterrupt:
-            print("\n\n⚠️  用户中断!")
-            break
-        except Exception as e:
-            print(f"  ❌ 错误: {e}")
-            error_count += 1
-            crawler.switch_token()
+    try:
+        success_count, skipped_count, error_count = asyncio.run(crawl_projects(projects))
+    except KeyboardInterrupt:
+        print("\n\n⚠️  用户中断!")
+        return
     
     print("\n" + "=" * 60)
     print("📊 爬取统计")
@@ -0,0 +1,873 @@
+"""
+本地模拟 GitHub API，用于爬虫吞吐量基准测试和限流处理测试（无需真实 Token）
+数据按项目名确定性生成，支持:
+    REST     /repos/{o}/{r}、stargazers / forks / commits / pulls / issues / issues/comments /
+             issues/{n}/comments / stats/commit_activity、/search/issues、/rate_limit
+    GraphQL  默认分支 history(since, until){ totalCount }、仓库计数（repository 别名）和 search issueCount
+返回 Link 分页头、ETag（支持 If-None-Match 304）和按 Token + 资源（core / search / graphql）计数的 X-RateLimit-* 头，
+可设置每个请求的模拟延迟
+
+限流与异常模拟（默认关闭）:
+    --secondary-limit N   同一 Token 同时进行中的请求超过 N 个时返回 403 二级限流（带 Retry-After），
+                          冷却期内该 Token 的请求都返回 403
+    --stats-pending N     每个项目的 stats/* 前 N 次请求返回 202（统计生成中）
+
+录制 / 回放（fixture 为 JSON 文件，按 方法 + 路径 + 查询参数 索引响应）:
+    --record FILE --upstream https://api.github.com   转发到真实 API 并录制响应（退出时写入，可多次追加录制）
+    --replay FILE                                     用录制的响应代替生成数据，延迟、限流头和二级限流照常模拟
+
+运行方式:
+    python fake_github.py                       # 监听 127.0.0.1:8090，每个请求延迟 50ms
+    python fake_github.py --port 8090 --latency 100 --stars 20000
+    python fake_github.py --secondary-limit 20 --retry-after 5 --stats-pending 2
+    GITHUB_API_URL=http://127.0.0.1:8090 python crawl_stars.py facebook/react
+    各爬虫的基准测试见 bench_crawl.py
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlparse
+
+HISTORY_START = datetime(2015, 1, 1, tzinfo=timezone.utc)
+HISTORY_END = datetime(2024, 1, 1, tzinfo=timezone.utc)
+RATE_LIMIT = 5000
+RATE_WINDOW = 3600
+SEARCH_LIMIT = 30
+SEARCH_WINDOW = 60
+# 与 GitHub 一致，search 最多只能翻到前 1000 条结果（total_count 仍为实际数量）
+SEARCH_RESULT_CAP = 1000
+RETRY_AFTER = 60
+
+# 录制时转发给上游的请求头 / 保存的响应头
+FORWARDED_HEADERS = ('Authorization', 'Accept', 'Content-Type', 'User-Agent', 'X-GitHub-Api-Version')
+RECORDED_HEADERS = ('link', 'retry-after', 'x-ratelimit-limit', 'x-ratelimit-remaining',
+                    'x-ratelimit-reset', 'x-ratelimit-resource')
+
+SECONDARY_MESSAGE = ("You have exceeded a secondary rate limit. "
+                     "Please wait a few minutes before you try again.")
+
+
+GRAPHQL_REPO = re.compile(r'repository\(owner:\s*"([^"]+)",\s*name:\s*"([^"]+)"\)')
+GRAPHQL_REPO_ALIAS = re.compile(r'(\w+):\s*repository\(owner:\s*"([^"]+)",\s*name:\s*"([^"]+)"\)')
+GRAPHQL_SEARCH = re.compile(r'(\w+):\s*search\(query:\s*"((?:[^"\\]|\\.)*)"')
+GRAPHQL_HISTORY = re.compile(r'(\w+):\s*history\([^)]*since:\s*"([^"]+)",\s*until:\s*"([^"]+)"\)')
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _parse_iso(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _seed(text: str) -> int:
+    return int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+
+
+def _parse_day(value: str, end: bool = False) -> datetime:
+    """search 的日期：YYYY-MM-DD（end=True 取当天最后时刻）或完整的 ISO 时间"""
+    if 'T' in value:
+        return _parse_iso(value)
+    day = datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    return day + timedelta(days=1, microseconds=-1) if end else day
+
+
+def _parse_range(value: str) -> Tuple[datetime, datetime]:
+    """search 的时间限定词：a..b、a..*、*..b、>=a、>a、<=b、<b 或单日"""
+    lo = datetime.min.replace(tzinfo=timezone.utc)
+    hi = datetime.max.replace(tzinfo=timezone.utc)
+    if '..' in value:
+        a, b = value.split('..', 1)
+        return (lo if a in ('', '*') else _parse_day(a),
+                hi if b in ('', '*') else _parse_day(b, end=True))
+    if value.startswith('>='):
+        return _parse_day(value[2:]), hi
+    if value.startswith('>'):
+        return _parse_day(value[1:], end=True) + timedelta(microseconds=1), hi
+    if value.startswith('<='):
+        return lo, _parse_day(value[2:], end=True)
+    if value.startswith('<'):
+        return lo, _parse_day(value[1:]) - timedelta(microseconds=1)
+    return _parse_day(value), _parse_day(value, end=True)
+
+
+def _resource(path: str) -> str:
+    if path.startswith('/search/'):
+        return 'search'
+    if path.rstrip('/') == '/graphql':
+        return 'graphql'
+    return 'core'
+
+
+class FakeDataset:
+    """按项目名确定性生成的事件时间序列（升序），生成后缓存"""
+
+    def __init__(self, stars: int = 5000, forks: int = 1000, commits: int = 3000, pulls: int = 1500,
+                 issues: int = 2000, comments: int = 4000):
+        self.sizes = {'stars': stars, 'forks': forks, 'commits': commits, 'pulls': pulls,
+                      'issues': issues, 'comments': comments}
+        self._cache: Dict[Tuple[str, str], list] = {}
+        self._lock = threading.RLock()
+
+    def times(self, repo: str, kind: str) -> List[datetime]:
+        key = (repo, kind)
+        with self._lock:
+            if key not in self._cache:
+                rng = random.Random(_seed(f"{repo}:{kind}"))
+                # 数量在基准值 50%~150% 之间浮动，时间向近期倾斜
+                n = int(self.sizes[kind] * rng.uniform(0.5, 1.5))
+                span = (HISTORY_END - HISTORY_START).total_seconds()
+                self._cache[key] = sorted(
+                    HISTORY_START + timedelta(seconds=span * (rng.random() ** 0.5)) for _ in range(n)
+                )
+            return self._cache[key]
+
+    def issues(self, repo: str) -> List[Dict]:
+        """issue 与 PR（与 GitHub 一样共用编号，按创建时间编号），含更新 / 关闭时间和评论数"""
+        with self._lock:
+            if (repo, 'issue_items') not in self._cache:
+                self._build_issues(repo)
+            return self._cache[(repo, 'issue_items')]
+
+    def comments(self, repo: str) -> List[Dict]:
+        """评论（按创建时间升序），每条属于创建时间在它之前的某个 issue / PR"""
+        with self._lock:
+            if (repo, 'comment_items') not in self._cache:
+                self._build_issues(repo)
+            return self._cache[(repo, 'comment_items')]
+
+    def _build_issues(self, repo: str):
+        rng = random.Random(_seed(f"{repo}:issue_items"))
+        merged = sorted([(t, False) for t in self.times(repo, 'issues')] +
+                        [(t, True) for t in self.times(repo, 'pulls')])
+        issues = []
+        for number, (created, is_pr) in enumerate(merged, 1):
+            closed = None
+            if rng.random() < 0.8:
+                closed = min(created + timedelta(days=rng.expovariate(1 / 7)), HISTORY_END)
+            issues.append({"number": number, "created": created, "updated": closed or created,
+                           "closed": closed, "is_pr": is_pr, "comments": 0})
+
+        created_times = [x['created'] for x in issues]
+        base_id = _seed(repo) % 100000 * 100000
+        comments = []
+        for i, created in enumerate(self.times(repo, 'comments')):
+            k = bisect.bisect_right(created_times, created)
+            if k == 0:
+                continue
+            issue = issues[rng.randrange(k)]
+            # 约 10% 的评论之后被编辑过
+            updated = created + timedelta(hours=rng.expovariate(1)) if rng.random() < 0.1 else created
+            issue['comments'] += 1
+            issue['updated'] = max(issue['updated'], updated)
+            comments.append({"id": base_id + i, "number": issue['number'], "created": created, "updated": updated})
+
+        self._cache[(repo, 'issue_items')] = issues
+        self._cache[(repo, 'comment_items')] = comments
+
+
+class RateLimiter:
+    """按 Authorization 头计数的额度，窗口到期自动重置"""
+
+    def __init__(self, limit: int = RATE_LIMIT, window: int = RATE_WINDOW):
+        self.limit = limit
+        self.window = window
+        self._state: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def consume(self, token: str, cost: int = 1) -> Tuple[int, int]:
+        """消耗额度，返回 (剩余, 重置时间)；cost=0 只查询"""
+        now = time.time()
+        with self._lock:
+            used, reset = self._state.get(token, (0, now + self.window))
+            if now >= reset:
+                used, reset = 0, now + self.window
+            used = max(min(used + cost, self.limit), 0)
+            self._state[token] = [used, reset]
+            return self.limit - used, int(reset)
+
+
+class FixtureStore:
+    """
+    录制 / 回放的响应: {"upstream": 上游地址, "responses": {键: {status, headers, body}}}
+    键为 方法 + 路径 + 排序后的查询参数，POST 再加请求体摘要；回放时 Link 中的上游地址替换为本地地址
+    """
+
+    def __init__(self, path: str, upstream: Optional[str] = None):
+        self.path = path
+        self.recording = upstream is not None
+        self.upstream = upstream.rstrip('/') if upstream else 'https://api.github.com'
+        self.responses: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.responses = data.get('responses', {})
+            if not self.recording:
+                self.upstream = data.get('upstream', self.upstream)
+        elif not self.recording:
+            raise FileNotFoundError(path)
+
+    @staticmethod
+    def key(method: str, path: str, body: bytes = b'') -> str:
+        parsed = urlparse(path)
+        query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+        key = f"{method} {parsed.path.rstrip('/') or '/'}?{query}"
+        if body:
+            key += ' ' + hashlib.sha1(body).hexdigest()[:16]
+        return key
+
+    def lookup(self, method: str, path: str, body: bytes = b'') -> Optional[Dict]:
+        return self.responses.get(self.key(method, path, body))
+
+    def fetch(self, method: str, path: str, body: bytes, headers: Dict[str, str]) -> Dict:
+        """转发到上游并录制（网络错误返回 502，不录制）"""
+        request = urllib.request.Request(self.upstream + path, data=body or None, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                status, raw, response_headers = response.status, response.read(), response.headers
+        except urllib.error.HTTPError as e:
+            status, raw, response_headers = e.code, e.read(), e.headers
+        except (urllib.error.URLError, OSError) as e:
+            return {"status": 502, "headers": {}, "body": {"message": f"upstream error: {e}"}}
+        try:
+            payload = json.loads(raw) if raw else None
+        except ValueError:
+            payload = raw.decode('utf-8', 'replace')
+        entry = {
+            "status": status,
+            "headers": {k: v for k, v in response_headers.items() if k.lower() in RECORDED_HEADERS},
+            "body": payload
+        }
+        with self._lock:
+            self.responses[self.key(method, path, body)] = entry
+            checkpoint = len(self.responses) % 100 == 0
+        if checkpoint:
+            self.save()
+        return entry
+
+    def save(self):
+        """录制模式下写入 fixture 文件（先写临时文件再替换）"""
+        if not self.recording:
+            return
+        with self._lock:
+            data = {"upstream": self.upstream, "responses": dict(self.responses)}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+def _page_slice(items: list, query: Dict[str, str]) -> Tuple[list, int, int]:
+    per_page = min(int(query.get('per_page', 30)), 100)
+    page = max(int(query.get('page', 1)), 1)
+    last = max((len(items) + per_page - 1) // per_page, 1)
+    return items[(page - 1) * per_page:page * per_page], page, last
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    server_version = "FakeGitHub/1.0"
+    protocol_version = "HTTP/1.1"
+
+    # 本次请求消耗的额度 (限流器, 计数键, 资源)，304 时退还
+    _charged = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _token(self) -> str:
+        return self.headers.get('Authorization', 'anonymous')
+
+    # ---------- 响应 ----------
+
+    def _send(self, status: int, body, headers: Optional[Dict[str, str]] = None):
+        payload = json.dumps(body).encode('utf-8')
+        headers = dict(headers or {})
+        if status == 200 and (isinstance(body, list) or (isinstance(body, dict) and 'items' in body)):
+            self.server.count('pages')
+        if status == 200:
+            etag = f'W/"{hashlib.md5(payload).hexdigest()}"'
+            headers['ETag'] = etag
+            if self.headers.get('If-None-Match') == etag:
+                # 与 GitHub 一致，304 不计入额度
+                if self._charged is not None:
+                    limiter, key, resource = self._charged
+                    remaining, _ = limiter.consume(key, cost=-1)
+                    self.server.count(resource, -1)
+                    if 'X-RateLimit-Remaining' in headers:
+                        headers['X-RateLimit-Remaining'] = str(remaining)
+                self.server.count('304')
+                self.send_response(304)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                return
+        self.server.count(str(status))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _link_header(self, path: str, query: Dict[str, str], page: int, last: int) -> str:
+        links = []
+        for rel, target in (('next', page + 1), ('last', last), ('first', 1), ('prev', page - 1)):
+            if rel in ('next', 'last') and page >= last:
+                continue
+            if rel in ('first', 'prev') and page <= 1:
+                continue
+            q = dict(query, page=str(target))
+            links.append(f'<{self.server.base_url}{path}?{urlencode(q)}>; rel="{rel}"')
+        return ', '.join(links)
+
+    def _send_page(self, path: str, query: Dict[str, str], items: list, rate_headers: Dict[str, str], render,
+                   total_count: Optional[int] = None):
+        """分页返回 items；给出 total_count 时按 search 的格式包装"""
+        chunk, page, last = _page_slice(items, query)
+        headers = dict(rate_headers)
+        link = self._link_header(path, query, page, last)
+        if link:
+            headers['Link'] = link
+        body = [render(x) for x in chunk]
+        if total_count is not None:
+            body = {"total_count": total_count, "incomplete_results": False, "items": body}
+        self._send(200, body, headers)
+
+    def _rate_headers(self, resource: str) -> Optional[Dict[str, str]]:
+        """按 Token + 资源计数，额度耗尽时直接返回 403 并返回 None"""
+        limiter = self.server.limiter(resource)
+        token = self._token()
+        key = token if resource == 'core' else f"{token}:{resource}"
+        remaining, reset = limiter.consume(key, cost=0)
+        exhausted = remaining <= 0
+        if not exhausted:
+            remaining, reset = limiter.consume(key)
+            self._charged = (limiter, key, resource)
+            self.server.count(resource)
+        headers = {
+            'X-RateLimit-Limit': str(limiter.limit),
+            'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset': str(reset),
+            'X-RateLimit-Resource': resource
+        }
+        if exhausted:
+            self._send(403, {"message": "API rate limit exceeded"}, headers)
+            return None
+        return headers
+
+    # ---------- 路由 ----------
+
+    def do_GET(self):
+        self._dispatch('GET', b'', self._route_get)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        self._dispatch('POST', body, lambda: self._route_post(body))
+
+    def _dispatch(self, method: str, body: bytes, route):
+        """公共流程：模拟延迟 -> 二级限流 -> 回放录制的响应或生成数据（录制时直接转发）"""
+        server = self.server
+        fixtures = server.fixtures
+        self._charged = None
+        token = self._token()
+        with server.in_flight(token) as active:
+            server.count('requests')
+            if fixtures is not None and fixtures.recording:
+                self._serve_fixture(method, body)
+                return
+            time.sleep(server.latency)
+            wait = server.secondary_wait(token, active)
+            if wait:
+                server.count('secondary_limited')
+                self._send(403, {"message": SECONDARY_MESSAGE,
+                                 "documentation_url": "https://docs.github.com/rest/overview/rate-limits-for-the-rest-api"},
+                           {'Retry-After': str(wait)})
+                return
+            if fixtures is not None and urlparse(self.path).path.rstrip('/') != '/rate_limit':
+                self._serve_fixture(method, body)
+                return
+            route()
+
+    def _serve_fixture(self, method: str, body: bytes):
+        fixtures = self.server.fixtures
+        if fixtures.recording:
+            forwarded = {name: self.headers[name] for name in FORWARDED_HEADERS if self.headers.get(name)}
+            entry = fixtures.fetch(method, self.path, body, forwarded)
+            headers = dict(entry['headers'])
+        else:
+            entry = fixtures.lookup(method, self.path, body)
+            if entry is None:
+                self._send(404, {"message": "Not Found (no recorded fixture)"})
+                return
+            rate_headers = self._rate_headers(_resource(urlparse(self.path).path))
+            if rate_headers is None:
+                return
+            # 限流头以本地模拟为准
+            headers = {k: v for k, v in entry['headers'].items() if not k.lower().startswith('x-ratelimit-')}
+            headers.update(rate_headers)
+        for name in list(headers):
+            if name.lower() == 'link':
+                headers[name] = headers[name].replace(fixtures.upstream, self.server.base_url)
+        self._send(entry['status'], entry['body'], headers)
+
+    def _route_get(self):
+        parsed = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        parts = [p for p in parsed.path.split('/') if p]
+
+        if parts == ['rate_limit']:
+            # 与 GitHub 一致，查询额度本身不消耗额度
+            token = self._token()
+            resources = {}
+            for resource in ('core', 'search', 'graphql'):
+                limiter = self.server.limiter(resource)
+                remaining, reset = limiter.consume(token if resource == 'core' else f"{token}:{resource}", cost=0)
+                resources[resource] = {"limit": limiter.limit, "remaining": remaining, "reset": reset,
+                                       "used": limiter.limit - remaining}
+            self._send(200, {"resources": resources, "rate": resources['core']})
+            return
+
+        rate_headers = self._rate_headers(_resource(parsed.path))
+        if rate_headers is None:
+            return
+
+        if parts == ['search', 'issues']:
+            self._search_issues(parsed.path, query, rate_headers)
+            return
+        if len(parts) < 3 or parts[0] != 'repos' or parts[1] == 'missing':
+            self._send(404, {"message": "Not Found"}, rate_headers)
+            return
+        repo, rest = f"{parts[1]}/{parts[2]}", parts[3:]
+
+        if not rest:
+            self._repo(repo, rate_headers)
+            return
+        if len(rest) == 2 and rest[0] == 'stats':
+            handler = getattr(self, f"_stats_{rest[1]}", None)
+            if handler is not None:
+                if not self.server.stats_ready(repo, rest[1]):
+                    self._send(202, {}, rate_headers)
+                    return
+                handler(repo, rate_headers)
+                return
+        if len(rest) == 1:
+            handler = getattr(self, f"_list_{rest[0]}", None)
+            if handler is not None:
+                handler(parsed.path, query, repo, rate_headers)
+                return
+        if rest == ['issues', 'comments']:
+            self._issue_comments(parsed.path, query, repo, rate_headers)
+            return
+        if len(rest) == 3 and rest[0] == 'issues' and rest[1].isdigit() and rest[2] == 'comments':
+            if 0 < int(rest[1]) <= len(self.server.dataset.issues(repo)):
+                self._issue_comments(parsed.path, query, repo, rate_headers, number=int(rest[1]))
+                return
+        self._send(404, {"message": "Not Found"}, rate_headers)
+
+    def _route_post(self, raw: bytes):
+        body = json.loads(raw or b'{}')
+        if urlparse(self.path).path.strip('/') != 'graphql':
+            self._send(404, {"message": "Not Found"})
+            return
+        rate_headers = self._rate_headers('graphql')
+        if rate_headers is None:
+            return
+        query = body.get('query', '')
+        if not GRAPHQL_HISTORY.search(query):
+            self._graphql_counters(query, rate_headers)
+            return
+        repo_match = GRAPHQL_REPO.search(query)
+        if not repo_match:
+            self._send(200, {"data": None, "errors": [{"message": "unsupported query"}]}, rate_headers)
+            return
+        repo = f"{repo_match.group(1)}/{repo_match.group(2)}"
+        times = self.server.dataset.times(repo, 'commits')
+        target = {}
+        for alias, since, until in GRAPHQL_HISTORY.findall(query):
+            start, end = _parse_iso(since), _parse_iso(until)
+            target[alias] = {"totalCount": sum(1 for t in times if start <= t <= end)}
+        data = {"repository": {"defaultBranchRef": {"target": target}}}
+        self._send(200, {"data": data}, rate_headers)
+
+    # ---------- 数据 ----------
+
+    def _search_matches(self, q: str) -> Tuple[Optional[str], List[Dict]]:
+        """按 search 查询串中的 repo / is / type / state / created / updated / closed 限定词筛选，返回 (项目, issue 和 PR)"""
+        qualifiers: Dict[str, List[str]] = {}
+        for term in q.split():
+            if ':' in term:
+                name, value = term.split(':', 1)
+                qualifiers.setdefault(name, []).append(value)
+        repos = qualifiers.get('repo')
+        if not repos:
+            return None, []
+        items = self.server.dataset.issues(repos[0])
+        for value in qualifiers.get('is', []) + qualifiers.get('type', []) + qualifiers.get('state', []):
+            if value in ('pr', 'pull-request'):
+                items = [x for x in items if x['is_pr']]
+            elif value == 'issue':
+                items = [x for x in items if not x['is_pr']]
+            elif value == 'open':
+                items = [x for x in items if x['closed'] is None]
+            elif value == 'closed':
+                items = [x for x in items if x['closed'] is not None]
+        for field in ('created', 'updated', 'closed'):
+            for value in qualifiers.get(field, []):
+                start, end = _parse_range(value)
+                items = [x for x in items if x[field] is not None and start <= x[field] <= end]
+        return repos[0], items
+
+    def _search_issues(self, path, query, rate_headers):
+        repo, items = self._search_matches(query.get('q', ''))
+        # 默认按相关度排序，这里以创建时间倒序代替
+        field = query.get('sort') if query.get('sort') in ('created', 'updated', 'comments') else 'created'
+        ordered = sorted(items, key=lambda x: (x[field], x['number']), reverse=query.get('order', 'desc') == 'desc')
+        self._send_page(path, query, ordered[:SEARCH_RESULT_CAP], rate_headers,
+                        lambda x: self._render_issue(repo, x), total_count=len(items))
+
+    def _graphql_counters(self, query, rate_headers):
+        """批量 repository 计数 + search issueCount，owner 为 missing 的项目视为不存在"""
+        dataset = self.server.dataset
+        data, errors = {}, []
+        repos = GRAPHQL_REPO_ALIAS.findall(query)
+        for alias, owner, name in repos:
+            repo = f"{owner}/{name}"
+            if owner == 'missing':
+                data[alias] = None
+                errors.append({"type": "NOT_FOUND", "path": [alias],
+                               "message": f"Could not resolve to a Repository with the name '{repo}'."})
+                continue
+            seed = _seed(repo)
+            issues, pulls = len(dataset.times(repo, 'issues')), len(dataset.times(repo, 'pulls'))
+            open_issues, open_prs = issues * (seed % 20) // 100, pulls * (seed % 10) // 100
+            merged = (pulls - open_prs) * 3 // 4
+            data[alias] = {
+                "nameWithOwner": repo,
+                "stargazerCount": len(dataset.times(repo, 'stars')),
+                "forkCount": len(dataset.times(repo, 'forks')),
+                "openIssues": {"totalCount": open_issues},
+                "closedIssues": {"totalCount": issues - open_issues},
+                "openPRs": {"totalCount": open_prs},
+                "closedPRs": {"totalCount": pulls - open_prs - merged},
+                "mergedPRs": {"totalCount": merged},
+                "primaryLanguage": {"name": ["Python", "Go", "TypeScript", "Rust"][seed % 4]},
+                "licenseInfo": {"spdxId": "MIT", "name": "MIT License"},
+                "createdAt": _iso(HISTORY_START),
+                "pushedAt": _iso(HISTORY_END),
+                "isArchived": False
+            }
+        searches = GRAPHQL_SEARCH.findall(query)
+        for alias, search in searches:
+            _, matches = self._search_matches(json.loads(f'"{search}"'))
+            data[alias] = {"issueCount": len(matches)}
+        if 'rateLimit' in query:
+            cost = max(1, round((len(repos) * 5 + len(searches)) / 100))
+            data['rateLimit'] = {"cost": cost, "remaining": int(rate_headers['X-RateLimit-Remaining']),
+                                 "resetAt": _iso(datetime.fromtimestamp(int(rate_headers['X-RateLimit-Reset']), timezone.utc))}
+        payload = {"data": data}
+        if errors:
+            payload["errors"] = errors
+        self._send(200, payload, rate_headers)
+
+    def _repo(self, repo, rate_headers):
+        dataset = self.server.dataset
+        owner, name = repo.split('/')
+        self._send(200, {
+            "id": _seed(repo),
+            "name": name,
+            "full_name": repo,
+            "owner": {"login": owner, "id": _seed(owner)},
+            "private": False,
+            "url": f"{self.server.base_url}/repos/{repo}",
+            "html_url": f"https://github.com/{repo}",
+            "stargazers_count": len(dataset.times(repo, 'stars')),
+            "forks_count": len(dataset.times(repo, 'forks')),
+            "open_issues_count": sum(1 for x in dataset.issues(repo) if x['closed'] is None),
+            "default_branch": "main",
+            "archived": False,
+            "created_at": _iso(HISTORY_START),
+            "pushed_at": _iso(HISTORY_END)
+        }, rate_headers)
+
+    def _stats_commit_activity(self, repo, rate_headers):
+        # 最近 52 周，每周从周日开始按天计数
+        times = self.server.dataset.times(repo, 'commits')
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        sunday = today - timedelta(days=(today.weekday() + 1) % 7)
+        weeks = []
+        for w in range(51, -1, -1):
+            start = sunday - timedelta(weeks=w)
+            days = [sum(1 for t in times if start + timedelta(days=d) <= t < start + timedelta(days=d + 1))
+                    for d in range(7)]
+            weeks.append({"days": days, "total": sum(days), "week": int(start.timestamp())})
+        self._send(200, weeks, rate_headers)
+
+    def _list_stargazers(self, path, query, repo, rate_headers):
+        times = self.server.dataset.times(repo, 'stars')
+        star_json = 'star+json' in self.headers.get('Accept', '')
+
+        def render(item):
+            i, t = item
+            user = {"login": f"user{i}", "id": i}
+            return {"starred_at": _iso(t), "user": user} if star_json else user
+
+        self._send_page(path, query, list(enumerate(times)), rate_headers, render)
+
+    def _list_forks(self, path, query, repo, rate_headers):
+        items = list(enumerate(self.server.dataset.times(repo, 'forks')))
+        if query.get('sort', 'newest') in ('newest', 'stargazers', 'watchers'):
+            items.reverse()
+        self._send_page(path, query, items, rate_headers, lambda x: {
+            "id": x[0], "full_name": f"user{x[0]}/{repo.split('/')[1]}", "created_at": _iso(x[1])
+        })
+
+    def _list_commits(self, path, query, repo, rate_headers):
+        items = list(enumerate(self.server.dataset.times(repo, 'commits')))
+        since, until = query.get('since'), query.get('until')
+        if since:
+            start = _parse_iso(since)
+            items = [x for x in items if x[1] >= start]
+        if until:
+            end = _parse_iso(until)
+            items = [x for x in items if x[1] <= end]
+        items.reverse()  # 新的在前
+        self._send_page(path, query, items, rate_headers, lambda x: {
+            "sha": hashlib.sha1(f"{repo}{x[0]}".encode()).hexdigest(),
+            "commit": {"committer": {"date": _iso(x[1])}, "author": {"date": _iso(x[1])}}
+        })
+
+    def _list_pulls(self, path, query, repo, rate_headers):
+        items = [x for x in self._filter_state(self.server.dataset.issues(repo), query) if x['is_pr']]
+        if query.get('direction', 'desc') == 'desc':
+            items.reverse()
+        self._send_page(path, query, items, rate_headers, lambda x: {
+            "number": x['number'],
+            "state": "closed" if x['closed'] else "open",
+            "created_at": _iso(x['created']),
+            "updated_at": _iso(x['updated']),
+            "closed_at": _iso(x['closed']) if x['closed'] else None
+        })
+
+    def _list_issues(self, path, query, repo, rate_headers):
+        items = self._filter_state(self.server.dataset.issues(repo), query)
+        if query.get('since'):
+            start = _parse_iso(query['since'])
+            items = [x for x in items if x['updated'] >= start]
+        field = query.get('sort') if query.get('sort') in ('created', 'updated', 'comments') else 'created'
+        items = sorted(items, key=lambda x: (x[field], x['number']), reverse=query.get('direction', 'desc') == 'desc')
+        self._send_page(path, query, items, rate_headers, lambda x: self._render_issue(repo, x))
+
+    def _issue_comments(self, path, query, repo, rate_headers, number: Optional[int] = None):
+        """仓库全部评论（/issues/comments，可按 created / updated 排序）或单个 issue 的评论（按创建时间升序）"""
+        items = self.server.dataset.comments(repo)
+        if number is not None:
+            items = [c for c in items if c['number'] == number]
+        if query.get('since'):
+            start = _parse_iso(query['since'])
+            items = [c for c in items if c['updated'] >= start]
+        if number is None:
+            field = 'updated' if query.get('sort') == 'updated' else 'created'
+            items = sorted(items, key=lambda c: (c[field], c['id']), reverse=query.get('direction', 'asc') == 'desc')
+        self._send_page(path, query, items, rate_headers, lambda c: self._render_comment(repo, c))
+
+    @staticmethod
+    def _filter_state(items: List[Dict], query: Dict[str, str]) -> List[Dict]:
+        state = query.get('state', 'open')
+        if state == 'all':
+            return list(items)
+        return [x for x in items if (x['closed'] is None) == (state == 'open')]
+
+    def _render_issue(self, repo: str, item: Dict) -> Dict:
+        number = item['number']
+        url = f"{self.server.base_url}/repos/{repo}/issues/{number}"
+        kind = 'pull' if item['is_pr'] else 'issues'
+        user = number % 97
+        issue = {
+            "id": _seed(repo) % 100000 * 100000 + number,
+            "number": number,
+            "url": url,
+            "comments_url": f"{url}/comments",
+            "html_url": f"https://github.com/{repo}/{kind}/{number}",
+            "title": f"{'PR' if item['is_pr'] else 'Issue'} #{number}",
+            "body": f"Synthetic {'pull request' if item['is_pr'] else 'issue'} {number} of {repo}",
+            "state": "closed" if item['closed'] else "open",
+            "user": {"login": f"user{user}", "id": user},
+            "labels": [],
+            "comments": item['comments'],
+            "author_association": "NONE",
+            "created_at": _iso(item['created']),
+            "updated_at": _iso(item['updated']),
+            "closed_at": _iso(item['closed']) if item['closed'] else None
+        }
+        if item['is_pr']:
+            issue["pull_request"] = {"url": f"{self.server.base_url}/repos/{repo}/pulls/{number}"}
+        return issue
+
+    def _render_comment(self, repo: str, comment: Dict) -> Dict:
+        api = f"{self.server.base_url}/repos/{repo}"
+        user = comment['id'] % 89
+        return {
+            "id": comment['id'],
+            "url": f"{api}/issues/comments/{comment['id']}",
+            "html_url": f"https://github.com/{repo}/issues/{comment['number']}#issuecomment-{comment['id']}",
+            "issue_url": f"{api}/issues/{comment['number']}",
+            "body": f"Synthetic comment {comment['id']}",
+            "user": {"login": f"user{user}", "id": user},
+            "author_association": "NONE",
+            "created_at": _iso(comment['created']),
+            "updated_at": _iso(comment['updated'])
+        }
+
+
+class FakeGitHubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.05,
+                 dataset: Optional[FakeDataset] = None, rate_limit: int = RATE_LIMIT,
+                 rate_window: int = RATE_WINDOW, search_limit: int = SEARCH_LIMIT,
+                 secondary_limit: int = 0, retry_after: int = RETRY_AFTER, stats_pending: int = 0,
+                 fixtures: Optional[FixtureStore] = None):
+        super().__init__((host, port), FakeGitHubHandler)
+        self.latency = latency
+        self.dataset = dataset or FakeDataset()
+        self.rate = RateLimiter(rate_limit, rate_window)
+        self.search_rate = RateLimiter(search_limit, SEARCH_WINDOW)
+        self.secondary_limit = secondary_limit
+        self.retry_after = retry_after
+        self.stats_pending = stats_pending
+        self.fixtures = fixtures
+        self.base_url = f"http://{host}:{self.server_address[1]}"
+        # 请求计数：requests、各状态码、pages（列表页）、secondary_limited、core / search / graphql（实际消耗的额度）
+        self.counters: Counter = Counter()
+        self._state_lock = threading.Lock()
+        self._active: Counter = Counter()
+        self._blocked: Dict[str, float] = {}
+        self._stats_requests: Counter = Counter()
+
+    def limiter(self, resource: str) -> RateLimiter:
+        # graphql 与 core 额度相同，按 Token:graphql 单独计数
+        return self.search_rate if resource == 'search' else self.rate
+
+    def count(self, key: str, n: int = 1):
+        with self._state_lock:
+            self.counters[key] += n
+
+    def reset_counters(self) -> Dict[str, int]:
+        """返回并清零请求计数"""
+        with self._state_lock:
+            counters = dict(self.counters)
+            self.counters.clear()
+        return counters
+
+    @contextmanager
+    def in_flight(self, token: str):
+        """记录 Token 同时进行中的请求数（含本次）"""
+        with self._state_lock:
+            self._active[token] += 1
+            active = self._active[token]
+        try:
+            yield active
+        finally:
+            with self._state_lock:
+                self._active[token] -= 1
+
+    def secondary_wait(self, token: str, active: int) -> int:
+        """二级限流：返回需要等待的秒数，0 表示放行；超过并发上限后该 Token 冷却 retry_after 秒"""
+        if not self.secondary_limit:
+            return 0
+        now = time.time()
+        with self._state_lock:
+            until = self._blocked.get(token, 0)
+            if until <= now and active > self.secondary_limit:
+                until = self._blocked[token] = now + self.retry_after
+        return max(math.ceil(until - now), 0)
+
+    def stats_ready(self, repo: str, kind: str) -> bool:
+        """stats/* 的前 stats_pending 次请求视为统计生成中"""
+        with self._state_lock:
+            self._stats_requests[(repo, kind)] += 1
+            return self._stats_requests[(repo, kind)] > self.stats_pending
+
+    def shutdown(self):
+        super().shutdown()
+        if self.fixtures is not None:
+            self.fixtures.save()
+
+
+def start_server(**kwargs) -> FakeGitHubServer:
+    """在后台线程启动模拟服务（port=0 自动分配端口），返回 server，用完调用 server.shutdown()"""
+    server = FakeGitHubServer(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟 GitHub API')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=float, default=50, help='每个请求的模拟延迟（毫秒）')
+    parser.add_argument('--stars', type=int, default=5000, help='每个项目的平均 star 数')
+    parser.add_argument('--forks', type=int, default=1000, help='每个项目的平均 fork 数')
+    parser.add_argument('--commits', type=int, default=3000, help='每个项目的平均 commit 数')
+    parser.add_argument('--pulls', type=int, default=1500, help='每个项目的平均 PR 数')
+    parser.add_argument('--issues', type=int, default=2000, help='每个项目的平均 issue 数')
+    parser.add_argument('--comments', type=int, default=4000, help='每个项目的平均评论数')
+    parser.add_argument('--rate-limit', type=int, default=RATE_LIMIT, help='每个 Token 每小时的 core 额度')
+    parser.add_argument('--secondary-limit', type=int, default=0,
+                        help='同一 Token 同时进行中的请求上限，超过返回 403 二级限流（0 不限制）')
+    parser.add_argument('--retry-after', type=int, default=RETRY_AFTER, help='二级限流的冷却时间（秒）')
+    parser.add_argument('--stats-pending', type=int, default=0, help='每个项目 stats/* 的前 N 次请求返回 202')
+    parser.add_argument('--record', metavar='FILE', help='转发到 --upstream 并把响应录制到 FILE')
+    parser.add_argument('--upstream', default='https://api.github.com', help='录制时的上游 API 地址')
+    parser.add_argument('--replay', metavar='FILE', help='回放 FILE 中录制的响应')
+    args = parser.parse_args()
+    if args.record and args.replay:
+        parser.error('--record 与 --replay 不能同时使用')
+
+    fixtures = None
+    if args.record:
+        fixtures = FixtureStore(args.record, upstream=args.upstream)
+    elif args.replay:
+        fixtures = FixtureStore(args.replay)
+
+    dataset = FakeDataset(args.stars, args.forks, args.commits, args.pulls, args.issues, args.comments)
+    server = FakeGitHubServer(port=args.port, latency=args.latency / 1000, dataset=dataset,
+                              rate_limit=args.rate_limit, secondary_limit=args.secondary_limit,
+                              retry_after=args.retry_after, stats_pending=args.stats_pending, fixtures=fixtures)
+    print(f"模拟 GitHub API: {server.base_url} (延迟 {args.latency:.0f}ms)")
+    if args.record:
+        print(f"录制: {args.upstream} -> {args.record}")
+    elif args.replay:
+        print(f"回放: {args.replay} ({len(fixtures.responses)} 个响应)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if fixtures is not None:
+            fixtures.save()
+        print(f"请求统计: {dict(server.counters)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,441 @@
+"""
+GitHub 爬虫公共内核（asyncio + httpx）
+所有爬虫脚本共用：多 Token、连接复用、跨项目/跨页面并发，
+同时进行中的请求数受 Token 剩余额度约束（见 token_pool.py），额度耗尽时才等待
+
+用法:
+    from github_core import AsyncGitHubCrawler, run_concurrently
+
+    async with AsyncGitHubCrawler(TOKENS) as crawler:
+        data, headers = await crawler.get(f"/repos/{owner}/{repo}/stargazers", {"page": 1})
+
+环境变量:
+    GITHUB_API_URL       API 地址（默认 https://api.github.com，基准测试时指向本地模拟服务）
+    CRAWL_CONCURRENCY    同时进行中的请求上限（默认 16）
+    CRAWL_REPO_CONCURRENCY  同时处理的项目数（默认 4）
+    CRAWL_MAX_RETRIES / CRAWL_PACING  重试次数与各端点类别的请求间隔（见 retry_policy.py）
+    HTTP_CACHE / HTTP_CACHE_SCOPE  条件请求缓存（见 http_cache.py）
+"""
+import asyncio
+import os
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+from http_cache import HTTP_CACHE_ENABLED, HTTP_CACHE_FILE, HttpCache, cache_key
+from retry_policy import RetryPolicy, make_pacers, parse_retry_after
+from token_pool import RESOURCES, TOKEN_STATE_FILE, TokenPool, TokenState, resource_for
+
+API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip('/')
+API_VERSION = '2022-11-28'
+ACCEPT_JSON = 'application/vnd.github.v3+json'
+ACCEPT_STAR = 'application/vnd.github.star+json'
+
+DEFAULT_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "16"))
+DEFAULT_REPO_CONCURRENCY = int(os.getenv("CRAWL_REPO_CONCURRENCY", "4"))
+
+LINK_PART = re.compile(r'<([^>]+)>;\s*rel="([^"]+)"')
+
+
+def parse_link_header(value: Optional[str]) -> Dict[str, str]:
+    """解析 Link 响应头: {"next": url, "last": url, ...}"""
+    return {rel: url for url, rel in LINK_PART.findall(value or '')}
+
+
+def link_page(headers, rel: str) -> Optional[int]:
+    """从 Link 头中取出 rel 对应链接的 page 参数（如 rel="last" 即总页数）"""
+    url = parse_link_header(headers.get('Link') if headers else None).get(rel)
+    if not url:
+        return None
+    values = parse_qs(urlparse(url).query).get('page')
+    return int(values[0]) if values else None
+
+
+def has_next_page(headers) -> bool:
+    return 'next' in parse_link_header(headers.get('Link') if headers else None)
+
+
+class CrawlStats:
+    """单次运行的请求统计"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.pages = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_saved_bytes = 0
+        # 累计耗时（并发请求各自计入，可超过总耗时）：请求本身 / 重试退避 / 节奏控制 / 等待 Token 额度
+        self.fetch_seconds = 0.0
+        self.waits = {'backoff': 0.0, 'pacing': 0.0, 'budget': 0.0}
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.pages / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def cache_hit_rate(self) -> float:
+        total = self.cache_hits + self.cache_misses
+        return self.cache_hits / total if total else 0.0
+
+    def wait(self, reason: str, seconds: float):
+        self.waits[reason] += seconds
+
+    @property
+    def wait_seconds(self) -> float:
+        return sum(self.waits.values())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "pages": self.pages,
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes": self.bytes,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": round(self.cache_hit_rate, 3),
+            "cache_saved_bytes": self.cache_saved_bytes,
+            "seconds": round(self.elapsed, 2),
+            "pages_per_sec": round(self.pages_per_sec, 2),
+            "fetch_seconds": round(self.fetch_seconds, 2),
+            "wait_seconds": round(self.wait_seconds, 2),
+            "waits": {reason: round(seconds, 2) for reason, seconds in self.waits.items()}
+        }
+
+
+# 本进程所有爬虫实例共用的统计（基准测试读取）
+RUN_STATS = CrawlStats()
+
+
+def reset_run_stats() -> CrawlStats:
+    global RUN_STATS
+    RUN_STATS = CrawlStats()
+    return RUN_STATS
+
+
+class AsyncGitHubCrawler:
+    """
+    异步 GitHub API 客户端
+    - 全局并发上限 max_concurrency
+    - 每次请求按资源类型（core / search / graphql）选择剩余额度最多的 Token，
+      所有 Token 的剩余额度之和即为可同时发出的请求数
+    - 所有 Token 额度耗尽时等待最早的重置时间，Token 状态跨运行保存
+    - 重试退避与各端点类别的请求节奏由 retry_policy 控制，等待时间与请求耗时分别统计
+    - GET 请求带上缓存的 ETag，304（不消耗额度）时返回缓存内容
+    """
+
+    def __init__(
+        self,
+        tokens: List[str],
+        base_url: Optional[str] = None,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = 30,
+        policy: Optional[RetryPolicy] = None,
+        accept: str = ACCEPT_JSON,
+        stats: Optional[CrawlStats] = None,
+        state_file: Optional[str] = TOKEN_STATE_FILE,
+        cache_file: Optional[str] = HTTP_CACHE_FILE if HTTP_CACHE_ENABLED else None
+    ):
+        self.pool = TokenPool(tokens, state_file=state_file)
+        self.cache = HttpCache(cache_file) if cache_file else None
+        self.base_url = (base_url or API_URL).rstrip('/')
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.policy = policy or RetryPolicy()
+        self.pacers = make_pacers(RESOURCES)
+        self.accept = accept
+        self.stats = stats or RUN_STATS
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                ),
+                headers={'X-GitHub-Api-Version': API_VERSION}
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self.pool.save()
+        if self.cache is not None:
+            self.cache.close()
+
+    def url(self, path_or_url: str) -> str:
+        if path_or_url.startswith('http://') or path_or_url.startswith('https://'):
+            return path_or_url
+        return self.base_url + '/' + path_or_url.lstrip('/')
+
+    # ---------- 请求 ----------
+
+    async def request(
+        self,
+        method: str,
+        path_or_url: str,
+        params: Optional[Dict] = None,
+        accept: Optional[str] = None,
+        json_body: Any = None,
+        resource: Optional[str] = None
+    ) -> Optional[httpx.Response]:
+        """
+        发送请求并处理限流/重试，成功返回响应，不可恢复的错误返回 None
+        resource 缺省时按地址判断（/search/ -> search，/graphql -> graphql，其余 core）
+        """
+        url = self.url(path_or_url)
+        resource = resource or resource_for(url)
+        accept = accept or self.accept
+        cacheable = self.cache is not None and method.upper() == 'GET'
+        pacer = self.pacers[resource]
+        attempts = 0    # 网络错误 / 5xx / 202，按次数退避
+        throttled = 0   # 主限流 / 二级限流，等待交给 Token 池
+        while True:
+            await self.start()
+            self.stats.wait('pacing', await pacer.wait())
+            async with self._slots:
+                entry = None
+                if cacheable:
+                    key = cache_key(method, url, params, accept)
+                    entry = self.cache.get(key)
+                started = time.monotonic()
+                # 已有缓存时优先用存下它的 Token，按 Token 隔离缓存时才能发条件请求
+                state = await self.pool.acquire(resource, prefer=entry.fingerprint if entry else None)
+                self.stats.wait('budget', time.monotonic() - started)
+                headers = {
+                    'Authorization': f'Bearer {state.token}',
+                    'Accept': accept
+                }
+                if entry is not None and not self.cache.usable(entry, state.fingerprint):
+                    entry = None
+                if entry is not None:
+                    headers.update(entry.validators())
+                response = None
+                sent_at = started = time.monotonic()
+                try:
+                    response = await self._client.request(
+                        method, url, params=params, headers=headers, json=json_body
+                    )
+                    self.stats.requests += 1
+                    self.stats.bytes += len(response.content)
+                except httpx.HTTPError as e:
+                    self.stats.errors += 1
+                    print(f"\n请求错误 (尝试 {attempts + 1}/{self.policy.max_retries}): {e}")
+                finally:
+                    self.stats.fetch_seconds += time.monotonic() - started
+                    await self.pool.release(state, resource, response.headers if response is not None else None)
+
+            retry_after = None
+            if response is not None:
+                status = response.status_code
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if status == 304 and entry is not None:
+                    pacer.on_success()
+                    self.stats.cache_hits += 1
+                    self.stats.cache_saved_bytes += len(entry.body)
+                    return self._cached_response(response, entry)
+                if status == 200:
+                    pacer.on_success()
+                    if cacheable:
+                        self.stats.cache_misses += 1
+                        self.cache.put(key, url, response.headers, response.content, state.fingerprint)
+                    return response
+                if status in (403, 429):
+                    message = self._error_message(response)
+                    kind = self._handle_rate_limit(state, resource, response, message, retry_after)
+                    if kind is None:
+                        print(f"\n403 Forbidden: {message}")
+                        return None
+                    if kind == 'secondary':
+                        pacer.on_throttle(sent_at)
+                    throttled += 1
+                    self.stats.retries += 1
+                    if throttled >= self.policy.max_throttle_retries:
+                        print(f"\n限流重试 {throttled} 次后放弃: {url}")
+                        return None
+                    continue
+                if status in (404, 409, 422):
+                    return None
+                if status != 202:
+                    # 202: 统计类接口数据生成中，按退避重试
+                    self.stats.errors += 1
+                    print(f"\nHTTP {status}: {response.text[:200]}")
+
+            attempts += 1
+            if attempts >= self.policy.max_retries:
+                return None
+            self.stats.retries += 1
+            delay = self.policy.delay(attempts, retry_after)
+            await asyncio.sleep(delay)
+            self.stats.wait('backoff', delay)
+
+    def _handle_rate_limit(self, state: TokenState, resource: str, response: httpx.Response, message: str,
+                           retry_after: Optional[float]) -> Optional[str]:
+        """识别主限流 / 二级限流并更新 Token 状态，返回 'primary' / 'secondary'（换 Token 重试）或 None"""
+        headers = response.headers
+        lowered = message.lower()
+        if 'secondary rate limit' in lowered or 'abuse' in lowered or retry_after is not None:
+            self.pool.mark_secondary(state, retry_after)
+            print(f"\n二级限流 (Token {state.index + 1})，冷却后重试，先换用其他token...")
+            return 'secondary'
+        if headers.get('X-RateLimit-Remaining') == '0' or 'rate limit' in lowered or response.status_code == 429:
+            reset = headers.get('X-RateLimit-Reset')
+            self.pool.mark_exhausted(state, headers.get('X-RateLimit-Resource', resource),
+                                     float(reset) if reset else None)
+            print(f"\n{resource} 额度耗尽 (Token {state.index + 1})，换用其他token...")
+            return 'primary'
+        return None
+
+    @staticmethod
+    def _cached_response(response: httpx.Response, entry) -> httpx.Response:
+        """用缓存的响应体和响应头构造 200 响应（限流相关的头以本次 304 为准）"""
+        headers = {k: v for k, v in response.headers.items()
+                   if k.lower() not in ('content-length', 'content-encoding', 'transfer-encoding')}
+        headers.update(entry.headers)
+        return httpx.Response(200, headers=headers, content=entry.body, request=response.request)
+
+    @staticmethod
+    def _error_message(response: httpx.Response) -> str:
+        try:
+            return response.json().get('message', '')
+        except ValueError:
+            return response.text[:200]
+
+    async def get(
+        self, path_or_url: str, params: Optional[Dict] = None, accept: Optional[str] = None,
+        resource: Optional[str] = None
+    ) -> Tuple[Any, Optional[httpx.Headers]]:
+        """GET 并解析 JSON，失败返回 (None, None)"""
+        response = await self.request('GET', path_or_url, params=params, accept=accept, resource=resource)
+        if response is None:
+            return None, None
+        return response.json(), response.headers
+
+    async def graphql(self, query: str, variables: Optional[Dict] = None) -> Optional[Dict]:
+        """POST /graphql，返回 data（部分出错时仍返回已有字段），失败返回 None"""
+        response = await self.request(
+            'POST', '/graphql', json_body={'query': query, 'variables': variables or {}}, resource='graphql'
+        )
+        if response is None:
+            return None
+        payload = response.json()
+        if payload.get('errors'):
+            print(f"\nGraphQL 错误: {payload['errors'][0].get('message', '')}")
+        return payload.get('data')
+
+    async def get_page(
+        self, path_or_url: str, params: Optional[Dict] = None, page: int = 1,
+        per_page: int = 100, accept: Optional[str] = None
+    ) -> Tuple[Any, Optional[httpx.Headers]]:
+        """获取列表接口的一页"""
+        query = dict(params or {})
+        query.update({'page': page, 'per_page': per_page})
+        data, headers = await self.get(path_or_url, query, accept=accept)
+        if data is not None:
+            self.stats.pages += 1
+        return data, headers
+
+    async def refresh_rate_limits(self):
+        """逐个 Token 查询 /rate_limit（不消耗额度），初始化额度池"""
+        await self.start()
+
+        async def refresh(state: TokenState):
+            try:
+                response = await self._client.get(self.url('/rate_limit'), headers={
+                    'Authorization': f'Bearer {state.token}', 'Accept': ACCEPT_JSON
+                })
+            except httpx.HTTPError:
+                return
+            if response.status_code == 200:
+                self.pool.update_from_rate_limit(state, response.json())
+
+        await asyncio.gather(*(refresh(state) for state in self.pool.tokens))
+
+    async def get_rate_limit_info(self) -> Dict[str, int]:
+        """刷新全部 Token 的额度，返回 core / search 剩余额度之和"""
+        await self.refresh_rate_limits()
+        totals = self.pool.totals()
+        now = time.time()
+        resets = {
+            r: min((t.budgets[r].reset for t in self.pool.tokens if t.budgets[r].reset > now), default=0)
+            for r in ('core', 'search')
+        }
+        return {
+            'core_remaining': totals['core'],
+            'core_reset': int(resets['core']),
+            'search_remaining': totals['search'],
+            'search_reset': int(resets['search'])
+        }
+
+
+async def run_concurrently(
+    items: Iterable[Any],
+    worker: Callable[[Any], Awaitable[Any]],
+    concurrency: int = DEFAULT_REPO_CONCURRENCY
+) -> List[Any]:
+    """
+    以固定并发数处理 items（如项目列表），结果按输入顺序返回
+    单个任务的异常作为结果返回，不影响其他任务
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(item):
+        async with semaphore:
+            try:
+                return await worker(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                return e
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+async def fetch_pages(
+    pages: Iterable[int],
+    fetch: Callable[[int], Awaitable[Tuple[Any, Any]]],
+    handle: Callable[[int, Any], None],
+    concurrency: int = DEFAULT_CONCURRENCY
+) -> List[int]:
+    """
+    并发获取多页：fetch(page) -> (data, headers)，每页返回后立即调用 handle(page, data)，
+    完成顺序不固定，调用方需按页合并。返回失败（data 为 None）的页码
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    failed = []
+
+    async def run(page):
+        async with semaphore:
+            data, _ = await fetch(page)
+        if data is None:
+            failed.append(page)
+        else:
+            handle(page, data)
+
+    results = await asyncio.gather(*(run(page) for page in pages), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return sorted(failed)
@@ -0,0 +1,140 @@
+"""
+GitHub API 条件请求缓存（ETag / Last-Modified）
+200 响应的 ETag、分页相关响应头和压缩后的响应体保存在 data/http_cache.sqlite，
+下次请求同一地址时带上 If-None-Match，GitHub 返回 304 时不消耗额度，直接用缓存内容
+
+缓存键 = 请求方法 + 完整地址（参数排序）+ Accept，与 Token 无关；每条缓存记录存下它的 Token 指纹:
+    - 默认（HTTP_CACHE_SCOPE=token）缓存按 Token 隔离：GitHub 的响应随 Authorization 变化（Vary），
+      只有用存下缓存的那个 Token 请求时才带 If-None-Match、才把 304 解释为缓存命中，
+      不会把一个 Token 可见的内容返回给另一个 Token
+      Token 池默认选额度最多的 Token，若不加处理，N 个 Token 时再次爬取只有约 1/N 的请求落到原 Token 上；
+      因此已有缓存时优先使用记录中的 Token（TokenPool.acquire 的 prefer），该 Token 额度耗尽或冷却中才换用
+      其他 Token，此时发普通请求（消耗额度）并把缓存改记为新 Token
+      命中率的取舍：各 Token 额度充足时接近 shared；额度紧张、频繁换 Token 时命中率下降
+    - HTTP_CACHE_SCOPE=shared 时所有 Token 共用缓存（确认只爬公开仓库、各 Token 权限相同时显式开启），
+      任何 Token 都带 If-None-Match，命中率不受 Token 轮换影响
+
+环境变量:
+    HTTP_CACHE          设为 0 关闭缓存
+    HTTP_CACHE_SCOPE    token（默认）| shared
+"""
+import json
+import os
+import sqlite3
+import time
+import zlib
+from hashlib import sha256
+from typing import Dict, Optional
+from urllib.parse import urlencode
+
+HTTP_CACHE_FILE = os.path.join("data", "http_cache.sqlite")
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE", "1") != "0"
+HTTP_CACHE_SCOPE = os.getenv("HTTP_CACHE_SCOPE", "token")
+
+# 命中 304 时需要从缓存恢复的响应头（分页依赖 Link）
+KEPT_HEADERS = ('Content-Type', 'Link', 'ETag', 'Last-Modified')
+# 每积累多少条写入一次（在内存中攒批，写入时才持有写锁，多个分片进程共用缓存文件时不互相阻塞）
+COMMIT_EVERY = 50
+
+
+def cache_key(method: str, url: str, params: Optional[Dict], accept: str) -> str:
+    query = urlencode(sorted((k, str(v)) for k, v in (params or {}).items()))
+    raw = f"{method.upper()} {url}?{query} {accept}"
+    return sha256(raw.encode('utf-8')).hexdigest()
+
+
+class CacheEntry:
+    def __init__(self, etag: Optional[str], last_modified: Optional[str], headers: Dict[str, str], body: bytes,
+                 fingerprint: Optional[str] = None):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.headers = headers
+        self.body = body
+        # 存下缓存的 Token 指纹
+        self.fingerprint = fingerprint
+
+    def validators(self) -> Dict[str, str]:
+        """条件请求头"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """SQLite 存储的响应缓存，只缓存带 ETag / Last-Modified 的 GET 200 响应"""
+
+    def __init__(self, path: str = HTTP_CACHE_FILE, scope: str = HTTP_CACHE_SCOPE):
+        self.path = path
+        self.per_token = scope != 'shared'
+        self._pending: Dict[str, tuple] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    headers TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    stored_at REAL NOT NULL,
+                    fingerprint TEXT
+                )
+            """)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+            if 'fingerprint' not in columns:
+                # 旧版缓存文件的键含 Token 作用域，不会再被命中，只补上列以便与新文件合并
+                self._conn.execute("ALTER TABLE responses ADD COLUMN fingerprint TEXT")
+        return self._conn
+
+    def usable(self, entry: Optional[CacheEntry], fingerprint: str) -> bool:
+        """本 Token 能否用这条缓存发条件请求（按 Token 隔离时只能用自己存下的）"""
+        return entry is not None and (not self.per_token or entry.fingerprint == fingerprint)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        if key in self._pending:
+            pending = self._pending[key]
+            row = pending[2:6] + pending[7:]
+        else:
+            row = self.conn.execute(
+                "SELECT etag, last_modified, headers, body, fingerprint FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, headers, body, fingerprint = row
+        return CacheEntry(etag, last_modified, json.loads(headers), zlib.decompress(body), fingerprint)
+
+    def put(self, key: str, url: str, headers, body: bytes, fingerprint: Optional[str] = None):
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        kept = {name: headers[name] for name in KEPT_HEADERS if headers.get(name) is not None}
+        self._pending[key] = (key, url, etag, last_modified, json.dumps(kept), zlib.compress(body, 6), time.time(),
+                              fingerprint)
+        if len(self._pending) >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        if self._pending:
+            with self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                      list(self._pending.values()))
+            self._pending = {}
+
+    def close(self):
+        self.commit()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,317 @@
+"""
+爬取任务队列（data/crawl_jobs.sqlite）
+每个 项目 × 数据类型（star / fork / commits / prs / issues / comments）一行任务，记录状态、租约、尝试次数和游标，
+取代各爬虫各自的断点文件（*_checkpoint 目录的 JSON、comment_number / issue_numbers 中的计数）
+
+多个爬虫进程（或挂载同一文件的多台机器）可以共享一个队列文件：
+    - 领取任务在 BEGIN IMMEDIATE 事务中完成，同一任务同时只会被一个进程领取
+    - 领取后持有租约 LEASE_SECONDS 秒，保存游标和心跳时续期；进程崩溃后租约到期，任务可被其他进程重新领取
+    - 游标（原断点内容）保存为一次 UPDATE，只有租约持有者能写入，租约被接管时抛出 LeaseLost
+    - 失败的任务延迟 RETRY_DELAY × 尝试次数 秒后重试，达到 MAX_ATTEMPTS 次标记为 failed，下次运行重新入队时恢复
+    - 领取顺序: 尝试次数少的优先，其次 priority 高的优先（调度器写入，见 scheduler.py），最后按入队顺序
+    - finished_at 记录最近一次完成的时间，重新入队（reopen）时保留，供调度器判断数据的陈旧程度
+
+首次读取游标时，如果队列中没有，会读取旧版断点文件作为初始游标（见各爬虫的 read_checkpoint）
+
+环境变量:
+    CRAWL_JOB_DB       队列文件路径（默认 data/crawl_jobs.sqlite）
+    CRAWL_WORKER_ID    进程标识（默认 主机名:进程号）
+"""
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+JOB_DB_FILE = os.getenv("CRAWL_JOB_DB", os.path.join("data", "crawl_jobs.sqlite"))
+WORKER_ID = os.getenv("CRAWL_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+LEASE_SECONDS = 600
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 60
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+STATUSES = (PENDING, RUNNING, DONE, FAILED)
+
+
+class LeaseLost(Exception):
+    """任务租约已过期并被其他进程接管"""
+
+
+class JobQueue:
+    def __init__(self, path: str = JOB_DB_FILE, worker_id: str = WORKER_ID, lease_seconds: int = LEASE_SECONDS):
+        self.path = path
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 自动提交模式，领取任务时显式开启 IMMEDIATE 事务
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                project TEXT NOT NULL,
+                data_type TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                available_at REAL NOT NULL DEFAULT 0,
+                cursor TEXT,
+                last_error TEXT,
+                updated_at REAL NOT NULL,
+                priority REAL NOT NULL DEFAULT 0,
+                finished_at REAL,
+                PRIMARY KEY (project, data_type)
+            )
+        """)
+        # 旧版队列文件没有调度相关的列
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        for column, definition in (('priority', 'REAL NOT NULL DEFAULT 0'), ('finished_at', 'REAL')):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+
+    @contextmanager
+    def _transaction(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def enqueue(self, projects: Iterable[str], data_type: str):
+        """加入缺少的任务；上次运行中失败的任务恢复为 pending 并清零尝试次数"""
+        now = time.time()
+        rows = [(project, data_type, now) for project in projects]
+        with self._transaction():
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO jobs (project, data_type, updated_at) VALUES (?, ?, ?)", rows
+            )
+            self.conn.executemany(
+                "UPDATE jobs SET status = 'pending', attempts = 0, available_at = 0 "
+                "WHERE project = ? AND data_type = ? AND status = 'failed'",
+                [row[:2] for row in rows]
+            )
+
+    def reopen(self, projects: Iterable[str], data_type: str, min_age: float = 0) -> int:
+        """把已完成超过 min_age 秒的任务重新置为 pending（增量模式），返回数量"""
+        now = time.time()
+        cur = self.conn.execute(
+            "UPDATE jobs SET status = 'pending', attempts = 0, available_at = 0, updated_at = ? "
+            "WHERE data_type = ? AND status = 'done' AND updated_at <= ? "
+            "AND project IN (SELECT value FROM json_each(?))",
+            (now, data_type, now - min_age, json.dumps(list(projects)))
+        )
+        return cur.rowcount
+
+    def prioritize(self, data_type: str, priorities: Dict[str, float]):
+        """写入各项目任务的领取优先级（越大越先领取）"""
+        with self._transaction():
+            self.conn.executemany(
+                "UPDATE jobs SET priority = ? WHERE project = ? AND data_type = ?",
+                [(priority, project, data_type) for project, priority in priorities.items()]
+            )
+
+    def finished(self, projects: Iterable[str], data_type: str) -> Dict[str, float]:
+        """各项目最近一次完成的时间（epoch 秒），从未完成的不在结果中"""
+        rows = self.conn.execute(
+            "SELECT project, finished_at FROM jobs WHERE data_type = ? AND finished_at IS NOT NULL "
+            "AND project IN (SELECT value FROM json_each(?))",
+            (data_type, json.dumps(list(projects)))
+        ).fetchall()
+        return dict(rows)
+
+    def claim(self, data_types: Iterable[str], projects: Iterable[str]) -> Optional[Tuple[str, str]]:
+        """领取一个可执行的任务（pending 且已到重试时间，或租约已过期的 running），返回 (项目, 数据类型)"""
+        now = time.time()
+        data_types = list(data_types)
+        with self._transaction():
+            row = self.conn.execute(
+                f"SELECT project, data_type FROM jobs "
+                f"WHERE data_type IN ({','.join('?' * len(data_types))}) "
+                f"AND project IN (SELECT value FROM json_each(?)) "
+                f"AND ((status = 'pending' AND available_at <= ?) OR (status = 'running' AND lease_expires < ?)) "
+                f"ORDER BY attempts, priority DESC, rowid LIMIT 1",
+                (*data_types, json.dumps(list(projects)), now, now)
+            ).fetchone()
+            if row is not None:
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'running', lease_owner = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE project = ? AND data_type = ?",
+                    (self.worker_id, now + self.lease_seconds, now, *row)
+                )
+        return tuple(row) if row else None
+
+    def _update_owned(self, project: str, data_type: str, assignments: str, params: tuple) -> bool:
+        cur = self.conn.execute(
+            f"UPDATE jobs SET {assignments}, updated_at = ? "
+            f"WHERE project = ? AND data_type = ? AND status = 'running' AND lease_owner = ?",
+            (*params, time.time(), project, data_type, self.worker_id)
+        )
+        return cur.rowcount == 1
+
+    def cursor(self, project: str, data_type: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(
+            "SELECT cursor FROM jobs WHERE project = ? AND data_type = ?", (project, data_type)
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def save_cursor(self, project: str, data_type: str, cursor: Dict[str, Any]):
+        """保存游标并续租；租约不在本进程手中时抛出 LeaseLost"""
+        if not self._update_owned(project, data_type, "cursor = ?, lease_expires = ?",
+                                  (json.dumps(cursor, ensure_ascii=False), time.time() + self.lease_seconds)):
+            raise LeaseLost(f"{project} {data_type}")
+
+    def heartbeat(self):
+        """为本进程持有的全部任务续租"""
+        self.conn.execute(
+            "UPDATE jobs SET lease_expires = ? WHERE status = 'running' AND lease_owner = ?",
+            (time.time() + self.lease_seconds, self.worker_id)
+        )
+
+    def idle(self, seconds: float):
+        """同步爬虫等待限流重置：等待期间定时为持有的任务续租"""
+        deadline = time.time() + seconds
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, self.lease_seconds / 3))
+            self.heartbeat()
+
+    def complete(self, project: str, data_type: str):
+        self._update_owned(project, data_type,
+                           "status = 'done', lease_owner = NULL, last_error = NULL, finished_at = ?", (time.time(),))
+
+    def fail(self, project: str, data_type: str, error: str = ''):
+        """记一次失败：未达到 MAX_ATTEMPTS 时延迟后重试，否则标记为 failed"""
+        row = self.conn.execute(
+            "SELECT attempts FROM jobs WHERE project = ? AND data_type = ?", (project, data_type)
+        ).fetchone()
+        attempts = row[0] if row else MAX_ATTEMPTS
+        status = FAILED if attempts >= MAX_ATTEMPTS else PENDING
+        self._update_owned(project, data_type, "status = ?, lease_owner = NULL, available_at = ?, last_error = ?",
+                           (status, time.time() + RETRY_DELAY * attempts, error[:500]))
+
+    def release(self, project: str, data_type: str):
+        """中断时交还任务，不计入尝试次数"""
+        self._update_owned(project, data_type,
+                           "status = 'pending', lease_owner = NULL, attempts = MAX(attempts - 1, 0)", ())
+
+    def statuses(self, projects: Iterable[str], data_type: str) -> Dict[str, str]:
+        rows = self.conn.execute(
+            "SELECT project, status FROM jobs WHERE data_type = ? AND project IN (SELECT value FROM json_each(?))",
+            (data_type, json.dumps(list(projects)))
+        ).fetchall()
+        return dict(rows)
+
+    def counts(self, data_types: Iterable[str]) -> Dict[str, int]:
+        data_types = list(data_types)
+        rows = self.conn.execute(
+            f"SELECT status, COUNT(*) FROM jobs WHERE data_type IN ({','.join('?' * len(data_types))}) GROUP BY status",
+            data_types
+        ).fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(rows)
+        return counts
+
+    def summary(self, data_types: Iterable[str]) -> str:
+        return ', '.join(f"{status}: {count}" for status, count in self.counts(data_types).items())
+
+    def close(self):
+        self.conn.close()
+
+
+_queues: Dict[str, JobQueue] = {}
+
+
+def open_queue(path: str = JOB_DB_FILE) -> JobQueue:
+    """按文件路径复用同一个队列连接"""
+    key = os.path.abspath(path)
+    if key not in _queues:
+        _queues[key] = JobQueue(path)
+    return _queues[key]
+
+
+def run_job(queue: JobQueue, project: str, data_type: str, worker: Callable[[str, str], Any]) -> Any:
+    """同步执行一个已领取的任务：返回 True 标记完成，其他返回值或异常记一次失败"""
+    try:
+        result = worker(project, data_type)
+    except LeaseLost:
+        print(f"  ⚠️  {project} {data_type} 租约已被其他进程接管")
+        return False
+    except KeyboardInterrupt:
+        queue.release(project, data_type)
+        raise
+    except Exception as e:
+        queue.fail(project, data_type, repr(e))
+        return e
+    if result is True:
+        queue.complete(project, data_type)
+    else:
+        queue.fail(project, data_type, str(result))
+    return result
+
+
+async def run_jobs(
+    queue: JobQueue,
+    data_types: Iterable[str],
+    projects: Iterable[str],
+    worker: Callable[[str, str], Awaitable[Any]],
+    concurrency: int,
+    stop: Optional[Callable[[], bool]] = None
+) -> List[Tuple[str, str, Any]]:
+    """
+    concurrency 个协程循环领取 projects 中 data_types 的任务并执行 worker(项目, 数据类型)，
+    直到没有可领取的任务或 stop() 返回 True（如预算用完，见 scheduler.RunBudget）；
+    运行期间定时为持有的任务续租，返回 [(项目, 数据类型, 结果)]
+    """
+    data_types, projects = list(data_types), list(projects)
+    results = []
+
+    async def run():
+        while stop is None or not stop():
+            job = queue.claim(data_types, projects)
+            if job is None:
+                return
+            project, data_type = job
+            try:
+                result = await worker(project, data_type)
+            except LeaseLost:
+                print(f"  ⚠️  {project} {data_type} 租约已被其他进程接管")
+                continue
+            except asyncio.CancelledError:
+                queue.release(project, data_type)
+                raise
+            except Exception as e:
+                queue.fail(project, data_type, repr(e))
+                results.append((project, data_type, e))
+                continue
+            if result is True:
+                queue.complete(project, data_type)
+            else:
+                queue.fail(project, data_type, str(result))
+            results.append((project, data_type, result))
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(queue.lease_seconds / 3)
+            queue.heartbeat()
+
+    beat = asyncio.create_task(heartbeat())
+    try:
+        await asyncio.gather(*(run() for _ in range(max(1, concurrency))))
+    finally:
+        beat.cancel()
+    return results
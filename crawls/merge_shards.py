@@ -0,0 +1,198 @@
+"""
+合并分片爬取的输出（各分片在不同目录 / 机器上运行时使用，见 sharding.py）
+每个项目只由一个分片爬取，各分片的 data 目录中项目文件互不重叠，合并规则:
+    项目文件        data/<类型>/ 下的文件（输出、.idx 索引、断点等）直接复制；同名文件以命令行中靠前的分片为准
+    project_catalog.json    按项目合并字段，updated_at 较新的记录覆盖较旧的
+    token_state.json        按 Token 指纹合并（各分片的 Token 不相交），同一指纹取 updated_at 较新的记录
+    crawl.sqlite            sinks.TABLES 中的各表按项目替换：先删除目标库中该分片包含的项目，再整体插入
+    crawl_jobs.sqlite       任务队列同样按 项目 × 数据类型 替换
+    http_cache.sqlite       按缓存键合并，同一键取 stored_at 较新的响应
+各分片的项目不重叠时，合并结果与分片的顺序无关，重复合并同一批分片得到相同的结果
+
+运行方式:
+    python merge_shards.py shard1/data shard2/data shard3/data --into data
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+from typing import Callable, Dict, List
+
+from http_cache import HttpCache
+from job_queue import JobQueue
+from project_catalog import load_catalog
+from sinks import TABLES, SqliteSink
+
+CATALOG_NAME = "project_catalog.json"
+TOKEN_STATE_NAME = "token_state.json"
+SINK_DB_NAME = "crawl.sqlite"
+JOB_DB_NAME = "crawl_jobs.sqlite"
+HTTP_CACHE_NAME = "http_cache.sqlite"
+SPECIAL_FILES = {CATALOG_NAME, TOKEN_STATE_NAME, SINK_DB_NAME, JOB_DB_NAME, HTTP_CACHE_NAME}
+# SQLite 的附属文件和写入中的临时文件不复制
+SKIP_SUFFIXES = ('-wal', '-shm', '-journal', '.tmp', '.lock')
+
+
+def write_json(path: str, data: Dict):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def merge_catalogs(sources: List[str], into: str) -> int:
+    paths = [os.path.join(d, CATALOG_NAME) for d in [into] + sources]
+    entries = []
+    for path in paths:
+        entries.extend(load_catalog(path).items())
+    if not entries:
+        return 0
+    # 按 updated_at 从旧到新应用，新值覆盖旧值
+    entries.sort(key=lambda item: str(item[1].get('updated_at') or ''))
+    catalog = {}
+    for project, fields in entries:
+        catalog.setdefault(project, {}).update(fields)
+    write_json(os.path.join(into, CATALOG_NAME), catalog)
+    return len(catalog)
+
+
+def merge_token_states(sources: List[str], into: str) -> int:
+    merged = {}
+    for directory in [into] + sources:
+        path = os.path.join(directory, TOKEN_STATE_NAME)
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for fingerprint, state in saved.items():
+            if fingerprint not in merged or state.get('updated_at', 0) > merged[fingerprint].get('updated_at', 0):
+                merged[fingerprint] = state
+    if merged:
+        write_json(os.path.join(into, TOKEN_STATE_NAME), merged)
+    return len(merged)
+
+
+def replace_rows(conn: sqlite3.Connection, table: str, keys: List[str]) -> int:
+    """用附加库 src 中的行替换主库中相同 keys 的全部行，返回插入的行数"""
+    columns = [row[1] for row in conn.execute(f"PRAGMA src.table_info(`{table}`)")]
+    if not columns:
+        return 0
+    match = ' AND '.join(f"`{table}`.`{k}` = s.`{k}`" for k in keys)
+    conn.execute(f"DELETE FROM `{table}` WHERE EXISTS (SELECT 1 FROM src.`{table}` s WHERE {match})")
+    names = ', '.join(f"`{c}`" for c in columns)
+    return conn.execute(f"INSERT OR REPLACE INTO `{table}` ({names}) SELECT {names} FROM src.`{table}`").rowcount
+
+
+def newer_responses(conn: sqlite3.Connection) -> int:
+    """附加库 src 中比主库更新的缓存响应写入主库"""
+    return conn.execute("""
+        INSERT OR REPLACE INTO responses SELECT * FROM src.responses s
+        WHERE NOT EXISTS (SELECT 1 FROM responses r WHERE r.key = s.key AND r.stored_at >= s.stored_at)
+    """).rowcount
+
+
+def merge_database(source: str, target: str, merge: Callable[[sqlite3.Connection], int]) -> int:
+    conn = sqlite3.connect(target, timeout=30, isolation_level=None)
+    try:
+        conn.execute("ATTACH DATABASE ? AS src", (source,))
+        conn.execute("BEGIN IMMEDIATE")
+        rows = merge(conn)
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE src")
+        return rows
+    finally:
+        conn.close()
+
+
+def merge_sink_dbs(sources: List[str], into: str) -> int:
+    paths = [os.path.join(d, SINK_DB_NAME) for d in sources]
+    paths = [p for p in paths if os.path.exists(p)]
+    if not paths:
+        return 0
+    target = os.path.join(into, SINK_DB_NAME)
+    # 建表，并把源库升级到同样的表结构
+    for path in [target] + paths:
+        SqliteSink(path).conn.close()
+    # 按项目替换（crawl_series 另按 kind），每个项目只出现在一个分片中
+    tables = {table: ['kind', 'project'] if table == 'crawl_series' else ['project'] for table in TABLES}
+
+    def merge(conn):
+        return sum(replace_rows(conn, table, keys) for table, keys in tables.items())
+    return sum(merge_database(p, target, merge) for p in reversed(paths))
+
+
+def merge_job_dbs(sources: List[str], into: str) -> int:
+    paths = [os.path.join(d, JOB_DB_NAME) for d in sources]
+    paths = [p for p in paths if os.path.exists(p)]
+    if not paths:
+        return 0
+    target = os.path.join(into, JOB_DB_NAME)
+    # JobQueue 打开时会迁移旧版队列文件的列
+    for path in [target] + paths:
+        JobQueue(path).conn.close()
+    return sum(merge_database(p, target, lambda conn: replace_rows(conn, 'jobs', ['project', 'data_type']))
+               for p in reversed(paths))
+
+
+def merge_http_caches(sources: List[str], into: str) -> int:
+    paths = [os.path.join(d, HTTP_CACHE_NAME) for d in sources]
+    paths = [p for p in paths if os.path.exists(p)]
+    if not paths:
+        return 0
+    target = os.path.join(into, HTTP_CACHE_NAME)
+    for path in [target] + paths:
+        HttpCache(path).conn.close()
+    return sum(merge_database(p, target, newer_responses) for p in paths)
+
+
+def copy_project_files(sources: List[str], into: str) -> int:
+    """复制各分片 data/<类型>/ 下的文件；倒序复制，靠前的分片最后写入"""
+    copied = 0
+    for source in reversed(sources):
+        for root, _, files in os.walk(source):
+            rel = os.path.relpath(root, source)
+            for name in files:
+                if rel == '.' and name in SPECIAL_FILES or name.endswith(SKIP_SUFFIXES):
+                    continue
+                target_dir = os.path.join(into, rel)
+                os.makedirs(target_dir, exist_ok=True)
+                shutil.copy2(os.path.join(root, name), os.path.join(target_dir, name))
+                copied += 1
+    return copied
+
+
+def merge_shards(sources: List[str], into: str) -> Dict[str, int]:
+    sources = [s for s in sources if os.path.abspath(s) != os.path.abspath(into)]
+    os.makedirs(into, exist_ok=True)
+    return {
+        'files': copy_project_files(sources, into),
+        'catalog': merge_catalogs(sources, into),
+        'token_state': merge_token_states(sources, into),
+        'sink_rows': merge_sink_dbs(sources, into),
+        'jobs': merge_job_dbs(sources, into),
+        'http_cache': merge_http_caches(sources, into),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合并分片爬取的 data 目录')
+    parser.add_argument('sources', nargs='+', help='各分片的 data 目录')
+    parser.add_argument('--into', default='data', help='合并到的 data 目录（默认 data）')
+    args = parser.parse_args()
+
+    for source in args.sources:
+        if not os.path.isdir(source):
+            parser.error(f"目录不存在: {source}")
+    result = merge_shards(args.sources, args.into)
+    print(f"✅ 合并 {len(args.sources)} 个分片到 {args.into}: {result['files']} 个项目文件, "
+          f"{result['catalog']} 个项目目录记录, {result['token_state']} 个Token状态, "
+          f"{result['sink_rows']} 行数据库记录, {result['jobs']} 个任务, "
+          f"{result['http_cache']} 条缓存响应")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+项目目录（data/project_catalog.json）
+按项目名保存仓库级别的计数和属性（star / fork / issue / PR 数、主要语言、许可证等），
+由 crawl_repo_counters.py 写入，其他爬虫读取（例如 crawl_issues_v2 用时间范围内的 issue/PR 数判断是否已爬完），
+导入数据库见 clean/import_data_folder.py --type catalog
+
+结构:
+    {"owner/repo": {"stars": 123, "forks": 45, ..., "updated_at": "..."}, ...}
+"""
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sharding import file_lock
+
+CATALOG_FILE = os.path.join("data", "project_catalog.json")
+
+
+def load_catalog(path: str = CATALOG_FILE) -> Dict[str, Dict]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def upsert_projects(entries: Dict[str, Dict], path: str = CATALOG_FILE) -> int:
+    """按项目合并字段（新值覆盖旧值，未涉及的字段保留），原子写入，返回更新的项目数"""
+    if not entries:
+        return 0
+    # 分片运行时多个进程共用这个文件（见 sharding.py）
+    with file_lock(path):
+        catalog = load_catalog(path)
+        now = datetime.now(timezone.utc).isoformat()
+        for project, fields in entries.items():
+            catalog.setdefault(project, {}).update(fields, updated_at=now)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(catalog, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+    return len(entries)
+
+
+def get_project(project: str, path: str = CATALOG_FILE) -> Optional[Dict]:
+    return load_catalog(path).get(project)
+
+
+def window_issue_count(project: str, start: datetime, end: datetime, path: str = CATALOG_FILE) -> Optional[int]:
+    """目录中记录的、与 [start, end] 一致的时间范围内 issue + PR 数，没有记录返回 None"""
+    entry = get_project(project, path) or {}
+    window = entry.get('window') or {}
+    if window.get('start') != start.strftime('%Y-%m-%d') or window.get('end') != end.strftime('%Y-%m-%d'):
+        return None
+    if window.get('issues') is None or window.get('prs') is None:
+        return None
+    return window['issues'] + window['prs']
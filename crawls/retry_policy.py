@@ -0,0 +1,126 @@
+"""
+请求重试与节奏控制（github_core 使用）
+    RetryPolicy   网络错误 / 5xx / 202 按指数退避重试（等抖动：上限的一半 + 随机另一半），
+                  响应带 Retry-After 时按它等待；限流（主限流 / 二级限流）的重试单独计数，
+                  等待交给 Token 池（到重置时间 / 冷却结束），不占错误重试次数
+    Pacer         按端点类别（core / search / graphql）控制相邻请求的最小间隔：
+                  遇到二级限流时间隔加倍（同一批并发请求的限流只算一次），之后每次成功逐步缩短，回到 min_interval；
+                  默认 min_interval 为 0，不额外限速，吞吐只受服务端的真实限制约束
+
+环境变量:
+    CRAWL_MAX_RETRIES   单个请求的错误重试次数（默认 5）
+    CRAWL_PACING        各端点类别的最小请求间隔（秒），如 "search=2,core=0.05"
+"""
+import asyncio
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, Optional
+
+MAX_RETRIES = int(os.getenv("CRAWL_MAX_RETRIES", "5"))
+# 限流重试上限（每次都会先等到 Token 可用，只为防止死循环）
+MAX_THROTTLE_RETRIES = 20
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+
+# 二级限流后间隔至少增加到 THROTTLE_INTERVAL 秒，再逐次加倍，最多 MAX_INTERVAL 秒
+THROTTLE_INTERVAL = 0.25
+MAX_INTERVAL = 10.0
+# 每次成功后间隔乘以 RECOVERY
+RECOVERY = 0.8
+
+
+def parse_pacing(value: str) -> Dict[str, float]:
+    """"search=2,core=0.05" -> {"search": 2.0, "core": 0.05}"""
+    pacing = {}
+    for part in (value or '').split(','):
+        if '=' in part:
+            name, seconds = part.split('=', 1)
+            try:
+                pacing[name.strip()] = float(seconds)
+            except ValueError:
+                continue
+    return pacing
+
+
+PACING = parse_pacing(os.getenv("CRAWL_PACING", ""))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After 头：秒数或 HTTP 日期，无法解析返回 None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    def __init__(self, max_retries: int = MAX_RETRIES, base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY,
+                 max_throttle_retries: int = MAX_THROTTLE_RETRIES):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_throttle_retries = max_throttle_retries
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """第 attempt 次（从 1 开始）重试前的等待秒数"""
+        if retry_after is not None:
+            # 按服务端要求等待，加一点抖动避免所有请求同时醒来
+            return retry_after + random.uniform(0, min(1.0, retry_after * 0.1))
+        cap = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+
+class Pacer:
+    """单个端点类别的请求节奏"""
+
+    def __init__(self, min_interval: float = 0.0, max_interval: float = MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self._next = 0.0
+        self._throttled_at = 0.0
+
+    async def wait(self) -> float:
+        """等到本请求的发送时刻，返回等待的秒数"""
+        if self.interval <= 0:
+            return 0.0
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def on_success(self):
+        if self.interval > self.min_interval:
+            self.interval = max(self.min_interval, self.interval * RECOVERY)
+            if self.interval < THROTTLE_INTERVAL / 10:
+                self.interval = self.min_interval
+
+    def on_throttle(self, sent_at: float):
+        """sent_at 为该请求发出时的 time.monotonic()；上次调整之前发出的请求不再重复加倍"""
+        if sent_at < self._throttled_at:
+            return
+        self._throttled_at = time.monotonic()
+        self.interval = min(self.max_interval, max(self.interval * 2, THROTTLE_INTERVAL))
+
+
+def make_pacers(resources: Iterable[str], pacing: Optional[Dict[str, float]] = None) -> Dict[str, Pacer]:
+    pacing = PACING if pacing is None else pacing
+    return {r: Pacer(pacing.get(r, 0.0)) for r in resources}
+
+
+def reset_wait(resets: Iterable[float], default: float = 60) -> float:
+    """同步爬虫的全部 Token 都触发限流后：等到最早的重置时间（epoch 秒，未知时等 default 秒）"""
+    known = [r for r in resets if r]
+    if not known:
+        return default
+    return max(min(known) - time.time(), 0) + 1
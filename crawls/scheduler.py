@@ -0,0 +1,204 @@
+"""
+爬取调度（CRAWL_SCHEDULE=1 或设置 CRAWL_BUDGET 时启用）
+按数据的陈旧程度和项目近期活跃度给每个任务打分，任务队列按分数从高到低领取（job_queue.JobQueue.prioritize），
+不再按 top300_projects_list.txt 的文件顺序；设置 CRAWL_BUDGET 时，本次运行的 API 请求按分数分配
+
+打分（每个 项目 × 数据类型）:
+    预计新增数据 expected   近期日均数 × 距上次爬取的天数 × 活跃度系数
+        近期日均数          输出的每日统计中最后 RECENT_DAYS 天的均值（star / fork / commits / prs），
+                            没有每日统计时用项目目录中的总数 ÷ 仓库年龄（issue / 评论）
+        上次爬取时间        任务队列记录的完成时间（finished_at），没有时用输出的 crawled_at
+        活跃度系数          health_scores.json 中活跃度维度得分 a（0~100）: 0.5 + a / 100，没有评分时为 1；
+                            已归档的项目为 0；commits 在上次爬取之后没有推送（项目目录的 pushed_at）时为 0
+    预计消耗 cost           1 + expected / PER_PAGE 次请求（增量模式定位水位的探测 + 新数据页）
+    分数                    expected / cost，即每次请求预计带回的数据量
+    从未爬取过的任务排在最前（分数为 NEVER_CRAWLED + 活跃度系数），
+    预计消耗按项目目录中的总数估算，没有记录时为 DEFAULT_COST
+
+预算（CRAWL_BUDGET，本次运行每个进程最多消耗的 API 请求数）:
+    按分数从高到低累加预计消耗，放不进剩余预算的任务本次不领取（保持 pending，下次运行重新打分），
+    后面消耗更小的任务仍可填入；
+    github_core 异步内核的爬虫另按实际消耗（RunBudget，304 不计）在用完后停止领取新任务，已开始的任务照常完成
+
+环境变量:
+    CRAWL_SCHEDULE        1 启用调度
+    CRAWL_BUDGET          本次运行的 API 请求预算（默认 0 不限，设置后自动启用调度）
+    CRAWL_HEALTH_SCORES   健康度评分文件（默认 ../backend/health_scores.json，由 backend/precompute_health.py 生成）
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from incremental import load_output, parse_time
+from job_queue import DONE, JobQueue
+from project_catalog import load_catalog
+
+BUDGET = int(os.getenv("CRAWL_BUDGET", "0"))
+SCHEDULE = os.getenv("CRAWL_SCHEDULE", "0") == "1" or BUDGET > 0
+HEALTH_SCORES_FILE = os.getenv("CRAWL_HEALTH_SCORES", os.path.join("..", "backend", "health_scores.json"))
+
+RECENT_DAYS = 30
+PER_PAGE = 100
+DEFAULT_COST = 10
+# 从未爬取过的任务的分数加上这个值，保证排在已有数据的任务之前
+NEVER_CRAWLED = 1e9
+
+# 任务数据类型 -> (每日统计的类型, 项目目录中对应的总数字段)
+JOB_KINDS = {
+    'star': ('stars', ('stars',)),
+    'fork': ('forks', ('forks',)),
+    'commits': ('commits', ()),
+    'prs': ('prs', ('open_prs', 'closed_prs', 'merged_prs')),
+    'issues': (None, ('open_issues', 'closed_issues', 'open_prs', 'closed_prs', 'merged_prs')),
+    'comments': (None, ('open_issues', 'closed_issues', 'open_prs', 'closed_prs', 'merged_prs')),
+}
+
+
+def load_health_scores(path: str = HEALTH_SCORES_FILE) -> Dict[str, Dict]:
+    """按 owner/repo 返回健康度评分，文件不存在或损坏返回 {}"""
+    scores = (load_output(path) or {}).get('scores') or {}
+    return {entry.get('repo_name') or key: entry for key, entry in scores.items()}
+
+
+def activity_factor(health: Optional[Dict]) -> float:
+    dimensions = (health or {}).get('dimensions') or {}
+    score = (dimensions.get('activity') or {}).get('score')
+    return 1.0 if score is None else 0.5 + score / 100
+
+
+def series_rate(output: Optional[Dict], kind: Optional[str]) -> Optional[float]:
+    """每日统计中最后 RECENT_DAYS 天的日均数，没有每日统计返回 None"""
+    if not output or not kind or f"daily_{kind}" not in output:
+        return None
+    daily = output[f"daily_{kind}"] or {}
+    end = parse_time(output.get('end_date')) or parse_time(max(daily, default=None))
+    if end is None:
+        return 0.0
+    since = (end - timedelta(days=RECENT_DAYS - 1)).strftime("%Y-%m-%d")
+    return sum(count for date, count in daily.items() if date >= since) / RECENT_DAYS
+
+
+def catalog_total(entry: Dict, fields: Iterable[str]) -> Optional[int]:
+    values = [entry.get(field) for field in fields]
+    if not values or any(value is None for value in values):
+        return None
+    return sum(values)
+
+
+def catalog_rate(entry: Dict, fields: Iterable[str], now: datetime) -> Optional[float]:
+    """项目目录中的总数 ÷ 仓库年龄（天）"""
+    total = catalog_total(entry, fields)
+    created = parse_time(entry.get('created_at'))
+    if total is None or created is None:
+        return None
+    return total / max((now - created).total_seconds() / 86400, 1)
+
+
+class JobScore:
+    def __init__(self, project: str, data_type: str, score: float, cost: float, expected: float,
+                 stale_days: Optional[float]):
+        self.project = project
+        self.data_type = data_type
+        self.score = score
+        self.cost = cost
+        self.expected = expected
+        self.stale_days = stale_days
+
+    def describe(self) -> str:
+        if self.stale_days is None:
+            return f"{self.project} {self.data_type} (未爬取, 预计 {self.cost:.0f} 次请求)"
+        return (f"{self.project} {self.data_type} ({self.stale_days:.1f} 天未更新, 预计新增 {self.expected:.0f}, "
+                f"{self.cost:.0f} 次请求)")
+
+
+def score_job(project: str, data_type: str, output: Optional[Dict], finished_at: Optional[float],
+              entry: Dict, health: Optional[Dict], now: datetime) -> JobScore:
+    kind, fields = JOB_KINDS.get(data_type, (None, ()))
+    last = datetime.fromtimestamp(finished_at, timezone.utc) if finished_at else None
+    if last is None and output:
+        last = parse_time(output.get('crawled_at'))
+
+    factor = activity_factor(health)
+    if entry.get('archived'):
+        factor = 0.0
+    if last is None:
+        total = catalog_total(entry, fields)
+        cost = 1 + total / PER_PAGE if total is not None else DEFAULT_COST
+        return JobScore(project, data_type, NEVER_CRAWLED + factor, cost, total or 0, None)
+
+    pushed_at = parse_time(entry.get('pushed_at'))
+    if data_type == 'commits' and pushed_at is not None and pushed_at <= last:
+        factor = 0.0
+    rate = series_rate(output, kind)
+    if rate is None:
+        rate = catalog_rate(entry, fields, now)
+    stale_days = max((now - last).total_seconds() / 86400, 0)
+    expected = (rate if rate is not None else 1.0) * stale_days * factor
+    cost = 1 + expected / PER_PAGE
+    return JobScore(project, data_type, expected / cost, cost, expected, stale_days)
+
+
+def schedule(queue: JobQueue, projects: List[str], data_types: Iterable[str],
+             load: Optional[Callable[[str, str], Optional[Dict]]] = None, budget: int = BUDGET,
+             now: Optional[datetime] = None) -> List[str]:
+    """
+    给 projects 中 data_types 的任务打分并写入队列，返回本次可领取的项目（按分数从高到低，预计消耗不超过预算）；
+    load(项目, 数据类型) 读取已有的输出（每日统计）；未启用调度时清零优先级并原样返回 projects
+    """
+    data_types = list(data_types)
+    if not SCHEDULE:
+        for data_type in data_types:
+            queue.prioritize(data_type, dict.fromkeys(projects, 0.0))
+        return projects
+    now = now or datetime.now(timezone.utc)
+    catalog = load_catalog()
+    health = load_health_scores()
+
+    scores = []
+    for data_type in data_types:
+        finished = queue.finished(projects, data_type)
+        statuses = queue.statuses(projects, data_type)
+        ranked = [
+            score_job(project, data_type, load(project, data_type) if load else None, finished.get(project),
+                      catalog.get(project) or {}, health.get(project), now)
+            for project in projects if statuses.get(project) != DONE
+        ]
+        queue.prioritize(data_type, {s.project: s.score for s in ranked})
+        scores.extend(ranked)
+    scores.sort(key=lambda s: s.score, reverse=True)
+
+    selected, planned = [], 0.0
+    for s in scores:
+        # 至少领取一个任务，避免预算小于单个任务的预计消耗时什么都不做
+        if budget and selected and planned + s.cost > budget:
+            continue
+        selected.append(s)
+        planned += s.cost
+    print(f"📋 调度 {'/'.join(data_types)}: {len(scores)} 个待爬任务, 本次领取 {len(selected)} 个, "
+          f"预计 {planned:.0f} 次请求" + (f" (预算 {budget})" if budget else ""))
+    for s in selected[:5]:
+        print(f"    {s.describe()}")
+    return list(dict.fromkeys(s.project for s in selected))
+
+
+class RunBudget:
+    """本次运行的 API 请求预算，used() 返回累计消耗的请求数"""
+
+    def __init__(self, limit: int, used: Callable[[], int]):
+        self.limit = limit
+        self.used = used
+        self.start = used()
+
+    @property
+    def spent(self) -> int:
+        return self.used() - self.start
+
+    def exhausted(self) -> bool:
+        return self.spent >= self.limit
+
+
+def crawler_budget(crawler, limit: int = BUDGET) -> Optional[RunBudget]:
+    """异步内核爬虫的实际消耗（304 命中缓存不占额度），未设置预算返回 None"""
+    if not limit:
+        return None
+    return RunBudget(limit, lambda: crawler.stats.requests - crawler.stats.cache_hits)
@@ -0,0 +1,107 @@
+"""
+分片爬取（--shard i/N 或 CRAWL_SHARD=i/N，分片号从 1 开始）
+多个独立进程（可以在不同机器上）各跑一个分片，不重复爬取:
+    项目    按项目名的 sha1 取模分配，与项目列表的顺序和增删无关，同一项目总落在同一分片
+    Token   第 i 个分片使用下标 ≡ i-1 (mod N) 的 Token，各分片的 Token 互不相交，
+            额度和二级限流互不影响，总吞吐随 Token 数近似线性增长
+每个项目的输出只由它所在的分片写入:
+    同一工作目录（共享 data/）运行时输出直接落在一起，任务队列本身支持多进程，
+    多个进程都会写的 project_catalog.json / token_state.json 写入时加文件锁（file_lock）；
+    在不同目录 / 机器上运行时，用 merge_shards.py 合并各分片的 data 目录
+
+运行方式:
+    python crawl_stars.py --shard 1/4 &
+    python crawl_stars.py --shard 2/4 &  ...
+"""
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Sequence, Tuple
+
+SHARD_ENV = "CRAWL_SHARD"
+# 持有锁的进程崩溃后，锁文件超过这个时间视为失效
+LOCK_STALE_SECONDS = 60
+
+
+def parse_shard(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """"2/4" -> (2, 4)，空值返回 None"""
+    if not value:
+        return None
+    try:
+        index, count = (int(part) for part in value.split('/', 1))
+    except ValueError:
+        raise ValueError(f"分片格式应为 i/N（如 1/4）: {value}")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"分片号应在 1~N 之间: {value}")
+    return index, count
+
+
+def pop_shard_arg(argv: List[str]) -> Optional[Tuple[int, int]]:
+    """从命令行参数中取出 --shard i/N（原地删除，其余参数按原来的方式解析），没有时读 CRAWL_SHARD"""
+    for i, arg in enumerate(argv):
+        if arg == '--shard' and i + 1 < len(argv):
+            value = argv[i + 1]
+            del argv[i:i + 2]
+            return parse_shard(value)
+        if arg.startswith('--shard='):
+            del argv[i]
+            return parse_shard(arg.split('=', 1)[1])
+    return parse_shard(os.getenv(SHARD_ENV))
+
+
+def shard_of(project: str, count: int) -> int:
+    """项目所在的分片号（1~count）"""
+    digest = hashlib.sha1(project.encode('utf-8')).hexdigest()
+    return int(digest, 16) % count + 1
+
+
+def shard_projects(projects: Sequence[str], shard: Optional[Tuple[int, int]]) -> List[str]:
+    if shard is None:
+        return list(projects)
+    index, count = shard
+    return [p for p in projects if shard_of(p, count) == index]
+
+
+def shard_tokens(tokens: Sequence[str], shard: Optional[Tuple[int, int]]) -> List[str]:
+    if shard is None:
+        return list(tokens)
+    index, count = shard
+    subset = list(tokens[index - 1::count])
+    if not subset:
+        raise ValueError(f"Token 数 ({len(tokens)}) 少于分片数 ({count})，第 {index} 个分片没有可用的 Token")
+    return subset
+
+
+def describe(shard: Optional[Tuple[int, int]], projects: Sequence[str], tokens: Sequence[str]) -> str:
+    index, count = shard
+    return f"🧩 分片 {index}/{count}: {len(projects)} 个项目, {len(tokens)} 个Token"
+
+
+@contextmanager
+def file_lock(path: str, timeout: float = LOCK_STALE_SECONDS):
+    """多个进程读改写同一文件时的互斥锁（<path>.lock，O_EXCL 创建，跨平台）"""
+    lock = path + '.lock'
+    directory = os.path.dirname(lock)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) > timeout:
+                    os.remove(lock)
+                    continue
+            except OSError:
+                continue
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        try:
+            os.remove(lock)
+        except OSError:
+            pass
@@ -0,0 +1,303 @@
+"""
+爬虫输出目标（sink）
+CRAWL_SINK 选择输出目标，逗号分隔可同时写多个（默认 json）:
+    json     每个项目一个 JSON / JSONL 文件（data/star、data/issue 等，与之前相同）
+    sqlite   本地 SQLite 文件（CRAWL_SINK_DB，默认 data/crawl.sqlite），表结构与 MySQL 相同，可作为数据库的替身
+    mysql    直接写入 MySQL（连接参数默认与 clean/import_data_folder.py 相同，可用 CRAWL_MYSQL_* 覆盖）
+
+数据库表与导入脚本（import_data_folder.py / import_commits_prs.py）同名同列，另加主键 / 唯一键用于 upsert
+（common/table_keys.py；MySQL 中已由导入脚本建好、没有键的表在打开时补上键并去重）:
+    stars / forks / commit_activity / pr_daily    每个项目每天一行，(project, date)
+    issues                                         (project, number)
+    comments                                       (project, comment_id)
+    crawl_series                                   每个项目每类每日统计的时间范围、总数、爬取时间（增量模式的水位）
+
+每日统计在项目完成时写入；增量模式只改写 since 之后的天（先删后插，在一个事务内）。
+issue / 评论每批追加时按 BATCH_SIZE 分批 upsert，无需再由导入脚本重新读取 JSON。
+不写 json 时，增量模式从 crawl_series 表和每日统计表读取原有数据
+"""
+import json
+import os
+import sqlite3
+import sys
+from typing import Dict, Iterable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.table_keys import UNIQUE_KEYS, ensure_unique_key
+from incremental import load_output
+
+SINK_NAMES = [name.strip() for name in os.getenv("CRAWL_SINK", "json").split(",") if name.strip()] or ["json"]
+SINK_DB_FILE = os.getenv("CRAWL_SINK_DB", os.path.join("data", "crawl.sqlite"))
+MYSQL_CONFIG = {
+    "host": os.getenv("CRAWL_MYSQL_HOST", "127.0.0.1"),
+    "port": int(os.getenv("CRAWL_MYSQL_PORT", "3306")),
+    "user": os.getenv("CRAWL_MYSQL_USER", "root"),
+    "password": os.getenv("CRAWL_MYSQL_PASSWORD", "root"),
+    "database": os.getenv("CRAWL_MYSQL_DB", "openrankdata"),
+}
+BATCH_SIZE = 500
+
+# 每日统计: 数据类型 -> (表, 计数列, 每行附带的总数列)
+SERIES_TABLES = {
+    'stars': ('stars', 'stars_count', 'total_stargazers'),
+    'forks': ('forks', 'forks_count', 'total_forks'),
+    'commits': ('commit_activity', 'commit_count', None),
+    'prs': ('pr_daily', 'pr_count', None),
+}
+
+TABLES = {
+    'stars': ("project VARCHAR(255) NOT NULL, date VARCHAR(10) NOT NULL, stars_count INT, total_stargazers BIGINT",
+              UNIQUE_KEYS['stars']),
+    'forks': ("project VARCHAR(255) NOT NULL, date VARCHAR(10) NOT NULL, forks_count INT, total_forks BIGINT",
+              UNIQUE_KEYS['forks']),
+    'commit_activity': ("project VARCHAR(255) NOT NULL, date VARCHAR(10) NOT NULL, commit_count INT",
+                        UNIQUE_KEYS['commit_activity']),
+    'pr_daily': ("project VARCHAR(255) NOT NULL, date VARCHAR(10) NOT NULL, pr_count INT",
+                 UNIQUE_KEYS['pr_daily']),
+    'issues': ("project VARCHAR(255) NOT NULL, title LONGTEXT, body LONGTEXT, state TEXT, number BIGINT NOT NULL, "
+               "created_at VARCHAR(40), closed_at VARCHAR(40), labels LONGTEXT, author_association TEXT, "
+               "`user` TEXT, html_url TEXT",
+               UNIQUE_KEYS['issues']),
+    'comments': ("project VARCHAR(255) NOT NULL, issue_url TEXT, issue_number BIGINT, comment_id BIGINT NOT NULL, "
+                 "body LONGTEXT, `user` TEXT, created_at VARCHAR(40), updated_at VARCHAR(40), html_url TEXT",
+                 UNIQUE_KEYS['comments']),
+    'crawl_series': ("kind VARCHAR(20) NOT NULL, project VARCHAR(255) NOT NULL, start_date VARCHAR(10), "
+                     "end_date VARCHAR(10), crawled_at VARCHAR(40), total_in_range BIGINT, total_all_time BIGINT",
+                     ('kind', 'project')),
+}
+
+
+def issue_row(project: str, issue: Dict) -> Dict:
+    """与 import_data_folder.process_issue_file 的行结构一致"""
+    return {
+        'project': project,
+        'title': issue.get('title', ''),
+        'body': issue.get('body', ''),
+        'state': issue.get('state', ''),
+        'number': issue.get('number', 0),
+        'created_at': issue.get('created_at', ''),
+        'closed_at': issue.get('closed_at', ''),
+        'labels': json.dumps(issue.get('labels', []), ensure_ascii=False),
+        'author_association': issue.get('author_association', ''),
+        'user': issue.get('user', ''),
+        'html_url': issue.get('html_url', '')
+    }
+
+
+def comment_rows(project: str, group: Dict) -> List[Dict]:
+    """评论组 -> 每条评论一行，与 import_data_folder.process_comment_file 的行结构一致"""
+    issue_url = group.get('issue_url', '')
+    number = issue_url.rstrip('/').rsplit('/', 1)[-1]
+    return [{
+        'project': project,
+        'issue_url': issue_url,
+        'issue_number': int(number) if number.isdigit() else None,
+        'comment_id': comment.get('id', 0),
+        'body': comment.get('body', ''),
+        'user': comment.get('user') or '',
+        'created_at': comment.get('created_at') or comment.get('created_time') or '',
+        'updated_at': comment.get('updated_at') or comment.get('updated_time') or '',
+        'html_url': comment.get('html_url', '')
+    } for comment in group.get('comments', [])]
+
+
+class DatabaseSink:
+    """按批 upsert 的数据库 sink，子类提供连接、占位符和 upsert 语法"""
+    placeholder = '?'
+
+    def __init__(self, conn):
+        self.conn = conn
+        for table, (columns, keys) in TABLES.items():
+            self.execute(f"CREATE TABLE IF NOT EXISTS `{table}` ({columns}, PRIMARY KEY ({', '.join(keys)}))")
+        self.conn.commit()
+
+    def execute(self, sql: str, params: tuple = ()):
+        cur = self.conn.cursor()
+        cur.execute(sql, params)
+        return cur
+
+    def upsert_clause(self, keys: Iterable[str], columns: Iterable[str]) -> str:
+        raise NotImplementedError
+
+    def upsert(self, table: str, rows: List[Dict]):
+        if not rows:
+            return
+        columns = list(rows[0])
+        keys = TABLES[table][1]
+        updates = [c for c in columns if c not in keys]
+        sql = (f"INSERT INTO `{table}` ({', '.join(f'`{c}`' for c in columns)}) "
+               f"VALUES ({', '.join([self.placeholder] * len(columns))}) {self.upsert_clause(keys, updates)}")
+        cur = self.conn.cursor()
+        for i in range(0, len(rows), BATCH_SIZE):
+            cur.executemany(sql, [tuple(row[c] for c in columns) for row in rows[i:i + BATCH_SIZE]])
+
+    def save_series(self, kind: str, result: Dict, since: Optional[str] = None):
+        """写入一个项目的每日统计（result 为爬虫输出的 JSON 结构）；since 不为空时只改写该日期及之后的天"""
+        table, count_column, total_column = SERIES_TABLES[kind]
+        project = result['project']
+        total = result.get(f"total_{kind}_all_time")
+        p = self.placeholder
+        try:
+            if since is None:
+                self.execute(f"DELETE FROM `{table}` WHERE project = {p}", (project,))
+            else:
+                self.execute(f"DELETE FROM `{table}` WHERE project = {p} AND date >= {p}", (project, since))
+            rows = []
+            for date, count in result.get(f"daily_{kind}", {}).items():
+                if since is not None and date < since:
+                    continue
+                row = {'project': project, 'date': date, count_column: count}
+                if total_column:
+                    row[total_column] = total
+                rows.append(row)
+            self.upsert(table, rows)
+            if total_column and since is not None:
+                self.execute(f"UPDATE `{table}` SET {total_column} = {p} WHERE project = {p}", (total, project))
+            self.upsert('crawl_series', [{
+                'kind': kind,
+                'project': project,
+                'start_date': result.get('start_date'),
+                'end_date': result.get('end_date'),
+                'crawled_at': result.get('crawled_at'),
+                'total_in_range': result.get(f"total_{kind}_in_range"),
+                'total_all_time': total
+            }])
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+    def load_series(self, kind: str, project: str) -> Optional[Dict]:
+        """按爬虫输出的 JSON 结构读回一个项目的每日统计，没有记录返回 None"""
+        table, count_column, _ = SERIES_TABLES[kind]
+        p = self.placeholder
+        row = self.execute(
+            f"SELECT start_date, end_date, crawled_at, total_in_range, total_all_time FROM crawl_series "
+            f"WHERE kind = {p} AND project = {p}", (kind, project)
+        ).fetchone()
+        if row is None:
+            return None
+        daily = self.execute(
+            f"SELECT date, {count_column} FROM `{table}` WHERE project = {p} ORDER BY date", (project,)
+        ).fetchall()
+        start_date, end_date, crawled_at, total_in_range, total_all_time = row
+        return {
+            "project": project,
+            f"total_{kind}_in_range": total_in_range,
+            f"total_{kind}_all_time": total_all_time,
+            "start_date": start_date,
+            "end_date": end_date,
+            "crawled_at": crawled_at,
+            f"daily_{kind}": dict(daily)
+        }
+
+    def write_records(self, kind: str, project: str, records: List[Dict]):
+        """追加一批 issue（kind='issues'）或评论组（kind='comments'）"""
+        if kind == 'issues':
+            rows = [issue_row(project, issue) for issue in records]
+        else:
+            rows = [row for group in records for row in comment_rows(project, group)]
+        try:
+            self.upsert(kind, rows)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+    def last_created_at(self, kind: str, project: str) -> Optional[str]:
+        row = self.execute(
+            f"SELECT MAX(created_at) FROM `{kind}` WHERE project = {self.placeholder}", (project,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self.conn.close()
+
+
+class SqliteSink(DatabaseSink):
+    def __init__(self, path: str = SINK_DB_FILE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        super().__init__(conn)
+
+    def upsert_clause(self, keys, columns):
+        if not columns:
+            return f"ON CONFLICT ({', '.join(keys)}) DO NOTHING"
+        return (f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+                + ', '.join(f"`{c}` = excluded.`{c}`" for c in columns))
+
+
+class MySqlSink(DatabaseSink):
+    placeholder = '%s'
+
+    def __init__(self, config: Dict = MYSQL_CONFIG):
+        import pymysql
+        super().__init__(pymysql.connect(charset='utf8mb4', **config))
+        # 导入脚本用 to_sql 建的同名表没有键，CREATE TABLE IF NOT EXISTS 不会改动它们，upsert 会变成追加
+        for table in UNIQUE_KEYS:
+            ensure_unique_key(self.conn, table, TABLES[table][1])
+
+    def upsert_clause(self, keys, columns):
+        columns = list(columns) or list(keys)[:1]
+        return "ON DUPLICATE KEY UPDATE " + ', '.join(f"`{c}` = VALUES(`{c}`)" for c in columns)
+
+
+class Sinks:
+    """按 CRAWL_SINK 组合的输出目标"""
+
+    def __init__(self, names: Iterable[str] = SINK_NAMES):
+        names = list(names)
+        unknown = set(names) - {'json', 'sqlite', 'mysql'}
+        if unknown:
+            raise ValueError(f"未知的 CRAWL_SINK: {', '.join(sorted(unknown))}")
+        self.json = 'json' in names
+        self.databases: List[DatabaseSink] = []
+        if 'sqlite' in names:
+            self.databases.append(SqliteSink())
+        if 'mysql' in names:
+            self.databases.append(MySqlSink())
+
+    def save_series(self, kind: str, result: Dict, path: str, since: Optional[str] = None):
+        if self.json:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+        for database in self.databases:
+            database.save_series(kind, result, since)
+
+    def load_series(self, kind: str, project: str, path: str) -> Optional[Dict]:
+        if self.json:
+            return load_output(path)
+        for database in self.databases:
+            return database.load_series(kind, project)
+        return None
+
+    def write_records(self, kind: str, project: str, records: List[Dict]):
+        """写入数据库 sink（JSONL 文件仍由爬虫自己追加）"""
+        if not records:
+            return
+        for database in self.databases:
+            database.write_records(kind, project, records)
+
+    def last_created_at(self, kind: str, project: str) -> Optional[str]:
+        for database in self.databases:
+            return database.last_created_at(kind, project)
+        return None
+
+    def close(self):
+        for database in self.databases:
+            database.close()
+        self.databases = []
+
+
+_sinks: Dict[str, Sinks] = {}
+
+
+def open_sinks() -> Sinks:
+    """按当前目录复用同一组输出目标（数据库 sink 使用相对路径）"""
+    key = os.getcwd()
+    if key not in _sinks:
+        _sinks[key] = Sinks()
+    return _sinks[key]
@@ -0,0 +1,138 @@
+"""
+条件请求缓存（http_cache.py）测试
+用本地模拟服务（fake_github.py）验证 304 路径：再次请求同一页时带 If-None-Match，
+304 不消耗额度，返回的数据和分页响应头与首次请求一致；按 Token 隔离时不用其他 Token 存下的缓存
+
+运行方式:
+    python crawls/test_http_cache.py
+    python -m pytest crawls/test_http_cache.py
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_github import FakeDataset, start_server
+from github_core import AsyncGitHubCrawler, CrawlStats, link_page
+from http_cache import HttpCache, cache_key
+
+REPO_PATH = '/repos/octo/demo/stargazers'
+PAGES = 6
+PER_PAGE = 30
+
+
+def crawl(server, cache_file: str, tokens, scope: str = None):
+    """并发获取 PAGES 页，返回 (各页 (数据, 总页数), 统计)"""
+    stats = CrawlStats()
+
+    async def run():
+        async with AsyncGitHubCrawler(tokens, base_url=server.base_url, stats=stats, state_file=None,
+                                      cache_file=cache_file) as crawler:
+            if scope is not None:
+                crawler.cache = HttpCache(cache_file, scope=scope)
+            results = await asyncio.gather(*(crawler.get_page(REPO_PATH, page=page, per_page=PER_PAGE)
+                                             for page in range(1, PAGES + 1)))
+        return [(data, link_page(headers, 'last') or page) for page, (data, headers) in enumerate(results, 1)]
+
+    return asyncio.run(run()), stats
+
+
+def with_server(check):
+    server = start_server(latency=0, dataset=FakeDataset(stars=PAGES * PER_PAGE * 2))
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            check(server, os.path.join(tmp, 'http_cache.sqlite'))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_not_modified_served_from_cache():
+    """第二次爬取全部 304：数据和 Link 头来自缓存，不消耗 core 额度"""
+    def check(server, cache_file):
+        first, stats = crawl(server, cache_file, ['token-a'])
+        assert stats.cache_misses == PAGES and stats.cache_hits == 0
+        assert all(data for data, _ in first)
+        server.reset_counters()
+
+        second, stats = crawl(server, cache_file, ['token-a'])
+        counters = server.reset_counters()
+        assert stats.cache_hits == PAGES and stats.cache_misses == 0, stats.summary()
+        assert counters.get('304') == PAGES, counters
+        assert counters.get('core', 0) == 0, counters
+        assert second == first
+    with_server(check)
+
+
+def test_cache_follows_token():
+    """多个 Token 时优先用存下缓存的 Token，再次爬取仍全部命中"""
+    def check(server, cache_file):
+        tokens = [f'token-{i}' for i in range(4)]
+        first, _ = crawl(server, cache_file, tokens)
+        second, stats = crawl(server, cache_file, tokens)
+        assert stats.cache_hits == PAGES, stats.summary()
+        assert second == first
+    with_server(check)
+
+
+def test_cache_scoped_by_token():
+    """按 Token 隔离（默认）时其他 Token 不发条件请求；shared 时任何 Token 都能命中"""
+    def check(server, cache_file):
+        first, _ = crawl(server, cache_file, ['token-a'])
+
+        _, stats = crawl(server, cache_file, ['token-b'], scope='token')
+        assert stats.cache_hits == 0 and stats.cache_misses == PAGES, stats.summary()
+
+        # 上一步把缓存改记为 token-b，shared 模式下 token-c 也能用
+        second, stats = crawl(server, cache_file, ['token-c'], scope='shared')
+        assert stats.cache_hits == PAGES, stats.summary()
+        assert second == first
+    with_server(check)
+
+
+def test_cache_store():
+    """只缓存带校验头的响应；缓存键与 Token 无关、与参数顺序无关；旧版缓存文件补上 fingerprint 列"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'http_cache.sqlite')
+        key = cache_key('GET', 'https://api.github.com/x', {'page': 2, 'per_page': 100}, 'application/json')
+        assert key == cache_key('get', 'https://api.github.com/x', {'per_page': '100', 'page': '2'},
+                                'application/json')
+
+        cache = HttpCache(path)
+        cache.put('no-validator', 'u', {'Content-Type': 'application/json'}, b'[]', 'fp-a')
+        cache.put(key, 'u', {'ETag': 'W/"1"', 'Link': '<u?page=3>; rel="last"', 'X-Other': '1'}, b'[1]', 'fp-a')
+        assert cache.get('no-validator') is None
+        entry = cache.get(key)
+        assert entry.body == b'[1]' and entry.headers == {'ETag': 'W/"1"', 'Link': '<u?page=3>; rel="last"'}
+        assert entry.validators() == {'If-None-Match': 'W/"1"'}
+        assert cache.usable(entry, 'fp-a') and not cache.usable(entry, 'fp-b')
+        assert HttpCache(path, scope='shared').usable(entry, 'fp-b')
+        cache.close()
+        assert HttpCache(path).get(key).fingerprint == 'fp-a'
+
+        legacy = os.path.join(tmp, 'legacy.sqlite')
+        with sqlite3.connect(legacy) as conn:
+            conn.execute("CREATE TABLE responses (key TEXT PRIMARY KEY, url TEXT NOT NULL, etag TEXT, "
+                         "last_modified TEXT, headers TEXT NOT NULL, body BLOB NOT NULL, stored_at REAL NOT NULL)")
+        conn.close()
+        cache = HttpCache(legacy)
+        cache.put(key, 'u', {'ETag': 'W/"2"'}, b'[2]', 'fp-a')
+        cache.close()
+        assert HttpCache(legacy).get(key).fingerprint == 'fp-a'
+
+
+if __name__ == '__main__':
+    tests = [test_not_modified_served_from_cache, test_cache_follows_token, test_cache_scoped_by_token,
+             test_cache_store]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,157 @@
+"""
+任务队列（job_queue.py）测试
+两个 JobQueue 实例（不同 worker_id）共用一个队列文件，模拟两个爬虫进程:
+租约未到期时任务不会被重复领取，续租（心跳 / 保存游标）推迟到期时间，
+持有者崩溃、租约到期后任务被另一进程接管，原持有者的写入被拒绝（LeaseLost）
+
+运行方式:
+    python crawls/test_job_queue.py
+    python -m pytest crawls/test_job_queue.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from job_queue import DONE, FAILED, MAX_ATTEMPTS, PENDING, RUNNING, JobQueue, LeaseLost, run_jobs
+
+LEASE = 0.3
+PROJECTS = ['octo/alpha', 'octo/beta']
+
+
+def open_pair(path: str):
+    return tuple(JobQueue(path, worker_id=worker, lease_seconds=LEASE) for worker in ('worker-a', 'worker-b'))
+
+
+def job_row(queue: JobQueue, project: str, data_type: str = 'star'):
+    return queue.conn.execute(
+        "SELECT status, attempts, lease_owner FROM jobs WHERE project = ? AND data_type = ?", (project, data_type)
+    ).fetchone()
+
+
+def test_lease_expiry():
+    """租约到期前不可重复领取；到期后被接管，原持有者保存游标抛出 LeaseLost，完成标记无效"""
+    with tempfile.TemporaryDirectory() as tmp:
+        a, b = open_pair(os.path.join(tmp, 'jobs.sqlite'))
+        try:
+            a.enqueue(PROJECTS[:1], 'star')
+            assert a.claim(['star'], PROJECTS) == ('octo/alpha', 'star')
+            a.save_cursor('octo/alpha', 'star', {'page': 3})
+            assert b.claim(['star'], PROJECTS) is None
+
+            # worker-a 不再续租（模拟崩溃），租约到期后 worker-b 接管，游标保留
+            time.sleep(LEASE * 1.5)
+            assert b.claim(['star'], PROJECTS) == ('octo/alpha', 'star')
+            assert b.cursor('octo/alpha', 'star') == {'page': 3}
+            assert job_row(b, 'octo/alpha') == (RUNNING, 2, 'worker-b')
+
+            try:
+                a.save_cursor('octo/alpha', 'star', {'page': 4})
+            except LeaseLost:
+                pass
+            else:
+                raise AssertionError("租约被接管后保存游标应抛出 LeaseLost")
+            a.complete('octo/alpha', 'star')
+            assert job_row(b, 'octo/alpha') == (RUNNING, 2, 'worker-b')
+
+            b.save_cursor('octo/alpha', 'star', {'page': 5})
+            b.complete('octo/alpha', 'star')
+            assert job_row(b, 'octo/alpha') == (DONE, 2, None)
+            assert b.cursor('octo/alpha', 'star') == {'page': 5}
+            assert b.claim(['star'], PROJECTS) is None
+        finally:
+            a.close()
+            b.close()
+
+
+def test_renewal_keeps_lease():
+    """心跳和保存游标续租：超过一个租约周期仍不会被接管"""
+    with tempfile.TemporaryDirectory() as tmp:
+        a, b = open_pair(os.path.join(tmp, 'jobs.sqlite'))
+        try:
+            a.enqueue(PROJECTS, 'fork')
+            first = a.claim(['fork'], PROJECTS)
+            deadline = time.time() + LEASE * 2
+            i = 0
+            while time.time() < deadline:
+                time.sleep(LEASE / 4)
+                if i % 2:
+                    a.heartbeat()
+                else:
+                    a.save_cursor(*first, {'page': i})
+                i += 1
+                claimed = b.claim(['fork'], [first[0]])
+                assert claimed is None, f"续租后任务被接管: {claimed}"
+            # 另一个项目不受影响
+            assert b.claim(['fork'], PROJECTS) == (PROJECTS[1], 'fork')
+        finally:
+            a.close()
+            b.close()
+
+
+def test_fail_release_and_reenqueue():
+    """失败延迟重试，达到 MAX_ATTEMPTS 标记 failed，重新入队时恢复；中断交还不计尝试次数"""
+    with tempfile.TemporaryDirectory() as tmp:
+        a, b = open_pair(os.path.join(tmp, 'jobs.sqlite'))
+        try:
+            a.enqueue(PROJECTS[:1], 'issues')
+            a.claim(['issues'], PROJECTS)
+            a.release('octo/alpha', 'issues')
+            assert job_row(a, 'octo/alpha', 'issues') == (PENDING, 0, None)
+
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                assert b.claim(['issues'], PROJECTS) == ('octo/alpha', 'issues'), attempt
+                b.fail('octo/alpha', 'issues', 'HTTP 502')
+                # 重试时间未到，不可领取；测试中直接把重试时间提前
+                assert a.claim(['issues'], PROJECTS) is None
+                a.conn.execute("UPDATE jobs SET available_at = 0")
+            assert job_row(a, 'octo/alpha', 'issues') == (FAILED, MAX_ATTEMPTS, None)
+            assert a.claim(['issues'], PROJECTS) is None
+
+            a.enqueue(PROJECTS[:1], 'issues')
+            assert job_row(a, 'octo/alpha', 'issues') == (PENDING, 0, None)
+            assert a.claim(['issues'], PROJECTS) == ('octo/alpha', 'issues')
+        finally:
+            a.close()
+            b.close()
+
+
+def test_run_jobs_heartbeat():
+    """run_jobs 执行期间定时续租：worker 耗时超过租约，另一进程也领取不到同一任务"""
+    with tempfile.TemporaryDirectory() as tmp:
+        a, b = open_pair(os.path.join(tmp, 'jobs.sqlite'))
+        stolen = []
+
+        async def worker(project, data_type):
+            for _ in range(4):
+                await asyncio.sleep(LEASE / 2)
+                job = b.claim([data_type], [project])
+                if job:
+                    stolen.append(job)
+            return True
+
+        try:
+            a.enqueue(PROJECTS, 'commits')
+            results = asyncio.run(run_jobs(a, ['commits'], PROJECTS, worker, concurrency=2))
+            assert sorted(results) == [(p, 'commits', True) for p in PROJECTS]
+            assert not stolen, stolen
+            assert a.statuses(PROJECTS, 'commits') == dict.fromkeys(PROJECTS, DONE)
+        finally:
+            a.close()
+            b.close()
+
+
+if __name__ == '__main__':
+    tests = [test_lease_expiry, test_renewal_keeps_lease, test_fail_release_and_reenqueue, test_run_jobs_heartbeat]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,145 @@
+"""
+分片（sharding.py）测试
+各分片的项目和 Token 两两不相交、合起来覆盖全部；项目的分配与列表顺序和增删无关
+
+运行方式:
+    python crawls/test_sharding.py
+    python -m pytest crawls/test_sharding.py
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sharding import SHARD_ENV, file_lock, parse_shard, pop_shard_arg, shard_of, shard_projects, shard_tokens
+
+PROJECTS = [f"owner{i % 37}/repo-{i}" for i in range(1000)]
+TOKENS = [f"ghp_token{i}" for i in range(12)]
+
+
+def partition(items, count, split):
+    return [split(items, (index, count)) for index in range(1, count + 1)]
+
+
+def assert_partition(parts, items):
+    """两两不相交，合起来恰好是全部（无重复）"""
+    merged = [item for part in parts for item in part]
+    assert len(merged) == len(set(merged)) == len(items), (len(merged), len(set(merged)), len(items))
+    assert set(merged) == set(items)
+
+
+def test_projects_disjoint():
+    """任意分片数下项目两两不相交并覆盖全部，各分片大致均衡"""
+    for count in (1, 2, 3, 4, 7, 16):
+        parts = partition(PROJECTS, count, shard_projects)
+        assert_partition(parts, PROJECTS)
+        if count > 1:
+            assert min(len(p) for p in parts) > len(PROJECTS) / count / 2, [len(p) for p in parts]
+    assert shard_projects(PROJECTS, None) == PROJECTS
+
+
+def test_projects_stable():
+    """分配只取决于项目名：打乱顺序、增删其他项目后同一项目仍在同一分片"""
+    count = 5
+    before = {p: shard_of(p, count) for p in PROJECTS}
+    shuffled = PROJECTS[::-1][::2] + [f"new/repo-{i}" for i in range(100)]
+    for index, part in enumerate(partition(shuffled, count, shard_projects), 1):
+        for project in part:
+            if project in before:
+                assert before[project] == index, project
+    # 分片内保持原列表顺序
+    part = shard_projects(PROJECTS, (2, count))
+    assert part == sorted(part, key=PROJECTS.index)
+
+
+def test_tokens_disjoint():
+    """Token 按下标轮流分配，两两不相交并覆盖全部；Token 少于分片数时报错"""
+    for count in (1, 2, 3, 5, 12):
+        parts = partition(TOKENS, count, shard_tokens)
+        assert_partition(parts, TOKENS)
+        assert max(len(p) for p in parts) - min(len(p) for p in parts) <= 1
+    assert shard_tokens(TOKENS, (2, 4)) == ['ghp_token1', 'ghp_token5', 'ghp_token9']
+    assert shard_tokens(TOKENS, None) == TOKENS
+    try:
+        shard_tokens(TOKENS[:2], (3, 3))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Token 数少于分片数时应报错")
+
+
+def test_parse_shard_args():
+    """--shard i/N、--shard=i/N 和 CRAWL_SHARD，其余参数原样保留；非法值报错"""
+    argv = ['crawl_stars.py', '--shard', '2/4', 'projects.txt']
+    assert pop_shard_arg(argv) == (2, 4) and argv == ['crawl_stars.py', 'projects.txt']
+    argv = ['crawl_stars.py', '--shard=3/3']
+    assert pop_shard_arg(argv) == (3, 3) and argv == ['crawl_stars.py']
+
+    saved = os.environ.pop(SHARD_ENV, None)
+    try:
+        assert pop_shard_arg(['x']) is None
+        os.environ[SHARD_ENV] = '1/2'
+        assert pop_shard_arg(['x']) == (1, 2)
+    finally:
+        os.environ.pop(SHARD_ENV, None)
+        if saved is not None:
+            os.environ[SHARD_ENV] = saved
+
+    assert parse_shard('') is None
+    for value in ('0/4', '5/4', '1/0', 'a/b', '3'):
+        try:
+            parse_shard(value)
+        except ValueError:
+            continue
+        raise AssertionError(f"{value} 应报错")
+
+
+def test_file_lock_exclusive():
+    """多个线程读改写同一文件：加锁后计数不丢失；过期的锁文件被清理"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'counter.txt')
+        with open(path, 'w') as f:
+            f.write('0')
+
+        def bump():
+            for _ in range(20):
+                with file_lock(path):
+                    with open(path) as f:
+                        value = int(f.read())
+                    time.sleep(0.001)
+                    with open(path, 'w') as f:
+                        f.write(str(value + 1))
+
+        threads = [threading.Thread(target=bump) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        with open(path) as f:
+            assert int(f.read()) == 80
+        assert not os.path.exists(path + '.lock')
+
+        # 崩溃进程留下的锁文件超过 timeout 后视为失效
+        open(path + '.lock', 'w').close()
+        stale = time.time() - 10
+        os.utime(path + '.lock', (stale, stale))
+        with file_lock(path, timeout=1):
+            pass
+        assert not os.path.exists(path + '.lock')
+
+
+if __name__ == '__main__':
+    tests = [test_projects_disjoint, test_projects_stable, test_tokens_disjoint, test_parse_shard_args,
+             test_file_lock_exclusive]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,227 @@
+"""
+GitHub Token 额度池
+按 Token、按资源类型（core / search / graphql）跟踪剩余额度、重置时间和二级限流冷却，
+每次请求分配给当前余量最多的 Token；全部耗尽时只等待到最早的真实重置时间
+
+状态保存在 data/token_state.json（只记录 Token 指纹，不保存 Token 本身），
+重启后仍未到重置时间的额度信息继续生效，避免一启动就撞上限流
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from sharding import file_lock
+
+TOKEN_STATE_FILE = os.path.join("data", "token_state.json")
+
+RESOURCES = ('core', 'search', 'graphql')
+DEFAULT_LIMITS = {'core': 5000, 'search': 30, 'graphql': 5000}
+# 二级限流没有给出 Retry-After 时的冷却时间（秒）
+SECONDARY_COOLDOWN = 60
+
+
+def token_fingerprint(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()[:12]
+
+
+def resource_for(url: str) -> str:
+    """根据请求地址判断消耗哪类额度"""
+    if '/search/' in url:
+        return 'search'
+    if url.rstrip('/').endswith('/graphql'):
+        return 'graphql'
+    return 'core'
+
+
+class Budget:
+    """单个 Token 某类资源的额度"""
+
+    def __init__(self, resource: str):
+        self.limit = DEFAULT_LIMITS.get(resource, 5000)
+        self.remaining: Optional[int] = None   # None 表示尚未收到响应头
+        self.reset: float = 0.0
+        self.in_flight = 0
+
+    def headroom(self, now: float) -> int:
+        if self.remaining is None or now >= self.reset:
+            return self.limit - self.in_flight
+        return self.remaining - self.in_flight
+
+    def to_dict(self) -> Dict:
+        return {'limit': self.limit, 'remaining': self.remaining, 'reset': self.reset}
+
+    def load(self, data: Dict, now: float):
+        # 已过重置时间的记录没有意义
+        if data.get('reset', 0) > now:
+            self.limit = data.get('limit', self.limit)
+            self.remaining = data.get('remaining')
+            self.reset = data['reset']
+
+
+class TokenState:
+    """单个 Token 的全部额度状态"""
+
+    def __init__(self, index: int, token: str):
+        self.index = index
+        self.token = token
+        self.fingerprint = token_fingerprint(token)
+        self.budgets = {r: Budget(r) for r in RESOURCES}
+        self.blocked_until = 0.0   # 二级限流冷却结束时间
+        self.requests = 0
+
+    def headroom(self, resource: str, now: float) -> int:
+        if now < self.blocked_until:
+            return 0
+        return self.budgets[resource].headroom(now)
+
+    def available_at(self, resource: str, now: float) -> float:
+        """该 Token 下一次可用的时间"""
+        budget = self.budgets[resource]
+        at = self.blocked_until
+        if budget.headroom(now) <= 0 and budget.reset > now:
+            at = max(at, budget.reset)
+        return at
+
+    def update(self, headers, resource: str):
+        """根据 X-RateLimit-* 响应头更新额度（以响应头中的资源类型为准）"""
+        resource = headers.get('X-RateLimit-Resource', resource)
+        budget = self.budgets.get(resource)
+        if budget is None:
+            return
+        if headers.get('X-RateLimit-Limit') is not None:
+            budget.limit = int(headers['X-RateLimit-Limit'])
+        if headers.get('X-RateLimit-Remaining') is not None:
+            budget.remaining = int(headers['X-RateLimit-Remaining'])
+        if headers.get('X-RateLimit-Reset') is not None:
+            budget.reset = float(headers['X-RateLimit-Reset'])
+
+
+class TokenPool:
+    """
+    Token 调度：
+    - acquire(resource) 选余量最多的 Token，余量都为 0 时等待最早可用时间（或其他请求归还）
+    - release() 回写响应头中的额度
+    - 遇到限流时 mark_exhausted / mark_secondary，立即改用其他 Token
+    """
+
+    def __init__(self, tokens: List[str], state_file: Optional[str] = TOKEN_STATE_FILE):
+        self.tokens = [TokenState(i, t) for i, t in enumerate(tokens)]
+        self.state_file = state_file
+        self._cond = asyncio.Condition()
+        self.load()
+
+    # ---------- 持久化 ----------
+
+    def load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for state in self.tokens:
+            entry = saved.get(state.fingerprint)
+            if not entry:
+                continue
+            for resource, data in entry.get('budgets', {}).items():
+                if resource in state.budgets:
+                    state.budgets[resource].load(data, now)
+            if entry.get('blocked_until', 0) > now:
+                state.blocked_until = entry['blocked_until']
+
+    def save(self):
+        if not self.state_file:
+            return
+        with file_lock(self.state_file):
+            saved = {}
+            if os.path.exists(self.state_file):
+                # 保留不在本进程 Token 列表中的记录（其他分片进程使用的 Token）
+                try:
+                    with open(self.state_file, 'r', encoding='utf-8') as f:
+                        saved = json.load(f)
+                except (OSError, ValueError):
+                    saved = {}
+            for state in self.tokens:
+                saved[state.fingerprint] = {
+                    'budgets': {r: b.to_dict() for r, b in state.budgets.items()},
+                    'blocked_until': state.blocked_until,
+                    'updated_at': time.time()
+                }
+            tmp = self.state_file + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(saved, f, indent=2)
+            os.replace(tmp, self.state_file)
+
+    # ---------- 调度 ----------
+
+    async def acquire(self, resource: str = 'core', prefer: Optional[str] = None) -> TokenState:
+        """
+        取额度最多的 Token；prefer 为 Token 指纹（如存下条件请求缓存的 Token），该 Token 有余量时优先使用
+        """
+        async with self._cond:
+            while True:
+                now = time.time()
+                preferred = [t for t in self.tokens if t.fingerprint == prefer] if prefer else []
+                if preferred and preferred[0].headroom(resource, now) > 0:
+                    best = preferred[0]
+                else:
+                    best = max(self.tokens, key=lambda t: t.headroom(resource, now))
+                if best.headroom(resource, now) > 0:
+                    best.budgets[resource].in_flight += 1
+                    best.requests += 1
+                    return best
+                earliest = min(t.available_at(resource, now) for t in self.tokens)
+                wait = max(earliest - now, 0) + 1
+                print(f"\n所有token的 {resource} 额度耗尽，等待 {wait:.0f} 秒至最早的重置时间...")
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, state: TokenState, resource: str = 'core', headers=None):
+        async with self._cond:
+            state.budgets[resource].in_flight -= 1
+            if headers is not None:
+                state.update(headers, resource)
+            self._cond.notify_all()
+
+    def mark_exhausted(self, state: TokenState, resource: str, reset: Optional[float] = None):
+        """主限流：额度归零，直到 reset（缺省按一小时窗口）"""
+        budget = state.budgets[resource]
+        budget.remaining = 0
+        budget.reset = max(budget.reset, reset or time.time() + 3600)
+        self.save()
+
+    def mark_secondary(self, state: TokenState, retry_after: Optional[float] = None):
+        """二级限流：该 Token 冷却 retry_after 秒"""
+        state.blocked_until = max(state.blocked_until, time.time() + (retry_after or SECONDARY_COOLDOWN))
+        self.save()
+
+    def update_from_rate_limit(self, state: TokenState, data: Dict):
+        """用 /rate_limit 返回的 resources 初始化各类额度"""
+        resources = (data or {}).get('resources', {})
+        for resource, budget in state.budgets.items():
+            info = resources.get(resource)
+            if info:
+                budget.limit = info.get('limit', budget.limit)
+                budget.remaining = info.get('remaining', budget.remaining)
+                budget.reset = float(info.get('reset', budget.reset))
+
+    def totals(self) -> Dict[str, int]:
+        """各类资源在所有 Token 上的剩余额度之和"""
+        now = time.time()
+        return {r: sum(max(t.headroom(r, now), 0) for t in self.tokens) for r in RESOURCES}
+
+    def summary(self) -> List[Dict]:
+        now = time.time()
+        return [{
+            'token': t.index + 1,
+            'requests': t.requests,
+            **{f'{r}_remaining': max(t.headroom(r, now), 0) for r in ('core', 'search')},
+            'blocked': now < t.blocked_until
+        } for t in self.tokens]